@@ -0,0 +1,183 @@
+"""Cached snapshots of the objects a user has been granted access to.
+
+Access checks for repositories, review groups and Local Sites depend on
+the user's memberships. Rather than querying for each membership every
+time an object is checked, :py:func:`get_access_snapshot` loads all of a
+user's memberships at once and caches them.
+
+Each user's snapshot is cached under a generation of their own, which is
+replaced whenever any of their memberships change, so a change only
+invalidates the snapshots of the users it affects. Changes made within a
+transaction invalidate the snapshots again once the transaction has ended,
+so that a snapshot built from data that hadn't yet been committed (or
+that was rolled back) is never reused.
+
+Snapshots only record memberships. Whether an object is public, and
+whether the user is an administrator, are still checked against the
+objects themselves, so changes to those never leave a snapshot stale.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+
+ACCESS_SNAPSHOT_GENERATION_KEY = 'access-snapshot-generation-%s'
+ACCESS_SNAPSHOT_KEY = 'access-snapshot-%s-%s'
+ACCESS_SNAPSHOT_EXPIRATION = 24 * 60 * 60
+
+
+class AccessSnapshot(object):
+    """The memberships used to determine what a user can access.
+
+    This contains the IDs of the repositories the user is allowed to access
+    (directly, or through a review group), the review groups the user is a
+    member of, and the Local Sites the user is a member or administrator of.
+    """
+    def __init__(self, repository_ids=(), group_ids=(), local_site_ids=(),
+                 admin_local_site_ids=(), generation=None):
+        self.repository_ids = frozenset(repository_ids)
+        self.group_ids = frozenset(group_ids)
+        self.local_site_ids = frozenset(local_site_ids)
+        self.admin_local_site_ids = frozenset(admin_local_site_ids)
+        self.generation = generation
+
+    @classmethod
+    def build(cls, user, generation=None):
+        """Builds a snapshot for a user from the database."""
+        from reviewboard.reviews.models import Group
+        from reviewboard.scmtools.models import Repository
+        from reviewboard.site.models import LocalSite
+
+        return cls(
+            repository_ids=(
+                Repository.objects
+                .filter(Q(users=user) | Q(review_groups__users=user))
+                .values_list('pk', flat=True)),
+            group_ids=(
+                Group.users.through.objects
+                .filter(user=user)
+                .values_list('group', flat=True)),
+            local_site_ids=(
+                LocalSite.users.through.objects
+                .filter(user=user)
+                .values_list('localsite', flat=True)),
+            admin_local_site_ids=(
+                LocalSite.admins.through.objects
+                .filter(user=user)
+                .values_list('localsite', flat=True)),
+            generation=generation)
+
+    def serialize(self):
+        """Returns the snapshot in a form suitable for caching."""
+        return (list(self.repository_ids), list(self.group_ids),
+                list(self.local_site_ids), list(self.admin_local_site_ids))
+
+
+_empty_snapshot = AccessSnapshot()
+
+# The IDs of users whose snapshots must be invalidated again once the
+# current transaction ends, for each thread.
+_pending = threading.local()
+
+
+def get_access_snapshot(user):
+    """Returns the access snapshot for a user.
+
+    The snapshot is stored on the user object, and in the cache, so that
+    it only needs to be built once until the user's memberships change.
+    Anonymous users are not members of anything, so they get an empty
+    snapshot without any lookups.
+    """
+    if user is None or not user.is_authenticated():
+        return _empty_snapshot
+
+    flush_pending_invalidations()
+
+    generation = _get_generation(user.pk)
+    snapshot = getattr(user, '_access_snapshot', None)
+
+    if snapshot is not None and snapshot.generation == generation:
+        return snapshot
+
+    cache_key = ACCESS_SNAPSHOT_KEY % (user.pk, generation)
+    data = cache.get(cache_key)
+
+    if data is None:
+        snapshot = AccessSnapshot.build(user, generation)
+        cache.set(cache_key, snapshot.serialize(), ACCESS_SNAPSHOT_EXPIRATION)
+    else:
+        snapshot = AccessSnapshot(*data, generation=generation)
+
+    user._access_snapshot = snapshot
+
+    return snapshot
+
+
+def invalidate_access_snapshots(user_ids):
+    """Invalidates the access snapshots for the given users.
+
+    This is called automatically whenever repository, review group or
+    Local Site memberships change. If called within a transaction, the
+    snapshots are invalidated immediately, and again once the transaction
+    has ended (see :py:func:`flush_pending_invalidations`).
+    """
+    user_ids = set(user_ids)
+
+    if not user_ids:
+        return
+
+    _set_generations(user_ids)
+
+    if connection.in_atomic_block:
+        if not hasattr(_pending, 'user_ids'):
+            _pending.user_ids = set()
+
+        _pending.user_ids.update(user_ids)
+
+
+def flush_pending_invalidations():
+    """Invalidates snapshots for changes made in a transaction that ended.
+
+    While a transaction is in progress, other threads may build snapshots
+    from data that doesn't yet include its changes, and the thread making
+    the changes may build snapshots from data that is later rolled back.
+    Those snapshots are invalidated here, once the transaction has ended.
+
+    This is called automatically when a request finishes, and before
+    snapshots are fetched.
+    """
+    user_ids = getattr(_pending, 'user_ids', None)
+
+    if user_ids and not connection.in_atomic_block:
+        _pending.user_ids = set()
+        _set_generations(user_ids)
+
+
+def _get_generation(user_id):
+    """Returns the current generation of a user's access snapshots.
+
+    If the generation has been evicted from the cache, a new one is
+    generated, so that stale snapshots are never reused.
+    """
+    key = ACCESS_SNAPSHOT_GENERATION_KEY % user_id
+    generation = cache.get(key)
+
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex)
+        generation = cache.get(key)
+
+    return generation
+
+
+def _set_generations(user_ids):
+    """Sets new generations of access snapshots for the given users."""
+    cache.set_many(dict(
+        (ACCESS_SNAPSHOT_GENERATION_KEY % user_id, uuid.uuid4().hex)
+        for user_id in user_ids
+    ))
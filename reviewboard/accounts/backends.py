@@ -1,10 +1,15 @@
 from __future__ import unicode_literals
 
+import atexit
 import logging
 import pkg_resources
 import re
 import sre_constants
 import sys
+import threading
+import time
+from collections import defaultdict
+from hashlib import sha1
 from warnings import warn
 
 from django.conf import settings
@@ -12,8 +17,11 @@ from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.contrib.auth import get_backends
 from django.contrib.auth import hashers
+from django.core.cache import cache
 from django.utils import six
+from django.utils.six.moves import range
 from django.utils.translation import ugettext_lazy as _
+from djblets.cache.backend import cache_memoize, make_cache_key
 from djblets.db.query import get_object_or_none
 from djblets.siteconfig.models import SiteConfiguration
 try:
@@ -340,6 +348,161 @@ class NISBackend(AuthBackend):
         return user
 
 
+class LDAPConnectionPool(object):
+    """A pool of connections to LDAP servers.
+
+    Setting up an LDAP connection means a TCP connection, often a StartTLS
+    negotiation, and a bind. Rather than doing this for every login (and
+    every API request using HTTP Basic authentication), connections are
+    kept open and reused.
+
+    Connections are pooled by server URI, TLS usage, and the credentials
+    they're bound with when opened. Connections opened without credentials
+    are meant for callers that bind on each use, such as when verifying a
+    user's password.
+    """
+    MAX_IDLE_CONNECTIONS = 4
+
+    #: The number of seconds after which idle connections are closed.
+    #:
+    #: Servers often drop connections that have been idle for a while.
+    MAX_IDLE_TIME = 5 * 60
+
+    def __init__(self, max_idle_connections=MAX_IDLE_CONNECTIONS,
+                 max_idle_time=MAX_IDLE_TIME):
+        self.max_idle_connections = max_idle_connections
+        self.max_idle_time = max_idle_time
+        self._idle_connections = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def call(self, func, uri, use_tls=False, credentials=None):
+        """Calls a function with a connection from the pool.
+
+        ``func`` is passed the connection, and its result is returned.
+        ``credentials`` is a tuple of a DN and password to bind with when
+        opening a new connection. An empty DN and password binds
+        anonymously.
+
+        If the connection was reused and turns out to have been dropped by
+        the server, the call is retried once with a new connection. Any
+        other LDAP errors are raised to the caller.
+        """
+        import ldap
+
+        key = (uri, use_tls, credentials)
+        con = self._get_idle_connection(key)
+        reused = con is not None
+
+        while True:
+            if con is None:
+                con = self._open_connection(uri, use_tls, credentials)
+
+            try:
+                result = func(con)
+            except ldap.SERVER_DOWN:
+                self._close_connection(con)
+
+                if reused:
+                    con = None
+                    reused = False
+                    continue
+
+                raise
+            except (ldap.INVALID_CREDENTIALS, ldap.NO_SUCH_OBJECT):
+                # The connection is still usable.
+                self._release_connection(key, con)
+                raise
+            except:
+                self._close_connection(con)
+                raise
+
+            self._release_connection(key, con)
+
+            return result
+
+    def clear(self):
+        """Closes all idle connections."""
+        with self._lock:
+            connections = [
+                con
+                for idle in six.itervalues(self._idle_connections)
+                for con, last_used in idle
+            ]
+            self._idle_connections.clear()
+
+        for con in connections:
+            self._close_connection(con)
+
+    def _get_idle_connection(self, key):
+        """Returns an idle connection for the given key, if one is open."""
+        expired = []
+        con = None
+
+        with self._lock:
+            idle = self._idle_connections[key]
+            min_last_used = time.time() - self.max_idle_time
+
+            while idle:
+                con, last_used = idle.pop()
+
+                if last_used >= min_last_used:
+                    break
+
+                expired.append(con)
+                con = None
+
+        for expired_con in expired:
+            self._close_connection(expired_con)
+
+        return con
+
+    def _release_connection(self, key, con):
+        """Returns a connection to the pool, or closes it if it's full."""
+        with self._lock:
+            idle = self._idle_connections[key]
+
+            if len(idle) < self.max_idle_connections:
+                idle.append((con, time.time()))
+                con = None
+
+        if con is not None:
+            self._close_connection(con)
+
+    def _open_connection(self, uri, use_tls, credentials):
+        """Opens a new connection, setting up TLS and binding if needed."""
+        import ldap
+
+        con = ldap.initialize(uri)
+
+        try:
+            con.set_option(ldap.OPT_REFERRALS, 0)
+            con.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
+
+            if use_tls:
+                con.start_tls_s()
+
+            if credentials is not None:
+                con.simple_bind_s(*credentials)
+        except:
+            self._close_connection(con)
+            raise
+
+        return con
+
+    def _close_connection(self, con):
+        """Closes a connection, ignoring any errors."""
+        import ldap
+
+        try:
+            con.unbind_s()
+        except ldap.LDAPError:
+            pass
+
+
+ldap_connection_pool = LDAPConnectionPool()
+atexit.register(ldap_connection_pool.clear)
+
+
 class LDAPBackend(AuthBackend):
     """Authenticate against a user on an LDAP server."""
     backend_id = 'ldap'
@@ -348,6 +511,9 @@ class LDAPBackend(AuthBackend):
     login_instructions = \
         _('Use your standard LDAP username and password.')
 
+    #: How long, in seconds, to cache the DNs of users.
+    USER_DN_CACHE_PERIOD = 5 * 60
+
     def authenticate(self, username, password):
         username = username.strip()
 
@@ -379,43 +545,34 @@ class LDAPBackend(AuthBackend):
 
         try:
             import ldap
-            ldapo = ldap.initialize(settings.LDAP_URI)
-            ldapo.set_option(ldap.OPT_REFERRALS, 0)
-            ldapo.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
-            if settings.LDAP_TLS:
-                ldapo.start_tls_s()
-
-            if settings.LDAP_ANON_BIND_UID:
-                # Log in as the service account before searching.
-                ldapo.simple_bind_s(settings.LDAP_ANON_BIND_UID,
-                                    settings.LDAP_ANON_BIND_PASSWD)
-            else:
-                # Bind anonymously to the server
-                ldapo.simple_bind_s()
 
             # Search for the user with the given base DN and uid. If the user
             # is found, a fully qualified DN is returned. Authentication is
             # then done with bind using this fully qualified DN.
-            search = ldapo.search_s(settings.LDAP_BASE_DN,
-                                    ldap.SCOPE_SUBTREE,
-                                    uidfilter)
-            if not search:
+            userdn = self.get_user_dn(uidfilter)
+
+            if not userdn:
                 # No such user, return early, no need for bind attempts
                 logging.warning("LDAP error: The specified object does "
                                 "not exist in the Directory: %s",
                                 username)
                 return None
-            else:
-                userdn = search[0][0]
 
             # Now that we have the user, attempt to bind to verify
-            # authentication
+            # authentication. This uses a separate connection from the
+            # service account's, so that one stays bound.
             logging.debug("Attempting to authenticate as %s"
                           % userdn.decode('utf-8'))
-            ldapo.bind_s(userdn, password)
 
-            return self.get_or_create_user(username_bytes, None, ldapo, userdn)
+            def _bind_user(ldapo):
+                ldapo.bind_s(userdn, password)
+
+                return self.get_or_create_user(username_bytes, None, ldapo,
+                                               userdn)
 
+            return ldap_connection_pool.call(_bind_user,
+                                             settings.LDAP_URI,
+                                             use_tls=settings.LDAP_TLS)
         except ImportError:
             pass
         except ldap.INVALID_CREDENTIALS:
@@ -434,6 +591,50 @@ class LDAPBackend(AuthBackend):
 
         return None
 
+    def get_user_dn(self, uidfilter):
+        """Returns the DN of the user matching the given search filter.
+
+        The search is done over a pooled connection bound as the service
+        account (or anonymously). The DN is cached for a short time, so
+        repeated logins and API requests don't need a search. This returns
+        None if there's no such user.
+        """
+        import ldap
+
+        if isinstance(uidfilter, six.text_type):
+            uidfilter = uidfilter.encode('utf-8')
+
+        cache_key = make_cache_key('ldap-user-dn:%s' % sha1(
+            b'\0'.join([settings.LDAP_URI.encode('utf-8'),
+                         settings.LDAP_BASE_DN.encode('utf-8'),
+                         uidfilter])).hexdigest())
+        userdn = cache.get(cache_key)
+
+        if userdn is None:
+            if settings.LDAP_ANON_BIND_UID:
+                # Log in as the service account before searching.
+                credentials = (settings.LDAP_ANON_BIND_UID,
+                               settings.LDAP_ANON_BIND_PASSWD)
+            else:
+                # Bind anonymously to the server
+                credentials = ('', '')
+
+            search = ldap_connection_pool.call(
+                lambda ldapo: ldapo.search_s(settings.LDAP_BASE_DN,
+                                             ldap.SCOPE_SUBTREE,
+                                             uidfilter),
+                settings.LDAP_URI,
+                use_tls=settings.LDAP_TLS,
+                credentials=credentials)
+
+            if not search:
+                return None
+
+            userdn = search[0][0]
+            cache.set(cache_key, userdn, self.USER_DN_CACHE_PERIOD)
+
+        return userdn
+
     def get_or_create_user(self, username, request, ldapo, userdn):
         username = re.sub(INVALID_USERNAME_CHAR_REGEX, '', username).lower()
 
@@ -524,6 +725,15 @@ class ActiveDirectoryBackend(AuthBackend):
     login_instructions = \
         _('Use your standard Active Directory username and password.')
 
+    #: How long, in seconds, to cache domain controllers found through DNS.
+    DOMAIN_CONTROLLERS_CACHE_PERIOD = 5 * 60
+
+    #: How long, in seconds, to cache the groups that a user is a member of.
+    MEMBER_OF_CACHE_PERIOD = 5 * 60
+
+    #: The maximum number of groups to look up in a single search.
+    GROUP_SEARCH_BATCH_SIZE = 50
+
     def get_domain_name(self):
         return six.text_type(settings.AD_DOMAIN_NAME)
 
@@ -560,79 +770,81 @@ class ActiveDirectoryBackend(AuthBackend):
                 depth <= settings.AD_RECURSION_DEPTH)
 
     def get_member_of(self, con, search_results, seen=None, depth=0):
-        depth += 1
+        """Returns the names of the groups the search results are members of.
+
+        Groups are resolved recursively, up to ``AD_RECURSION_DEPTH``
+        levels. Each level of groups is looked up together, in batches of
+        :py:attr:`GROUP_SEARCH_BATCH_SIZE`, rather than with one search per
+        group.
+        """
         if seen is None:
             seen = set()
 
-        for name, data in search_results:
-            if name is None:
-                continue
-            member_of = data.get('memberOf', [])
-            new_groups = [x.split(',')[0].split('=')[1] for x in member_of]
-            old_seen = seen.copy()
-            seen.update(new_groups)
+        while search_results:
+            depth += 1
+            new_groups = []
+
+            for name, data in search_results:
+                if name is None:
+                    continue
+
+                for group_dn in data.get('memberOf', []):
+                    group = group_dn.split(',')[0].split('=')[1]
+
+                    if group not in seen:
+                        seen.add(group)
+                        new_groups.append(group)
+
+            if not new_groups:
+                break
 
             # collect groups recursively
-            if self.can_recurse(depth):
-                for group in new_groups:
-                    if group in old_seen:
-                        continue
-
-                    # Search for groups with the specified CN. Use the CN
-                    # rather than The sAMAccountName so that behavior is
-                    # correct when the values differ (e.g. if a
-                    # "pre-Windows 2000" group name is set in AD)
-                    group_data = self.search_ad(
-                        con,
-                        filter_format('(&(objectClass=group)(cn=%s))',
-                                      (group,)))
-                    seen.update(self.get_member_of(con, group_data,
-                                                   seen=seen, depth=depth))
-            else:
+            if not self.can_recurse(depth):
                 logging.warning('ActiveDirectory recursive group check '
                                 'reached maximum recursion depth.')
+                break
+
+            # Search for groups with the specified CNs. Use the CN rather
+            # than The sAMAccountName so that behavior is correct when the
+            # values differ (e.g. if a "pre-Windows 2000" group name is set
+            # in AD)
+            search_results = []
+
+            for i in range(0, len(new_groups), self.GROUP_SEARCH_BATCH_SIZE):
+                batch = new_groups[i:i + self.GROUP_SEARCH_BATCH_SIZE]
+                cn_filter = ''.join(
+                    filter_format('(cn=%s)', (group,))
+                    for group in batch
+                )
+                search_results += self.search_ad(
+                    con, '(&(objectClass=group)(|%s))' % cn_filter)
 
         return seen
 
-    def get_ldap_connections(self, userdomain=None):
-        import ldap
-        if settings.AD_FIND_DC_FROM_DNS:
-            dcs = self.find_domain_controllers_from_dns(userdomain)
-        else:
-            dcs = []
+    def get_domain_controllers(self, userdomain=None):
+        """Returns the domain controllers to try, as (port, host) pairs.
 
-            for dc_entry in settings.AD_DOMAIN_CONTROLLER.split():
-                if ':' in dc_entry:
-                    host, port = dc_entry.split(':')
-                else:
-                    host = dc_entry
-                    port = '389'
+        Domain controllers found through DNS are cached for a short time.
+        """
+        if settings.AD_FIND_DC_FROM_DNS:
+            return cache_memoize(
+                'ad-domain-controllers:%s'
+                % (userdomain or self.get_domain_name()),
+                lambda: self.find_domain_controllers_from_dns(userdomain),
+                self.DOMAIN_CONTROLLERS_CACHE_PERIOD)
 
-                dcs.append([port, host])
+        dcs = []
 
-        for dc in dcs:
-            port, host = dc
-            ldap_uri = 'ldap://%s:%s' % (host, port)
-            con = ldap.initialize(ldap_uri)
+        for dc_entry in settings.AD_DOMAIN_CONTROLLER.split():
+            if ':' in dc_entry:
+                host, port = dc_entry.split(':')
+            else:
+                host = dc_entry
+                port = '389'
 
-            if settings.AD_USE_TLS:
-                try:
-                    con.start_tls_s()
-                except ldap.UNAVAILABLE:
-                    logging.warning('Active Directory: Domain controller '
-                                    '%s:%d for domain %s unavailable',
-                                    host, int(port), userdomain)
-                    continue
-                except ldap.CONNECT_ERROR:
-                    logging.warning("Active Directory: Could not connect "
-                                    "to domain controller %s:%d for domain "
-                                    "%s, possibly the certificate wasn't "
-                                    "verifiable",
-                                    host, int(port), userdomain)
-                    continue
+            dcs.append([port, host])
 
-            con.set_option(ldap.OPT_REFERRALS, 0)
-            yield con
+        return dcs
 
     def authenticate(self, username, password):
         import ldap
@@ -651,7 +863,6 @@ class ActiveDirectoryBackend(AuthBackend):
         if user_subdomain:
             userdomain = "%s.%s" % (user_subdomain, userdomain)
 
-        connections = self.get_ldap_connections(userdomain)
         required_group = settings.AD_GROUP_NAME
 
         if isinstance(username, six.text_type):
@@ -665,40 +876,58 @@ class ActiveDirectoryBackend(AuthBackend):
         if isinstance(password, six.text_type):
             password = password.encode('utf-8')
 
-        for con in connections:
-            try:
-                bind_username = b'%s@%s' % (username_bytes, userdomain)
-                logging.debug("User %s is trying to log in via AD",
-                              bind_username.decode('utf-8'))
-                con.simple_bind_s(bind_username, password)
-                user_data = self.search_ad(
-                    con,
-                    filter_format('(&(objectClass=user)(sAMAccountName=%s))',
-                                  (username_bytes,)),
-                    userdomain)
-
-                if not user_data:
+        bind_username = b'%s@%s' % (username_bytes, userdomain)
+
+        def _authenticate(con):
+            logging.debug("User %s is trying to log in via AD",
+                          bind_username.decode('utf-8'))
+            con.simple_bind_s(bind_username, password)
+            user_data = self.search_ad(
+                con,
+                filter_format('(&(objectClass=user)(sAMAccountName=%s))',
+                              (username_bytes,)),
+                userdomain)
+
+            if not user_data:
+                return None
+
+            if required_group:
+                try:
+                    group_names = self._get_cached_member_of(con, user_data)
+                except Exception as e:
+                    logging.error("Active Directory error: failed getting"
+                                  "groups for user '%s': %s",
+                                  username, e, exc_info=1)
                     return None
 
-                if required_group:
-                    try:
-                        group_names = self.get_member_of(con, user_data)
-                    except Exception as e:
-                        logging.error("Active Directory error: failed getting"
-                                      "groups for user '%s': %s",
-                                      username, e, exc_info=1)
-                        return None
-
-                    if required_group not in group_names:
-                        logging.warning("Active Directory: User %s is not in "
-                                        "required group %s",
-                                        username, required_group)
-                        return None
-
-                return self.get_or_create_user(username, None, user_data)
+                if required_group not in group_names:
+                    logging.warning("Active Directory: User %s is not in "
+                                    "required group %s",
+                                    username, required_group)
+                    return None
+
+            return self.get_or_create_user(username, None, user_data)
+
+        # Connections are pooled per domain controller, so that TLS only
+        # needs to be set up once. Each login binds as the user first.
+        for port, host in self.get_domain_controllers(userdomain):
+            ldap_uri = 'ldap://%s:%s' % (host, port)
+
+            try:
+                return ldap_connection_pool.call(
+                    _authenticate, ldap_uri, use_tls=settings.AD_USE_TLS)
+            except ldap.UNAVAILABLE:
+                logging.warning('Active Directory: Domain controller '
+                                '%s:%d for domain %s unavailable',
+                                host, int(port), userdomain)
+            except ldap.CONNECT_ERROR:
+                logging.warning("Active Directory: Could not connect "
+                                "to domain controller %s:%d for domain "
+                                "%s, possibly the certificate wasn't "
+                                "verifiable",
+                                host, int(port), userdomain)
             except ldap.SERVER_DOWN:
                 logging.warning('Active Directory: Domain controller is down')
-                continue
             except ldap.INVALID_CREDENTIALS:
                 logging.warning('Active Directory: Failed login for user %s',
                                 username)
@@ -708,6 +937,23 @@ class ActiveDirectoryBackend(AuthBackend):
                       'controller servers')
         return None
 
+    def _get_cached_member_of(self, con, user_data):
+        """Returns the groups a user is a member of, caching the result.
+
+        Group memberships are cached for a short time by the user's DN, so
+        that repeated logins and API requests don't need to resolve them
+        again.
+        """
+        userdn = user_data[0][0]
+
+        if isinstance(userdn, six.text_type):
+            userdn = userdn.encode('utf-8')
+
+        return cache_memoize(
+            'ad-member-of:%s' % sha1(userdn).hexdigest(),
+            lambda: self.get_member_of(con, user_data),
+            self.MEMBER_OF_CACHE_PERIOD)
+
     def get_or_create_user(self, username, request, ad_user_data):
         username = re.sub(INVALID_USERNAME_CHAR_REGEX, '', username).lower()
 
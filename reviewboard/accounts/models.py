@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
+from django.core.signals import request_finished
 from django.db import models
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
@@ -12,10 +14,13 @@ from djblets.db.managers import ConcurrencyManager
 from djblets.forms.fields import TIMEZONE_CHOICES
 from djblets.siteconfig.models import SiteConfiguration
 
+from reviewboard.accounts.access import (flush_pending_invalidations,
+                                         invalidate_access_snapshots)
 from reviewboard.accounts.managers import ProfileManager, TrophyManager
 from reviewboard.accounts.trophies import TrophyType
 from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.reviews.signals import review_request_published
+from reviewboard.scmtools.models import Repository
 from reviewboard.site.models import LocalSite
 
 
@@ -385,3 +390,116 @@ User._meta.ordering = ('username',)
 def _call_compute_trophies(sender, review_request, **kwargs):
     if review_request.changedescs.count() == 0 and review_request.public:
         Trophy.objects.compute_trophies(review_request)
+
+
+def _get_group_member_ids(group_ids):
+    """Returns the IDs of the users in the given review groups."""
+    return list(Group.users.through.objects
+                .filter(group__in=group_ids)
+                .values_list('user', flat=True))
+
+
+def _on_membership_changed(sender, instance, action, model, pk_set,
+                           **kwargs):
+    """Invalidates access snapshots when memberships change.
+
+    Only the snapshots of the users who were added or removed are
+    invalidated. When review groups are added to or removed from a
+    repository, the snapshots of all users in those groups are invalidated.
+
+    When memberships are cleared, the affected users are looked up before
+    the memberships are removed, but their snapshots are only invalidated
+    once they're gone. Otherwise, a snapshot built in between could keep
+    the removed access until it expires.
+    """
+    if action == 'post_clear':
+        cleared_user_ids = getattr(instance, '_cleared_access_user_ids', {})
+        user_ids = cleared_user_ids.pop(sender, None)
+
+        if user_ids:
+            invalidate_access_snapshots(user_ids)
+
+        return
+    elif action == 'pre_clear':
+        # The IDs of the removed objects aren't provided when clearing, so
+        # look them up before they're gone.
+        for field in sender._meta.fields:
+            if field.rel and field.rel.to is model:
+                target_field = field.name
+            elif field.rel and isinstance(instance, field.rel.to):
+                source_field = field.name
+
+        pk_set = list(sender.objects
+                      .filter(**{source_field: instance.pk})
+                      .values_list(target_field, flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+
+    if isinstance(instance, User):
+        user_ids = [instance.pk]
+    elif model is User:
+        user_ids = pk_set
+    elif isinstance(instance, Group):
+        user_ids = _get_group_member_ids([instance.pk])
+    else:
+        user_ids = _get_group_member_ids(pk_set)
+
+    if action == 'pre_clear':
+        if not hasattr(instance, '_cleared_access_user_ids'):
+            instance._cleared_access_user_ids = {}
+
+        instance._cleared_access_user_ids[sender] = user_ids
+    else:
+        invalidate_access_snapshots(user_ids)
+
+
+def _on_access_object_deleted(sender, instance, **kwargs):
+    """Invalidates access snapshots when an object is about to be deleted.
+
+    Deleting an object removes its memberships without sending
+    m2m_changed, so the snapshots of all users with access through the
+    object are invalidated. This also ensures that a new object reusing
+    the ID of the deleted one won't be listed in any snapshots.
+    """
+    if sender is User:
+        user_ids = [instance.pk]
+    elif sender is Group:
+        user_ids = _get_group_member_ids([instance.pk])
+    elif sender is Repository:
+        user_ids = (list(instance.users.values_list('pk', flat=True)) +
+                    _get_group_member_ids(instance.review_groups.all()))
+    elif sender is LocalSite:
+        user_ids = (list(instance.users.values_list('pk', flat=True)) +
+                    list(instance.admins.values_list('pk', flat=True)))
+
+    invalidate_access_snapshots(user_ids)
+
+
+def _on_user_saved(instance, created, **kwargs):
+    """Invalidates the access snapshots of a new user.
+
+    A new user may reuse the ID of one that was removed without any signals
+    being sent (such as through a rolled back transaction), whose snapshot
+    could otherwise still be cached.
+    """
+    if created:
+        invalidate_access_snapshots([instance.pk])
+
+
+def _on_request_finished(**kwargs):
+    """Invalidates access snapshots for transactions that have ended."""
+    flush_pending_invalidations()
+
+
+m2m_changed.connect(_on_membership_changed, sender=Group.users.through)
+m2m_changed.connect(_on_membership_changed, sender=Repository.users.through)
+m2m_changed.connect(_on_membership_changed,
+                    sender=Repository.review_groups.through)
+m2m_changed.connect(_on_membership_changed, sender=LocalSite.users.through)
+m2m_changed.connect(_on_membership_changed, sender=LocalSite.admins.through)
+pre_delete.connect(_on_access_object_deleted, sender=Group)
+pre_delete.connect(_on_access_object_deleted, sender=Repository)
+pre_delete.connect(_on_access_object_deleted, sender=LocalSite)
+pre_delete.connect(_on_access_object_deleted, sender=User)
+post_save.connect(_on_user_saved, sender=User)
+request_finished.connect(_on_request_finished)
@@ -5,11 +5,25 @@ import re
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models.signals import m2m_changed
 from django.test.client import RequestFactory
+from django.utils import six
+from django.utils.six.moves import range
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
-
-from reviewboard.accounts.backends import (AuthBackend,
+import nose
+
+try:
+    import ldap
+except ImportError:
+    ldap = None
+
+from reviewboard.accounts.access import (flush_pending_invalidations,
+                                         get_access_snapshot)
+from reviewboard.accounts.backends import (ActiveDirectoryBackend,
+                                           AuthBackend,
+                                           LDAPConnectionPool,
                                            get_enabled_auth_backends,
                                            INVALID_USERNAME_CHAR_REGEX)
 from reviewboard.accounts.forms.pages import (AccountPageForm,
@@ -21,6 +35,7 @@ from reviewboard.accounts.pages import (AccountPage, get_page_classes,
                                         register_account_page_class,
                                         unregister_account_page_class,
                                         _clear_page_defaults)
+from reviewboard.scmtools.models import Repository
 from reviewboard.testing import TestCase
 
 
@@ -190,6 +205,152 @@ class AccountPageTests(TestCase):
         self.assertRaises(KeyError, lambda: MyPage.remove_form(MyForm))
 
 
+class AccessSnapshotTests(TestCase):
+    """Unit tests for reviewboard.accounts.access."""
+    fixtures = ['test_users', 'test_scmtools', 'test_site']
+
+    def test_snapshot(self):
+        """Testing get_access_snapshot"""
+        user = User.objects.get(username='doc')
+        group = self.create_review_group(invite_only=True)
+        group.users.add(user)
+
+        repository1 = self.create_repository(name='repo1', public=False)
+        repository1.review_groups.add(group)
+        repository2 = self.create_repository(name='repo2', public=False)
+        repository2.users.add(user)
+        self.create_repository(name='repo3', public=False)
+
+        snapshot = get_access_snapshot(user)
+        self.assertEqual(snapshot.repository_ids,
+                         set([repository1.pk, repository2.pk]))
+        self.assertEqual(snapshot.group_ids, set([group.pk]))
+        self.assertEqual(
+            snapshot.local_site_ids,
+            set(user.local_site.values_list('pk', flat=True)))
+
+    def test_snapshot_cached(self):
+        """Testing is_accessible_by using a cached access snapshot"""
+        user = User.objects.get(username='doc')
+        group = self.create_review_group(invite_only=True)
+        group.users.add(user)
+        repository = self.create_repository(public=False)
+        repository.review_groups.add(group)
+
+        self.assertTrue(repository.is_accessible_by(user))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(repository.is_accessible_by(user))
+            self.assertTrue(group.is_accessible_by(user))
+
+        # A fresh copy of the user should get the snapshot from the cache.
+        user = User.objects.get(username='doc')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(repository.is_accessible_by(user))
+
+    def test_snapshot_invalidated(self):
+        """Testing access snapshots invalidated on membership changes"""
+        user = User.objects.get(username='doc')
+        group = self.create_review_group(invite_only=True)
+        group.users.add(user)
+        repository = self.create_repository(public=False)
+        repository.review_groups.add(group)
+
+        self.assertTrue(group.is_accessible_by(user))
+        self.assertTrue(repository.is_accessible_by(user))
+
+        group.users.remove(user)
+
+        self.assertFalse(group.is_accessible_by(user))
+        self.assertFalse(repository.is_accessible_by(user))
+
+        repository.users.add(user)
+
+        self.assertTrue(repository.is_accessible_by(user))
+
+        repository.review_groups.add(group)
+        repository.users.clear()
+        group.users.add(user)
+
+        self.assertTrue(repository.is_accessible_by(user))
+
+        group.delete()
+
+        self.assertFalse(repository.is_accessible_by(user))
+
+    def test_snapshot_invalidated_per_user(self):
+        """Testing access snapshots only invalidated for the users whose
+        memberships changed
+        """
+        group = self.create_review_group(invite_only=True)
+        repository = self.create_repository(public=False)
+        repository.review_groups.add(group)
+
+        user = User.objects.get(username='doc')
+        other_user = User.objects.get(username='grumpy')
+        group.users.add(other_user)
+
+        self.assertFalse(repository.is_accessible_by(user))
+        self.assertTrue(repository.is_accessible_by(other_user))
+
+        group.users.add(user)
+
+        self.assertTrue(repository.is_accessible_by(user))
+
+        other_user = User.objects.get(username='grumpy')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(repository.is_accessible_by(other_user))
+
+    def test_snapshot_invalidated_after_transaction(self):
+        """Testing access snapshots invalidated again when a transaction
+        ends
+        """
+        user = User.objects.get(username='doc')
+        group = self.create_review_group(invite_only=True)
+        group.users.add(user)
+
+        snapshot = get_access_snapshot(user)
+        self.assertIs(get_access_snapshot(user), snapshot)
+
+        # Test cases run within a transaction, so simulate its end.
+        connection.in_atomic_block = False
+
+        try:
+            flush_pending_invalidations()
+        finally:
+            connection.in_atomic_block = True
+
+        self.assertIsNot(get_access_snapshot(user), snapshot)
+
+    def test_snapshot_invalidated_after_clear(self):
+        """Testing access snapshots invalidated after memberships are
+        cleared
+        """
+        def _on_membership_changed(action, **kwargs):
+            if action == 'pre_clear':
+                # Simulate another request building a snapshot before the
+                # memberships are removed.
+                get_access_snapshot(User.objects.get(pk=user.pk))
+
+        user = User.objects.get(username='doc')
+        repository = self.create_repository(public=False)
+        repository.users.add(user)
+
+        m2m_changed.connect(_on_membership_changed,
+                            sender=Repository.users.through)
+
+        try:
+            repository.users.clear()
+        finally:
+            m2m_changed.disconnect(_on_membership_changed,
+                                   sender=Repository.users.through)
+
+        user = User.objects.get(username='doc')
+        self.assertFalse(repository.is_accessible_by(user))
+
+
 class UsernameTests(TestCase):
     cases = [
         ('spaces  ', 'spaces'),
@@ -377,3 +538,151 @@ class SandboxTests(SpyAgency, TestCase):
 
         form.save()
         self.assertTrue(SandboxAuthBackend.update_email.called)
+
+
+class _FakeLDAPConnection(object):
+    def __init__(self, uri):
+        self.uri = uri
+        self.binds = []
+        self.searches = []
+        self.closed = False
+
+    def set_option(self, option, value):
+        pass
+
+    def start_tls_s(self):
+        pass
+
+    def simple_bind_s(self, who='', cred=''):
+        self.binds.append(who)
+
+    def search_s(self, base, scope, filterstr=None):
+        self.searches.append(filterstr)
+
+        return []
+
+    def unbind_s(self):
+        self.closed = True
+
+
+class LDAPConnectionPoolTests(TestCase):
+    """Unit tests for LDAPConnectionPool."""
+    def setUp(self):
+        super(LDAPConnectionPoolTests, self).setUp()
+
+        if ldap is None:
+            raise nose.SkipTest('python-ldap is not installed')
+
+        self.connections = []
+
+        def initialize(uri):
+            con = _FakeLDAPConnection(uri)
+            self.connections.append(con)
+
+            return con
+
+        self.old_initialize = ldap.initialize
+        ldap.initialize = initialize
+
+    def tearDown(self):
+        super(LDAPConnectionPoolTests, self).tearDown()
+
+        ldap.initialize = self.old_initialize
+
+    def test_call_reuses_connections(self):
+        """Testing LDAPConnectionPool.call reuses bound connections"""
+        pool = LDAPConnectionPool()
+        credentials = ('cn=service', 'password')
+
+        for i in range(3):
+            pool.call(lambda con: con.search_s('dc=example', 0, '(uid=a)'),
+                      'ldap://example.com', credentials=credentials)
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].binds, ['cn=service'])
+        self.assertEqual(len(self.connections[0].searches), 3)
+
+        # Connections with different credentials aren't shared.
+        pool.call(lambda con: None, 'ldap://example.com')
+        self.assertEqual(len(self.connections), 2)
+
+        pool.clear()
+        self.assertTrue(self.connections[0].closed)
+        self.assertTrue(self.connections[1].closed)
+
+    def test_call_retries_dropped_connections(self):
+        """Testing LDAPConnectionPool.call retries when a reused connection
+        was dropped
+        """
+        def _search(con):
+            if con is self.connections[0] and con.searches:
+                raise ldap.SERVER_DOWN()
+
+            return con.search_s('dc=example', 0, '(uid=a)')
+
+        pool = LDAPConnectionPool()
+        pool.call(_search, 'ldap://example.com')
+        pool.call(_search, 'ldap://example.com')
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+        self.assertFalse(self.connections[1].closed)
+
+    def test_call_closes_idle_connections(self):
+        """Testing LDAPConnectionPool.call closes connections that have
+        been idle too long
+        """
+        pool = LDAPConnectionPool(max_idle_time=-1)
+        pool.call(lambda con: None, 'ldap://example.com')
+        pool.call(lambda con: None, 'ldap://example.com')
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+
+class ActiveDirectoryBackendTests(TestCase):
+    """Unit tests for ActiveDirectoryBackend."""
+    def setUp(self):
+        super(ActiveDirectoryBackendTests, self).setUp()
+
+        if ldap is None:
+            raise nose.SkipTest('python-ldap is not installed')
+
+    def test_get_member_of(self):
+        """Testing ActiveDirectoryBackend.get_member_of looks up each level
+        of groups with a single search
+        """
+        groups = {
+            'group1': ['CN=parent1,DC=example', 'CN=parent2,DC=example'],
+            'group2': ['CN=parent2,DC=example'],
+            'parent1': ['CN=root,DC=example'],
+            'parent2': [],
+            'root': [],
+        }
+
+        def search_ad(con, filterstr, userdomain=None):
+            searches.append(filterstr)
+
+            return [
+                ('CN=%s,DC=example' % name, {'memberOf': member_of})
+                for name, member_of in six.iteritems(groups)
+                if '(cn=%s)' % name in filterstr
+            ]
+
+        searches = []
+        backend = ActiveDirectoryBackend()
+        backend.search_ad = search_ad
+
+        user_data = [
+            ('CN=user,DC=example', {
+                'memberOf': ['CN=group1,DC=example', 'CN=group2,DC=example'],
+            }),
+        ]
+
+        with self.settings(AD_RECURSION_DEPTH=-1):
+            group_names = backend.get_member_of(None, user_data)
+
+        self.assertEqual(group_names,
+                         set(['group1', 'group2', 'parent1', 'parent2',
+                              'root']))
+        self.assertEqual(len(searches), 3)
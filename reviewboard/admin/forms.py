@@ -474,6 +474,13 @@ class EMailSettingsForm(SiteSettingsForm):
                     'auto-replies. Disable this if your mailing list rejects '
                     '"auto-generated" e-mails.'),
         required=False)
+    mail_use_outbox = forms.BooleanField(
+        label=_('Queue e-mails for background delivery'),
+        help_text=_('Store outgoing e-mails in an outbox instead of sending '
+                    'them while publishing. The outbox must be delivered '
+                    'by running <code>rb-site manage /path/to/site '
+                    'send-queued-email -- --loop</code>.'),
+        required=False)
     mail_default_from = forms.CharField(
         label=_("Sender e-mail address"),
         help_text=_('The e-mail address that all e-mails will be sent from. '
@@ -552,7 +559,8 @@ class EMailSettingsForm(SiteSettingsForm):
                 'classes': ('wide',),
                 'title': _('E-Mail Delivery Settings'),
                 'fields': ('mail_default_from',
-                           'mail_enable_autogenerated_header'),
+                           'mail_enable_autogenerated_header',
+                           'mail_use_outbox'),
             },
             {
                 'classes': ('wide',),
@@ -619,11 +627,44 @@ class DiffSettingsForm(SiteSettingsForm):
                     'to disable size restrictions.'),
         widget=forms.TextInput(attrs={'size': '15'}))
 
+    scm_mirrors_dir = forms.CharField(
+        label=_('Repository mirrors directory'),
+        help_text=_('The directory where local mirrors of remote '
+                    'repositories are kept, for repositories set to keep a '
+                    'local mirror. Leave this blank to disable local '
+                    'mirrors.'),
+        required=False,
+        widget=forms.TextInput(attrs={'size': '60'}))
+
+    scm_mirrors_max_size = forms.IntegerField(
+        label=_('Maximum size of mirrors (MB)'),
+        help_text=_('The maximum combined size (in megabytes) of all local '
+                    'mirrors. Mirrors that would exceed this are removed. '
+                    'Enter 0 for no limit.'),
+        min_value=0,
+        widget=forms.TextInput(attrs={'size': '15'}))
+
     def load(self):
         super(DiffSettingsForm, self).load()
         self.fields['include_space_patterns'].initial = \
             ', '.join(self.siteconfig.get('diffviewer_include_space_patterns'))
 
+    def clean_scm_mirrors_dir(self):
+        """Validates that the mirrors directory is valid."""
+        mirrors_dir = self.cleaned_data['scm_mirrors_dir'].strip()
+
+        if mirrors_dir:
+            if not os.path.isabs(mirrors_dir):
+                raise ValidationError(
+                    _("The mirrors directory must be absolute."))
+
+            if (os.path.exists(mirrors_dir) and
+                    not os.access(mirrors_dir, os.W_OK)):
+                raise ValidationError(
+                    _("This path is not writable by the web server."))
+
+        return mirrors_dir
+
     def save(self):
         self.siteconfig.set(
             'diffviewer_include_space_patterns',
@@ -654,6 +695,20 @@ class DiffSettingsForm(SiteSettingsForm):
                            'diffviewer_context_num_lines',
                            'diffviewer_paginate_by',
                            'diffviewer_paginate_orphans')
+            },
+            {
+                'title': _("Repository Mirrors"),
+                'description': _(
+                    "Review Board can keep local mirrors of remote Git and "
+                    "Mercurial repositories that are accessed without a "
+                    "hosting service, so that files can be read locally. "
+                    "The mirrors are kept up to date by running "
+                    "<tt>rb-site manage /path/to/site "
+                    "update-repository-mirrors</tt> periodically."
+                ),
+                'classes': ('wide',),
+                'fields': ('scm_mirrors_dir',
+                           'scm_mirrors_max_size'),
             }
         )
 
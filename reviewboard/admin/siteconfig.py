@@ -143,6 +143,9 @@ defaults.update({
     'mail_send_review_mail':               False,
     'mail_send_new_user_mail':             False,
     'mail_enable_autogenerated_header':    True,
+    'mail_use_outbox':                     False,
+    'scm_mirrors_dir':                     '',
+    'scm_mirrors_max_size':                0,
     'search_enable':                       False,
     'send_support_usage_stats':            True,
     'site_domain_method':                  'http',
@@ -14,11 +14,13 @@ from django.template.loader import render_to_string
 from django.utils import six, timezone
 from django.utils.translation import ugettext_lazy as _
 from djblets.cache.backend import cache_memoize
+from djblets.siteconfig.models import SiteConfiguration
 
 from reviewboard.admin.cache_stats import get_cache_stats
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.changedescs.models import ChangeDescription
 from reviewboard.diffviewer.models import DiffSet
+from reviewboard.notifications.models import QueuedEmail
 from reviewboard.reviews.models import (ReviewRequest, Group,
                                         Comment, Review, Screenshot,
                                         ReviewRequestDraft)
@@ -332,6 +334,31 @@ class DatabaseStatsWidget(Widget):
         }
 
 
+class EmailOutboxWidget(Widget):
+    """E-mail outbox widget.
+
+    Displays the number of e-mails waiting to be delivered from the outbox.
+    """
+    widget_id = 'email-outbox-widget'
+    title = _('E-Mail Outbox')
+    template = 'admin/widgets/w-email-outbox.html'
+    cache_data = False
+    actions = [
+        {
+            'url': 'db/notifications/queuedemail/',
+            'label': _('View All'),
+            'classes': 'btn-right',
+        },
+    ]
+
+    def generate_data(self, request):
+        siteconfig = SiteConfiguration.objects.get_current()
+        stats = QueuedEmail.objects.get_stats()
+        stats['enabled'] = siteconfig.get('mail_use_outbox')
+
+        return stats
+
+
 class RecentActionsWidget(Widget):
     """Recent actions widget.
 
@@ -553,3 +580,4 @@ register_admin_widget(ReviewGroupsWidget)
 register_admin_widget(ServerCacheWidget)
 register_admin_widget(NewsWidget)
 register_admin_widget(DatabaseStatsWidget)
+register_admin_widget(EmailOutboxWidget)
@@ -7,4 +7,5 @@ SEQUENCE = [
     'file_attachment_repo_path_no_index',
     'file_attachment_repo_revision_max_length_64',
     'file_attachment_revision',
+    'file_attachment_thumbnail_paths',
 ]
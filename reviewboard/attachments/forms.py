@@ -10,6 +10,7 @@ from djblets.util.filesystem import is_exe_in_path
 
 from reviewboard.attachments.models import (FileAttachment,
                                             FileAttachmentHistory)
+from reviewboard.attachments.thumbnails import generate_after_response
 from reviewboard.reviews.models import (ReviewRequestDraft,
                                         FileAttachmentComment)
 
@@ -114,6 +115,7 @@ class UploadFileForm(forms.Form):
             file_attachment = FileAttachment(**attachment_kwargs)
 
         file_attachment.file.save(filename, file, save=True)
+        generate_after_response(file_attachment.generate_thumbnail)
 
         draft = ReviewRequestDraft.create(self.review_request)
         draft.file_attachments.add(file_attachment)
@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+
+import logging
+from optparse import make_option
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from django.utils.translation import ugettext as _
+
+from reviewboard.attachments.models import (FileAttachment,
+                                            FileAttachmentHistory)
+
+
+class Command(NoArgsCommand):
+    help = _('Creates histories for legacy file attachments that were '
+             'uploaded without one')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    default=100,
+                    dest='batch_size',
+                    help=_('Number of file attachments to load from the '
+                           'database at a time')),
+    )
+
+    def handle_noargs(self, **options):
+        batch_size = options['batch_size']
+        count = 0
+        last_pk = 0
+
+        # File attachments from diffs never have histories, so skip them.
+        queryset = (
+            FileAttachment.objects
+            .filter(attachment_history__isnull=True,
+                    repository__isnull=True,
+                    added_in_filediff__isnull=True)
+            .order_by('pk')
+        )
+
+        while True:
+            file_attachments = list(
+                queryset.filter(pk__gt=last_pk)[:batch_size])
+
+            if not file_attachments:
+                break
+
+            for file_attachment in file_attachments:
+                if self._create_history(file_attachment):
+                    count += 1
+
+            last_pk = file_attachments[-1].pk
+
+        self.stdout.write(_('Created %d file attachment histories.') % count)
+
+    def _create_history(self, file_attachment):
+        """Creates a history for a file attachment.
+
+        The history is placed after the other file attachments on the
+        review request. This returns whether the history was created.
+        """
+        try:
+            review_request = file_attachment.get_review_request()
+        except ObjectDoesNotExist:
+            logging.warning('Skipping file attachment %s, which does not '
+                            'belong to a review request',
+                            file_attachment.pk)
+            return False
+
+        with transaction.atomic():
+            history = FileAttachmentHistory.objects.create(
+                display_position=FileAttachmentHistory
+                    .compute_next_display_position(review_request))
+            review_request.file_attachment_histories.add(history)
+
+            file_attachment.attachment_history = history
+            file_attachment.save(update_fields=['attachment_history'])
+
+        return True
@@ -0,0 +1,74 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.attachments.models import FileAttachment
+from reviewboard.reviews.models import Screenshot
+
+
+class Command(NoArgsCommand):
+    help = _('Generates thumbnails for uploaded files and screenshots that '
+             "don't have them yet")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--force',
+                    action='store_true',
+                    default=False,
+                    dest='force',
+                    help=_('Regenerate thumbnails that already exist')),
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    default=100,
+                    dest='batch_size',
+                    help=_('Number of objects to load from the database '
+                           'at a time')),
+    )
+
+    def handle_noargs(self, **options):
+        force = options['force']
+        batch_size = options['batch_size']
+
+        num_screenshots = self._generate(
+            Screenshot, force, batch_size,
+            lambda screenshot: screenshot.generate_thumbnails())
+        num_attachments = self._generate(
+            FileAttachment, force, batch_size,
+            lambda attachment: attachment.generate_thumbnail())
+
+        self.stdout.write(
+            _('Generated thumbnails for %(num_screenshots)d screenshot(s) '
+              'and %(num_attachments)d file attachment(s).')
+            % {
+                'num_screenshots': num_screenshots,
+                'num_attachments': num_attachments,
+            })
+
+    def _generate(self, model, force, batch_size, generate_func):
+        """Generates thumbnails for all objects of a model.
+
+        Objects are loaded in batches ordered by ID, so that only one batch
+        is held in memory at a time. This returns the number of objects
+        processed.
+        """
+        count = 0
+        last_pk = 0
+
+        while True:
+            objs = list(model.objects.filter(pk__gt=last_pk)
+                        .order_by('pk')[:batch_size])
+
+            if not objs:
+                break
+
+            for obj in objs:
+                if force or not obj.thumbnail_paths:
+                    generate_func(obj)
+                    count += 1
+
+            last_pk = objs[-1].pk
+
+        return count
@@ -8,7 +8,6 @@ from django.utils.html import escape
 from django.utils.encoding import smart_str, force_unicode
 from django.utils.safestring import mark_safe
 from djblets.cache.backend import cache_memoize
-from djblets.util.templatetags.djblets_images import thumbnail
 from pipeline.storage import default_storage
 from pygments import highlight
 from pygments.lexers import (ClassNotFound, guess_lexer_for_filename,
@@ -17,6 +16,12 @@ import docutils.core
 import markdown
 import mimeparse
 
+from reviewboard.attachments.thumbnails import (THUMBNAIL_2X_SIZE,
+                                                THUMBNAIL_SIZE,
+                                                THUMBNAIL_SIZES,
+                                                generate_thumbnails,
+                                                get_thumbnail_url)
+
 
 _registered_mimetype_handlers = []
 
@@ -186,6 +191,16 @@ class MimetypeHandler(object):
         """
         return mark_safe('<pre class="file-thumbnail"></pre>')
 
+    def generate_thumbnail(self):
+        """Generates the thumbnail ahead of time.
+
+        This is called when the file is uploaded, and by the
+        ``generate-thumbnails`` management command. Subclasses whose
+        thumbnails are expensive to create should generate and store them
+        here, so that get_thumbnail() can use them.
+        """
+        pass
+
     def set_thumbnail(self):
         """Set the thumbnail data.
 
@@ -201,13 +216,36 @@ class ImageMimetype(MimetypeHandler):
     """Handles image mimetypes."""
     supported_mimetypes = ['image/*']
 
+    def generate_thumbnail(self):
+        """Generates the thumbnails of the image.
+
+        The paths to the thumbnails are stored on the file attachment.
+        """
+        attachment = self.attachment
+        attachment.thumbnail_paths = generate_thumbnails(attachment.file)
+
+        if attachment.pk:
+            attachment.__class__.objects.filter(pk=attachment.pk).update(
+                thumbnail_paths=attachment.thumbnail_paths)
+
     def get_thumbnail(self):
         """Returns a thumbnail of the image."""
+        attachment = self.attachment
+        thumbnail_paths = attachment.thumbnail_paths
+
+        if (not thumbnail_paths or
+            any(size not in thumbnail_paths for size in THUMBNAIL_SIZES)):
+            self.generate_thumbnail()
+            thumbnail_paths = attachment.thumbnail_paths
+
         return mark_safe('<img src="%s" data-at2x="%s" '
                          'class="file-thumbnail" alt="%s" />'
-                         % (thumbnail(self.attachment.file),
-                            thumbnail(self.attachment.file, '800x200'),
-                            escape(self.attachment.caption)))
+                         % (get_thumbnail_url(attachment.file,
+                                              thumbnail_paths[THUMBNAIL_SIZE]),
+                            get_thumbnail_url(
+                                attachment.file,
+                                thumbnail_paths[THUMBNAIL_2X_SIZE]),
+                            escape(attachment.caption)))
 
 
 class TextMimetype(MimetypeHandler):
@@ -268,16 +306,26 @@ class TextMimetype(MimetypeHandler):
         return mark_safe('<div class="file-thumbnail-clipped">%s</div>'
                          % self._generate_preview_html(data))
 
+    def generate_thumbnail(self):
+        """Generates the thumbnail of the text file and caches it."""
+        cache_memoize(self._get_thumbnail_cache_key(),
+                      self._generate_thumbnail,
+                      force_overwrite=True)
+
     def get_thumbnail(self):
         """Returns the thumbnail of the text file as rendered as html"""
         # Caches the generated thumbnail to eliminate the need on each page
         # reload to:
         # 1) re-read the file attachment
         # 2) re-generate the html based on the data read
-        return cache_memoize('file-attachment-thumbnail-%s-html-%s'
-                             % (self.__class__.__name__, self.attachment.pk),
+        return cache_memoize(self._get_thumbnail_cache_key(),
                              self._generate_thumbnail)
 
+    def _get_thumbnail_cache_key(self):
+        """Returns the cache key for the thumbnail HTML."""
+        return ('file-attachment-thumbnail-%s-html-%s'
+                % (self.__class__.__name__, self.attachment.pk))
+
 
 class ReStructuredTextMimetype(TextMimetype):
     """Handles ReStructuredText (.rst) mimetypes."""
@@ -8,7 +8,7 @@ from django.db import models
 from django.db.models import Max
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
-from djblets.db.fields import RelationCounterField
+from djblets.db.fields import JSONField, RelationCounterField
 
 from reviewboard.admin.server import build_server_url
 from reviewboard.attachments.managers import FileAttachmentManager
@@ -68,6 +68,10 @@ class FileAttachment(models.Model):
                                                    '%Y', '%m', '%d'))
     mimetype = models.CharField(_('mimetype'), max_length=256, blank=True)
 
+    # The paths in storage to any thumbnail images generated for the file,
+    # keyed by size. Thumbnails that couldn't be generated have empty paths.
+    thumbnail_paths = JSONField(null=True)
+
     # repo_path, repo_revision, and repository are used to identify
     # FileAttachments associated with committed binary files in a source tree.
     # They are not used for new files that don't yet have a revision.
@@ -136,6 +140,19 @@ class FileAttachment(models.Model):
 
     thumbnail = property(_get_thumbnail, _set_thumbnail)
 
+    def generate_thumbnail(self):
+        """Generates the thumbnail for display ahead of time.
+
+        This is called after the file is uploaded, so that the thumbnail
+        doesn't have to be generated when it's first displayed.
+        """
+        try:
+            self.mimetype_handler.generate_thumbnail()
+        except Exception as e:
+            logging.error('Error when calling generate_thumbnail for '
+                          'MimetypeHandler %r: %s',
+                          self.mimetype_handler, e, exc_info=1)
+
     @property
     def filename(self):
         """Returns the filename for display purposes."""
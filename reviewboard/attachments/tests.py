@@ -7,6 +7,9 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_finished
+from django.core.management import call_command
+from django.utils.six.moves import cStringIO as StringIO
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
@@ -17,6 +20,10 @@ from reviewboard.attachments.mimetypes import (MimetypeHandler,
                                                unregister_mimetype_handler)
 from reviewboard.attachments.models import (FileAttachment,
                                             FileAttachmentHistory)
+from reviewboard.attachments.thumbnails import (THUMBNAIL_2X_SIZE,
+                                                THUMBNAIL_SIZE,
+                                                THUMBNAIL_SIZES,
+                                                generate_thumbnails)
 from reviewboard.diffviewer.models import DiffSet, DiffSetHistory, FileDiff
 from reviewboard.reviews.models import ReviewRequest
 from reviewboard.scmtools.core import PRE_CREATION
@@ -67,7 +74,7 @@ class BaseFileAttachmentTestCase(TestCase):
         return filediff
 
 
-class FileAttachmentTests(BaseFileAttachmentTestCase):
+class FileAttachmentTests(SpyAgency, BaseFileAttachmentTestCase):
     @add_fixtures(['test_users', 'test_scmtools'])
     def test_upload_file(self):
         """Testing uploading a file attachment"""
@@ -84,6 +91,121 @@ class FileAttachmentTests(BaseFileAttachmentTestCase):
             '__trophy.png'))
         self.assertEqual(file_attachment.mimetype, 'image/png')
 
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_upload_file_generates_thumbnails(self):
+        """Testing uploading an image file attachment generates thumbnails
+        after the response is sent
+        """
+        review_request = self.create_review_request(publish=True)
+
+        form = UploadFileForm(review_request, files={
+            'path': self.make_uploaded_file(),
+        })
+        self.assertTrue(form.is_valid())
+
+        file_attachment = form.create()
+        file_attachment = FileAttachment.objects.get(pk=file_attachment.pk)
+        self.assertFalse(file_attachment.thumbnail_paths)
+
+        request_finished.send(sender=self.__class__)
+
+        file_attachment = FileAttachment.objects.get(pk=file_attachment.pk)
+        self.assertEqual(set(file_attachment.thumbnail_paths.keys()),
+                         set(THUMBNAIL_SIZES))
+
+        # The stored thumbnails should be used when displaying the file.
+        self.spy_on(generate_thumbnails)
+        thumbnail = file_attachment.thumbnail
+        storage = file_attachment.file.storage
+
+        self.assertFalse(generate_thumbnails.spy.called)
+        self.assertIn(
+            storage.url(file_attachment.thumbnail_paths[THUMBNAIL_SIZE]),
+            thumbnail)
+        self.assertIn(
+            storage.url(file_attachment.thumbnail_paths[THUMBNAIL_2X_SIZE]),
+            thumbnail)
+
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_thumbnail_with_invalid_image(self):
+        """Testing FileAttachment.thumbnail with an invalid image records
+        the failure
+        """
+        review_request = self.create_review_request(publish=True)
+        file_attachment = FileAttachment.objects.create(
+            caption='',
+            orig_filename='bad.png',
+            mimetype='image/png')
+        file_attachment.file.save('bad.png',
+                                  SimpleUploadedFile('bad.png', b'bad'),
+                                  save=True)
+        review_request.file_attachments.add(file_attachment)
+
+        self.assertIn('src=""', file_attachment.thumbnail)
+
+        file_attachment = FileAttachment.objects.get(pk=file_attachment.pk)
+        self.assertEqual(file_attachment.thumbnail_paths, {
+            THUMBNAIL_SIZE: '',
+            THUMBNAIL_2X_SIZE: '',
+        })
+
+        # The failure shouldn't be retried on the next display.
+        self.spy_on(generate_thumbnails)
+        self.assertIn('src=""', file_attachment.thumbnail)
+        self.assertFalse(generate_thumbnails.spy.called)
+
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_generate_thumbnails_command(self):
+        """Testing the generate-thumbnails management command"""
+        review_request = self.create_review_request(publish=True)
+
+        form = UploadFileForm(review_request, files={
+            'path': self.make_uploaded_file(),
+        })
+        self.assertTrue(form.is_valid())
+
+        file_attachment = form.create()
+        FileAttachment.objects.filter(pk=file_attachment.pk).update(
+            thumbnail_paths=None)
+
+        call_command('generate-thumbnails', stdout=StringIO())
+
+        file_attachment = FileAttachment.objects.get(pk=file_attachment.pk)
+        self.assertEqual(set(file_attachment.thumbnail_paths.keys()),
+                         set(THUMBNAIL_SIZES))
+
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_create_attachment_histories_command(self):
+        """Testing the create-attachment-histories management command"""
+        review_request = self.create_review_request(publish=True)
+        history = FileAttachmentHistory.objects.create(display_position=1)
+        review_request.file_attachment_histories.add(history)
+
+        file_attachment_1 = self.create_file_attachment(
+            review_request, attachment_history=history)
+        file_attachment_2 = self.create_file_attachment(review_request)
+        file_attachment_3 = self.create_file_attachment(review_request,
+                                                        draft=True)
+
+        call_command('create-attachment-histories', stdout=StringIO())
+
+        file_attachment_1 = FileAttachment.objects.get(
+            pk=file_attachment_1.pk)
+        file_attachment_2 = FileAttachment.objects.get(
+            pk=file_attachment_2.pk)
+        file_attachment_3 = FileAttachment.objects.get(
+            pk=file_attachment_3.pk)
+
+        self.assertEqual(file_attachment_1.attachment_history, history)
+        self.assertEqual(
+            file_attachment_2.attachment_history.display_position, 2)
+        self.assertEqual(
+            file_attachment_3.attachment_history.display_position, 3)
+        self.assertEqual(
+            set(review_request.file_attachment_histories.all()),
+            set([history, file_attachment_2.attachment_history,
+                 file_attachment_3.attachment_history]))
+
     @add_fixtures(['test_users', 'test_scmtools'])
     def test_upload_file_with_history(self):
         """Testing uploading a file attachment to an existing
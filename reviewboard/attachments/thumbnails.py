@@ -0,0 +1,120 @@
+"""Generation of thumbnails for uploaded images.
+
+Creating a thumbnail means checking storage for an existing one, and
+otherwise reading and resizing the full image. Rather than doing this while
+rendering pages, thumbnails are generated after the response to the upload
+has been sent (see :py:func:`generate_after_response`), and their paths in
+storage are stored on the model. URLs are built from the paths when
+displayed, so they follow any changes to ``MEDIA_URL`` or the storage
+backend.
+
+Sizes that couldn't be generated are stored with an empty path, so that
+they aren't attempted again on every display. Images uploaded before
+thumbnails were stored are given them on first display, or through the
+``generate-thumbnails`` management command.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from django.core.signals import request_finished
+from djblets.util.templatetags.djblets_images import thumbnail
+
+
+#: The size of thumbnails shown on review request pages.
+THUMBNAIL_SIZE = '400x100'
+
+#: The size of thumbnails shown on high-DPI displays.
+THUMBNAIL_2X_SIZE = '800x200'
+
+#: All the thumbnail sizes generated for an image.
+THUMBNAIL_SIZES = (THUMBNAIL_SIZE, THUMBNAIL_2X_SIZE)
+
+
+# The functions to call once the current response has been sent, for each
+# thread.
+_deferred = threading.local()
+
+
+def generate_thumbnails(f):
+    """Generates the thumbnails for an image file.
+
+    This returns a dictionary mapping each size to the path of its
+    thumbnail in storage. Sizes that couldn't be generated (for instance,
+    if the image is corrupt) map to an empty path.
+    """
+    thumbnail_paths = {}
+
+    for size in THUMBNAIL_SIZES:
+        try:
+            url = thumbnail(f, size)
+        except Exception as e:
+            logging.error('Unable to generate a %s thumbnail for %s: %s',
+                          size, f.name, e, exc_info=1)
+            url = None
+
+        if url:
+            thumbnail_paths[size] = get_thumbnail_path(f, size)
+        else:
+            thumbnail_paths[size] = ''
+
+    return thumbnail_paths
+
+
+def get_thumbnail_path(f, size):
+    """Returns the path in storage to a thumbnail of an image file.
+
+    This matches the path that djblets' ``thumbnail`` filter stores the
+    thumbnail at.
+    """
+    if '.' in f.name:
+        basename, ext = f.name.rsplit('.', 1)
+
+        return '%s_%s.%s' % (basename, size, ext)
+    else:
+        return '%s_%s' % (f.name, size)
+
+
+def get_thumbnail_url(f, path):
+    """Returns the URL to a thumbnail stored with an image file.
+
+    If there's no thumbnail, this returns an empty string.
+    """
+    if path:
+        return f.storage.url(path)
+    else:
+        return ''
+
+
+def generate_after_response(func):
+    """Calls a function to generate thumbnails after the response is sent.
+
+    This is used when a file is uploaded, so that the upload doesn't have
+    to wait for its thumbnails. If there's no request in progress, the
+    thumbnails will instead be generated when they're first displayed.
+    """
+    if not hasattr(_deferred, 'funcs'):
+        _deferred.funcs = []
+
+    _deferred.funcs.append(func)
+
+
+def _on_request_finished(**kwargs):
+    """Generates any thumbnails deferred until the response was sent."""
+    funcs = getattr(_deferred, 'funcs', None)
+
+    if funcs:
+        _deferred.funcs = []
+
+        for func in funcs:
+            try:
+                func()
+            except Exception as e:
+                logging.error('Unable to generate thumbnails after the '
+                              'response was sent: %s',
+                              e, exc_info=1)
+
+
+request_finished.connect(_on_request_finished)
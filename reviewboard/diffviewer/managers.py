@@ -532,6 +532,8 @@ class DiffSetManager(models.Manager):
     def _process_files(self, parser, basedir, repository, base_commit_id,
                        request, check_existence=False, limit_to=None):
         tool = repository.get_scmtool()
+        files = []
+        files_to_check = []
 
         for f in parser.parse():
             f2, revision = tool.parse_diff_revision(f.origFile, f.origInfo,
@@ -549,22 +551,35 @@ class DiffSetManager(models.Manager):
                 continue
 
             # FIXME: this would be a good place to find permissions errors
-            if (revision != PRE_CREATION and
+            if (check_existence and
+                revision != PRE_CREATION and
                 revision != UNKNOWN and
                 not f.binary and
                 not f.deleted and
                 not f.moved and
-                not f.copied and
-                (check_existence and
-                 not repository.get_file_exists(filename, revision,
-                                                base_commit_id=base_commit_id,
-                                                request=request))):
-                raise FileNotFoundError(filename, revision, base_commit_id)
+                not f.copied):
+                files_to_check.append((filename, revision))
 
             f.origFile = filename
             f.origInfo = revision
 
-            yield f
+            files.append(f)
+
+        # Check all the files at once, since some repositories can do that
+        # far faster than checking them one at a time.
+        if files_to_check:
+            files_exist = repository.get_files_exist(
+                files_to_check,
+                base_commit_id=base_commit_id,
+                request=request)
+
+            for (filename, revision), exists in zip(files_to_check,
+                                                    files_exist):
+                if not exists:
+                    raise FileNotFoundError(filename, revision,
+                                            base_commit_id)
+
+        return files
 
     def _compare_files(self, filename1, filename2):
         """
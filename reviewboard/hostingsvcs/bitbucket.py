@@ -23,7 +23,7 @@ from reviewboard.hostingsvcs.errors import (AuthorizationError,
 from reviewboard.hostingsvcs.forms import HostingServiceForm
 from reviewboard.hostingsvcs.hook_utils import (close_all_review_requests,
                                                 get_repository_for_hook,
-                                                get_review_request_id)
+                                                get_review_request_ids)
 from reviewboard.hostingsvcs.service import HostingService
 from reviewboard.scmtools.crypto_utils import (decrypt_password,
                                                encrypt_password)
@@ -207,12 +207,14 @@ class Bitbucket(HostingService):
                         *args, **kwargs):
         """Determines if a file exists.
 
-        This will perform an API request to fetch the metadata for a file.
+        This will perform a HEAD request for the file, without fetching
+        its contents.
 
         If using Git, this will expect a base commit ID to be provided.
         """
         try:
-            self._api_get_src(repository, path, revision, base_commit_id)
+            self._api_get_src(repository, path, revision, base_commit_id,
+                              method='HEAD')
 
             return True
         except (URLError, HTTPError, FileNotFoundError):
@@ -258,7 +260,8 @@ class Bitbucket(HostingService):
 
         return self._api_get(url)
 
-    def _api_get_src(self, repository, path, revision, base_commit_id):
+    def _api_get_src(self, repository, path, revision, base_commit_id,
+                     method='GET'):
         # If a base commit ID is provided, use it. It may not be provided,
         # though, and in this case, we need to use the provided revision,
         # which will work for Mercurial but not for Git.
@@ -283,7 +286,7 @@ class Bitbucket(HostingService):
                quote(revision),
                quote(path)))
 
-        return self._api_get(url, raw_content=True)
+        return self._api_get(url, raw_content=True, method=method)
 
     def _build_api_url(self, url, version='1.0'):
         return 'https://bitbucket.org/api/%s/%s' % (version, url)
@@ -318,9 +321,14 @@ class Bitbucket(HostingService):
         else:
             raise InvalidPlanError(plan)
 
-    def _api_get(self, url, raw_content=False):
+    def _api_get(self, url, raw_content=False, method='GET'):
+        if method == 'HEAD':
+            http_method = self.client.http_head
+        else:
+            http_method = self.client.http_get
+
         try:
-            data, headers = self.client.http_get(
+            data, headers = http_method(
                 url,
                 username=self.account.username,
                 password=decrypt_password(self.account.data['password']))
@@ -396,17 +404,21 @@ def _get_review_request_id_to_commits_map(payload, server_url, repository):
     append the commit to the key None.
     """
     review_request_id_to_commits_map = defaultdict(list)
-    commits = payload.get('commits', [])
-
-    for commit in commits:
-        commit_hash = commit.get('raw_node')
-        commit_message = commit.get('message')
-        branch_name = commit.get('branch')
-
-        if branch_name:
-            review_request_id = get_review_request_id(
-                commit_message, server_url, commit_hash, repository)
-            review_request_id_to_commits_map[review_request_id].append(
-                '%s (%s)' % (branch_name, commit_hash[:7]))
+    commits = [
+        commit
+        for commit in payload.get('commits', [])
+        if commit.get('branch')
+    ]
+    review_request_ids = get_review_request_ids(
+        [
+            (commit.get('raw_node'), commit.get('message'))
+            for commit in commits
+        ],
+        server_url,
+        repository)
+
+    for commit, review_request_id in zip(commits, review_request_ids):
+        review_request_id_to_commits_map[review_request_id].append(
+            '%s (%s)' % (commit['branch'], commit.get('raw_node')[:7]))
 
     return review_request_id_to_commits_map
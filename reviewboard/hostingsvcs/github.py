@@ -5,6 +5,7 @@ import hmac
 import json
 import logging
 import re
+import threading
 import uuid
 from collections import defaultdict
 
@@ -14,6 +15,7 @@ from django.conf.urls import patterns, url
 from django.contrib.sites.models import Site
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.template import RequestContext
 from django.template.loader import render_to_string
@@ -22,6 +24,7 @@ from django.utils.six.moves.urllib.error import HTTPError, URLError
 from django.utils.six.moves.urllib.parse import urljoin
 from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.http import require_POST
+from djblets.cache.backend import cache_memoize
 from djblets.siteconfig.models import SiteConfiguration
 
 from reviewboard.admin.server import build_server_url, get_server_url
@@ -35,7 +38,7 @@ from reviewboard.hostingsvcs.forms import HostingServiceForm
 from reviewboard.hostingsvcs.hook_utils import (close_all_review_requests,
                                                 get_git_branch_name,
                                                 get_repository_for_hook,
-                                                get_review_request_id)
+                                                get_review_request_ids)
 from reviewboard.hostingsvcs.repository import RemoteRepository
 from reviewboard.hostingsvcs.service import (HostingService,
                                              HostingServiceClient)
@@ -162,6 +165,12 @@ class GitHubClient(HostingServiceClient):
         self._check_rate_limits(headers)
         return data, headers
 
+    def http_head(self, url, *args, **kwargs):
+        data, headers = super(GitHubClient, self).http_head(
+            url, *args, **kwargs)
+        self._check_rate_limits(headers)
+        return data, headers
+
     def http_post(self, url, *args, **kwargs):
         data, headers = super(GitHubClient, self).http_post(
             url, *args, **kwargs)
@@ -234,6 +243,15 @@ class GitHubClient(HostingServiceClient):
         except (URLError, HTTPError):
             raise FileNotFoundError(path, sha)
 
+    def api_get_blob_exists(self, repo_api_url, sha):
+        url = self._build_api_url(repo_api_url, 'git/blobs/%s' % sha)
+
+        try:
+            self.http_head(url)
+            return True
+        except (URLError, HTTPError):
+            return False
+
     def api_get_commits(self, repo_api_url, branch=None, start=None):
         url = self._build_api_url(repo_api_url, 'commits')
 
@@ -489,6 +507,8 @@ class GitHub(HostingService, BugTracker):
     # This should be the prefix for every field on the plan forms.
     plan_field_prefix = 'github'
 
+    FULL_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
     def get_api_url(self, hosting_url):
         """Returns the API URL for GitHub.
 
@@ -705,12 +725,32 @@ class GitHub(HostingService, BugTracker):
         return self.client.api_get_blob(repo_api_url, path, revision)
 
     def get_file_exists(self, repository, path, revision, *args, **kwargs):
-        try:
-            repo_api_url = self._get_repo_api_url(repository)
-            self.client.api_get_blob(repo_api_url, path, revision)
-            return True
-        except FileNotFoundError:
-            return False
+        repo_api_url = self._get_repo_api_url(repository)
+        return self.client.api_get_blob_exists(repo_api_url, revision)
+
+    def get_files_exist(self, repository, files, base_commit_id=None):
+        """Determines whether several files exist.
+
+        If there's a base commit ID, the SHAs of every blob in that commit's
+        tree are fetched with a single recursive tree listing, and any files
+        with those SHAs are known to exist. Only the remaining files (such
+        as ones from an older commit) are checked individually.
+        """
+        blob_shas = frozenset()
+
+        if base_commit_id:
+            try:
+                blob_shas = self._get_tree_blob_shas(repository,
+                                                     base_commit_id)
+            except SCMError:
+                # This was logged. Fall back on checking each file.
+                pass
+
+        return [
+            (revision in blob_shas or
+             self.get_file_exists(repository, path, revision))
+            for path, revision in files
+        ]
 
     def get_branches(self, repository):
         repo_api_url = self._get_repo_api_url(repository)
@@ -764,17 +804,23 @@ class GitHub(HostingService, BugTracker):
             parent_revision = commit['parents'][0]['sha']
             message = commit['commit']['message']
 
-        # Step 2: Get the diff and tree from the "compare commits" API
-        files, tree_sha = self.client.api_get_compare_commits(
+        # Step 2: Get the diff from the "compare commits" API. This doesn't
+        # depend on the next step, so it's fetched in another thread.
+        get_compare_result = _call_in_thread(
+            self.client.api_get_compare_commits,
             repo_api_url, parent_revision, revision)
 
-        # Step 3: fetch the tree for the original commit, so that we can get
-        # full blob SHAs for each of the files in the diff.
-        tree = self.client.api_get_tree(repo_api_url, tree_sha, recursive=True)
-
-        file_shas = {}
-        for file in tree['tree']:
-            file_shas[file['path']] = file['sha']
+        # Step 3: fetch the tree for the parent commit, so that we can get
+        # full blob SHAs for each of the files in the diff. A root commit
+        # only adds files, so there's nothing to look up.
+        try:
+            if parent_revision:
+                file_shas = self._get_tree_file_shas(repository,
+                                                     parent_revision)
+            else:
+                file_shas = {}
+        finally:
+            files = get_compare_result()[0]
 
         diff = []
 
@@ -1001,6 +1047,35 @@ class GitHub(HostingService, BugTracker):
     def _build_api_url(self, *api_paths):
         return self.client._build_api_url(*api_paths)
 
+    def _get_tree_blob_shas(self, repository, sha):
+        """Returns the SHAs of all blobs in a commit or tree."""
+        return frozenset(six.itervalues(
+            self._get_tree_file_shas(repository, sha)))
+
+    def _get_tree_file_shas(self, repository, sha):
+        """Returns a mapping of paths to blob SHAs in a commit or tree.
+
+        The tree of a commit never changes, so the result is cached if a
+        full SHA was given, rather than a branch name or shortened SHA.
+        """
+        def _fetch_file_shas():
+            repo_api_url = self._get_repo_api_url(repository)
+            tree = self.client.api_get_tree(repo_api_url, sha, recursive=True)
+
+            return dict(
+                (item['path'], item['sha'])
+                for item in tree['tree']
+                if item['type'] == 'blob'
+            )
+
+        if self.FULL_SHA_RE.match(sha):
+            return cache_memoize(
+                'github-tree-files:%s:%s' % (repository.pk, sha),
+                _fetch_file_shas,
+                large_data=True)
+        else:
+            return _fetch_file_shas()
+
     def _get_repo_api_url(self, repository):
         plan = repository.extra_data['repository_plan']
 
@@ -1024,6 +1099,37 @@ class GitHub(HostingService, BugTracker):
         return self.get_plan_field(plan, extra_data, 'repo_name')
 
 
+def _call_in_thread(func, *args, **kwargs):
+    """Starts calling a function in a new thread.
+
+    This returns a function that waits for the call to finish, and then
+    returns its result or raises its exception.
+    """
+    result = {}
+
+    def _run():
+        try:
+            result['value'] = func(*args, **kwargs)
+        except Exception as e:
+            result['error'] = e
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=_run)
+    thread.daemon = True
+    thread.start()
+
+    def _wait():
+        thread.join()
+
+        if 'error' in result:
+            raise result['error']
+
+        return result['value']
+
+    return _wait
+
+
 @require_POST
 def post_receive_hook_close_submitted(request, local_site_name=None,
                                       repository_id=None,
@@ -1070,6 +1176,13 @@ def post_receive_hook_close_submitted(request, local_site_name=None,
                                   local_site_name, repository,
                                   hosting_service_id)
 
+    if settings.HOSTINGSVCS_HOOK_PREFETCH_CHANGES:
+        repository.prefetch_changes([
+            commit['id']
+            for commit in payload.get('commits', [])
+            if commit.get('id') and commit.get('distinct', True)
+        ])
+
     return HttpResponse()
 
 
@@ -1089,14 +1202,15 @@ def _get_review_request_id_to_commits_map(payload, server_url, repository):
     if not branch_name:
         return None
 
-    commits = payload.get('commits', [])
-
-    for commit in commits:
-        commit_hash = commit.get('id')
-        commit_message = commit.get('message')
-        review_request_id = get_review_request_id(commit_message, server_url,
-                                                  commit_hash, repository)
+    commits = [
+        (commit.get('id'), commit.get('message'))
+        for commit in payload.get('commits', [])
+    ]
+    review_request_ids = get_review_request_ids(commits, server_url,
+                                                repository)
 
+    for (commit_hash, commit_message), review_request_id in \
+            zip(commits, review_request_ids):
         review_request_id_to_commits_map[review_request_id].append(
             '%s (%s)' % (branch_name, commit_hash[:7]))
 
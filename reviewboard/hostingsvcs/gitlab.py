@@ -170,12 +170,14 @@ class GitLab(HostingService):
                         *args, **kwargs):
         """Determines if a file exists.
 
-        This will perform an API request to fetch the metadata for a file.
+        This will perform a HEAD request for the file, without fetching
+        its contents.
         """
         try:
             self._api_get(
                 self._get_blob_url(repository, path, revision, base_commit_id),
-                raw_content=True)
+                raw_content=True,
+                method='HEAD')
 
             return True
         except (HTTPError, URLError):
@@ -344,10 +346,15 @@ class GitLab(HostingService):
         """Returns the private token used for authentication."""
         return decrypt_password(self.account.data['private_token'])
 
-    def _api_get(self, url, raw_content=False):
+    def _api_get(self, url, raw_content=False, method='GET'):
         """Makes a request to the GitLab API and returns the result."""
+        if method == 'HEAD':
+            http_method = self.client.http_head
+        else:
+            http_method = self.client.http_get
+
         try:
-            data, headers = self.client.http_get(
+            data, headers = http_method(
                 url,
                 headers={
                     'Accept': 'application/json',
@@ -16,7 +16,7 @@ from reviewboard.admin.server import build_server_url, get_server_url
 from reviewboard.hostingsvcs.forms import HostingServiceForm
 from reviewboard.hostingsvcs.hook_utils import (close_all_review_requests,
                                                 get_repository_for_hook,
-                                                get_review_request_id)
+                                                get_review_request_ids)
 from reviewboard.hostingsvcs.service import HostingService
 from reviewboard.site.urlresolvers import local_site_reverse
 
@@ -139,15 +139,19 @@ def close_review_requests(payload, server_url):
         return review_request_id_to_commits_map
 
     revisions = payload.get('revisions', [])
-
-    for revision in revisions:
+    review_request_ids = get_review_request_ids(
+        [
+            (None, revision.get('message'))
+            for revision in revisions
+        ],
+        server_url)
+
+    for revision, review_request_id in zip(revisions, review_request_ids):
         revision_id = revision.get('revision')
 
         if len(revision_id) > 7:
             revision_id = revision_id[:7]
 
-        commit_message = revision.get('message')
-        review_request_id = get_review_request_id(commit_message, server_url)
         review_request_id_to_commits_map[review_request_id].append(
             '%s (%s)' % (branch_name, revision_id))
 
@@ -4,15 +4,20 @@ import logging
 import re
 
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import six
 
 from reviewboard.reviews.models import ReviewRequest
+from reviewboard.reviews.signals import review_request_closed
 from reviewboard.scmtools.models import Repository
 from reviewboard.site.models import LocalSite
 
 
+_hook_regex_cache = {}
+
+
 def get_git_branch_name(ref_name):
     """Returns the branch name corresponding to the specified ref name."""
     branch_ref_prefix = 'refs/heads/'
@@ -49,45 +54,115 @@ def get_review_request_id(commit_message, server_url, commit_id=None,
 
     We assume there is at most one review request associated with each commit.
     If a matching review request cannot be found, we return None.
+
+    When processing more than one commit, use get_review_request_ids instead,
+    which looks up all the commit IDs at once.
     """
-    regex = settings.HOSTINGSVCS_HOOK_REGEX % {
-        'server_url': server_url,
-    }
+    return get_review_request_ids([(commit_id, commit_message)],
+                                  server_url, repository)[0]
 
-    pattern = re.compile(regex, settings.HOSTINGSVCS_HOOK_REGEX_FLAGS)
-    match = pattern.search(commit_message)
 
-    if match:
-        try:
-            review_request_id = int(match.group('id'))
-        except ValueError:
-            logging.error('The review request ID must be an integer.')
-            review_request_id = None
-    elif commit_id:
-        assert repository
+def get_review_request_ids(commits, server_url, repository=None):
+    """Returns the review request IDs matching a list of pushed commits.
 
-        try:
-            review_request = ReviewRequest.objects.get(
-                commit_id=six.text_type(commit_id),
-                repository=repository)
-            review_request_id = review_request.display_id
-        except ReviewRequest.DoesNotExist:
+    ``commits`` is a list of ``(commit_id, commit_message)`` tuples. The
+    result is a list of review request IDs (or None, for commits without
+    a matching review request) in the same order.
+
+    Each commit message is first matched against the hook regex. The IDs
+    of any commits that don't reference a review request are then looked up
+    using a single query.
+    """
+    regex = _get_hook_regex(server_url)
+    review_request_ids = []
+    lookup_commit_ids = set()
+
+    for commit_id, commit_message in commits:
+        match = commit_message and regex.search(commit_message)
+
+        if match:
+            try:
+                review_request_id = int(match.group('id'))
+            except ValueError:
+                logging.error('The review request ID must be an integer.')
+                review_request_id = None
+        elif commit_id:
+            assert repository
+
+            commit_id = six.text_type(commit_id)
+            lookup_commit_ids.add(commit_id)
+            review_request_id = _LookupCommitID(commit_id)
+        else:
             review_request_id = None
 
-    return review_request_id
+        review_request_ids.append(review_request_id)
+
+    if lookup_commit_ids:
+        commit_id_to_review_request_id = dict(
+            (commit_id, local_id if local_site_id else pk)
+            for commit_id, pk, local_id, local_site_id in (
+                ReviewRequest.objects
+                .filter(repository=repository,
+                        commit_id__in=lookup_commit_ids)
+                .values_list('commit_id', 'pk', 'local_id', 'local_site'))
+        )
+
+        review_request_ids = [
+            commit_id_to_review_request_id.get(lookup_id.commit_id)
+            if isinstance(lookup_id, _LookupCommitID)
+            else lookup_id
+            for lookup_id in review_request_ids
+        ]
+
+    return review_request_ids
+
 
+class _LookupCommitID(object):
+    """A placeholder for a review request ID to look up by commit ID."""
+    def __init__(self, commit_id):
+        self.commit_id = commit_id
 
-def close_review_request(review_request, review_request_id, description):
-    """Closes the specified review request as submitted."""
+
+def _get_hook_regex(server_url):
+    """Returns the compiled hook regex for the given server URL.
+
+    The compiled regex is cached for future lookups.
+    """
+    key = (settings.HOSTINGSVCS_HOOK_REGEX,
+           settings.HOSTINGSVCS_HOOK_REGEX_FLAGS,
+           server_url)
+
+    try:
+        return _hook_regex_cache[key]
+    except KeyError:
+        regex = re.compile(
+            settings.HOSTINGSVCS_HOOK_REGEX % {
+                'server_url': server_url,
+            },
+            settings.HOSTINGSVCS_HOOK_REGEX_FLAGS)
+        _hook_regex_cache[key] = regex
+
+        return regex
+
+
+def close_review_request(review_request, review_request_id, description,
+                         send_notification=True):
+    """Closes the specified review request as submitted.
+
+    Returns whether the review request was closed.
+    """
     if review_request.status == ReviewRequest.SUBMITTED:
         logging.warning('Review request #%s is already submitted.',
                         review_request_id)
-        return
+        return False
 
-    review_request.close(ReviewRequest.SUBMITTED, description=description)
+    review_request.close(ReviewRequest.SUBMITTED, description=description,
+                         send_notification=send_notification)
     logging.debug('Review request #%s is set to %s.',
                   review_request_id, review_request.status)
 
+    return True
+
 
 def close_all_review_requests(review_request_id_to_commits, local_site_name,
                               repository, hosting_service_id):
@@ -132,7 +207,7 @@ def close_all_review_requests(review_request_id_to_commits, local_site_name,
 
     # Check if there are any listed that we couldn't find, and log them.
     if len(review_request_ids) != len(review_requests):
-        id_to_review_request = dict(*[
+        id_to_review_request = dict([
             (review_request.display_id, review_request)
             for review_request in review_requests
         ])
@@ -143,12 +218,24 @@ def close_all_review_requests(review_request_id_to_commits, local_site_name,
                               'does not exist.',
                               review_request_id)
 
-    # Close any review requests we did find.
-    for review_request in review_requests:
-        review_request_id = review_request.display_id
+    # Close any review requests we did find. This is done in a single
+    # transaction, and the notifications (e-mails, WebHooks, and anything
+    # else listening to review_request_closed) are sent once they've all
+    # been closed.
+    closed_review_requests = []
 
-        close_review_request(
-            review_request,
-            review_request_id,
-            ('Pushed to ' +
-             ', '.join(review_request_id_to_commits[review_request_id])))
+    with transaction.atomic():
+        for review_request in review_requests:
+            review_request_id = review_request.display_id
+            commits = review_request_id_to_commits[review_request_id]
+            description = 'Pushed to ' + ', '.join(commits)
+
+            if close_review_request(review_request, review_request_id,
+                                    description, send_notification=False):
+                closed_review_requests.append(review_request)
+
+    for review_request in closed_review_requests:
+        review_request_closed.send(sender=ReviewRequest,
+                                   user=None,
+                                   review_request=review_request,
+                                   type=ReviewRequest.SUBMITTED)
@@ -1,21 +1,35 @@
 from __future__ import unicode_literals
 
 import base64
+import hashlib
+import itertools
 import json
 import logging
 import mimetools
+import socket
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from io import BytesIO
 
 from django.conf.urls import include, patterns, url
+from django.core.cache import cache
 from django.dispatch import receiver
 from django.utils import six
-from django.utils.six.moves.urllib.parse import urlparse
+from django.utils.six.moves import http_client
+from django.utils.six.moves.urllib.error import HTTPError, URLError
+from django.utils.six.moves.urllib.parse import urljoin, urlparse
 from django.utils.six.moves.urllib.request import (Request as BaseURLRequest,
                                                    HTTPBasicAuthHandler,
+                                                   getproxies,
+                                                   proxy_bypass,
                                                    urlopen)
 from django.utils.translation import ugettext_lazy as _
+from djblets.cache.backend import make_cache_key
 from pkg_resources import iter_entry_points
 
 import reviewboard.hostingsvcs.urls as hostingsvcs_urls
+from reviewboard import get_package_version
 from reviewboard.signals import initializing
 
 
@@ -28,6 +42,192 @@ class URLRequest(BaseURLRequest):
         return self.method
 
 
+class HTTPConnectionPool(object):
+    """A pool of persistent HTTP connections to hosting services.
+
+    Connections are kept open after a response has been read, and reused
+    for later requests to the same host. This saves a TCP (and, for HTTPS,
+    a TLS) handshake on every API call.
+
+    Redirects are followed the same way urllib2 follows them. Responses
+    with error codes raise :py:class:`HTTPError`, and connection failures
+    raise :py:class:`URLError`, so callers can handle errors the same way
+    they would with ``urlopen``. Connections time out after ``timeout``
+    seconds without a response, so that a stalled hosting service can't
+    hold up a thread indefinitely.
+    """
+    MAX_IDLE_CONNECTIONS = 4
+    MAX_REDIRECTS = 10
+    REDIRECT_CODES = (301, 302, 303, 307)
+    RETRY_METHODS = ('GET', 'HEAD')
+    TIMEOUT = 60
+
+    def __init__(self, max_idle_connections=MAX_IDLE_CONNECTIONS,
+                 timeout=TIMEOUT):
+        self.max_idle_connections = max_idle_connections
+        self.timeout = timeout
+        self._idle_connections = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def urlopen(self, request):
+        """Performs a request, returning the status, data and headers."""
+        url = request.get_full_url()
+        method = request.get_method()
+        body = request.data or None
+        headers = dict(request.header_items())
+
+        for i in range(self.MAX_REDIRECTS + 1):
+            status, reason, data, rsp_headers = \
+                self._send(url, method, body, headers)
+
+            location = rsp_headers.get('location')
+
+            if status not in self.REDIRECT_CODES or not location:
+                break
+
+            if method not in ('GET', 'HEAD'):
+                if status == 307:
+                    break
+
+                # Like urllib2, turn the redirected request into a GET.
+                method = 'GET'
+                body = None
+                headers = dict(
+                    (key, value)
+                    for key, value in six.iteritems(headers)
+                    if key.lower() not in ('content-length', 'content-type')
+                )
+
+            url = urljoin(url, location)
+
+        if status >= 400 or status in self.REDIRECT_CODES:
+            raise HTTPError(url, status, reason, rsp_headers, BytesIO(data))
+
+        return status, data, rsp_headers
+
+    def clear(self):
+        """Closes all idle connections in the pool."""
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = defaultdict(list)
+
+        for connections in six.itervalues(idle_connections):
+            for conn in connections:
+                conn.close()
+
+    def _send(self, url, method, body, headers):
+        """Sends a single request over a pooled connection.
+
+        If a reused connection turns out to have been closed by the server
+        while idle, GET and HEAD requests are retried once on a new
+        connection. Other requests aren't retried, as the server may have
+        already acted on them before the connection failed.
+        """
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        path = parsed.path or '/'
+
+        if parsed.query:
+            path += '?' + parsed.query
+
+        while True:
+            conn, reused = self._get_connection(key)
+
+            try:
+                conn.request(method, path, body, headers)
+                rsp = conn.getresponse()
+                data = rsp.read()
+            except (http_client.HTTPException, socket.error) as e:
+                conn.close()
+
+                if reused and method in self.RETRY_METHODS:
+                    continue
+
+                raise URLError(e)
+
+            if rsp.will_close:
+                conn.close()
+            else:
+                self._release_connection(key, conn)
+
+            return rsp.status, rsp.reason, data, rsp.msg
+
+    def _get_connection(self, key):
+        """Returns a connection for a host, and whether it was reused."""
+        with self._lock:
+            connections = self._idle_connections.get(key)
+
+            if connections:
+                return connections.pop(), True
+
+        scheme, netloc = key
+
+        if scheme == 'https':
+            conn_cls = http_client.HTTPSConnection
+        else:
+            conn_cls = http_client.HTTPConnection
+
+        return conn_cls(netloc, timeout=self.timeout), False
+
+    def _release_connection(self, key, conn):
+        """Returns a connection to the pool, or closes it if the pool is full.
+        """
+        with self._lock:
+            connections = self._idle_connections[key]
+
+            if len(connections) < self.max_idle_connections:
+                connections.append(conn)
+                return
+
+        conn.close()
+
+
+#: The shared pool of connections used by all hosting service clients.
+http_connection_pool = HTTPConnectionPool()
+
+_request_stats = defaultdict(lambda: {
+    'requests': 0,
+    'not_modified': 0,
+    'errors': 0,
+    'bytes_received': 0,
+    'request_time': 0.0,
+})
+_request_stats_lock = threading.Lock()
+
+
+def get_http_request_stats():
+    """Returns statistics on the HTTP requests made to hosting services.
+
+    This returns a dictionary mapping hosting service IDs to the number of
+    requests made, the number of those answered with "304 Not Modified",
+    the number of errors, the number of bytes received, and the total time
+    spent on requests (in seconds), for the current process.
+    """
+    with _request_stats_lock:
+        return dict(
+            (hosting_service_id, dict(stats))
+            for hosting_service_id, stats in six.iteritems(_request_stats)
+        )
+
+
+def _record_http_request(hosting_service_id, request_time, data=None,
+                         not_modified=False, error=False):
+    """Records statistics for an HTTP request to a hosting service."""
+    with _request_stats_lock:
+        stats = _request_stats[hosting_service_id]
+        stats['requests'] += 1
+        stats['request_time'] += request_time
+
+        if not_modified:
+            stats['not_modified'] += 1
+
+        if error:
+            stats['errors'] += 1
+
+        if data:
+            stats['bytes_received'] += len(data)
+
+
 class HostingServiceClient(object):
     """Client for communicating with a hosting service's API.
 
@@ -37,9 +237,25 @@ class HostingServiceClient(object):
     HostingService subclasses can also include an override of this class to add
     additional checking (such as GitHub's checking of rate limit headers), or
     add higher-level API functionality.
+
+    Requests are made over the shared :py:data:`http_connection_pool`. GET
+    requests are revalidated using ETags when ``use_etags`` is set: the
+    last response for each URL is cached, and if the server responds to
+    ``If-None-Match`` with "304 Not Modified", the cached data is returned
+    along with the cached headers (updated with any sent in the 304), so
+    that headers such as ``Link`` are still available.
     """
+    #: Whether to cache GET responses and revalidate them using ETags.
+    use_etags = True
+
+    #: The largest response, in bytes, that will be cached for revalidation.
+    ETAG_CACHE_MAX_SIZE = 512 * 1024
+
+    #: How long, in seconds, responses are cached for revalidation.
+    ETAG_CACHE_EXPIRATION = 24 * 60 * 60
+
     def __init__(self, hosting_service):
-        pass
+        self.hosting_service_id = getattr(hosting_service, 'id', None)
 
     #
     # HTTP utility methods
@@ -54,6 +270,10 @@ class HostingServiceClient(object):
         """Perform an HTTP GET on the given URL."""
         return self.http_request(url, method='GET', **kwargs)
 
+    def http_head(self, url, *args, **kwargs):
+        """Perform an HTTP HEAD on the given URL."""
+        return self.http_request(url, method='HEAD', **kwargs)
+
     def http_post(self, url, body=None, fields={}, files={}, content_type=None,
                   headers={}, *args, **kwargs):
         """Perform an HTTP POST on the given URL."""
@@ -76,9 +296,55 @@ class HostingServiceClient(object):
     def http_request(self, url, body=None, headers={}, method='GET', **kwargs):
         """Perform some HTTP operation on a given URL."""
         r = self._build_request(url, body, headers, method=method, **kwargs)
-        u = urlopen(r)
+        cache_key = None
+        cached_rsp = None
+
+        if method == 'GET' and self.use_etags:
+            cache_key = self._make_etag_cache_key(r)
+            cached_rsp = cache.get(cache_key)
 
-        return u.read(), u.headers
+            if cached_rsp:
+                r.add_header('If-None-Match', cached_rsp['etag'])
+
+        start_time = time.time()
+
+        try:
+            try:
+                status, data, rsp_headers = self._open_request(r)
+            except HTTPError as e:
+                if e.code == 304 and cached_rsp:
+                    status = 304
+                    rsp_headers = e.info()
+                else:
+                    raise
+        except Exception:
+            _record_http_request(self.hosting_service_id,
+                                 time.time() - start_time,
+                                 error=True)
+            raise
+
+        if status == 304:
+            data = cached_rsp['data']
+            rsp_headers = self._merge_headers(cached_rsp.get('headers', []),
+                                              rsp_headers)
+        elif cache_key:
+            etag = rsp_headers.get('ETag')
+
+            if etag and len(data) <= self.ETAG_CACHE_MAX_SIZE:
+                cache.set(cache_key,
+                          {
+                              'etag': etag,
+                              'data': data,
+                              'headers': list(rsp_headers.items()),
+                          },
+                          self.ETAG_CACHE_EXPIRATION)
+
+        _record_http_request(self.hosting_service_id,
+                             time.time() - start_time,
+                             data=data,
+                             not_modified=(status == 304))
+
+        return data, rsp_headers
 
     #
     # JSON utility methods
@@ -113,6 +379,7 @@ class HostingServiceClient(object):
                        password=None, method='GET'):
         """Build a URLRequest object, including HTTP Basic auth"""
         r = URLRequest(url, body, headers, method=method)
+        r.add_header('User-Agent', 'ReviewBoard/%s' % get_package_version())
 
         if username is not None and password is not None:
             auth_key = username + ':' + password
@@ -122,6 +389,60 @@ class HostingServiceClient(object):
 
         return r
 
+    def _open_request(self, request):
+        """Sends a request, returning the status, data and headers.
+
+        Requests are sent over the connection pool, unless a proxy is
+        configured for the URL, in which case they're left to urllib2.
+        """
+        parsed = urlparse(request.get_full_url())
+
+        if (parsed.scheme not in ('http', 'https') or
+            (parsed.scheme in getproxies() and
+             not proxy_bypass(parsed.hostname))):
+            u = urlopen(request)
+
+            return u.getcode(), u.read(), u.headers
+
+        return http_connection_pool.urlopen(request)
+
+    def _merge_headers(self, cached_headers, rsp_headers):
+        """Returns cached response headers updated from a 304 response.
+
+        Servers aren't required to repeat all of a response's headers when
+        responding with "304 Not Modified", so the headers from the cached
+        response are used, replaced by any sent in the 304.
+        """
+        headers = OrderedDict()
+
+        for key, value in itertools.chain(cached_headers,
+                                          rsp_headers.items()):
+            headers[key.lower()] = value
+
+        header_text = ''.join(
+            '%s: %s\r\n' % (key, value)
+            for key, value in six.iteritems(headers)
+        )
+
+        return http_client.HTTPMessage(
+            BytesIO(header_text.encode('iso-8859-1')))
+
+    def _make_etag_cache_key(self, request):
+        """Returns the cache key for revalidating a request using ETags.
+
+        The key covers the URL and all request headers, so that responses
+        fetched with different credentials are cached separately.
+        """
+        key_data = [request.get_full_url()]
+        key_data += [
+            '%s: %s' % (key, value)
+            for key, value in sorted(request.header_items())
+        ]
+
+        return make_cache_key(
+            'hostingsvcs-etag-%s'
+            % hashlib.sha1('\n'.join(key_data).encode('utf-8')).hexdigest())
+
     def _build_form_data(self, fields, files):
         """Encodes data for use in an HTTP POST."""
         BOUNDARY = mimetools.choose_boundary()
@@ -267,6 +588,21 @@ class HostingService(object):
 
         return repository.get_scmtool().file_exists(path, revision)
 
+    def get_files_exist(self, repository, files, base_commit_id=None):
+        """Determines whether several files exist.
+
+        ``files`` is a list of (path, revision) tuples. This returns a list
+        of booleans, in the same order.
+
+        By default, this calls get_file_exists() for each file. Subclasses
+        can override this to check the files in fewer requests.
+        """
+        return [
+            self.get_file_exists(repository, path, revision,
+                                 base_commit_id=base_commit_id)
+            for path, revision in files
+        ]
+
     def get_branches(self, repository):
         """Get a list of all branches in the repositories.
 
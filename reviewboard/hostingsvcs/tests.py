@@ -3,29 +3,42 @@ from __future__ import print_function, unicode_literals
 import hashlib
 import hmac
 import json
+import threading
 from hashlib import md5
 from textwrap import dedent
 
 from django.conf.urls import patterns, url
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import NoReverseMatch
 from django.http import HttpResponse
+from django.test.utils import override_settings
 from django.utils import six
 from django.utils.six.moves import cStringIO as StringIO
-from django.utils.six.moves.urllib.error import HTTPError
+from django.utils.six.moves import http_client
+from django.utils.six.moves.BaseHTTPServer import (BaseHTTPRequestHandler,
+                                                    HTTPServer)
+from django.utils.six.moves.socketserver import ThreadingMixIn
+from django.utils.six.moves.urllib.error import HTTPError, URLError
 from django.utils.six.moves.urllib.parse import urlparse
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
 from reviewboard.hostingsvcs.errors import (AuthorizationError,
                                             RepositoryError)
+from reviewboard.hostingsvcs.hook_utils import (close_all_review_requests,
+                                                get_review_request_ids)
 from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.hostingsvcs.repository import RemoteRepository
-from reviewboard.hostingsvcs.service import (get_hosting_service,
+from reviewboard.hostingsvcs.service import (HostingServiceClient,
+                                             get_hosting_service,
+                                             get_http_request_stats,
+                                             http_connection_pool,
                                              HostingService,
                                              register_hosting_service,
                                              unregister_hosting_service)
 from reviewboard.reviews.models import ReviewRequest
+from reviewboard.reviews.signals import review_request_closed
 from reviewboard.scmtools.core import Branch
 from reviewboard.scmtools.crypto_utils import encrypt_password
 from reviewboard.scmtools.errors import FileNotFoundError, SCMError
@@ -761,7 +774,7 @@ class BitbucketTests(ServiceTests):
     def _test_get_file_exists(self, tool_name, revision, base_commit_id,
                               expected_revision, expected_found,
                               expected_http_called=True):
-        def _http_get(service, url, *args, **kwargs):
+        def _http_head(service, url, *args, **kwargs):
             self.assertEqual(
                 url,
                 'https://bitbucket.org/api/1.0/repositories/'
@@ -769,7 +782,7 @@ class BitbucketTests(ServiceTests):
                 % expected_revision)
 
             if expected_found:
-                return b'{}', {}
+                return b'', {}
             else:
                 raise HTTPError()
 
@@ -783,11 +796,11 @@ class BitbucketTests(ServiceTests):
 
         account.data['password'] = encrypt_password('abc123')
 
-        self.spy_on(service.client.http_get, call_fake=_http_get)
+        self.spy_on(service.client.http_head, call_fake=_http_head)
 
         result = service.get_file_exists(repository, 'path', revision,
                                          base_commit_id)
-        self.assertEqual(service.client.http_get.called, expected_http_called)
+        self.assertEqual(service.client.http_head.called, expected_http_called)
         self.assertEqual(result, expected_found)
 
 
@@ -1225,6 +1238,97 @@ class GitHubTests(ServiceTests):
         self.assertEqual(body['client_id'], client_id)
         self.assertEqual(body['client_secret'], client_secret)
 
+    def test_get_file_exists(self):
+        """Testing GitHub get_file_exists using HEAD requests"""
+        def _http_head(client, url, *args, **kwargs):
+            self.assertEqual(
+                url,
+                'https://api.github.com/repos/myuser/myrepo/git/blobs/'
+                'abc123?access_token=abc123')
+
+            return b'', {}
+
+        account = self._get_hosting_account()
+        account.data['authorization'] = {'token': 'abc123'}
+
+        repository = Repository(hosting_account=account)
+        repository.extra_data = {
+            'repository_plan': 'public',
+            'github_public_repo_name': 'myrepo',
+        }
+
+        service = account.service
+        self.spy_on(service.client.http_get)
+        self.spy_on(service.client.http_head, call_fake=_http_head)
+
+        self.assertTrue(service.get_file_exists(repository, 'path', 'abc123'))
+        self.assertTrue(service.client.http_head.called)
+        self.assertFalse(service.client.http_get.called)
+
+    def test_get_files_exist(self):
+        """Testing GitHub get_files_exist using the tree of the base commit"""
+        base_commit_id = 'a' * 40
+        blob_sha1 = '1' * 40
+        blob_sha2 = '2' * 40
+        old_blob_sha = '3' * 40
+
+        cache.clear()
+
+        def _http_get(client, url, *args, **kwargs):
+            self.assertEqual(
+                url,
+                'https://api.github.com/repos/myuser/myrepo/git/trees/'
+                '%s?access_token=abc123&recursive=1' % base_commit_id)
+
+            payload = {
+                'sha': base_commit_id,
+                'tree': [
+                    {'path': 'README', 'type': 'blob', 'sha': blob_sha1},
+                    {'path': 'src', 'type': 'tree', 'sha': 'b' * 40},
+                    {'path': 'src/main.c', 'type': 'blob', 'sha': blob_sha2},
+                ],
+            }
+
+            return json.dumps(payload).encode('utf-8'), {}
+
+        def _http_head(client, url, *args, **kwargs):
+            if old_blob_sha not in url:
+                raise HTTPError(url, 404, '', {}, StringIO())
+
+            return b'', {}
+
+        account = self._get_hosting_account()
+        account.data['authorization'] = {'token': 'abc123'}
+
+        repository = Repository(pk=1, hosting_account=account)
+        repository.extra_data = {
+            'repository_plan': 'public',
+            'github_public_repo_name': 'myrepo',
+        }
+
+        service = account.service
+        self.spy_on(service.client.http_get, call_fake=_http_get)
+        self.spy_on(service.client.http_head, call_fake=_http_head)
+
+        files = [
+            ('/README', blob_sha1),
+            ('/src/main.c', blob_sha2),
+            ('/src/old.c', old_blob_sha),
+            ('/src/missing.c', 'c' * 40),
+        ]
+
+        self.assertEqual(
+            service.get_files_exist(repository, files, base_commit_id),
+            [True, True, True, False])
+        self.assertEqual(len(service.client.http_get.calls), 1)
+        self.assertEqual(len(service.client.http_head.calls), 2)
+
+        # The tree should be cached.
+        self.assertEqual(
+            service.get_files_exist(repository, files[:2], base_commit_id),
+            [True, True])
+        self.assertEqual(len(service.client.http_get.calls), 1)
+
     def test_get_branches(self):
         """Testing GitHub get_branches implementation"""
         branches_api_response = json.dumps([
@@ -1449,32 +1553,34 @@ class GitHubTests(ServiceTests):
             'tree': [
                 {
                     'path': 'reviewboard/static/rb/css/defs.less',
+                    'type': 'blob',
                     'sha': '830a40c3197223c6a0abb3355ea48891a1857bfd',
                 },
                 {
                     'path': 'reviewboard/static/rb/css/reviews.less',
+                    'type': 'blob',
                     'sha': '535cd2c4211038d1bb8ab6beaed504e0db9d7e62',
                 },
             ],
         })
 
-        # This has to be a list to avoid python's hinky treatment of scope of
-        # variables assigned within a closure.
-        step = [1]
+        # The comparison and the parent's tree are fetched concurrently, so
+        # they may be fetched in either order.
+        fetched = []
 
         def _http_get(service, url, *args, **kwargs):
             parsed = urlparse(url)
             if parsed.path == '/repos/myuser/myrepo/commits':
-                self.assertEqual(step[0], 1)
-                step[0] += 1
+                self.assertEqual(fetched, [])
+                fetched.append('commits')
 
                 query = parsed.query.split('&')
                 self.assertIn(('sha=%s' % commit_sha), query)
 
                 return commits_api_response, None
             elif parsed.path.startswith('/repos/myuser/myrepo/compare/'):
-                self.assertEqual(step[0], 2)
-                step[0] += 1
+                self.assertEqual(fetched[0], 'commits')
+                fetched.append('compare')
 
                 revs = parsed.path.split('/')[-1].split('...')
                 self.assertEqual(revs[0], parent_sha)
@@ -1482,10 +1588,10 @@ class GitHubTests(ServiceTests):
 
                 return compare_api_response, None
             elif parsed.path.startswith('/repos/myuser/myrepo/git/trees/'):
-                self.assertEqual(step[0], 3)
-                step[0] += 1
+                self.assertEqual(fetched[0], 'commits')
+                fetched.append('tree')
 
-                self.assertEqual(parsed.path.split('/')[-1], tree_sha)
+                self.assertEqual(parsed.path.split('/')[-1], parent_sha)
 
                 return trees_api_response, None
             else:
@@ -1507,6 +1613,7 @@ class GitHubTests(ServiceTests):
         change = service.get_change(repository, commit_sha)
 
         self.assertTrue(service.client.http_get.called)
+        self.assertEqual(sorted(fetched), ['commits', 'compare', 'tree'])
 
         self.assertEqual(change.message, 'Move .clearfix to defs.less')
         self.assertEqual(md5(change.diff.encode('utf-8')).hexdigest(),
@@ -1841,6 +1948,25 @@ class GitHubTests(ServiceTests):
         self._test_post_commit_hook(
             LocalSite.objects.get(name=self.local_site_name))
 
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_close_submitted_hook_with_prefetch(self):
+        """Testing GitHub close_submitted hook prefetches pushed changes"""
+        def prefetch_changes(repository, revisions):
+            prefetched.extend(revisions)
+
+        prefetched = []
+        old_prefetch_changes = Repository.prefetch_changes
+        Repository.prefetch_changes = prefetch_changes
+
+        try:
+            with override_settings(HOSTINGSVCS_HOOK_PREFETCH_CHANGES=True):
+                self._test_post_commit_hook()
+        finally:
+            Repository.prefetch_changes = old_prefetch_changes
+
+        self.assertEqual(prefetched,
+                         ['1c44b461cebe5874a857c51a4a13a849a4d1e52d'])
+
     @add_fixtures(['test_users', 'test_scmtools'])
     def test_close_submitted_hook_ping(self):
         """Testing GitHub close_submitted hook ping"""
@@ -3198,6 +3324,254 @@ def hosting_service_url_test_view(request, repo_id):
     return HttpResponse(str(repo_id))
 
 
+class HostingServiceClientTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.hostingsvcs.service.HostingServiceClient."""
+    def setUp(self):
+        super(HostingServiceClientTests, self).setUp()
+
+        self.client = HostingServiceClient(get_hosting_service('github'))
+
+    def test_http_get_with_etag(self):
+        """Testing HostingServiceClient.http_get revalidating with ETags"""
+        requests = []
+
+        def _open_request(client, request):
+            requests.append(request)
+
+            if len(requests) == 1:
+                return 200, b'My data', {'ETag': '"abc123"'}
+            else:
+                self.assertEqual(request.get_header('If-none-match'),
+                                 '"abc123"')
+                return 304, b'', {}
+
+        self.spy_on(self.client._open_request, call_fake=_open_request)
+        old_stats = get_http_request_stats().get('github', {})
+
+        url = 'https://api.example.com/etag-test'
+        self.assertEqual(self.client.http_get(url)[0], b'My data')
+        self.assertEqual(self.client.http_get(url)[0], b'My data')
+        self.assertEqual(len(requests), 2)
+
+        stats = get_http_request_stats()['github']
+        self.assertEqual(stats['requests'] - old_stats.get('requests', 0), 2)
+        self.assertEqual(
+            stats['not_modified'] - old_stats.get('not_modified', 0), 1)
+
+    def test_http_get_with_etag_and_other_credentials(self):
+        """Testing HostingServiceClient.http_get not sharing cached
+        responses between credentials
+        """
+        def _open_request(client, request):
+            self.assertIsNone(request.get_header('If-none-match'))
+            return 200, b'My data', {'ETag': '"abc123"'}
+
+        self.spy_on(self.client._open_request, call_fake=_open_request)
+
+        url = 'https://api.example.com/etag-credentials-test'
+        self.client.http_get(url, username='user1', password='pass')
+        self.client.http_get(url, username='user2', password='pass')
+
+        self.assertEqual(len(self.client._open_request.calls), 2)
+
+    def test_http_get_with_etag_and_pagination(self):
+        """Testing HostingServiceClient.http_get keeping headers from cached
+        responses when paging through them
+        """
+        url = 'https://api.github.com/etag-pagination-test'
+        next_url = url + '?page=2'
+
+        def _open_request(client, request):
+            if request.get_header('If-none-match'):
+                # Servers aren't required to repeat the Link header.
+                return 304, b'', {'ETag': request.get_header('If-none-match')}
+            elif request.get_full_url() == url:
+                return 200, b'[1]', {
+                    'ETag': '"page1"',
+                    'Link': '<%s>; rel="next"' % next_url,
+                }
+            else:
+                return 200, b'[2]', {'ETag': '"page2"'}
+
+        account = HostingServiceAccount(service_name='github',
+                                        username='myuser')
+        client = get_hosting_service('github')(account).client
+        self.spy_on(client._open_request, call_fake=_open_request)
+
+        for i in range(2):
+            paginator = client.api_get_list(url)
+            self.assertEqual(paginator.page_data, [1])
+            self.assertEqual(paginator.next_url, next_url)
+
+            paginator.next()
+            self.assertEqual(paginator.page_data, [2])
+            self.assertFalse(paginator.has_next)
+
+        self.assertEqual(len(client._open_request.calls), 4)
+
+    def test_post_not_retried_on_reused_connection(self):
+        """Testing HTTPConnectionPool not retrying POST requests when a
+        reused connection fails
+        """
+        requests = []
+
+        class FakeConnection(object):
+            def request(self, method, path, body, headers):
+                requests.append(method)
+
+            def getresponse(self):
+                raise http_client.BadStatusLine('')
+
+            def close(self):
+                pass
+
+        def _get_connection(pool, key):
+            return FakeConnection(), True
+
+        self.spy_on(http_connection_pool._get_connection,
+                    call_fake=_get_connection)
+
+        with self.assertRaises(URLError):
+            self.client.http_post('https://api.example.com/post-test',
+                                  body=b'data')
+
+        self.assertEqual(requests, ['POST'])
+
+    def test_connection_reuse(self):
+        """Testing HostingServiceClient reusing HTTP connections"""
+        connections = []
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                connections.append(self.client_address)
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '7')
+                self.end_headers()
+                self.wfile.write(b'My data')
+
+            def log_message(self, *args, **kwargs):
+                pass
+
+        class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            url = 'http://127.0.0.1:%s/' % server.server_address[1]
+            self.client.use_etags = False
+
+            for i in range(3):
+                self.assertEqual(self.client.http_get(url)[0], b'My data')
+        finally:
+            http_connection_pool.clear()
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(len(connections), 1)
+
+    def test_not_found(self):
+        """Testing HostingServiceClient raising HTTPError for error codes"""
+        def _send(pool, url, method, body, headers):
+            return 404, 'Not Found', b'{}', {}
+
+        self.spy_on(http_connection_pool._send, call_fake=_send)
+
+        with self.assertRaises(HTTPError) as cm:
+            self.client.http_get('https://api.example.com/not-found')
+
+        self.assertEqual(cm.exception.code, 404)
+        self.assertEqual(cm.exception.read(), b'{}')
+
+
+class HookUtilsTests(TestCase):
+    """Unit tests for reviewboard.hostingsvcs.hook_utils."""
+    fixtures = ['test_users', 'test_scmtools']
+
+    def test_get_review_request_ids(self):
+        """Testing get_review_request_ids"""
+        repository = self.create_repository()
+        review_request1 = self.create_review_request(repository=repository,
+                                                     commit_id='abc123')
+        review_request2 = self.create_review_request(repository=repository,
+                                                     commit_id='def456')
+
+        commits = [
+            ('111111', 'Reviewed at http://example.com/r/42/'),
+            ('abc123', 'Fix a bug'),
+            ('def456', None),
+            ('999999', 'Unrelated change'),
+            (None, 'Review request #7: Add a feature'),
+        ]
+
+        with self.assertNumQueries(1):
+            review_request_ids = get_review_request_ids(
+                commits, 'http://example.com/', repository)
+
+        self.assertEqual(review_request_ids,
+                         [42, review_request1.pk, review_request2.pk,
+                          None, 7])
+
+    def test_get_review_request_ids_without_lookups(self):
+        """Testing get_review_request_ids without commit IDs"""
+        with self.assertNumQueries(0):
+            review_request_ids = get_review_request_ids(
+                [
+                    (None, 'Reviewed at http://example.com/r/42/'),
+                    (None, 'Unrelated change'),
+                ],
+                'http://example.com/')
+
+        self.assertEqual(review_request_ids, [42, None])
+
+    def test_close_all_review_requests(self):
+        """Testing close_all_review_requests sending notifications after
+        closing
+        """
+        account = HostingServiceAccount.objects.create(
+            service_name='github', username='myuser')
+        repository = self.create_repository(hosting_account=account)
+        review_request1 = self.create_review_request(repository=repository,
+                                                     publish=True)
+        review_request2 = self.create_review_request(repository=repository,
+                                                     publish=True)
+        closed_statuses = []
+
+        def _on_closed(review_request, **kwargs):
+            closed_statuses.append(set(
+                ReviewRequest.objects.filter(repository=repository)
+                .values_list('status', flat=True)))
+
+        review_request_closed.connect(_on_closed, sender=ReviewRequest)
+
+        try:
+            close_all_review_requests(
+                {
+                    review_request1.pk: ['master (abc1234)'],
+                    review_request2.pk: ['master (def5678)'],
+                },
+                None, repository, 'github')
+        finally:
+            review_request_closed.disconnect(_on_closed, sender=ReviewRequest)
+
+        # Both review requests should be closed before the first
+        # notification is sent.
+        self.assertEqual(closed_statuses,
+                         [set([ReviewRequest.SUBMITTED])] * 2)
+
+        review_request1 = ReviewRequest.objects.get(pk=review_request1.pk)
+        self.assertEqual(review_request1.changedescs.get().text,
+                         'Pushed to master (abc1234)')
+
+
 class HostingServiceRegistrationTests(TestCase):
     """Unit tests for Hosting Service registration."""
     class DummyService(HostingService):
@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.notifications.forms import WebHookTargetForm
-from reviewboard.notifications.models import WebHookTarget
+from reviewboard.notifications.models import QueuedEmail, WebHookTarget
 
 
 class WebHookTargetAdmin(admin.ModelAdmin):
@@ -40,4 +40,32 @@ class WebHookTargetAdmin(admin.ModelAdmin):
     )
 
 
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'time_added',
+                    'next_attempt')
+    list_filter = ('status',)
+    readonly_fields = ('subject', 'from_email', 'recipients', 'message_id',
+                       'time_added', 'attempts', 'last_error')
+    fieldsets = (
+        (None, {
+            'fields': (
+                'subject',
+                'from_email',
+                'recipients',
+                'message_id',
+                'time_added',
+            ),
+        }),
+        (_('Delivery'), {
+            'fields': (
+                'status',
+                'attempts',
+                'next_attempt',
+                'last_error',
+            ),
+        }),
+    )
+
+
 admin.site.register(WebHookTarget, WebHookTargetAdmin)
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
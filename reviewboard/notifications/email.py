@@ -16,6 +16,7 @@ from djblets.siteconfig.models import SiteConfiguration
 from djblets.auth.signals import user_registered
 
 from reviewboard.admin.server import get_server_url
+from reviewboard.notifications.outbox import send_email
 from reviewboard.reviews.models import Group, ReviewRequest, Review
 from reviewboard.reviews.signals import (review_request_published,
                                          review_published, reply_published,
@@ -296,7 +297,7 @@ def send_review_mail(user, review_request, subject, in_reply_to,
                                  from_email, sender, list(to_field),
                                  list(cc_field), in_reply_to, headers)
     try:
-        message.send()
+        send_email(message)
     except Exception as e:
         logging.error("Error sending e-mail notification with subject '%s' on "
                       "behalf of '%s' to '%s': %s",
@@ -484,7 +485,7 @@ def mail_new_user(user):
                                   for a in settings.ADMINS], None, None)
 
     try:
-        message.send()
+        send_email(message)
     except Exception as e:
         logging.error("Error sending e-mail notification with subject '%s' on "
                       "behalf of '%s' to admin: %s",
@@ -0,0 +1,59 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.notifications.outbox import BATCH_SIZE, send_queued_emails
+
+
+class Command(NoArgsCommand):
+    help = _('Delivers the e-mails waiting in the outbox')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    dest='loop',
+                    help=_('Keep running, delivering new e-mails as they '
+                           'are queued')),
+        make_option('--interval',
+                    action='store',
+                    type='int',
+                    default=10,
+                    dest='interval',
+                    help=_('Number of seconds to wait between checks for '
+                           'new e-mails when using --loop')),
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    default=BATCH_SIZE,
+                    dest='batch_size',
+                    help=_('Maximum number of e-mails to send over a '
+                           'single connection')),
+    )
+
+    def handle_noargs(self, **options):
+        loop = options['loop']
+        interval = options['interval']
+        batch_size = options['batch_size']
+
+        while True:
+            num_sent, num_failed = send_queued_emails(max_messages=batch_size)
+
+            if num_sent or num_failed:
+                self.stdout.write(
+                    _('Sent %(num_sent)d e-mail(s), %(num_failed)d failed.')
+                    % {
+                        'num_sent': num_sent,
+                        'num_failed': num_failed,
+                    })
+
+            if not loop:
+                if num_sent + num_failed < batch_size:
+                    break
+            elif num_sent + num_failed < batch_size:
+                # The outbox is drained. Wait for more to arrive.
+                time.sleep(interval)
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
-from django.db.models import Manager, Q
+from django.db.models import Manager, Min, Q
+from django.utils import timezone
+from django.utils.encoding import force_text
 
 
 class WebHookTargetManager(Manager):
@@ -29,3 +31,50 @@ class WebHookTargetManager(Manager):
             for target in self.filter(q)
             if event in target.events or self.model.ALL_EVENTS in target.events
         ]
+
+
+class QueuedEmailManager(Manager):
+    """Manages QueuedEmail models.
+
+    This provides utility functions for adding e-mails to the outbox and
+    for querying the messages that are due for delivery.
+    """
+    def queue_message(self, message):
+        """Adds an EmailMessage to the outbox.
+
+        The message is fully rendered before being stored, so its
+        Message-ID is final and available on the returned QueuedEmail.
+        """
+        msg = message.message()
+        message_id = msg['Message-ID'] or ''
+
+        return self.create(
+            subject=force_text(message.subject)[:255],
+            from_email=force_text(message.from_email),
+            recipients='\n'.join(force_text(address)
+                                  for address in message.recipients()),
+            message=force_text(msg.as_string()),
+            message_id=message_id)
+
+    def due(self, now=None):
+        """Returns the pending messages that are due for delivery."""
+        if now is None:
+            now = timezone.now()
+
+        return self.filter(status=self.model.STATUS_PENDING,
+                           next_attempt__lte=now)
+
+    def get_stats(self):
+        """Returns statistics on the current state of the outbox.
+
+        This is used to report queue depth in the administration dashboard.
+        """
+        pending = self.filter(status=self.model.STATUS_PENDING)
+
+        return {
+            'pending': pending.count(),
+            'due': self.due().count(),
+            'failed': self.filter(status=self.model.STATUS_FAILED).count(),
+            'oldest_pending': pending.aggregate(
+                oldest=Min('time_added'))['oldest'],
+        }
@@ -1,12 +1,14 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import JSONField
 from multiselectfield import MultiSelectField
 
-from reviewboard.notifications.managers import WebHookTargetManager
+from reviewboard.notifications.managers import (QueuedEmailManager,
+                                                WebHookTargetManager)
 from reviewboard.scmtools.models import Repository
 from reviewboard.site.models import LocalSite
 
@@ -128,3 +130,64 @@ class WebHookTarget(models.Model):
 
     class Meta:
         verbose_name = _('webhook')
+
+
+@python_2_unicode_compatible
+class QueuedEmail(models.Model):
+    """An e-mail waiting in the outbox to be delivered.
+
+    When the outbox is enabled (through the ``mail_use_outbox`` site
+    configuration), e-mails are fully rendered at publish time and stored
+    here instead of being sent right away. The ``send-queued-email``
+    management command then delivers them in batches over a single SMTP
+    connection, retrying any that fail due to transient errors.
+
+    Successfully delivered e-mails are removed from the outbox.
+    """
+    STATUS_PENDING = 'P'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    subject = models.CharField(_('subject'), max_length=255)
+    from_email = models.CharField(_('envelope sender'), max_length=254)
+    recipients = models.TextField(
+        _('envelope recipients'),
+        help_text=_('The envelope recipients, one per line.'))
+    message = models.TextField(_('message'))
+    message_id = models.CharField(_('message ID'), max_length=255,
+                                  blank=True)
+
+    status = models.CharField(_('status'), max_length=1,
+                              choices=STATUS_CHOICES,
+                              default=STATUS_PENDING,
+                              db_index=True)
+    attempts = models.PositiveIntegerField(_('delivery attempts'),
+                                           default=0)
+    last_error = models.TextField(_('last error'), blank=True)
+
+    time_added = models.DateTimeField(_('time added'), default=timezone.now)
+    next_attempt = models.DateTimeField(_('next attempt'),
+                                        default=timezone.now,
+                                        db_index=True)
+
+    objects = QueuedEmailManager()
+
+    def get_recipients(self):
+        """Returns the list of envelope recipients."""
+        return [
+            recipient
+            for recipient in self.recipients.splitlines()
+            if recipient
+        ]
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        ordering = ['next_attempt', 'pk']
+        verbose_name = _('queued e-mail')
+        verbose_name_plural = _('queued e-mails')
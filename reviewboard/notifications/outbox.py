@@ -0,0 +1,218 @@
+"""Delivery of e-mails stored in the outbox.
+
+E-mails queued through :py:func:`send_email` (when the ``mail_use_outbox``
+site configuration is enabled) are stored as :py:class:`QueuedEmail`
+entries and delivered later by :py:func:`send_queued_emails`, which is
+normally invoked by the ``send-queued-email`` management command.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import smtplib
+import socket
+from datetime import timedelta
+from email import message_from_string
+from email.message import Message
+
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from django.utils.encoding import force_text
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.notifications.models import QueuedEmail
+
+
+#: The maximum number of delivery attempts before giving up on an e-mail.
+MAX_ATTEMPTS = 5
+
+#: The base delay between delivery attempts. This doubles on each retry.
+RETRY_DELAY = timedelta(minutes=1)
+
+#: The default number of e-mails to fetch from the outbox at a time.
+BATCH_SIZE = 100
+
+#: How long an e-mail is held by a sender before others may try sending it.
+#:
+#: This only comes into play if a sender dies between claiming an e-mail and
+#: recording the result.
+CLAIM_DURATION = timedelta(minutes=10)
+
+
+class _StoredMIMEMessage(Message):
+    """A parsed MIME message that serializes back to its original form.
+
+    Django's e-mail backends call ``as_bytes()`` on the result of
+    ``EmailMessage.message()``. Returning the stored payload as-is ensures
+    the message is delivered exactly as it was rendered at publish time.
+    """
+    raw_message = None
+
+    def as_bytes(self, unixfrom=False):
+        return self.raw_message
+
+    as_string = as_bytes
+
+
+class QueuedEmailMessage(EmailMessage):
+    """An EmailMessage wrapping an e-mail stored in the outbox.
+
+    This can be handed to any Django e-mail backend. The envelope sender and
+    recipients are those computed when the e-mail was queued.
+    """
+    def __init__(self, queued_email):
+        super(QueuedEmailMessage, self).__init__(
+            subject=queued_email.subject,
+            from_email=queued_email.from_email,
+            to=queued_email.get_recipients())
+
+        self.queued_email = queued_email
+        self.message_id = queued_email.message_id
+
+    def message(self):
+        raw_message = self.queued_email.message.encode('utf-8')
+        msg = message_from_string(raw_message, _class=_StoredMIMEMessage)
+        msg.raw_message = raw_message
+
+        return msg
+
+
+def send_email(message):
+    """Sends an EmailMessage, or queues it if the outbox is enabled.
+
+    Either way, the message's Message-ID will be generated by the time
+    this returns.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    if siteconfig.get('mail_use_outbox'):
+        QueuedEmail.objects.queue_message(message)
+    else:
+        message.send()
+
+
+def is_transient_error(e):
+    """Returns whether a delivery error is worth retrying.
+
+    Connection problems and 4xx SMTP responses are considered transient.
+    Anything else (such as a 5xx response for a bad recipient) is permanent.
+    """
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500
+                   for code, resp in e.recipients.values())
+    elif isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    else:
+        return isinstance(e, (smtplib.SMTPServerDisconnected,
+                              smtplib.SMTPConnectError,
+                              socket.error))
+
+
+def _close_connection(connection):
+    """Closes an e-mail backend connection, ignoring any errors."""
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _record_failure(queued_email, e, now):
+    """Records a failed delivery attempt on a queued e-mail.
+
+    Transient failures will be retried with an exponential backoff until
+    MAX_ATTEMPTS is reached. Permanent failures are marked as failed
+    immediately.
+    """
+    queued_email.attempts += 1
+    queued_email.last_error = force_text(e)
+
+    if is_transient_error(e) and queued_email.attempts < MAX_ATTEMPTS:
+        queued_email.next_attempt = \
+            now + RETRY_DELAY * (2 ** (queued_email.attempts - 1))
+    else:
+        queued_email.status = QueuedEmail.STATUS_FAILED
+
+        logging.error('Giving up on e-mail "%s" to %s after %d attempt(s): %s',
+                      queued_email.subject,
+                      ', '.join(queued_email.get_recipients()),
+                      queued_email.attempts, e)
+
+    queued_email.save(update_fields=['attempts', 'last_error',
+                                     'next_attempt', 'status'])
+
+
+def _claim(queued_email, now):
+    """Claims a queued e-mail for delivery by this sender.
+
+    The e-mail's next attempt is pushed back by CLAIM_DURATION, guarded on
+    it still being pending and due at the time it was fetched, so that only
+    one sender can claim it. This returns whether the claim succeeded.
+    """
+    claimed = QueuedEmail.objects.filter(
+        pk=queued_email.pk,
+        status=QueuedEmail.STATUS_PENDING,
+        next_attempt=queued_email.next_attempt,
+    ).update(next_attempt=now + CLAIM_DURATION)
+
+    return claimed == 1
+
+
+def send_queued_emails(max_messages=None, connection=None):
+    """Delivers the e-mails in the outbox that are due.
+
+    All messages are sent over a single connection to the mail server,
+    which is re-opened if the server drops it partway through. Each e-mail
+    is claimed before it's sent, so e-mails aren't sent twice when several
+    senders run at once. E-mails claimed by another sender are skipped.
+
+    Returns a tuple of the number of e-mails sent and the number that
+    failed to send.
+    """
+    now = timezone.now()
+    queued_emails = QueuedEmail.objects.due(now)
+
+    if max_messages is not None:
+        queued_emails = queued_emails[:max_messages]
+
+    queued_emails = list(queued_emails)
+
+    if not queued_emails:
+        return 0, 0
+
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+
+    num_sent = 0
+    num_failed = 0
+    sent_ids = []
+
+    try:
+        for queued_email in queued_emails:
+            if not _claim(queued_email, now):
+                continue
+
+            try:
+                connection.open()
+                connection.send_messages([QueuedEmailMessage(queued_email)])
+            except Exception as e:
+                logging.warning('Error sending queued e-mail "%s" '
+                                '(attempt %d): %s',
+                                queued_email.subject,
+                                queued_email.attempts + 1, e)
+                _record_failure(queued_email, e, now)
+                num_failed += 1
+
+                if is_transient_error(e):
+                    # The connection may be in a bad state. Start fresh
+                    # for the next message.
+                    _close_connection(connection)
+            else:
+                sent_ids.append(queued_email.pk)
+                num_sent += 1
+    finally:
+        _close_connection(connection)
+
+        if sent_ids:
+            QueuedEmail.objects.filter(pk__in=sent_ids).delete()
+
+    return num_sent, num_failed
@@ -1,9 +1,14 @@
 from __future__ import unicode_literals
 
+import smtplib
+from datetime import timedelta
+
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
 from django.template import TemplateSyntaxError
+from django.utils import timezone
 from django.utils.six.moves.urllib.request import urlopen
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.testing.decorators import add_fixtures
@@ -14,7 +19,8 @@ from reviewboard.admin.siteconfig import load_site_config
 from reviewboard.notifications.email import (build_email_address,
                                              get_email_address_for_user,
                                              get_email_addresses_for_group)
-from reviewboard.notifications.models import WebHookTarget
+from reviewboard.notifications.models import QueuedEmail, WebHookTarget
+from reviewboard.notifications.outbox import send_queued_emails
 from reviewboard.notifications.webhooks import (FakeHTTPRequest,
                                                 dispatch_webhook_event,
                                                 render_custom_content)
@@ -547,6 +553,172 @@ class ReviewRequestEmailTests(TestCase, EmailTestHelper):
         return build_email_address(user.get_full_name(), self.sender)
 
 
+class EmailOutboxTests(TestCase):
+    """Unit tests for queuing and delivering e-mails through the outbox."""
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(EmailOutboxTests, self).setUp()
+
+        mail.outbox = []
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('mail_send_review_mail', True)
+        siteconfig.set('mail_use_outbox', True)
+        siteconfig.save()
+        load_site_config()
+
+    def tearDown(self):
+        super(EmailOutboxTests, self).tearDown()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('mail_use_outbox', False)
+        siteconfig.save()
+
+    def test_publish_queues_email(self):
+        """Testing that publishing queues e-mail when the outbox is enabled"""
+        review_request = self.create_review_request(
+            summary='My test review request')
+        review_request.target_people.add(User.objects.get(username='grumpy'))
+        review_request.publish(review_request.submitter)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(queued_email.subject,
+                         'Review Request %s: My test review request'
+                         % review_request.pk)
+        self.assertTrue(get_email_address_for_user(
+            User.objects.get(username='grumpy')) in
+                        queued_email.get_recipients())
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        self.assertEqual(review_request.email_message_id,
+                         queued_email.message_id)
+
+    def test_send_queued_emails(self):
+        """Testing send_queued_emails delivering queued e-mail"""
+        review_request = self.create_review_request(
+            summary='My test review request')
+        review_request.target_people.add(User.objects.get(username='grumpy'))
+        review_request.publish(review_request.submitter)
+
+        message_id = QueuedEmail.objects.get().message_id
+
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(QueuedEmail.objects.count(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+        message = mail.outbox[0].message()
+        self.assertEqual(message['Message-ID'], message_id)
+        self.assertEqual(message['Subject'],
+                         'Review Request %s: My test review request'
+                         % review_request.pk)
+
+    def test_send_queued_emails_single_connection(self):
+        """Testing send_queued_emails reusing a single connection"""
+        for i in range(3):
+            QueuedEmail.objects.queue_message(
+                mail.EmailMessage('Test %d' % i, 'Body', 'from@example.com',
+                                  ['to@example.com']))
+
+        connection = _FakeEmailBackend()
+
+        self.assertEqual(send_queued_emails(connection=connection), (3, 0))
+        self.assertEqual(connection.num_opened, 1)
+        self.assertEqual(len(connection.sent), 3)
+
+    def test_send_queued_emails_transient_error(self):
+        """Testing send_queued_emails retrying after a transient error"""
+        QueuedEmail.objects.queue_message(
+            mail.EmailMessage('Test', 'Body', 'from@example.com',
+                              ['to@example.com']))
+
+        connection = _FakeEmailBackend(
+            error=smtplib.SMTPServerDisconnected('Connection lost'))
+
+        self.assertEqual(send_queued_emails(connection=connection), (0, 1))
+
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(queued_email.attempts, 1)
+        self.assertEqual(queued_email.last_error, 'Connection lost')
+        self.assertTrue(queued_email.next_attempt > queued_email.time_added)
+        self.assertFalse(QueuedEmail.objects.due().exists())
+
+    def test_send_queued_emails_permanent_error(self):
+        """Testing send_queued_emails giving up after a permanent error"""
+        QueuedEmail.objects.queue_message(
+            mail.EmailMessage('Test', 'Body', 'from@example.com',
+                              ['to@example.com']))
+
+        connection = _FakeEmailBackend(
+            error=smtplib.SMTPRecipientsRefused({
+                'to@example.com': (550, 'No such user'),
+            }))
+
+        self.assertEqual(send_queued_emails(connection=connection), (0, 1))
+
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_FAILED)
+        self.assertEqual(queued_email.attempts, 1)
+
+    def test_send_queued_emails_claimed_elsewhere(self):
+        """Testing send_queued_emails skipping e-mails claimed by another
+        sender
+        """
+        for i in range(2):
+            QueuedEmail.objects.queue_message(
+                mail.EmailMessage('Test %d' % i, 'Body', 'from@example.com',
+                                  ['to@example.com']))
+
+        class ConcurrentEmailBackend(_FakeEmailBackend):
+            def send_messages(self, messages):
+                # Simulate another sender claiming the remaining e-mail
+                # while this one is being sent.
+                QueuedEmail.objects.filter(subject='Test 1').update(
+                    next_attempt=timezone.now() + timedelta(minutes=10))
+
+                return super(ConcurrentEmailBackend, self).send_messages(
+                    messages)
+
+        connection = ConcurrentEmailBackend()
+
+        self.assertEqual(send_queued_emails(connection=connection), (1, 0))
+        self.assertEqual(len(connection.sent), 1)
+        self.assertEqual(QueuedEmail.objects.get().subject, 'Test 1')
+
+
+class _FakeEmailBackend(BaseEmailBackend):
+    """An e-mail backend recording connections and sent messages."""
+    def __init__(self, error=None, **kwargs):
+        super(_FakeEmailBackend, self).__init__(**kwargs)
+
+        self.error = error
+        self.is_open = False
+        self.num_opened = 0
+        self.sent = []
+
+    def open(self):
+        if not self.is_open:
+            self.is_open = True
+            self.num_opened += 1
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        if self.error:
+            raise self.error
+
+        for message in messages:
+            self.sent.append(message.message().as_bytes())
+
+        return len(messages)
+
+
 class WebHookCustomContentTests(TestCase):
     """Unit tests for render_custom_content."""
     def test_with_valid_template(self):
@@ -0,0 +1,17 @@
+from __future__ import unicode_literals
+
+from reviewboard.signals import initializing
+
+
+def connect_signals(**kwargs):
+    """
+    Listens to the ``initializing`` signal and tells other modules to
+    connect their signals. This is done so as to guarantee that django
+    is loaded first.
+    """
+    from reviewboard.reviews import updates
+
+    updates.connect_signals()
+
+
+initializing.connect(connect_signals)
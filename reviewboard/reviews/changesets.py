@@ -0,0 +1,83 @@
+"""Background refreshing of pending changesets.
+
+Review requests for pending changesets (such as Perforce changes that
+haven't been submitted yet) show whether the change is still pending. This
+requires asking the repository, which is slow, and shouldn't happen while
+rendering pages.
+
+:py:func:`refresh_pending_changesets` looks up the changesets of all
+pending review requests, one batch per repository, and caches the results
+for :py:meth:`ReviewRequest.changeset_is_pending
+<reviewboard.reviews.models.ReviewRequest.changeset_is_pending>`. It's
+normally invoked periodically by the ``refresh-pending-changesets``
+management command.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+from itertools import groupby
+
+from django.utils import six
+
+from reviewboard.reviews.models import ReviewRequest
+
+
+#: How long refreshed pending changesets are cached, in seconds.
+#:
+#: This should be longer than the interval between refreshes, so that
+#: pages never have to look the changesets up themselves.
+PENDING_EXPIRATION = 10 * 60
+
+
+def refresh_pending_changesets(pending_expiration=PENDING_EXPIRATION):
+    """Refreshes the cached state of changesets for pending review requests.
+
+    The changesets for each repository are fetched in a single batch. If a
+    repository can't be reached, its changesets are skipped, and any cached
+    state is left alone.
+
+    This returns the number of review requests refreshed.
+    """
+    review_requests = (
+        ReviewRequest.objects
+        .filter(status=ReviewRequest.PENDING_REVIEW,
+                changenum__isnull=False,
+                repository__isnull=False)
+        .select_related('repository', 'repository__tool')
+        .order_by('repository')
+    )
+    count = 0
+
+    for repository_id, repository_review_requests in groupby(
+            review_requests, lambda obj: obj.repository_id):
+        repository_review_requests = list(repository_review_requests)
+        repository = repository_review_requests[0].repository
+
+        try:
+            scmtool = repository.get_scmtool()
+
+            if not scmtool.supports_pending_changesets:
+                continue
+
+            changesets = scmtool.get_changesets(
+                set(six.text_type(review_request.changenum)
+                    for review_request in repository_review_requests),
+                allow_empty=True)
+        except Exception as e:
+            logging.error('Unable to refresh pending changesets for '
+                          'repository %s: %s',
+                          repository_id, e, exc_info=1)
+            continue
+
+        for review_request in repository_review_requests:
+            commit_id = six.text_type(review_request.changenum)
+            changeset = changesets.get(commit_id)
+
+            if changeset:
+                review_request.update_from_pending_changeset(
+                    commit_id, changeset,
+                    pending_expiration=pending_expiration)
+                count += 1
+
+    return count
@@ -0,0 +1,185 @@
+"""Maintenance of review request counters.
+
+Review requests affect a number of denormalized counters on
+:py:class:`~reviewboard.accounts.models.LocalSiteProfile` and
+:py:class:`~reviewboard.reviews.models.Group`. This module applies changes to
+those counters as batched deltas, and reconciles any drift between the
+counters and the actual state of the database incrementally, without
+having to reset every counter at once.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import six
+from djblets.db.fields import CounterField
+
+
+#: The LocalSiteProfile counters affected by a review request's reviewers.
+REVIEWER_COUNTER_FIELDS = (
+    'direct_incoming_request_count',
+    'total_incoming_request_count',
+    'starred_public_request_count',
+)
+
+#: The default number of objects to reconcile per run.
+RECONCILE_BATCH_SIZE = 100
+
+RECONCILE_CURSOR_KEY = 'review-counters-reconcile-cursor-%s'
+
+
+def update_reviewer_counts(review_request, delta):
+    """Applies a delta to the counters affected by a review request.
+
+    This is used when a review request becomes visible to (or hidden from)
+    its reviewers. The affected group and profile IDs are looked up through
+    the membership tables, and then each counter is updated with a single
+    UPDATE keyed by primary key, rather than an UPDATE joining across group
+    memberships. This keeps row locks limited to the rows being changed.
+
+    Profiles receiving the same set of deltas (for instance, all members of
+    a target group) are updated in the same statement.
+    """
+    from reviewboard.accounts.models import LocalSiteProfile, Profile
+    from reviewboard.reviews.models import Group
+
+    group_ids = list(review_request.target_groups.values_list('pk',
+                                                              flat=True))
+    people_ids = set(review_request.target_people.values_list('pk',
+                                                              flat=True))
+
+    if group_ids:
+        Group.incoming_request_count.increment(
+            Group.objects.filter(pk__in=group_ids),
+            delta)
+
+        group_member_ids = set(
+            Group.users.through.objects
+            .filter(group__in=group_ids)
+            .values_list('user', flat=True))
+    else:
+        group_member_ids = set()
+
+    starred_profile_ids = set(
+        Profile.starred_review_requests.through.objects
+        .filter(reviewrequest=review_request)
+        .values_list('profile', flat=True))
+
+    incoming_user_ids = people_ids | group_member_ids
+
+    if not incoming_user_ids and not starred_profile_ids:
+        return
+
+    site_profiles = (
+        LocalSiteProfile.objects
+        .filter(local_site=review_request.local_site)
+        .filter(Q(user__in=incoming_user_ids) |
+                Q(profile__in=starred_profile_ids))
+        .values_list('pk', 'user', 'profile'))
+
+    profile_ids_by_deltas = defaultdict(list)
+
+    for site_profile_id, user_id, profile_id in site_profiles:
+        deltas = (
+            user_id in people_ids,
+            user_id in incoming_user_ids,
+            profile_id in starred_profile_ids,
+        )
+        profile_ids_by_deltas[deltas].append(site_profile_id)
+
+    for deltas, site_profile_ids in six.iteritems(profile_ids_by_deltas):
+        values = dict(
+            (field_name, F(field_name) + delta)
+            for field_name, changed in zip(REVIEWER_COUNTER_FIELDS, deltas)
+            if changed
+        )
+
+        LocalSiteProfile.objects.filter(pk__in=site_profile_ids).update(
+            **values)
+
+
+def _get_counter_fields(model):
+    """Returns the initializable counter fields on a model."""
+    return [
+        field
+        for field in model._meta.fields
+        if isinstance(field, CounterField) and field._initializer
+    ]
+
+
+def _reconcile_model(model, batch_size):
+    """Reconciles the counters for the next batch of a model's objects.
+
+    The position within the table is stored in the cache, so that each call
+    picks up where the last left off, wrapping around at the end.
+
+    Each counter is recomputed from its initializer and only written back if
+    it's wrong and hasn't changed in the meantime, so that concurrent
+    increments and decrements aren't lost.
+
+    Returns a tuple of the number of objects checked and the number of
+    counters fixed.
+    """
+    cursor_key = RECONCILE_CURSOR_KEY % model._meta.object_name
+    cursor = cache.get(cursor_key, 0)
+    fields = _get_counter_fields(model)
+    objs = list(model.objects.filter(pk__gt=cursor).select_related()
+                .order_by('pk')[:batch_size])
+    num_fixed = 0
+
+    for obj in objs:
+        for field in fields:
+            current_value = getattr(obj, field.attname)
+            expected_value = field._initializer(obj)
+
+            if (expected_value is not None and
+                current_value is not None and
+                expected_value != current_value):
+                num_updated = model.objects.filter(**{
+                    'pk': obj.pk,
+                    field.attname: current_value,
+                }).update(**{
+                    field.attname: expected_value,
+                })
+
+                if num_updated:
+                    logging.info('Reconciled %s on %s %s from %s to %s',
+                                 field.attname, model._meta.object_name,
+                                 obj.pk, current_value, expected_value)
+                    num_fixed += 1
+
+    if len(objs) < batch_size:
+        cache.set(cursor_key, 0)
+    else:
+        cache.set(cursor_key, objs[-1].pk)
+
+    return len(objs), num_fixed
+
+
+def reconcile_review_counts(batch_size=RECONCILE_BATCH_SIZE):
+    """Reconciles a batch of review request counters.
+
+    This checks the next ``batch_size`` LocalSiteProfiles and Groups
+    against the database and fixes any counters that have drifted. It's
+    meant to be run periodically, gradually covering every counter without
+    the load of recomputing them all at once.
+
+    Returns a tuple of the number of objects checked and the number of
+    counters fixed.
+    """
+    from reviewboard.accounts.models import LocalSiteProfile
+    from reviewboard.reviews.models import Group
+
+    num_checked = 0
+    num_fixed = 0
+
+    for model in (LocalSiteProfile, Group):
+        model_checked, model_fixed = _reconcile_model(model, batch_size)
+        num_checked += model_checked
+        num_fixed += model_fixed
+
+    return num_checked, num_fixed
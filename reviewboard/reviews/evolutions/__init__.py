@@ -31,4 +31,6 @@ SEQUENCE = [
     'review_request_summary_index',
     'review_request_summary_index_manual',
     'split_rich_text',
+    'review_request_last_activity',
+    'screenshot_thumbnail_paths',
 ]
@@ -0,0 +1,14 @@
+from __future__ import unicode_literals
+
+from django_evolution.mutations import AddField
+from django.db import models
+
+
+MUTATIONS = [
+    AddField('ReviewRequest', 'last_activity_timestamp', models.DateTimeField,
+             null=True, db_index=True),
+    AddField('ReviewRequest', 'last_activity_type', models.CharField,
+             max_length=1, null=True),
+    AddField('ReviewRequest', 'last_activity_object_id',
+             models.PositiveIntegerField, null=True),
+]
@@ -7,6 +7,7 @@ from django.contrib.admin.widgets import FilteredSelectMultiple
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
+from reviewboard.attachments.thumbnails import generate_after_response
 from reviewboard.diffviewer import forms as diffviewer_forms
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.reviews.models import (DefaultReviewer, Group,
@@ -146,6 +147,7 @@ class UploadScreenshotForm(forms.Form):
         screenshot = Screenshot(caption='',
                                 draft_caption=self.cleaned_data['caption'])
         screenshot.image.save(file.name, file, save=True)
+        generate_after_response(screenshot.generate_thumbnails)
 
         draft = ReviewRequestDraft.create(review_request)
         draft.screenshots.add(screenshot)
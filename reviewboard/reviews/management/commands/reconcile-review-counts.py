@@ -0,0 +1,56 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.reviews.counters import (RECONCILE_BATCH_SIZE,
+                                          reconcile_review_counts)
+
+
+class Command(NoArgsCommand):
+    help = _('Checks a batch of review request counters against the '
+             'database and fixes any that have drifted')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    default=RECONCILE_BATCH_SIZE,
+                    dest='batch_size',
+                    help=_('Number of user profiles and groups to check '
+                           'per batch')),
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    dest='loop',
+                    help=_('Keep running, checking a new batch after each '
+                           'interval')),
+        make_option('--interval',
+                    action='store',
+                    type='int',
+                    default=60,
+                    dest='interval',
+                    help=_('Number of seconds to wait between batches when '
+                           'using --loop')),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            num_checked, num_fixed = \
+                reconcile_review_counts(batch_size=options['batch_size'])
+
+            self.stdout.write(
+                _('Checked %(num_checked)d object(s), fixed %(num_fixed)d '
+                  'counter(s).')
+                % {
+                    'num_checked': num_checked,
+                    'num_fixed': num_fixed,
+                })
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
@@ -0,0 +1,51 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.reviews.changesets import (PENDING_EXPIRATION,
+                                            refresh_pending_changesets)
+
+
+class Command(NoArgsCommand):
+    help = _('Refreshes the cached state of changesets for pending review '
+             'requests')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    dest='loop',
+                    help=_('Keep running, refreshing the changesets '
+                           'periodically')),
+        make_option('--interval',
+                    action='store',
+                    type='int',
+                    default=60,
+                    dest='interval',
+                    help=_('Number of seconds to wait between refreshes '
+                           'when using --loop')),
+        make_option('--expiration',
+                    action='store',
+                    type='int',
+                    default=PENDING_EXPIRATION,
+                    dest='expiration',
+                    help=_('Number of seconds to cache pending changesets. '
+                           'This should be longer than the time between '
+                           'refreshes')),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            count = refresh_pending_changesets(
+                pending_expiration=options['expiration'])
+
+            self.stdout.write(_('Refreshed %d pending changeset(s).') % count)
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
@@ -1,8 +1,11 @@
 from __future__ import unicode_literals
 
 import logging
+import re
+import uuid
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import connections, router, transaction
 from django.db.models import Manager, Q
@@ -10,14 +13,173 @@ from django.db.models.query import QuerySet
 from django.utils import six
 from djblets.db.managers import ConcurrencyManager
 
+from reviewboard.accounts.access import get_access_snapshot
 from reviewboard.diffviewer.models import DiffSetHistory
 from reviewboard.scmtools.errors import ChangeNumberInUseError
 from reviewboard.scmtools.models import Repository
 
 
+#: The largest number of IDs from an access snapshot to include directly in
+#: a query. Beyond this, a subquery is used instead, in order to stay within
+#: database limits on the number of query parameters.
+MAX_INLINE_ACCESS_IDS = 500
+
+
+def _get_accessible_ids(ids, queryset):
+    """Returns IDs from an access snapshot for use in an ``__in`` filter.
+
+    If there are too many IDs to include in the query directly, the given
+    queryset (which must match the same objects) is used as a subquery.
+    """
+    if len(ids) <= MAX_INLINE_ACCESS_IDS:
+        return list(ids)
+    else:
+        return queryset.values_list('pk', flat=True)
+
+
+def _get_accessible_repositories(user):
+    """Returns a queryset of repositories a user has been given access to."""
+    return Repository.objects.filter(Q(users=user) |
+                                     Q(review_groups__users=user))
+
+
 class DefaultReviewerManager(Manager):
     """A manager for DefaultReviewer models."""
 
+    MATCHERS_GENERATION_KEY = 'default-reviewer-matchers-generation'
+    MAX_CACHED_REGEXES = 2000
+
+    def __init__(self):
+        super(DefaultReviewerManager, self).__init__()
+
+        self._matchers_cache = {}
+        self._regex_cache = {}
+
+    def get_file_matchers(self, repository, local_site):
+        """Returns the file matchers for the DefaultReviewers of a repository.
+
+        Each matcher is a tuple of a compiled regex and the sets of user
+        and group IDs to add when a file path matches it. DefaultReviewers
+        sharing the same regex are merged into a single matcher, and
+        invalid regexes are skipped.
+
+        The matchers are cached in-process and rebuilt whenever any
+        DefaultReviewer (or its list of repositories, people or groups)
+        changes on any server process.
+        """
+        generation = self._get_matchers_generation()
+        key = (repository and repository.pk, local_site and local_site.pk)
+
+        try:
+            cached_generation, matchers = self._matchers_cache[key]
+
+            if cached_generation == generation:
+                return matchers
+        except KeyError:
+            pass
+
+        matchers = self._build_file_matchers(repository, local_site)
+        self._matchers_cache[key] = (generation, matchers)
+
+        return matchers
+
+    def invalidate_file_matchers(self):
+        """Invalidates all cached file matchers.
+
+        This is called automatically when DefaultReviewers change.
+        """
+        cache.set(self.MATCHERS_GENERATION_KEY, uuid.uuid4().hex)
+
+    def _get_matchers_generation(self):
+        """Returns the current generation of the file matchers.
+
+        If the generation has been evicted from the cache, a new one is
+        generated, so that stale matchers are never reused.
+        """
+        generation = cache.get(self.MATCHERS_GENERATION_KEY)
+
+        if generation is None:
+            cache.add(self.MATCHERS_GENERATION_KEY, uuid.uuid4().hex)
+            generation = cache.get(self.MATCHERS_GENERATION_KEY)
+
+        return generation
+
+    def _build_file_matchers(self, repository, local_site):
+        """Builds the list of file matchers for a repository.
+
+        This loads all the matching DefaultReviewers along with their
+        people and groups in a fixed number of queries.
+        """
+        file_regexes = dict(
+            self.for_repository(repository, local_site)
+            .values_list('pk', 'file_regex'))
+
+        if not file_regexes:
+            return []
+
+        model = self.model
+        people_ids = {}
+        group_ids = {}
+
+        for default_id, user_id in (
+                model.people.through.objects
+                .filter(defaultreviewer__in=file_regexes.keys())
+                .values_list('defaultreviewer', 'user')):
+            people_ids.setdefault(default_id, set()).add(user_id)
+
+        for default_id, group_id in (
+                model.groups.through.objects
+                .filter(defaultreviewer__in=file_regexes.keys())
+                .values_list('defaultreviewer', 'group')):
+            group_ids.setdefault(default_id, set()).add(group_id)
+
+        reviewers_by_regex = {}
+
+        for default_id, file_regex in six.iteritems(file_regexes):
+            regex_people_ids, regex_group_ids = \
+                reviewers_by_regex.setdefault(file_regex, (set(), set()))
+            regex_people_ids.update(people_ids.get(default_id, []))
+            regex_group_ids.update(group_ids.get(default_id, []))
+
+        matchers = []
+
+        for file_regex, (regex_people_ids, regex_group_ids) in \
+                six.iteritems(reviewers_by_regex):
+            if not regex_people_ids and not regex_group_ids:
+                continue
+
+            regex = self._compile_regex(file_regex)
+
+            if regex is not None:
+                matchers.append((regex, frozenset(regex_people_ids),
+                                 frozenset(regex_group_ids)))
+
+        return matchers
+
+    def _compile_regex(self, file_regex):
+        """Compiles a file regex, caching the result.
+
+        Python's own regex cache is too small to hold the patterns of a
+        large set of DefaultReviewers, so compiled regexes are kept here.
+        Returns None if the regex is invalid.
+        """
+        try:
+            return self._regex_cache[file_regex]
+        except KeyError:
+            pass
+
+        try:
+            regex = re.compile(file_regex)
+        except re.error:
+            regex = None
+
+        if len(self._regex_cache) >= self.MAX_CACHED_REGEXES:
+            self._regex_cache.clear()
+
+        self._regex_cache[file_regex] = regex
+
+        return regex
+
     def for_repository(self, repository, local_site):
         """Returns all DefaultReviewers that represent a repository.
 
@@ -321,15 +483,19 @@ class ReviewRequestManager(ConcurrencyManager):
                            Q(target_groups__invite_only=False))
 
             if is_authenticated:
-                accessible_repo_ids = Repository.objects.filter(
-                    Q(users=user) |
-                    Q(review_groups__users=user)).values_list('pk', flat=True)
-                accessible_group_ids = Group.objects.filter(
-                    users=user).values_list('pk', flat=True)
+                snapshot = get_access_snapshot(user)
+
+                if snapshot.repository_ids:
+                    repo_query = (repo_query |
+                                  Q(repository__in=_get_accessible_ids(
+                                      snapshot.repository_ids,
+                                      _get_accessible_repositories(user))))
 
-                repo_query = repo_query | Q(repository__in=accessible_repo_ids)
-                group_query = (group_query |
-                               Q(target_groups__in=accessible_group_ids))
+                if snapshot.group_ids:
+                    group_query = (group_query |
+                                   Q(target_groups__in=_get_accessible_ids(
+                                       snapshot.group_ids,
+                                       Group.objects.filter(users=user))))
 
                 query = query & (Q(submitter=user) |
                                  (repo_query &
@@ -470,16 +636,19 @@ class ReviewManager(ConcurrencyManager):
 
             # TODO: should be consolidated with queries in ReviewRequestManager
             if is_authenticated:
-                accessible_repo_ids = Repository.objects.filter(
-                    Q(users=user) |
-                    Q(review_groups__users=user)).values_list('pk', flat=True)
-                accessible_group_ids = Group.objects.filter(
-                    users=user).values_list('pk', flat=True)
-
-                repo_query |= \
-                    Q(review_request__repository__in=accessible_repo_ids)
-                group_query |= \
-                    Q(review_request__target_groups__in=accessible_group_ids)
+                snapshot = get_access_snapshot(user)
+
+                if snapshot.repository_ids:
+                    repo_query |= Q(
+                        review_request__repository__in=_get_accessible_ids(
+                            snapshot.repository_ids,
+                            _get_accessible_repositories(user)))
+
+                if snapshot.group_ids:
+                    group_query |= Q(
+                        review_request__target_groups__in=_get_accessible_ids(
+                            snapshot.group_ids,
+                            Group.objects.filter(users=user)))
 
                 query = query & (Q(user=user) |
                                  (repo_query &
@@ -77,8 +77,15 @@ class BaseComment(models.Model):
     def get_review(self):
         if hasattr(self, '_review'):
             return self._review
-        else:
-            return self.review.get()
+
+        # This uses all() instead of get(), so that a review fetched
+        # through prefetch_related() will be used.
+        reviews = self.review.all()[:1]
+
+        if not reviews:
+            raise self.review.model.DoesNotExist
+
+        return reviews[0]
 
     def get_review_url(self):
         return "%s#%s%d" % \
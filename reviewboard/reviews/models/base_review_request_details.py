@@ -8,7 +8,6 @@ from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import JSONField
 
-from reviewboard.attachments.models import FileAttachmentHistory
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.reviews.markdown_utils import markdown_escape
 from reviewboard.reviews.models.default_reviewer import DefaultReviewer
@@ -73,11 +72,7 @@ class BaseReviewRequestDetails(models.Model):
         By accessing screenshots through this method, future review request
         lookups from the screenshots will be avoided.
         """
-        review_request = self.get_review_request()
-
-        for screenshot in self.screenshots.all():
-            screenshot._review_request = review_request
-            yield screenshot
+        return self._load_attachments(self.screenshots.all())
 
     def get_inactive_screenshots(self):
         """Returns the list of all inactive screenshots on a review request.
@@ -88,50 +83,23 @@ class BaseReviewRequestDetails(models.Model):
         By accessing screenshots through this method, future review request
         lookups from the screenshots will be avoided.
         """
-        review_request = self.get_review_request()
-
-        for screenshot in self.inactive_screenshots.all():
-            screenshot._review_request = review_request
-            yield screenshot
+        return self._load_attachments(self.inactive_screenshots.all())
 
     def get_file_attachments(self):
         """Returns the list of all file attachments on a review request.
 
         This includes all current file attachments, but not previous ones.
+        They're sorted by their display position.
 
         By accessing file attachments through this method, future review
-        request lookups from the file attachments will be avoided.
+        request lookups from the file attachments will be avoided, and their
+        attachment histories will already be loaded.
         """
-        review_request = self.get_review_request()
-
-        def get_attachments():
-            for file_attachment in self.file_attachments.all():
-                file_attachment._review_request = review_request
-
-                # Handle legacy entries which don't have an associated
-                # FileAttachmentHistory entry.
-                if (not file_attachment.is_from_diff and
-                    file_attachment.attachment_history is None):
-                    history = FileAttachmentHistory.objects.create(
-                        display_position=FileAttachmentHistory
-                            .compute_next_display_position(
-                                review_request))
+        file_attachments = self._load_attachments(
+            self.file_attachments.select_related('attachment_history'))
+        file_attachments.sort(key=self._get_attachment_display_position)
 
-                    review_request.file_attachment_histories.add(history)
-
-                    file_attachment.attachment_history = history
-                    file_attachment.save(update_fields=['attachment_history'])
-
-                yield file_attachment
-
-        def get_display_position(attachment):
-            if attachment.attachment_history_id is not None:
-                return attachment.attachment_history.display_position
-            else:
-                return 0
-
-        return sorted(list(get_attachments()),
-                      key=get_display_position)
+        return file_attachments
 
     def get_inactive_file_attachments(self):
         """Returns all inactive file attachments on a review request.
@@ -140,13 +108,51 @@ class BaseReviewRequestDetails(models.Model):
         but have since been removed.
 
         By accessing file attachments through this method, future review
-        request lookups from the file attachments will be avoided.
+        request lookups from the file attachments will be avoided, and their
+        attachment histories will already be loaded.
+        """
+        return self._load_attachments(
+            self.inactive_file_attachments.select_related(
+                'attachment_history'))
+
+    def get_all_attachments(self):
+        """Returns all file attachments and screenshots on a review request.
+
+        This returns a tuple of the active file attachments, inactive file
+        attachments, active screenshots and inactive screenshots, as
+        returned by the individual methods for each. They're all fetched
+        in four queries, no matter how many there are.
+        """
+        return (self.get_file_attachments(),
+                self.get_inactive_file_attachments(),
+                self.get_screenshots(),
+                self.get_inactive_screenshots())
+
+    def _load_attachments(self, queryset):
+        """Returns a list of attachments, linked to the review request.
+
+        This prevents each attachment from having to look up the review
+        request again.
         """
         review_request = self.get_review_request()
+        attachments = list(queryset)
+
+        for attachment in attachments:
+            attachment._review_request = review_request
+
+        return attachments
+
+    def _get_attachment_display_position(self, file_attachment):
+        """Returns the position of a file attachment on the page.
 
-        for file_attachment in self.inactive_file_attachments.all():
-            file_attachment._review_request = review_request
-            yield file_attachment
+        Legacy file attachments without a history are shown first. The
+        ``create-attachment-histories`` management command gives them
+        histories of their own.
+        """
+        if file_attachment.attachment_history_id is not None:
+            return file_attachment.attachment_history.display_position
+        else:
+            return 0
 
     def add_default_reviewers(self):
         """Add default reviewers based on the diffset.
@@ -160,43 +166,40 @@ class BaseReviewRequestDetails(models.Model):
         if not diffset:
             return
 
-        people = set()
-        groups = set()
+        matchers = DefaultReviewer.objects.get_file_matchers(
+            self.repository, self.local_site)
 
-        # TODO: This is kind of inefficient, and could maybe be optimized in
-        # some fancy way.  Certainly the most superficial optimization that
-        # could be made would be to cache the compiled regexes somewhere.
-        files = diffset.files.all()
-        reviewers = DefaultReviewer.objects.for_repository(self.repository,
-                                                           self.local_site)
+        if not matchers:
+            return
 
-        for default in reviewers:
-            try:
-                regex = re.compile(default.file_regex)
-            except:
-                continue
+        paths = set(
+            source_file or dest_file
+            for source_file, dest_file in diffset.files.values_list(
+                'source_file', 'dest_file')
+        )
 
-            for filediff in files:
-                if regex.match(filediff.source_file or filediff.dest_file):
-                    for person in default.people.all():
-                        people.add(person)
+        people_ids = set()
+        group_ids = set()
 
-                    for group in default.groups.all():
-                        groups.add(group)
+        for regex, matcher_people_ids, matcher_group_ids in matchers:
+            if (matcher_people_ids <= people_ids and
+                matcher_group_ids <= group_ids):
+                # This wouldn't add anyone new, so don't bother matching.
+                continue
 
+            for path in paths:
+                if regex.match(path):
+                    people_ids.update(matcher_people_ids)
+                    group_ids.update(matcher_group_ids)
                     break
 
-        existing_people = self.target_people.all()
-
-        for person in people:
-            if person not in existing_people:
-                self.target_people.add(person)
-
-        existing_groups = self.target_groups.all()
+        # These will only insert the people and groups not already present,
+        # in a single query each.
+        if people_ids:
+            self.target_people.add(*people_ids)
 
-        for group in groups:
-            if group not in existing_groups:
-                self.target_groups.add(group)
+        if group_ids:
+            self.target_groups.add(*group_ids)
 
     def update_from_commit_id(self, commit_id):
         """Updates the data from a server-side changeset.
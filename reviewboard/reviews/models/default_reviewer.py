@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
@@ -69,3 +70,24 @@ class DefaultReviewer(models.Model):
 
     class Meta:
         app_label = 'reviews'
+
+
+def _invalidate_file_matchers(**kwargs):
+    """Invalidates the cached DefaultReviewer file matchers."""
+    DefaultReviewer.objects.invalidate_file_matchers()
+
+
+post_save.connect(_invalidate_file_matchers, sender=DefaultReviewer)
+post_delete.connect(_invalidate_file_matchers, sender=DefaultReviewer)
+m2m_changed.connect(_invalidate_file_matchers,
+                    sender=DefaultReviewer.repository.through)
+m2m_changed.connect(_invalidate_file_matchers,
+                    sender=DefaultReviewer.groups.through)
+m2m_changed.connect(_invalidate_file_matchers,
+                    sender=DefaultReviewer.people.through)
+
+# Deleting any of these removes them from DefaultReviewers without sending
+# m2m_changed.
+post_delete.connect(_invalidate_file_matchers, sender=Group)
+post_delete.connect(_invalidate_file_matchers, sender=Repository)
+post_delete.connect(_invalidate_file_matchers, sender=User)
@@ -9,6 +9,7 @@ from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import CounterField, JSONField
 
+from reviewboard.accounts.access import get_access_snapshot
 from reviewboard.reviews.managers import ReviewGroupManager
 from reviewboard.site.models import LocalSite
 from reviewboard.site.urlresolvers import local_site_reverse
@@ -81,7 +82,8 @@ class Group(models.Model):
         if not self.invite_only or user.is_superuser:
             return True
 
-        if user.is_authenticated() and self.users.filter(pk=user.pk).exists():
+        if (user.is_authenticated() and
+            self.pk in get_access_snapshot(user).group_ids):
             return True
 
         logging.warning('Group pk=%d (%s) is not accessible by user %s '
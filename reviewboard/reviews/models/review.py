@@ -212,6 +212,7 @@ class Review(models.Model):
         self.review_request.last_review_activity_timestamp = self.timestamp
         self.review_request.save(
             update_fields=['last_review_activity_timestamp', 'last_updated'])
+        self.review_request.set_last_activity(self.timestamp, self)
 
         if self.is_reply():
             reply_published.send(sender=self.__class__,
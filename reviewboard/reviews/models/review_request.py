@@ -139,6 +139,16 @@ class ReviewRequest(BaseReviewRequestDetails):
         (DISCARDED, _('Discarded')),
     )
 
+    LAST_ACTIVITY_REVIEW_REQUEST = 'R'
+    LAST_ACTIVITY_DIFFSET = 'D'
+    LAST_ACTIVITY_REVIEW = 'V'
+
+    LAST_ACTIVITY_TYPES = (
+        (LAST_ACTIVITY_REVIEW_REQUEST, _('Review request')),
+        (LAST_ACTIVITY_DIFFSET, _('Diff')),
+        (LAST_ACTIVITY_REVIEW, _('Review')),
+    )
+
     ISSUE_COUNTER_FIELDS = {
         BaseComment.OPEN: 'issue_open_count',
         BaseComment.RESOLVED: 'issue_resolved_count',
@@ -236,6 +246,26 @@ class ReviewRequest(BaseReviewRequestDetails):
         blank=True)
     shipit_count = CounterField(_("ship-it count"), default=0)
 
+    # The last public activity on the review request, as returned by
+    # get_last_activity(). This is updated when the review request, its
+    # diffs and its reviews are published.
+    last_activity_timestamp = models.DateTimeField(
+        _('last activity timestamp'),
+        null=True,
+        default=None,
+        blank=True,
+        db_index=True)
+    last_activity_type = models.CharField(
+        _('last activity type'),
+        max_length=1,
+        choices=LAST_ACTIVITY_TYPES,
+        null=True,
+        blank=True)
+    last_activity_object_id = models.PositiveIntegerField(
+        _('last activity object ID'),
+        null=True,
+        blank=True)
+
     issue_open_count = CounterField(
         _('open issue count'),
         initializer=_initialize_issue_counts)
@@ -255,6 +285,11 @@ class ReviewRequest(BaseReviewRequestDetails):
     # Set this up with the ReviewRequestManager
     objects = ReviewRequestManager()
 
+    def __init__(self, *args, **kwargs):
+        super(ReviewRequest, self).__init__(*args, **kwargs)
+
+        self._record_loaded_state()
+
     def get_commit(self):
         if self.commit_id is not None:
             return self.commit_id
@@ -473,6 +508,99 @@ class ReviewRequest(BaseReviewRequestDetails):
         This will return the last object updated, along with the timestamp
         of that object. It can be used to judge whether something on a
         review request has been made public more recently.
+
+        The activity is stored on the review request when things are
+        published. Any diffsets and reviews passed in will be checked
+        before querying for the updated object.
+        """
+        if self.last_activity_timestamp is None:
+            return self._update_last_activity(diffsets, reviews)
+
+        activity_type = self.last_activity_type
+        object_id = self.last_activity_object_id
+
+        if activity_type == self.LAST_ACTIVITY_REVIEW_REQUEST:
+            return self.last_activity_timestamp, self
+
+        if activity_type == self.LAST_ACTIVITY_DIFFSET:
+            model = DiffSet
+            objs = diffsets
+        else:
+            from reviewboard.reviews.models.review import Review
+
+            model = Review
+            objs = reviews
+
+        for obj in objs or []:
+            if obj.pk == object_id:
+                return self.last_activity_timestamp, obj
+
+        try:
+            return (self.last_activity_timestamp,
+                    model.objects.get(pk=object_id))
+        except model.DoesNotExist:
+            # The object has since been deleted. Find what's latest now.
+            return self._update_last_activity(diffsets, reviews)
+
+    def get_last_activity_time(self):
+        """Returns the timestamp of the last public activity.
+
+        This is equivalent to the timestamp from get_last_activity(), but
+        doesn't need to look up the updated object.
+        """
+        if self.last_activity_timestamp is None:
+            self._update_last_activity()
+
+        return self.last_activity_timestamp
+
+    def set_last_activity(self, timestamp, updated_object):
+        """Records new public activity on the review request.
+
+        ``updated_object`` is the review request, a diffset or a review.
+
+        This is stored without touching the review request's last_updated
+        timestamp, and never replaces activity newer than ``timestamp``.
+        """
+        self._store_last_activity(timestamp, updated_object,
+                                  only_if_newer=True)
+
+    def _store_last_activity(self, timestamp, updated_object, only_if_newer):
+        """Stores the last public activity in the database."""
+        from reviewboard.reviews.models.review import Review
+
+        if isinstance(updated_object, DiffSet):
+            activity_type = self.LAST_ACTIVITY_DIFFSET
+            object_id = updated_object.pk
+        elif isinstance(updated_object, Review):
+            activity_type = self.LAST_ACTIVITY_REVIEW
+            object_id = updated_object.pk
+        else:
+            activity_type = self.LAST_ACTIVITY_REVIEW_REQUEST
+            object_id = None
+
+        q = Q(pk=self.pk)
+
+        if only_if_newer:
+            q &= (Q(last_activity_timestamp__isnull=True) |
+                  Q(last_activity_timestamp__lte=timestamp))
+
+        ReviewRequest.objects.filter(q).update(
+            last_activity_timestamp=timestamp,
+            last_activity_type=activity_type,
+            last_activity_object_id=object_id)
+
+        if (not only_if_newer or
+            self.last_activity_timestamp is None or
+            self.last_activity_timestamp <= timestamp):
+            self.last_activity_timestamp = timestamp
+            self.last_activity_type = activity_type
+            self.last_activity_object_id = object_id
+
+    def _update_last_activity(self, diffsets=None, reviews=None):
+        """Computes and stores the last public activity.
+
+        This is used for review requests whose activity hasn't been
+        recorded yet, or whose recorded activity has been deleted.
         """
         timestamp = self.last_updated
         updated_object = self
@@ -503,6 +631,9 @@ class ReviewRequest(BaseReviewRequestDetails):
                 timestamp = review.timestamp
                 updated_object = review
 
+        self._store_last_activity(timestamp, updated_object,
+                                  only_if_newer=False)
+
         return timestamp, updated_object
 
     def changeset_is_pending(self, commit_id):
@@ -511,11 +642,15 @@ class ReviewRequest(BaseReviewRequestDetails):
         For repositories that support it, this will return whether the
         associated changeset is pending commit. This requires server-side
         knowledge of the change.
+
+        The result is cached. The ``refresh-pending-changesets`` management
+        command can keep the cache up to date in the background, so that
+        pages don't have to wait on the repository. If nothing is cached,
+        the changeset is looked up here.
         """
-        cache_key = make_cache_key(
-            'commit-id-is-pending-%d-%s' % (self.pk, commit_id))
+        cached_values = cache.get(
+            self._make_changeset_pending_cache_key(commit_id))
 
-        cached_values = cache.get(cache_key)
         if cached_values:
             return cached_values
 
@@ -527,31 +662,54 @@ class ReviewRequest(BaseReviewRequestDetails):
             changeset = scmtool.get_changeset(commit_id, allow_empty=True)
 
             if changeset:
-                is_pending = changeset.pending
-
-                new_commit_id = six.text_type(changeset.changenum)
-
-                if commit_id != new_commit_id:
-                    self.commit_id = new_commit_id
-                    self.save(update_fields=['commit_id'])
-                    commit_id = new_commit_id
-
-                    draft = self.get_draft()
-                    if draft:
-                        draft.commit_id = new_commit_id
-                        draft.save(update_fields=['commit_id'])
-
-                # If the changeset is pending, we cache for only one minute to
-                # speed things up a little bit when navigating through
-                # different pages. If the changeset is no longer pending, cache
-                # for the full default time.
-                if is_pending:
-                    cache.set(cache_key, (is_pending, commit_id), 60)
-                else:
-                    cache.set(cache_key, (is_pending, commit_id))
+                is_pending, commit_id = \
+                    self.update_from_pending_changeset(commit_id, changeset)
 
         return is_pending, commit_id
 
+    def update_from_pending_changeset(self, commit_id, changeset,
+                                      pending_expiration=60):
+        """Records the state of a changeset fetched from the repository.
+
+        If the changeset was renumbered (for instance, when a Perforce change
+        is submitted), the commit ID of the review request and its draft are
+        updated to match.
+
+        Whether the changeset is pending is cached for use by
+        :py:meth:`changeset_is_pending`. If the changeset is pending, it's
+        only cached for ``pending_expiration`` seconds, since it may be
+        committed at any time. If the changeset is no longer pending, it's
+        cached for the full default time.
+
+        This returns a tuple of whether the changeset is pending and the
+        new commit ID.
+        """
+        cache_key = self._make_changeset_pending_cache_key(commit_id)
+        is_pending = changeset.pending
+        new_commit_id = six.text_type(changeset.changenum)
+
+        if commit_id != new_commit_id:
+            self.commit_id = new_commit_id
+            self.save(update_fields=['commit_id'])
+            commit_id = new_commit_id
+
+            draft = self.get_draft()
+            if draft:
+                draft.commit_id = new_commit_id
+                draft.save(update_fields=['commit_id'])
+
+        if is_pending:
+            cache.set(cache_key, (is_pending, commit_id), pending_expiration)
+        else:
+            cache.set(cache_key, (is_pending, commit_id))
+
+        return is_pending, commit_id
+
+    def _make_changeset_pending_cache_key(self, commit_id):
+        """Returns the cache key for the pending state of a changeset."""
+        return make_cache_key(
+            'commit-id-is-pending-%d-%s' % (self.pk, commit_id))
+
     def get_absolute_url(self):
         if self.local_site:
             local_site_name = self.local_site.name
@@ -644,6 +802,8 @@ class ReviewRequest(BaseReviewRequestDetails):
 
         super(ReviewRequest, self).save(**kwargs)
 
+        self._record_loaded_state()
+
     def delete(self, **kwargs):
         from reviewboard.accounts.models import Profile, LocalSiteProfile
 
@@ -672,10 +832,15 @@ class ReviewRequest(BaseReviewRequestDetails):
     def can_publish(self):
         return not self.public or get_object_or_none(self.draft) is not None
 
-    def close(self, type, user=None, description=None, rich_text=False):
+    def close(self, type, user=None, description=None, rich_text=False,
+              send_notification=True):
         """Closes the review request.
 
         The type must be one of SUBMITTED or DISCARDED.
+
+        If ``send_notification`` is False, the ``review_request_closed``
+        signal won't be emitted, and it's up to the caller to send it. This
+        is used when closing many review requests at once.
         """
         if (user and not self.is_mutable_by(user) and
             not user.has_perm("reviews.can_change_status", self.local_site)):
@@ -709,10 +874,12 @@ class ReviewRequest(BaseReviewRequestDetails):
 
             self.status = type
             self.save(update_counts=True)
+            self.set_last_activity(self.last_updated, self)
 
-            review_request_closed.send(sender=self.__class__, user=user,
-                                       review_request=self,
-                                       type=type)
+            if send_notification:
+                review_request_closed.send(sender=self.__class__, user=user,
+                                           review_request=self,
+                                           type=type)
         else:
             # Update submission description.
             changedesc = self.changedescs.filter(public=True).latest()
@@ -723,6 +890,7 @@ class ReviewRequest(BaseReviewRequestDetails):
 
             # Needed to renew last-update.
             self.save()
+            self.set_last_activity(self.last_updated, self)
 
         # Delete the associated draft review request.
         if draft is not None:
@@ -756,6 +924,7 @@ class ReviewRequest(BaseReviewRequestDetails):
 
             self.status = self.PENDING_REVIEW
             self.save(update_counts=True)
+            self.set_last_activity(self.last_updated, self)
 
         review_request_reopened.send(sender=self.__class__, user=user,
                                      review_request=self)
@@ -799,10 +968,25 @@ class ReviewRequest(BaseReviewRequestDetails):
         self.public = True
         self.save(update_counts=True)
 
+        if draft is not None and draft.diffset_id:
+            self.set_last_activity(self.last_updated, draft.diffset)
+        else:
+            self.set_last_activity(self.last_updated, self)
+
         review_request_published.send(sender=self.__class__, user=user,
                                       review_request=self,
                                       changedesc=changes)
 
+    def _record_loaded_state(self):
+        """Records the state used for computing counter changes on save.
+
+        This lets _update_counts know what the status and public flag were
+        before they were modified, without querying the database. Deferred
+        fields are recorded as None, and won't be loaded here.
+        """
+        self._loaded_status = self.__dict__.get('status')
+        self._loaded_public = self.__dict__.get('public')
+
     def _update_counts(self):
         from reviewboard.accounts.models import Profile, LocalSiteProfile
 
@@ -828,10 +1012,16 @@ class ReviewRequest(BaseReviewRequestDetails):
             site_profile.increment_total_outgoing_request_count()
             old_status = None
             old_public = False
+        elif (self._loaded_status is not None and
+              self._loaded_public is not None):
+            # We know the state this was loaded or last saved with, so we
+            # can tell whether the status has changed without a query.
+            old_status = self._loaded_status
+            old_public = self._loaded_public
         else:
-            # We need to see if the status has changed, so that means
-            # finding out what's in the database.
-            r = ReviewRequest.objects.get(pk=self.id)
+            # The fields were deferred when loading, so we need to find
+            # out what's in the database.
+            r = ReviewRequest.objects.only('status', 'public').get(pk=self.id)
             old_status = r.status
             old_public = r.public
 
@@ -849,45 +1039,14 @@ class ReviewRequest(BaseReviewRequestDetails):
                 self._decrement_reviewer_counts()
 
     def _increment_reviewer_counts(self):
-        from reviewboard.accounts.models import LocalSiteProfile
-
-        groups = self.target_groups.all()
-        people = self.target_people.all()
-
-        Group.incoming_request_count.increment(groups)
-        LocalSiteProfile.direct_incoming_request_count.increment(
-            LocalSiteProfile.objects.filter(user__in=people,
-                                            local_site=self.local_site))
-        LocalSiteProfile.total_incoming_request_count.increment(
-            LocalSiteProfile.objects.filter(
-                Q(local_site=self.local_site) &
-                Q(Q(user__review_groups__in=groups) |
-                  Q(user__in=people))))
-        LocalSiteProfile.starred_public_request_count.increment(
-            LocalSiteProfile.objects.filter(
-                profile__starred_review_requests=self,
-                local_site=self.local_site))
+        from reviewboard.reviews.counters import update_reviewer_counts
+
+        update_reviewer_counts(self, 1)
 
     def _decrement_reviewer_counts(self):
-        from reviewboard.accounts.models import LocalSiteProfile
-
-        groups = self.target_groups.all()
-        people = self.target_people.all()
-
-        Group.incoming_request_count.decrement(groups)
-        LocalSiteProfile.direct_incoming_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                user__in=people,
-                local_site=self.local_site))
-        LocalSiteProfile.total_incoming_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                Q(local_site=self.local_site) &
-                Q(Q(user__review_groups__in=groups) |
-                  Q(user__in=people))))
-        LocalSiteProfile.starred_public_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                profile__starred_review_requests=self,
-                local_site=self.local_site))
+        from reviewboard.reviews.counters import update_reviewer_counts
+
+        update_reviewer_counts(self, -1)
 
     def _calculate_approval(self):
         """Calculates the approval information for the review request."""
@@ -9,8 +9,12 @@ from django.utils.encoding import python_2_unicode_compatible
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
-from djblets.util.templatetags.djblets_images import thumbnail
+from djblets.db.fields import JSONField
 
+from reviewboard.attachments.thumbnails import (THUMBNAIL_2X_SIZE,
+                                                THUMBNAIL_SIZE,
+                                                generate_thumbnails,
+                                                get_thumbnail_url)
 from reviewboard.site.urlresolvers import local_site_reverse
 
 
@@ -28,6 +32,10 @@ class Screenshot(models.Model):
                               upload_to=os.path.join('uploaded', 'images',
                                                      '%Y', '%m', '%d'))
 
+    # The paths in storage to the generated thumbnails, keyed by size.
+    # Thumbnails that couldn't be generated have empty paths.
+    thumbnail_paths = JSONField(null=True)
+
     @property
     def filename(self):
         """Returns the filename for display purposes."""
@@ -40,15 +48,33 @@ class Screenshot(models.Model):
 
         return self._comments
 
-    def get_thumbnail_url(self):
-        """Returns the URL for the thumbnail, creating it if necessary."""
-        return thumbnail(self.image)
+    def generate_thumbnails(self):
+        """Generates the thumbnails for the screenshot.
+
+        The paths to the thumbnails are stored on the screenshot, so that
+        they don't need to be looked up again when displaying it.
+        """
+        self.thumbnail_paths = generate_thumbnails(self.image)
+
+        if self.pk:
+            Screenshot.objects.filter(pk=self.pk).update(
+                thumbnail_paths=self.thumbnail_paths)
+
+    def get_thumbnail_url(self, size=THUMBNAIL_SIZE):
+        """Returns the URL for the thumbnail, creating it if necessary.
+
+        If the thumbnail couldn't be created, this returns an empty string.
+        """
+        if not self.thumbnail_paths or size not in self.thumbnail_paths:
+            self.generate_thumbnails()
+
+        return get_thumbnail_url(self.image, self.thumbnail_paths.get(size))
 
     def thumb(self):
         """Creates and returns HTML for this screenshot's thumbnail."""
-        url = self.get_thumbnail_url()
         return mark_safe('<img src="%s" data-at2x="%s" alt="%s" />' %
-                         (url, thumbnail(self.image, '800x200'),
+                         (self.get_thumbnail_url(),
+                          self.get_thumbnail_url(THUMBNAIL_2X_SIZE),
                           escape(self.caption)))
     thumb.allow_tags = True
 
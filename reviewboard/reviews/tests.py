@@ -3,9 +3,11 @@ from __future__ import print_function, unicode_literals
 from datetime import timedelta
 import logging
 import os
+import threading
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.template import Context, Template
 from django.test.client import RequestFactory
@@ -16,7 +18,12 @@ from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
 from reviewboard.accounts.models import Profile, LocalSiteProfile
-from reviewboard.attachments.models import FileAttachment
+from reviewboard.attachments.models import (FileAttachment,
+                                            FileAttachmentHistory)
+from reviewboard.attachments.thumbnails import (THUMBNAIL_2X_SIZE,
+                                                THUMBNAIL_SIZE)
+from reviewboard.reviews.changesets import refresh_pending_changesets
+from reviewboard.reviews.counters import reconcile_review_counts
 from reviewboard.reviews.forms import DefaultReviewerForm, GroupForm
 from reviewboard.reviews.markdown_utils import (get_markdown_element_tree,
                                                 iter_markdown_lines,
@@ -31,6 +38,9 @@ from reviewboard.reviews.models import (Comment,
                                         ReviewRequestDraft,
                                         Review,
                                         Screenshot)
+from reviewboard.reviews.updates import (get_update_token,
+                                         notify_review_request_updated,
+                                         wait_for_update)
 from reviewboard.reviews.ui.base import (FileAttachmentReviewUI,
                                          register_ui,
                                          unregister_ui)
@@ -40,6 +50,7 @@ from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.site.models import LocalSite
 from reviewboard.site.urlresolvers import local_site_reverse
 from reviewboard.testing import TestCase
+from reviewboard.testing.scmtool import TestTool
 
 
 class ReviewRequestManagerTests(TestCase):
@@ -671,6 +682,120 @@ class ReviewRequestTests(SpyAgency, TestCase):
         review_request.close(ReviewRequest.SUBMITTED)
         self.assertTrue(review_request.public)
 
+    def test_get_all_attachments(self):
+        """Testing ReviewRequest.get_all_attachments"""
+        review_request = self.create_review_request(publish=True)
+
+        file_attachments = []
+
+        for i in range(3):
+            history = FileAttachmentHistory.objects.create(
+                display_position=3 - i)
+            review_request.file_attachment_histories.add(history)
+            file_attachments.append(self.create_file_attachment(
+                review_request, attachment_history=history))
+
+        inactive_file_attachment = self.create_file_attachment(
+            review_request)
+        review_request.file_attachments.remove(inactive_file_attachment)
+        review_request.inactive_file_attachments.add(
+            inactive_file_attachment)
+
+        screenshot = self.create_screenshot(review_request)
+
+        # Fetch a fresh copy, so nothing is cached.
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+
+        with self.assertNumQueries(4):
+            (active, inactive, screenshots,
+             inactive_screenshots) = review_request.get_all_attachments()
+
+            # The histories and review request should already be loaded.
+            for attachment in active:
+                attachment.attachment_history.display_position
+                attachment.get_review_request()
+
+        self.assertEqual(active, list(reversed(file_attachments)))
+        self.assertEqual(inactive, [inactive_file_attachment])
+        self.assertEqual(screenshots, [screenshot])
+        self.assertEqual(inactive_screenshots, [])
+
+    def test_last_activity_on_publish(self):
+        """Testing ReviewRequest.get_last_activity after publishing"""
+        review_request = self.create_review_request(publish=True)
+
+        with self.assertNumQueries(0):
+            timestamp, updated_object = review_request.get_last_activity()
+
+        self.assertEqual(updated_object, review_request)
+        self.assertEqual(review_request.last_activity_type,
+                         ReviewRequest.LAST_ACTIVITY_REVIEW_REQUEST)
+        self.assertEqual(timestamp, review_request.get_last_activity_time())
+
+    def test_last_activity_on_review_publish(self):
+        """Testing ReviewRequest.get_last_activity after publishing a review
+        """
+        review_request = self.create_review_request(publish=True)
+        review = self.create_review(review_request)
+        review.publish()
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+
+        with self.assertNumQueries(0):
+            timestamp = review_request.get_last_activity_time()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(review_request.get_last_activity(),
+                             (timestamp, review))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                review_request.get_last_activity(reviews=[review]),
+                (timestamp, review))
+
+    @add_fixtures(['test_scmtools'])
+    def test_last_activity_on_diff_publish(self):
+        """Testing ReviewRequest.get_last_activity after publishing a diff"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request, draft=True)
+        review_request.publish(review_request.submitter)
+
+        timestamp, updated_object = review_request.get_last_activity()
+        self.assertEqual(updated_object, diffset)
+        self.assertEqual(review_request.last_activity_type,
+                         ReviewRequest.LAST_ACTIVITY_DIFFSET)
+
+    def test_last_activity_not_recorded(self):
+        """Testing ReviewRequest.get_last_activity without recorded activity
+        """
+        review_request = self.create_review_request(publish=True)
+
+        ReviewRequest.objects.filter(pk=review_request.pk).update(
+            last_activity_timestamp=None,
+            last_activity_type=None)
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+
+        timestamp, updated_object = review_request.get_last_activity()
+        self.assertEqual(updated_object, review_request)
+        self.assertEqual(timestamp, review_request.last_updated)
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        self.assertEqual(review_request.last_activity_timestamp, timestamp)
+        self.assertEqual(review_request.last_activity_type,
+                         ReviewRequest.LAST_ACTIVITY_REVIEW_REQUEST)
+
+    def test_last_activity_not_moved_backwards(self):
+        """Testing ReviewRequest.set_last_activity with an older timestamp"""
+        review_request = self.create_review_request(publish=True)
+        timestamp = review_request.get_last_activity_time()
+
+        review_request.set_last_activity(timestamp - timedelta(days=1),
+                                         review_request)
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        self.assertEqual(review_request.get_last_activity_time(), timestamp)
+
     def test_close_removes_commit_id(self):
         """Testing ReviewRequest.close with discarded removes commit ID"""
         review_request = self.create_review_request(publish=True,
@@ -722,6 +847,55 @@ class ReviewRequestTests(SpyAgency, TestCase):
         draft = review_request.get_draft()
         self.assertEqual(draft.commit_id, new_commit_id)
 
+    @add_fixtures(['test_scmtools'])
+    def test_refresh_pending_changesets(self):
+        """Testing refresh_pending_changesets caches changesets for
+        changeset_is_pending
+        """
+        repository = self.create_repository(tool_name='Test')
+        review_requests = []
+
+        for changenum in (123, 124):
+            review_request = self.create_review_request(
+                repository=repository,
+                commit_id=six.text_type(changenum))
+            review_request.changenum = changenum
+            review_request.save(update_fields=['changenum'])
+            review_requests.append(review_request)
+
+        def _get_changesets(scmtool, changesetids, allow_empty=False):
+            self.assertEqual(set(changesetids), set(['123', '124']))
+
+            changesets = {}
+
+            for changesetid in changesetids:
+                changeset = ChangeSet()
+                changeset.changenum = int(changesetid)
+                changeset.pending = (changesetid == '123')
+                changesets[changesetid] = changeset
+
+            return changesets
+
+        self.spy_on(TestTool.get_changesets, call_fake=_get_changesets)
+        TestTool.supports_pending_changesets = True
+
+        try:
+            self.assertEqual(refresh_pending_changesets(), 2)
+        finally:
+            TestTool.supports_pending_changesets = False
+
+        self.assertEqual(len(TestTool.get_changesets.spy.calls), 1)
+
+        # The results should now come from the cache, without asking the
+        # repository.
+        self.spy_on(TestTool.get_changeset)
+
+        self.assertEqual(review_requests[0].changeset_is_pending(123),
+                         (True, '123'))
+        self.assertEqual(review_requests[1].changeset_is_pending(124),
+                         (False, '124'))
+        self.assertFalse(TestTool.get_changeset.spy.called)
+
     def test_unicode_summary_and_str(self):
         """Testing ReviewRequest.__str__ with unicode summaries."""
         review_request = self.create_review_request(
@@ -1729,6 +1903,79 @@ class DefaultReviewerTests(TestCase):
         })
         self.assertFalse(form.is_valid())
 
+    @add_fixtures(['test_users'])
+    def test_add_default_reviewers(self):
+        """Testing ReviewRequest.add_default_reviewers"""
+        doc = User.objects.get(username='doc')
+        grumpy = User.objects.get(username='grumpy')
+        dopey = User.objects.get(username='dopey')
+        group = self.create_review_group()
+
+        review_request = self.create_review_request(create_repository=True)
+        diffset = self.create_diffset(review_request)
+        self.create_filediff(diffset, source_file='/src/main.c',
+                             dest_file='/src/main.c')
+        self.create_filediff(diffset, source_file='/docs/README',
+                             dest_file='/docs/README')
+
+        default_reviewer = DefaultReviewer.objects.create(
+            name='Source', file_regex=r'/src/.*\.c$')
+        default_reviewer.people.add(doc)
+
+        default_reviewer = DefaultReviewer.objects.create(
+            name='Docs', file_regex='/docs/')
+        default_reviewer.people.add(grumpy)
+        default_reviewer.groups.add(group)
+
+        default_reviewer = DefaultReviewer.objects.create(
+            name='Tests', file_regex='/tests/')
+        default_reviewer.people.add(dopey)
+
+        default_reviewer = DefaultReviewer.objects.create(
+            name='Invalid', file_regex='[')
+        default_reviewer.people.add(dopey)
+
+        review_request.target_people.add(doc)
+        review_request.add_default_reviewers()
+
+        self.assertEqual(set(review_request.target_people.all()),
+                         set([doc, grumpy]))
+        self.assertEqual(list(review_request.target_groups.all()), [group])
+
+    @add_fixtures(['test_users'])
+    def test_get_file_matchers_cached(self):
+        """Testing DefaultReviewer.objects.get_file_matchers caching and
+        invalidation
+        """
+        repository = self.create_repository()
+        doc = User.objects.get(username='doc')
+        grumpy = User.objects.get(username='grumpy')
+
+        default_reviewer = DefaultReviewer.objects.create(name='Test 1',
+                                                          file_regex='.*')
+        default_reviewer.people.add(doc)
+
+        default_reviewer2 = DefaultReviewer.objects.create(name='Test 2',
+                                                           file_regex='.*')
+        default_reviewer2.people.add(grumpy)
+
+        matchers = DefaultReviewer.objects.get_file_matchers(repository, None)
+        self.assertEqual(len(matchers), 1)
+        self.assertEqual(matchers[0][1], frozenset([doc.pk, grumpy.pk]))
+
+        with self.assertNumQueries(0):
+            DefaultReviewer.objects.get_file_matchers(repository, None)
+
+        default_reviewer2.people.remove(grumpy)
+
+        matchers = DefaultReviewer.objects.get_file_matchers(repository, None)
+        self.assertEqual(matchers[0][1], frozenset([doc.pk]))
+
+        default_reviewer.delete()
+
+        matchers = DefaultReviewer.objects.get_file_matchers(repository, None)
+        self.assertEqual(matchers, [])
+
 
 class GroupTests(TestCase):
     def test_form_with_localsite(self):
@@ -1765,6 +2012,43 @@ class GroupTests(TestCase):
         self.assertFalse(form.is_valid())
 
 
+class UpdateNotificationTests(TestCase):
+    """Unit tests for reviewboard.reviews.updates."""
+    fixtures = ['test_users']
+
+    def test_update_token_on_publish(self):
+        """Testing update tokens changing when publishing a review"""
+        review_request = self.create_review_request(publish=True)
+        token = get_update_token(review_request.pk)
+
+        self.assertEqual(get_update_token(review_request.pk), token)
+
+        review = self.create_review(review_request)
+        review.publish()
+
+        self.assertNotEqual(get_update_token(review_request.pk), token)
+
+    def test_wait_for_update_timeout(self):
+        """Testing wait_for_update without an update"""
+        token = get_update_token(1)
+
+        self.assertEqual(wait_for_update(1, token, 0.1), token)
+
+    def test_wait_for_update_notified(self):
+        """Testing wait_for_update woken up by an update"""
+        token = get_update_token(1)
+        timer = threading.Timer(0.1, notify_review_request_updated, [1])
+        timer.start()
+
+        try:
+            new_token = wait_for_update(1, token, 10)
+        finally:
+            timer.cancel()
+
+        self.assertNotEqual(new_token, token)
+        self.assertEqual(new_token, get_update_token(1))
+
+
 class IfNeatNumberTagTests(TestCase):
     def test_milestones(self):
         """Testing the ifneatnumber tag with milestone numbers"""
@@ -2251,6 +2535,46 @@ class ReviewRequestCounterTests(TestCase):
                              starred_public=1,
                              group_incoming=1)
 
+    def test_close_without_reload(self):
+        """Testing counters when closing a review request using its loaded
+        state
+        """
+        self.test_add_group()
+
+        review_request = ReviewRequest.objects.get(pk=self.review_request.pk)
+        self.assertEqual(review_request._loaded_status,
+                         ReviewRequest.PENDING_REVIEW)
+        self.assertTrue(review_request._loaded_public)
+
+        review_request.close(ReviewRequest.SUBMITTED)
+
+        self.assertEqual(review_request._loaded_status,
+                         ReviewRequest.SUBMITTED)
+        self._check_counters(total_outgoing=1,
+                             starred_public=0)
+
+    def test_reconcile_counts(self):
+        """Testing reconcile_review_counts fixing drifted counters"""
+        self.test_add_person()
+
+        cache.clear()
+        LocalSiteProfile.objects.filter(pk=self.site_profile.pk).update(
+            total_incoming_request_count=5)
+        Group.objects.filter(pk=self.group.pk).update(
+            incoming_request_count=3)
+
+        num_checked, num_fixed = reconcile_review_counts()
+        self.assertEqual(num_fixed, 2)
+
+        self._check_counters(total_outgoing=1,
+                             pending_outgoing=1,
+                             direct_incoming=1,
+                             total_incoming=1,
+                             starred_public=1)
+
+        num_checked, num_fixed = reconcile_review_counts()
+        self.assertEqual(num_fixed, 0)
+
     def _check_counters(self, total_outgoing=0, pending_outgoing=0,
                         direct_incoming=0, total_incoming=0,
                         starred_public=0, group_incoming=0,
@@ -2777,6 +3101,26 @@ class UserInfoboxTests(TestCase):
         self.client.get(local_site_reverse('user-infobox', args=['test']))
 
 
+class ScreenshotTests(TestCase):
+    fixtures = ['test_users']
+
+    def test_get_thumbnail_url(self):
+        """Testing Screenshot.get_thumbnail_url stores generated thumbnails"""
+        review_request = self.create_review_request()
+        screenshot = self.create_screenshot(review_request)
+        self.assertFalse(screenshot.thumbnail_paths)
+
+        url = screenshot.get_thumbnail_url()
+        self.assertTrue(url)
+
+        screenshot = Screenshot.objects.get(pk=screenshot.pk)
+        self.assertEqual(
+            screenshot.image.storage.url(
+                screenshot.thumbnail_paths[THUMBNAIL_SIZE]),
+            url)
+        self.assertIn(THUMBNAIL_2X_SIZE, screenshot.thumbnail_paths)
+
+
 class MarkdownUtilsTests(TestCase):
     UNESCAPED_TEXT = r'\`*_{}[]()#+-.!'
     ESCAPED_TEXT = r'\\\`\*\_\{\}\[\]\(\)#+-.\!'
@@ -95,8 +95,7 @@ class ReviewUI(object):
         """
         self.request = request
 
-        last_activity_time, updated_object = \
-            self.review_request.get_last_activity()
+        last_activity_time = self.review_request.get_last_activity_time()
 
         draft = self.review_request.get_draft(request.user)
         review_request_details = draft or self.review_request
@@ -0,0 +1,110 @@
+"""Notifications of new public activity on review requests.
+
+Each review request has an update token stored in the cache, which is
+replaced whenever something on the review request is published. Clients
+watching a review request for updates can hold on to the token and wait
+for it to change through :py:func:`wait_for_update`, rather than
+repeatedly querying the review request's activity.
+
+Waiters in the same process are woken up as soon as an update is
+published. Updates published by other processes are picked up by
+checking the cache every :py:data:`POLL_INTERVAL` seconds.
+
+Waiting ties up the caller for the whole wait, so this is only used when
+``settings.REVIEW_REQUEST_UPDATES_MAX_WAIT`` is set, which is meant for
+deployments with asynchronous (evented) workers, where a waiting request
+yields to others instead of holding a worker thread.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+from reviewboard.reviews.signals import (reply_published,
+                                         review_published,
+                                         review_request_closed,
+                                         review_request_published,
+                                         review_request_reopened)
+
+
+UPDATE_TOKEN_KEY = 'review-request-update-token-%s'
+UPDATE_TOKEN_EXPIRATION = 7 * 24 * 60 * 60
+
+#: The number of seconds between checks of the cache while waiting.
+POLL_INTERVAL = 1.0
+
+_update_condition = threading.Condition()
+
+
+def get_update_token(review_request_id):
+    """Returns the current update token for a review request.
+
+    If there's no token in the cache, a new one is generated. Clients
+    holding an older token will then see an update, which at worst causes
+    them to fetch the review request's activity again.
+    """
+    key = UPDATE_TOKEN_KEY % review_request_id
+    token = cache.get(key)
+
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, UPDATE_TOKEN_EXPIRATION)
+        token = cache.get(key)
+
+    return token
+
+
+def notify_review_request_updated(review_request_id):
+    """Marks a review request as having new public activity.
+
+    This replaces the review request's update token, and wakes up anything
+    waiting on it in this process.
+    """
+    cache.set(UPDATE_TOKEN_KEY % review_request_id, uuid.uuid4().hex,
+              UPDATE_TOKEN_EXPIRATION)
+
+    with _update_condition:
+        _update_condition.notify_all()
+
+
+def wait_for_update(review_request_id, token, timeout):
+    """Waits for a review request's update token to change.
+
+    This returns the new token as soon as it differs from ``token``, or
+    the current token once ``timeout`` seconds have passed without an
+    update.
+    """
+    deadline = time.time() + timeout
+
+    while True:
+        current_token = get_update_token(review_request_id)
+        remaining = deadline - time.time()
+
+        if current_token != token or remaining <= 0:
+            return current_token
+
+        with _update_condition:
+            _update_condition.wait(min(POLL_INTERVAL, remaining))
+
+
+def _on_review_request_updated(review_request, **kwargs):
+    notify_review_request_updated(review_request.pk)
+
+
+def _on_review_published(review, **kwargs):
+    notify_review_request_updated(review.review_request_id)
+
+
+def _on_reply_published(reply, **kwargs):
+    notify_review_request_updated(reply.review_request_id)
+
+
+def connect_signals():
+    review_request_published.connect(_on_review_request_updated)
+    review_request_closed.connect(_on_review_request_updated)
+    review_request_reopened.connect(_on_review_request_updated)
+    review_published.connect(_on_review_published)
+    reply_published.connect(_on_reply_published)
@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 
 import logging
 import time
+from itertools import chain
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
@@ -37,8 +38,7 @@ from haystack.views import SearchView
 from reviewboard.accounts.decorators import (check_login_required,
                                              valid_prefs_required)
 from reviewboard.accounts.models import ReviewRequestVisit, Profile
-from reviewboard.attachments.models import (FileAttachment,
-                                            FileAttachmentHistory)
+from reviewboard.attachments.models import FileAttachment
 from reviewboard.changedescs.models import ChangeDescription
 from reviewboard.diffviewer.diffutils import (convert_to_unicode,
                                               get_file_chunks_in_range,
@@ -301,18 +301,17 @@ def new_review_request(request,
 
 
 def _get_latest_file_attachments(file_attachments):
-    file_attachment_histories = FileAttachmentHistory.objects.filter(
-        file_attachments__in=file_attachments)
-    latest = dict([
-        (data['id'], data['latest_revision'])
-        for data in file_attachment_histories.values('id', 'latest_revision')
-    ])
+    """Returns the latest revision of each file attachment.
 
+    The attachment histories must already be loaded, as done by
+    BaseReviewRequestDetails.get_file_attachments.
+    """
     return [
         f
         for f in file_attachments
         if (not f.is_from_diff and
-            f.attachment_revision == latest[f.attachment_history_id])
+            (f.attachment_history_id is None or
+             f.attachment_revision == f.attachment_history.latest_revision))
     ]
 
 
@@ -453,8 +452,7 @@ def review_detail(request,
         diffsets_by_id[diffset.pk] = diffset
 
     # Find out if we can bail early. Generate an ETag for this.
-    last_activity_time, updated_object = \
-        review_request.get_last_activity(diffsets, public_reviews)
+    last_activity_time = review_request.get_last_activity_time()
 
     if draft:
         draft_timestamp = draft.last_updated
@@ -534,26 +532,12 @@ def review_detail(request,
     # is because any file attachments/screenshots created after the initial
     # creation of the review request that were later removed will still need
     # to be rendered as an added file in a change box.
-    file_attachments = []
-    inactive_file_attachments = []
-    screenshots = []
-    inactive_screenshots = []
-
-    for attachment in review_request_details.get_file_attachments():
-        attachment._comments = []
-        file_attachments.append(attachment)
-
-    for attachment in review_request_details.get_inactive_file_attachments():
-        attachment._comments = []
-        inactive_file_attachments.append(attachment)
-
-    for screenshot in review_request_details.get_screenshots():
-        screenshot._comments = []
-        screenshots.append(screenshot)
+    (file_attachments, inactive_file_attachments, screenshots,
+     inactive_screenshots) = review_request_details.get_all_attachments()
 
-    for screenshot in review_request_details.get_inactive_screenshots():
-        screenshot._comments = []
-        inactive_screenshots.append(screenshot)
+    for obj in chain(file_attachments, inactive_file_attachments,
+                     screenshots, inactive_screenshots):
+        obj._comments = []
 
     file_attachment_id_map = _build_id_map(file_attachments)
     file_attachment_id_map.update(_build_id_map(inactive_file_attachments))
@@ -849,8 +833,7 @@ class ReviewsDiffViewerView(DiffViewerView):
         if self.draft and self.draft.diffset:
             num_diffs += 1
 
-        last_activity_time, updated_object = \
-            self.review_request.get_last_activity(diffsets)
+        last_activity_time = self.review_request.get_last_activity_time()
 
         file_attachments = list(self.review_request.get_file_attachments())
         screenshots = list(self.review_request.get_screenshots())
@@ -6,17 +6,25 @@ from django.dispatch import receiver
 from django.http import HttpResponse, HttpResponseNotFound
 from django.shortcuts import get_object_or_404, render_to_response
 from django.template import RequestContext
+from django.template.defaultfilters import filesizeformat
+from django.utils.dateparse import parse_datetime
 from django.utils.html import format_html
+from django.utils.timesince import timesince
 from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.accounts.admin import fix_review_counts
 from reviewboard.admin.server import get_server_url
 from reviewboard.scmtools.forms import RepositoryForm
+from reviewboard.scmtools.mirrors import (MIRROR_STATE_ERROR,
+                                          MIRROR_STATE_OVER_QUOTA,
+                                          get_mirror_status,
+                                          is_mirror_enabled)
 from reviewboard.scmtools.models import Repository, Tool
 
 
 class RepositoryAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'path', 'hosting', '_visible', 'inline_actions')
+    list_display = ('__str__', 'path', 'hosting', 'mirror', '_visible',
+                    'inline_actions')
     list_select_related = ('hosting_account',)
     raw_id_fields = ('local_site',)
     fieldsets = (
@@ -45,6 +53,7 @@ class RepositoryAdmin(admin.ModelAdmin):
                 'username',
                 'password',
                 'use_ticket_auth',
+                'use_local_mirror',
             ),
             'classes': ('wide',),
         }),
@@ -91,6 +100,31 @@ class RepositoryAdmin(admin.ModelAdmin):
 
         return ''
 
+    def mirror(self, repository):
+        if not is_mirror_enabled(repository):
+            return ''
+
+        status = get_mirror_status(repository)
+
+        if not status:
+            return _('Not created yet')
+        elif status['state'] == MIRROR_STATE_OVER_QUOTA:
+            return _('Removed (over quota)')
+
+        updated = parse_datetime(status['updated'])
+
+        if status['state'] == MIRROR_STATE_ERROR:
+            return format_html('<span title="{0}">{1}</span>',
+                               status['error'],
+                               _('Failed %s ago') % timesince(updated))
+        else:
+            return _('%(size)s, updated %(timesince)s ago') % {
+                'size': filesizeformat(status['size']),
+                'timesince': timesince(updated),
+            }
+    mirror.allow_tags = True
+    mirror.short_description = _('Local mirror')
+
     def inline_actions(self, repository):
         s = ['<div class="admin-inline-actions">']
 
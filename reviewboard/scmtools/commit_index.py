@@ -0,0 +1,287 @@
+"""Local indexes of repository commit history.
+
+Listing commits (used when creating a new review request from a commit)
+normally requires a request to the repository or hosting service for every
+page of history. On large repositories, this is slow, and the same pages are
+fetched again and again.
+
+Instead, the commit history of each repository and branch is kept in a local
+index, stored in the database as :py:class:`IndexedCommit
+<reviewboard.scmtools.models.IndexedCommit>` entries. The index is built up
+incrementally:
+
+* New commits are prepended by :py:func:`update_commit_index`, which fetches
+  history from the tip of the branch until it reaches the newest commit
+  already in the index.
+
+* Older commits are appended the first time someone pages past the oldest
+  commit in the index.
+
+Pages are then served from the index by :py:func:`get_indexed_commits`, using
+a commit ID as the cursor. Indexes are refreshed periodically by
+:py:func:`update_commit_indexes`, which is normally invoked by the
+``update-commit-indexes`` management command. If an index hasn't been
+refreshed recently, it's refreshed when its first page is requested.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.six.moves import range
+from djblets.cache.backend import make_cache_key
+
+from reviewboard.scmtools.errors import SCMError
+
+
+#: The number of commits in a page served from the index.
+COMMITS_PAGE_SIZE = 30
+
+#: The maximum number of pages fetched when adding new commits to an index.
+#:
+#: If the newest indexed commit isn't found within this many pages (for
+#: instance, when the history was rewritten), the index is rebuilt.
+MAX_UPDATE_PAGES = 10
+
+#: How long to hold the lock on an index while it's being updated.
+LOCK_EXPIRATION = 5 * 60
+
+
+def get_indexed_commits(repository, branch=None, start=None):
+    """Returns a page of commits from a repository's commit index.
+
+    ``start`` is the ID of the commit to start listing from. If not provided,
+    the page starts with the newest commit on the branch, and the index is
+    refreshed first if it hasn't been refreshed recently.
+
+    Commits older than those in the index are fetched and added to the index
+    as needed. If ``start`` isn't a commit in the index, this falls back on
+    :py:meth:`Repository.get_commits
+    <reviewboard.scmtools.models.Repository.get_commits>`.
+
+    Any exceptions are expected to be handled by the caller.
+    """
+    entries = _get_entries(repository, branch)
+
+    if start:
+        start_entry = _get_entry(entries, start)
+
+        if start_entry is None:
+            oldest = entries.order_by('position').first()
+
+            if oldest and oldest.parent_id == start:
+                _extend_commit_index(repository, branch, oldest)
+                start_entry = _get_entry(entries, start)
+
+        if start_entry is None:
+            return repository.get_commits(branch=branch, start=start)
+    else:
+        if cache.get(_make_updated_cache_key(repository, branch)) is None:
+            update_commit_index(repository, branch)
+
+        start_entry = entries.order_by('-position').first()
+
+        if start_entry is None:
+            return []
+
+    page = _get_page(entries, start_entry)
+    oldest = page[-1]
+
+    if len(page) < COMMITS_PAGE_SIZE and oldest.parent_id:
+        # We've run past the oldest commit in the index. Add the next page
+        # of history to it.
+        if _extend_commit_index(repository, branch, oldest):
+            page = _get_page(entries, start_entry)
+
+    commits = [entry.to_commit() for entry in page]
+
+    for commit in commits:
+        cache.set(repository.get_commit_cache_key(commit.id),
+                  commit, repository.COMMITS_CACHE_PERIOD_LONG)
+
+    return commits
+
+
+def update_commit_index(repository, branch=None):
+    """Adds new commits to a repository's commit index.
+
+    History is fetched from the tip of the branch until reaching the newest
+    commit in the index. If the index is empty, only the first page of
+    history is indexed. If the newest commit can't be found, the index is
+    rebuilt.
+
+    This returns the number of commits added, or None if the index is
+    already being updated elsewhere.
+    """
+    lock_key = _make_lock_cache_key(repository, branch)
+
+    if not cache.add(lock_key, True, LOCK_EXPIRATION):
+        return None
+
+    try:
+        entries = _get_entries(repository, branch)
+        newest = entries.order_by('-position').first()
+        new_commits = []
+        found = False
+        start = None
+
+        for i in range(MAX_UPDATE_PAGES):
+            commits = repository.get_commits(branch=branch, start=start,
+                                             use_cache=False)
+
+            for commit in commits:
+                if newest and commit.id == newest.commit_id:
+                    found = True
+                    break
+
+                new_commits.append(commit)
+
+            if (found or newest is None or not commits or
+                not commits[-1].parent):
+                break
+
+            start = commits[-1].parent
+
+        with transaction.atomic():
+            if newest and not found:
+                logging.info('Rebuilding the commit index for repository '
+                             '%s, branch "%s"',
+                             repository.pk, branch or '')
+                entries.delete()
+                newest = None
+
+            if newest:
+                position = newest.position
+            else:
+                position = 0
+
+            _add_entries(repository, branch, reversed(new_commits), position,
+                         1)
+
+        cache.set(_make_updated_cache_key(repository, branch), True,
+                  repository.COMMITS_CACHE_PERIOD_SHORT)
+
+        return len(new_commits)
+    finally:
+        cache.delete(lock_key)
+
+
+def update_commit_indexes():
+    """Adds new commits to all commit indexes.
+
+    Only indexes that have already been created, by listing commits for a
+    repository and branch, are updated. Indexes of archived repositories are
+    left alone.
+
+    This returns the number of indexes updated.
+    """
+    from reviewboard.scmtools.models import IndexedCommit, Repository
+
+    keys = (IndexedCommit.objects
+            .filter(repository__archived=False)
+            .order_by('repository', 'branch')
+            .values_list('repository', 'branch')
+            .distinct())
+    repositories = {}
+    count = 0
+
+    for repository_id, branch in keys:
+        if repository_id not in repositories:
+            repositories[repository_id] = \
+                Repository.objects.get(pk=repository_id)
+
+        repository = repositories[repository_id]
+
+        try:
+            if update_commit_index(repository, branch or None) is not None:
+                count += 1
+        except (SCMError, NotImplementedError) as e:
+            logging.error('Unable to update the commit index for repository '
+                          '%s, branch "%s": %s',
+                          repository_id, branch, e)
+
+    return count
+
+
+def _get_entries(repository, branch):
+    """Returns a queryset for the commit index of a repository and branch."""
+    return repository.indexed_commits.filter(branch=branch or '')
+
+
+def _get_entry(entries, commit_id):
+    """Returns the index entry for a commit, or None if not indexed."""
+    return entries.filter(commit_id=commit_id).order_by('-position').first()
+
+
+def _get_page(entries, start_entry):
+    """Returns a page of index entries, starting at the given entry."""
+    return list(entries.filter(position__lte=start_entry.position)
+                .order_by('-position')[:COMMITS_PAGE_SIZE])
+
+
+def _extend_commit_index(repository, branch, oldest):
+    """Adds the history preceding the oldest commit to a commit index.
+
+    This returns whether any commits were added.
+    """
+    lock_key = _make_lock_cache_key(repository, branch)
+
+    if not cache.add(lock_key, True, LOCK_EXPIRATION):
+        return False
+
+    try:
+        if _get_entry(_get_entries(repository, branch),
+                      oldest.parent_id) is not None:
+            # Someone else has already extended the index.
+            return True
+
+        commits = repository.get_commits(branch=branch,
+                                         start=oldest.parent_id)
+
+        if not commits or commits[0].id != oldest.parent_id:
+            return False
+
+        with transaction.atomic():
+            _add_entries(repository, branch, commits, oldest.position, -1)
+
+        return True
+    finally:
+        cache.delete(lock_key)
+
+
+def _add_entries(repository, branch, commits, position, step):
+    """Adds commits to a commit index.
+
+    Each commit is placed ``step`` positions after the previous one,
+    starting after ``position``.
+    """
+    from reviewboard.scmtools.models import IndexedCommit
+
+    entries = []
+
+    for commit in commits:
+        position += step
+        entries.append(IndexedCommit(repository=repository,
+                                     branch=branch or '',
+                                     position=position,
+                                     commit_id=commit.id,
+                                     parent_id=commit.parent or '',
+                                     author_name=commit.author_name or '',
+                                     date=commit.date or '',
+                                     message=commit.message or ''))
+
+    IndexedCommit.objects.bulk_create(entries)
+
+
+def _make_updated_cache_key(repository, branch):
+    """Returns the cache key noting that an index was recently updated."""
+    return make_cache_key('commit-index-updated:%s:%s'
+                          % (repository.pk, branch or ''))
+
+
+def _make_lock_cache_key(repository, branch):
+    """Returns the cache key used to lock an index while updating it."""
+    return make_cache_key('commit-index-lock:%s:%s'
+                          % (repository.pk, branch or ''))
@@ -125,6 +125,8 @@ PRE_CREATION = Revision("PRE-CREATION")
 
 class SCMTool(object):
     name = None
+    supports_batch_file_fetches = False
+    supports_local_mirrors = False
     supports_pending_changesets = False
     supports_post_commit = False
     supports_raw_file_urls = False
@@ -149,6 +151,28 @@ class SCMTool(object):
     def get_file(self, path, revision=None):
         raise NotImplementedError
 
+    def get_files(self, files):
+        """Returns the contents of several files.
+
+        ``files`` is a list of (path, revision) tuples. The contents are
+        returned in the same order, with None for any files that don't
+        exist.
+
+        SCMTools that can fetch several files more efficiently than one at
+        a time should override this and set
+        ``supports_batch_file_fetches``. Review Board then uses it to check
+        for the files in uploaded diffs, caching their contents for display.
+        """
+        results = []
+
+        for path, revision in files:
+            try:
+                results.append(self.get_file(path, revision))
+            except FileNotFoundError:
+                results.append(None)
+
+        return results
+
     def file_exists(self, path, revision=HEAD):
         try:
             self.get_file(path, revision)
@@ -166,6 +190,28 @@ class SCMTool(object):
     def get_changeset(self, changesetid, allow_empty=False):
         raise NotImplementedError
 
+    def get_changesets(self, changesetids, allow_empty=False):
+        """Get several changesets at once.
+
+        This returns a dictionary mapping each changeset ID to its ChangeSet,
+        or to None if it couldn't be fetched.
+
+        By default, this calls get_changeset() for each ID. Subclasses can
+        override this to fetch them in fewer round trips to the repository.
+        """
+        changesets = {}
+
+        for changesetid in changesetids:
+            try:
+                changesets[changesetid] = self.get_changeset(changesetid,
+                                                             allow_empty)
+            except SCMError as e:
+                logging.warning('Failed to fetch changeset %s: %s',
+                                changesetid, e)
+                changesets[changesetid] = None
+
+        return changesets
+
     def get_repository_info(self):
         raise NotImplementedError
 
@@ -208,6 +254,41 @@ class SCMTool(object):
     def get_parser(self, data):
         return diffparser.DiffParser(data)
 
+    def update_local_mirror(self, mirror_path):
+        """Creates or updates a local mirror of the repository.
+
+        If there's nothing at ``mirror_path``, a new mirror is created
+        there. Otherwise, the existing mirror is brought up to date with the
+        repository.
+
+        This must be implemented by subclasses that set
+        ``supports_local_mirrors``.
+        """
+        raise NotImplementedError
+
+    def get_local_mirror_file(self, mirror_path, path, revision=HEAD):
+        """Returns a file from a local mirror of the repository.
+
+        This raises FileNotFoundError if the file isn't in the mirror,
+        which may just mean that the mirror hasn't been updated since the
+        file was added.
+
+        This must be implemented by subclasses that set
+        ``supports_local_mirrors``.
+        """
+        raise NotImplementedError
+
+    def local_mirror_file_exists(self, mirror_path, path, revision=HEAD):
+        """Returns whether a file exists in a local mirror of the repository.
+
+        By default, this fetches the file using get_local_mirror_file().
+        """
+        try:
+            self.get_local_mirror_file(mirror_path, path, revision)
+            return True
+        except FileNotFoundError:
+            return False
+
     def normalize_path_for_display(self, filename):
         return filename
 
@@ -219,15 +300,27 @@ class SCMTool(object):
         return patch
 
     @classmethod
-    def popen(cls, command, local_site_name=None):
+    def popen(cls, command, local_site_name=None, cwd=None, stdin=None,
+              env=None, stderr=subprocess.PIPE):
         """Launches an application, capturing output.
 
         This wraps subprocess.Popen to provide some common parameters and
         to pass environment variables that may be needed by rbssh, if
         indirectly invoked.
+
+        If ``cwd`` is provided, the application is run in that directory.
+        ``stdin`` is passed along to subprocess.Popen, and can be set to
+        ``subprocess.PIPE`` to write to the application. ``env`` is a
+        dictionary of additional environment variables to set. ``stderr``
+        is passed along to subprocess.Popen, and defaults to capturing
+        errors through ``subprocess.PIPE``.
         """
+        extra_env = env
         env = os.environ.copy()
 
+        if extra_env:
+            env.update(extra_env)
+
         if local_site_name:
             env['RB_LOCAL_SITE'] = local_site_name
 
@@ -235,7 +328,9 @@ class SCMTool(object):
 
         return subprocess.Popen(command,
                                 env=env,
-                                stderr=subprocess.PIPE,
+                                cwd=cwd,
+                                stdin=stdin,
+                                stderr=stderr,
                                 stdout=subprocess.PIPE,
                                 close_fds=(os.name != 'nt'))
 
@@ -1,12 +1,17 @@
 from __future__ import unicode_literals
 
+import hashlib
 import logging
 import os
 import re
+import shutil
 import tempfile
+from collections import defaultdict
 
+from django.core.cache import cache
 from django.utils import six
 from django.utils.six.moves.urllib.parse import urlparse
+from djblets.cache.backend import make_cache_key
 from djblets.util.filesystem import is_exe_in_path
 
 from reviewboard.scmtools.core import SCMTool, HEAD, PRE_CREATION
@@ -24,6 +29,7 @@ sshutils.register_rbssh('CVS_RSH')
 
 class CVSTool(SCMTool):
     name = "CVS"
+    supports_batch_file_fetches = True
     field_help_text = {
         'path': 'The CVSROOT used to access the repository.',
     }
@@ -61,6 +67,15 @@ class CVSTool(SCMTool):
 
         return self.client.cat_file(path, revision)
 
+    def get_files(self, files):
+        """Returns the contents of several files at once.
+
+        This takes a list of (path, revision) tuples, and returns a list of
+        the contents of each file, in the same order. Files that don't exist
+        have contents of None.
+        """
+        return self.client.cat_files(files)
+
     def parse_diff_revision(self, file_str, revision_str, *args, **kwargs):
         if revision_str == "PRE-CREATION":
             return file_str, PRE_CREATION
@@ -255,9 +270,10 @@ class CVSClient(object):
         'State',
     ]
 
+    keywords_re = re.compile(r'\$(%s):([^\$\n\r]*)\$' % '|'.join(keywords),
+                             re.IGNORECASE)
+
     def __init__(self, cvsroot, path, local_site_name):
-        self.tempdir = ""
-        self.currentdir = os.getcwd()
         self.cvsroot = cvsroot
         self.path = path
         self.local_site_name = local_site_name
@@ -267,15 +283,77 @@ class CVSClient(object):
             # pattern we use with all the other tools.
             raise ImportError
 
-    def cleanup(self):
-        if self.currentdir != os.getcwd():
-            # Restore current working directory
-            os.chdir(self.currentdir)
-            # Remove temporary directory
-            if self.tempdir != "":
-                os.rmdir(self.tempdir)
-
     def cat_file(self, filename, revision):
+        filename, filenameAttic = self._get_file_paths(filename)
+
+        if not filenameAttic:
+            return self._cat_specific_file(filename, revision)
+
+        # Files removed from the tip of a branch are moved into the Attic,
+        # so we may have to try both paths. Remember which one worked, so
+        # that we can try it first next time.
+        cache_key = self._make_attic_cache_key(filename)
+        in_attic = cache.get(cache_key, False)
+
+        if in_attic:
+            paths = [filenameAttic, filename]
+        else:
+            paths = [filename, filenameAttic]
+
+        try:
+            contents = self._cat_specific_file(paths[0], revision)
+        except FileNotFoundError:
+            contents = self._cat_specific_file(paths[1], revision)
+            cache.set(cache_key, not in_attic)
+
+        return contents
+
+    def cat_files(self, files):
+        """Returns the contents of several files.
+
+        This takes a list of (filename, revision) tuples, and returns a list
+        of the contents of each file, in the same order. Files that don't
+        exist have contents of None.
+
+        Files at the same revision are exported together with a single
+        'cvs export'. Any not found that way (such as files in the Attic)
+        are fetched individually.
+        """
+        results = [None] * len(files)
+        indexes_by_revision = defaultdict(list)
+
+        for i, (filename, revision) in enumerate(files):
+            indexes_by_revision[six.text_type(revision)].append(i)
+
+        for revision, indexes in six.iteritems(indexes_by_revision):
+            paths = [
+                self._get_file_paths(files[i][0])[0]
+                for i in indexes
+            ]
+
+            if len(indexes) > 1:
+                exported = self._export_files(paths, revision)
+            else:
+                exported = {}
+
+            for i, path in zip(indexes, paths):
+                if path in exported:
+                    results[i] = exported[path]
+                else:
+                    try:
+                        results[i] = self.cat_file(files[i][0], revision)
+                    except FileNotFoundError:
+                        pass
+
+        return results
+
+    def _get_file_paths(self, filename):
+        """Returns the paths to try when fetching a file.
+
+        This returns a tuple of the path relative to the repository, and the
+        same path in the Attic (or None, if there isn't enough path
+        information to construct one).
+        """
         # We strip the repo off of the fully qualified path as CVS does
         # not like to be given absolute paths.
         repos_path = self.path.split(":")[-1]
@@ -312,26 +390,34 @@ class CVSClient(object):
             # Attic path that makes any kind of sense.
             filenameAttic = None
 
-        try:
-            return self._cat_specific_file(filename, revision)
-        except FileNotFoundError:
-            if filenameAttic:
-                return self._cat_specific_file(filenameAttic, revision)
-            else:
-                raise
+        return filename, filenameAttic
+
+    def _make_attic_cache_key(self, filename):
+        """Returns the cache key noting whether a file is in the Attic.
+
+        The CVSROOT may contain a password, so it's hashed.
+        """
+        return make_cache_key('cvs-attic-%s-%s' % (
+            hashlib.sha1(self.cvsroot.encode('utf-8')).hexdigest(),
+            filename))
 
     def _cat_specific_file(self, filename, revision):
         # Somehow CVS sometimes seems to write .cvsignore files to current
-        # working directory even though we force stdout with -p.
-        self.tempdir = tempfile.mkdtemp()
-        os.chdir(self.tempdir)
+        # working directory even though we force stdout with -p, so run it
+        # in a temporary directory.
+        tempdir = tempfile.mkdtemp()
 
-        p = SCMTool.popen(['cvs', '-f', '-d', self.cvsroot, 'checkout', '-kk',
-                           '-r', six.text_type(revision), '-p', filename],
-                          self.local_site_name)
-        contents = p.stdout.read()
-        errmsg = six.text_type(p.stderr.read())
-        failure = p.wait()
+        try:
+            p = SCMTool.popen(['cvs', '-f', '-d', self.cvsroot, 'checkout',
+                               '-kk', '-r', six.text_type(revision), '-p',
+                               filename],
+                              self.local_site_name,
+                              cwd=tempdir)
+            contents, errmsg = p.communicate()
+            errmsg = six.text_type(errmsg)
+            failure = p.returncode
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
 
         # Unfortunately, CVS is not consistent about exiting non-zero on
         # errors.  If the file is not found at all, then CVS will print an
@@ -353,7 +439,6 @@ class CVSClient(object):
         if (not errmsg or
                 errmsg.startswith('cvs checkout: cannot find module') or
                 errmsg.startswith('cvs checkout: could not read RCS file')):
-            self.cleanup()
             raise FileNotFoundError(filename, revision)
 
         # Otherwise, if there's an exit code, or errmsg doesn't look like
@@ -363,12 +448,41 @@ class CVSClient(object):
         # stating this. This is safe to ignore.
         if ((failure and not errmsg.startswith('==========')) and
             '.cvspass does not exist - creating new file' not in errmsg):
-            self.cleanup()
             raise SCMError(errmsg)
 
-        self.cleanup()
         return contents
 
+    def _export_files(self, paths, revision):
+        """Exports several files at a revision with a single command.
+
+        The files are exported into a temporary directory and read back.
+        This returns a dictionary mapping each path that was exported to
+        its contents. Errors are ignored, leaving it up to the caller to
+        fetch the missing files individually.
+        """
+        tempdir = tempfile.mkdtemp()
+
+        try:
+            p = SCMTool.popen(['cvs', '-f', '-d', self.cvsroot, 'export',
+                               '-kk', '-r', revision] + paths,
+                              self.local_site_name,
+                              cwd=tempdir)
+            p.communicate()
+
+            results = {}
+
+            for path in paths:
+                full_path = os.path.normpath(os.path.join(tempdir, path))
+
+                if (full_path.startswith(tempdir + os.sep) and
+                    os.path.isfile(full_path)):
+                    with open(full_path, 'rb') as f:
+                        results[path] = f.read()
+
+            return results
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
     def check_repository(self):
         # Running 'cvs version' and specifying a CVSROOT will bail out if said
         # CVSROOT is invalid, which is perfect for us. This used to use
@@ -405,6 +519,4 @@ class CVSClient(object):
         the diffs uploaded may have expanded keywords. We use this function
         to collapse them back down in order to be able to apply the patch.
         """
-        regex = re.compile(r'\$(%s):([^\$\n\r]*)\$' % '|'.join(self.keywords),
-                           re.IGNORECASE)
-        return regex.sub(r'$\1$', data)
+        return self.keywords_re.sub(r'$\1$', data)
@@ -180,6 +180,17 @@ class RepositoryForm(forms.ModelForm):
         initial=False,
         required=False)
 
+    use_local_mirror = forms.BooleanField(
+        label=_("Keep a local mirror"),
+        help_text=_("Keeps a copy of the repository on this server, which "
+                    "is used for fetching files instead of going to the "
+                    "repository each time. The mirror is updated by the "
+                    "<tt>update-repository-mirrors</tt> management command, "
+                    "and is only used if a mirrors directory is set in the "
+                    "Diff Viewer settings."),
+        initial=False,
+        required=False)
+
     def __init__(self, *args, **kwargs):
         self.local_site_name = kwargs.pop('local_site_name', None)
 
@@ -375,6 +386,8 @@ class RepositoryForm(forms.ModelForm):
         """
         self.fields['use_ticket_auth'].initial = \
             self.instance.extra_data.get('use_ticket_auth', False)
+        self.fields['use_local_mirror'].initial = \
+            self.instance.extra_data.get('use_local_mirror', False)
         self.fields['password'].initial = self.instance.password
 
     def _populate_hosting_service_fields(self):
@@ -1085,6 +1098,12 @@ class RepositoryForm(forms.ModelForm):
         except KeyError:
             pass
 
+        try:
+            repository.extra_data['use_local_mirror'] = \
+                self.cleaned_data['use_local_mirror']
+        except KeyError:
+            pass
+
         if hosting_type in self.repository_forms:
             plan = (self.cleaned_data['repository_plan'] or
                     self.DEFAULT_PLAN_ID)
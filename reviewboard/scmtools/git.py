@@ -1,8 +1,13 @@
 from __future__ import unicode_literals
 
+import atexit
 import logging
 import os
 import re
+import select
+import subprocess
+import threading
+from collections import OrderedDict
 
 from django.utils import six
 from django.utils.six.moves.urllib.parse import quote as urlquote
@@ -50,6 +55,275 @@ class ShortSHA1Error(InvalidRevisionFormatError):
             *args, **kwargs)
 
 
+class GitCatFileProcess(object):
+    """A long-running git cat-file process for a local repository.
+
+    Rather than starting a new git process for every object that's looked
+    up, objects are requested one at a time from a single
+    ``git cat-file --batch`` (or ``--batch-check``, which returns only the
+    type and size of objects) process. Requests are serialized through a
+    lock, so the process can be shared between threads. If the process
+    dies, or its output can't be read within ``read_timeout`` seconds, it's
+    stopped and started again on the next request.
+
+    Errors from the process are discarded, rather than piped back and left
+    unread, so that they can't fill up the pipe and stall the process.
+    """
+    READ_TIMEOUT = 30
+    READ_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, git_dir, batch_option='--batch', local_site_name=None,
+                 read_timeout=READ_TIMEOUT):
+        self.git_dir = git_dir
+        self.batch_option = batch_option
+        self.local_site_name = local_site_name
+        self.read_timeout = read_timeout
+        self._process = None
+        self._devnull = None
+        self._buffer = b''
+        self._lock = threading.Lock()
+
+    def query(self, object_name):
+        """Looks up an object in the repository.
+
+        The object can be anything understood by git rev-parse, such as a
+        SHA1 or ``revision:path``. This returns a tuple of the object's
+        SHA1, type, size and contents (which is None for ``--batch-check``),
+        or None if the object doesn't exist.
+        """
+        if isinstance(object_name, six.text_type):
+            object_name = object_name.encode('utf-8')
+
+        if b'\n' in object_name:
+            # This can't be sent to git, and can't be a valid object.
+            return None
+
+        with self._lock:
+            try:
+                return self._query(object_name)
+            except (IOError, OSError, ValueError) as e:
+                self._stop()
+
+                raise SCMError('Unable to read from git cat-file: %s' % e)
+
+    def close(self):
+        """Stops the process, if it's running."""
+        with self._lock:
+            self._stop()
+
+    def _query(self, object_name):
+        """Sends a request to the process and reads the result."""
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+
+        stdin = self._process.stdin
+
+        stdin.write(object_name + b'\n')
+        stdin.flush()
+
+        header = self._read_line()
+
+        if header.endswith(b' missing\n'):
+            return None
+        elif header.endswith(b' ambiguous\n'):
+            raise InvalidRevisionFormatError(
+                path='', revision=object_name.decode('utf-8'),
+                detail='The object name is ambiguous.')
+
+        sha1, object_type, size = header.split()
+        size = int(size)
+
+        if self.batch_option == '--batch':
+            contents = self._read_bytes(size + 1)
+
+            if not contents.endswith(b'\n'):
+                raise IOError('git cat-file returned a truncated object')
+
+            contents = contents[:-1]
+        else:
+            contents = None
+
+        return (sha1.decode('ascii'), object_type.decode('ascii'), size,
+                contents)
+
+    def _start(self):
+        """Starts the process, without acquiring the lock."""
+        self._stop()
+
+        self._devnull = open(os.devnull, 'wb')
+        self._process = SCMTool.popen(
+            ['git', '--git-dir=%s' % self.git_dir, 'cat-file',
+             self.batch_option],
+            local_site_name=self.local_site_name,
+            stdin=subprocess.PIPE,
+            stderr=self._devnull)
+        self._buffer = b''
+
+    def _read_line(self):
+        """Reads a line of output, including the trailing newline."""
+        while b'\n' not in self._buffer:
+            self._buffer += self._read_chunk(self.READ_CHUNK_SIZE)
+
+        line, self._buffer = self._buffer.split(b'\n', 1)
+
+        return line + b'\n'
+
+    def _read_bytes(self, size):
+        """Reads exactly ``size`` bytes of output.
+
+        Anything already buffered is used first, and only the remaining
+        bytes are read from the process. The chunks are joined once at the
+        end, so that large objects aren't copied on every read.
+        """
+        chunks = [self._buffer[:size]]
+        remaining = size - len(chunks[0])
+        self._buffer = self._buffer[size:]
+
+        while remaining > 0:
+            chunk = self._read_chunk(min(remaining, self.READ_CHUNK_SIZE))
+            chunks.append(chunk)
+            remaining -= len(chunk)
+
+        return b''.join(chunks)
+
+    def _read_chunk(self, max_size):
+        """Reads up to ``max_size`` bytes of the next available output.
+
+        If no output arrives within the read timeout, the process is killed
+        and IOError is raised.
+        """
+        fd = self._process.stdout.fileno()
+        readable = select.select([fd], [], [], self.read_timeout)[0]
+
+        if not readable:
+            try:
+                self._process.kill()
+            except OSError:
+                pass
+
+            raise IOError('Timed out waiting for git cat-file after %s '
+                          'seconds' % self.read_timeout)
+
+        data = os.read(fd, max_size)
+
+        if not data:
+            raise IOError('git cat-file exited unexpectedly')
+
+        return data
+
+    def _stop(self):
+        """Stops the process, without acquiring the lock."""
+        if self._process is not None:
+            process = self._process
+            self._process = None
+            self._buffer = b''
+
+            try:
+                process.stdin.close()
+                process.stdout.close()
+                process.wait()
+            except (IOError, OSError):
+                pass
+
+        if self._devnull is not None:
+            self._devnull.close()
+            self._devnull = None
+
+
+class GitBlobCache(object):
+    """An in-memory cache of the contents of small blobs.
+
+    Blobs are looked up by SHA1, so their contents never change, and the
+    same file is often fetched many times in a row when diffs are
+    uploaded and rendered. Blobs up to ``max_blob_size`` bytes are kept,
+    with the least recently used blobs evicted once the cache holds more
+    than ``max_size`` bytes.
+    """
+    MAX_SIZE = 32 * 1024 * 1024
+    MAX_BLOB_SIZE = 256 * 1024
+
+    def __init__(self, max_size=MAX_SIZE, max_blob_size=MAX_BLOB_SIZE):
+        self.max_size = max_size
+        self.max_blob_size = max_blob_size
+        self.size = 0
+        self._blobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, git_dir, sha1):
+        """Returns the contents of a cached blob, or None."""
+        key = (git_dir, sha1)
+
+        with self._lock:
+            contents = self._blobs.pop(key, None)
+
+            if contents is not None:
+                # Move it to the end, as the most recently used blob.
+                self._blobs[key] = contents
+
+            return contents
+
+    def add(self, git_dir, sha1, contents):
+        """Adds a blob to the cache, if it's small enough."""
+        if len(contents) > self.max_blob_size:
+            return
+
+        key = (git_dir, sha1)
+
+        with self._lock:
+            old_contents = self._blobs.pop(key, None)
+
+            if old_contents is not None:
+                self.size -= len(old_contents)
+
+            self._blobs[key] = contents
+            self.size += len(contents)
+
+            while self.size > self.max_size:
+                self.size -= len(self._blobs.popitem(last=False)[1])
+
+    def clear(self):
+        """Removes all blobs from the cache."""
+        with self._lock:
+            self._blobs.clear()
+            self.size = 0
+
+
+git_blob_cache = GitBlobCache()
+
+_cat_file_processes = {}
+_cat_file_processes_lock = threading.Lock()
+
+
+def get_cat_file_process(git_dir, batch_option='--batch',
+                         local_site_name=None):
+    """Returns the shared git cat-file process for a repository.
+
+    There's one process for each repository, batch option and Local Site,
+    shared by all GitClients.
+    """
+    key = (git_dir, batch_option, local_site_name)
+
+    with _cat_file_processes_lock:
+        try:
+            return _cat_file_processes[key]
+        except KeyError:
+            process = GitCatFileProcess(git_dir, batch_option,
+                                        local_site_name)
+            _cat_file_processes[key] = process
+
+            return process
+
+
+@atexit.register
+def close_cat_file_processes():
+    """Stops all shared git cat-file processes."""
+    with _cat_file_processes_lock:
+        for process in six.itervalues(_cat_file_processes):
+            process.close()
+
+        _cat_file_processes.clear()
+
+
 class GitTool(SCMTool):
     """
     You can only use this tool with a locally available git repository.
@@ -57,6 +331,7 @@ class GitTool(SCMTool):
     you do not have a bare repositry).
     """
     name = "Git"
+    supports_local_mirrors = True
     supports_raw_file_urls = True
     field_help_text = {
         'path': _('For local Git repositories, this should be the path to a '
@@ -97,6 +372,36 @@ class GitTool(SCMTool):
         except (FileNotFoundError, InvalidRevisionFormatError):
             return False
 
+    def update_local_mirror(self, mirror_path):
+        if os.path.exists(mirror_path):
+            args = ['--git-dir=%s' % mirror_path, 'remote', 'update',
+                    '--prune']
+        else:
+            args = ['clone', '--mirror', self.client.path, mirror_path]
+
+        p = self.client._run_git(args)
+        errmsg = p.communicate()[1]
+
+        if p.returncode:
+            raise SCMError('Unable to update the local mirror: %s'
+                           % errmsg.decode('utf-8', 'replace'))
+
+    def get_local_mirror_file(self, mirror_path, path, revision=HEAD):
+        if revision == PRE_CREATION:
+            return ""
+
+        return self.client.get_local_file(path, revision, git_dir=mirror_path)
+
+    def local_mirror_file_exists(self, mirror_path, path, revision=HEAD):
+        if revision == PRE_CREATION:
+            return False
+
+        try:
+            return self.client.get_local_file_exists(path, revision,
+                                                     git_dir=mirror_path)
+        except (FileNotFoundError, InvalidRevisionFormatError):
+            return False
+
     def parse_diff_revision(self, file_str, revision_str, moved=False,
                             copied=False, *args, **kwargs):
         revision = revision_str
@@ -427,7 +732,7 @@ class GitClient(SCMClient):
             return self.get_file_http(self._build_raw_url(path, revision),
                                       path, revision)
         else:
-            return self._cat_file(path, revision, "blob")
+            return self.get_local_file(path, revision)
 
     def get_file_exists(self, path, revision):
         if self.raw_file_url:
@@ -442,8 +747,7 @@ class GitClient(SCMClient):
             except Exception:
                 return False
         else:
-            contents = self._cat_file(path, revision, "-t")
-            return contents and contents.strip() == "blob"
+            return self.get_local_file_exists(path, revision)
 
     def validate_sha1_format(self, path, sha1):
         """Validates that a SHA1 is of the right length for this repository."""
@@ -461,33 +765,61 @@ class GitClient(SCMClient):
         url = url.replace("<filename>", urlquote(path))
         return url
 
-    def _cat_file(self, path, revision, option):
-        """
-        Call git-cat-file(1) to get content or type information for a
-        repository object.
+    def get_local_file(self, path, revision, git_dir=None):
+        """Returns the contents of a file in a local repository.
 
-        If called with just "commit", gets the content of a blob (or
-        raises an exception if the commit is not a blob).
+        The file is read through the repository's shared git cat-file
+        process. Blobs requested by SHA1 are cached in memory.
 
-        Otherwise, "option" can be used to pass a switch to git-cat-file,
-        e.g. to test or existence or get the type of "commit".
+        By default, this reads from the client's repository, but
+        ``git_dir`` can point to another copy of it, such as a local mirror.
         """
-        commit = self._resolve_head(revision, path)
+        git_dir = git_dir or self.git_dir
+        object_name = self._resolve_head(revision, path)
+        cacheable = (revision != HEAD)
 
-        p = self._run_git(['--git-dir=%s' % self.git_dir, 'cat-file',
-                           option, commit])
-        contents = p.stdout.read()
-        errmsg = six.text_type(p.stderr.read())
-        failure = p.wait()
+        if cacheable:
+            contents = git_blob_cache.get(git_dir, object_name)
 
-        if failure:
-            if errmsg.startswith("fatal: Not a valid object name"):
-                raise FileNotFoundError(commit)
-            else:
-                raise SCMError(errmsg)
+            if contents is not None:
+                return contents
+
+        result = get_cat_file_process(
+            git_dir, '--batch', self.local_site_name).query(object_name)
+
+        if result is None:
+            raise FileNotFoundError(object_name)
+
+        object_type, contents = result[1], result[3]
+
+        if object_type != 'blob':
+            raise SCMError('%s is a %s, not a blob' % (object_name,
+                                                       object_type))
+
+        if cacheable:
+            git_blob_cache.add(git_dir, object_name, contents)
 
         return contents
 
+    def get_local_file_exists(self, path, revision, git_dir=None):
+        """Returns whether a file exists in a local repository.
+
+        As with :py:meth:`get_local_file`, ``git_dir`` can point to another
+        copy of the repository.
+        """
+        git_dir = git_dir or self.git_dir
+        object_name = self._resolve_head(revision, path)
+
+        if (revision != HEAD and
+            git_blob_cache.get(git_dir, object_name) is not None):
+            return True
+
+        result = get_cat_file_process(
+            git_dir, '--batch-check',
+            self.local_site_name).query(object_name)
+
+        return result is not None and result[1] == 'blob'
+
     def _resolve_head(self, revision, path):
         if revision == HEAD:
             if path == "":
@@ -1,20 +1,44 @@
 from __future__ import unicode_literals
 
+import atexit
+import hashlib
 import logging
+import os
 import re
-
+import select
+import struct
+import subprocess
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import cache
 from django.utils import six
 from django.utils.six.moves.urllib.parse import quote as urllib_quote
+from djblets.cache.backend import make_cache_key
 from djblets.util.filesystem import is_exe_in_path
 
 from reviewboard.diffviewer.parser import DiffParser, DiffParserError
 from reviewboard.scmtools.git import GitDiffParser
 from reviewboard.scmtools.core import \
     FileNotFoundError, SCMClient, SCMTool, HEAD, PRE_CREATION, UNKNOWN
+from reviewboard.scmtools.errors import SCMError
+
+
+# The configuration files hg reads when HGRCPATH isn't set. Setting it
+# replaces these, so they're added back when passing along credentials.
+DEFAULT_HGRC_PATHS = [
+    '/etc/mercurial/hgrc',
+    '/etc/mercurial/hgrc.d',
+    '~/.hgrc',
+    '~/.config/hg/hgrc',
+]
 
 
 class HgTool(SCMTool):
     name = "Mercurial"
+    supports_local_mirrors = True
     dependencies = {
         'modules': ['mercurial'],
     }
@@ -39,6 +63,80 @@ class HgTool(SCMTool):
     def get_file(self, path, revision=HEAD):
         return self.client.cat_file(path, six.text_type(revision))
 
+    def update_local_mirror(self, mirror_path):
+        args = ['hg', '--noninteractive']
+
+        if os.path.exists(mirror_path):
+            args += ['--repository', mirror_path, 'pull', self.client.path]
+        else:
+            args += ['clone', '--noupdate', self.client.path, mirror_path]
+
+        if self.repository.local_site:
+            local_site_name = self.repository.local_site.name
+        else:
+            local_site_name = None
+
+        with self._make_auth_env() as env:
+            p = SCMTool.popen(args, local_site_name=local_site_name, env=env)
+            errmsg = p.communicate()[1]
+
+        if p.returncode:
+            raise SCMError('Unable to update the local mirror: %s'
+                           % errmsg.decode('utf-8', 'replace'))
+
+    @contextmanager
+    def _make_auth_env(self):
+        """Provides environment variables passing credentials to hg.
+
+        The credentials for hgweb repositories are written to a temporary
+        configuration file, readable only by the current user, which is
+        added to hg's configuration search path through ``HGRCPATH``. This
+        keeps the password out of the command line, where any user could
+        see it. The file is removed once the command has finished.
+
+        This yields a dictionary of the environment variables to set, which
+        is empty if there are no credentials.
+        """
+        if not (isinstance(self.client, HgWebClient) and
+                self.client.username):
+            yield {}
+            return
+
+        # mkstemp creates the file readable and writable only by us.
+        fd, hgrc_path = tempfile.mkstemp(prefix='rb-hgrc-')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(('[auth]\n'
+                         'reviewboard.prefix = %s\n'
+                         'reviewboard.username = %s\n'
+                         'reviewboard.password = %s\n'
+                         % tuple(
+                             re.sub(r'[\r\n]', '', value or '')
+                             for value in (self.client.path,
+                                           self.client.username,
+                                           self.client.password)
+                         )).encode('utf-8'))
+
+            if 'HGRCPATH' in os.environ:
+                hgrc_paths = os.environ['HGRCPATH'].split(os.pathsep)
+            else:
+                hgrc_paths = [
+                    os.path.expanduser(path)
+                    for path in DEFAULT_HGRC_PATHS
+                ]
+
+            yield {
+                'HGRCPATH': os.pathsep.join(hgrc_paths + [hgrc_path]),
+            }
+        finally:
+            os.unlink(hgrc_path)
+
+    def get_local_mirror_file(self, mirror_path, path, revision=HEAD):
+        client = HgClient(mirror_path, self.repository.local_site)
+
+        return client.cat_file(path, six.text_type(revision))
+
     def parse_diff_revision(self, file_str, revision_str, *args, **kwargs):
         revision = revision_str
         if file_str == "/dev/null":
@@ -204,6 +302,9 @@ class HgDiffParser(DiffParser):
 class HgWebClient(SCMClient):
     FULL_FILE_URL = '%(url)s/%(rawpath)s/%(revision)s/%(quoted_path)s'
 
+    #: The URL styles that hgweb servers may use for raw files.
+    RAW_PATHS = ['raw-file', 'raw', 'hg-history']
+
     def __init__(self, path, username, password):
         super(HgWebClient, self).__init__(path, username=username,
                                           password=password)
@@ -217,22 +318,293 @@ class HgWebClient(SCMClient):
         elif rev == PRE_CREATION:
             rev = ""
 
-        for rawpath in ["raw-file", "raw", "hg-history"]:
+        # Servers only support one of the URL styles, so once a style has
+        # worked, it's tried first. A file that can't be found using that
+        # style doesn't exist, so the others are only tried on other errors.
+        cache_key = self._make_raw_path_cache_key()
+        known_rawpath = cache.get(cache_key)
+
+        if known_rawpath in self.RAW_PATHS:
             try:
-                url = self.FULL_FILE_URL % {
-                    'url': self.path.rstrip('/'),
-                    'rawpath': rawpath,
-                    'revision': rev,
-                    'quoted_path': urllib_quote(path.lstrip('/')),
-                }
-
-                return self.get_file_http(url, path, rev)
+                return self._get_raw_file(known_rawpath, path, rev)
+            except FileNotFoundError:
+                raise
             except Exception:
                 # It failed. Error was logged and we may try again.
-                pass
+                cache.delete(cache_key)
+
+        for rawpath in self.RAW_PATHS:
+            if rawpath == known_rawpath:
+                continue
+
+            try:
+                contents = self._get_raw_file(rawpath, path, rev)
+            except Exception:
+                # It failed. Error was logged and we may try again.
+                continue
+
+            cache.set(cache_key, rawpath)
+
+            return contents
 
         raise FileNotFoundError(path, rev)
 
+    def _get_raw_file(self, rawpath, path, rev):
+        """Fetches a file using one of the URL styles."""
+        url = self.FULL_FILE_URL % {
+            'url': self.path.rstrip('/'),
+            'rawpath': rawpath,
+            'revision': rev,
+            'quoted_path': urllib_quote(path.lstrip('/')),
+        }
+
+        return self.get_file_http(url, path, rev)
+
+    def _make_raw_path_cache_key(self):
+        """Returns the cache key for the server's URL style."""
+        return make_cache_key('hgweb-raw-path-%s' % hashlib.sha1(
+            self.path.rstrip('/').encode('utf-8')).hexdigest())
+
+
+class HgCommandServer(object):
+    """A persistent Mercurial command server for a local repository.
+
+    Starting Mercurial takes far longer than most commands, so rather than
+    starting a new hg process for each command, commands are sent to a
+    long-running ``hg serve --cmdserver pipe`` process, using Mercurial's
+    command server protocol.
+
+    A command server can only run one command at a time. Servers are shared
+    through :py:class:`HgCommandServerPool`.
+
+    Anything the server writes directly to stderr (such as warnings from
+    extensions) is discarded, so that it can't fill up an unread pipe. If
+    the server doesn't respond within ``read_timeout`` seconds, it's killed
+    and can no longer be used.
+    """
+    READ_TIMEOUT = 60
+    READ_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path, local_site_name=None, read_timeout=READ_TIMEOUT):
+        self.path = path
+        self.local_site_name = local_site_name
+        self.read_timeout = read_timeout
+        self.encoding = None
+
+        self._devnull = open(os.devnull, 'wb')
+        self._process = SCMTool.popen(
+            ['hg', '--noninteractive', '--repository', path,
+             'serve', '--cmdserver', 'pipe'],
+            local_site_name=local_site_name,
+            cwd=path,
+            stdin=subprocess.PIPE,
+            stderr=self._devnull)
+
+        try:
+            channel, data = self._read_channel()
+
+            if channel != b'o':
+                raise ValueError('Unexpected hello message')
+
+            capabilities = []
+
+            for line in data.splitlines():
+                key, value = line.split(b': ', 1)
+
+                if key == b'capabilities':
+                    capabilities = value.split()
+                elif key == b'encoding':
+                    self.encoding = value.decode('ascii')
+
+            if b'runcommand' not in capabilities:
+                raise ValueError('The runcommand capability is missing')
+        except (IOError, OSError, ValueError) as e:
+            self.close()
+
+            raise SCMError('Unable to start the Mercurial command server: %s'
+                           % e)
+
+    @property
+    def alive(self):
+        """Whether the command server is still running."""
+        return self._process is not None and self._process.poll() is None
+
+    def run_command(self, args):
+        """Runs a Mercurial command.
+
+        This returns a tuple of the command's exit code, output and error
+        output. An SCMError is raised if the command server fails, in
+        which case it can no longer be used.
+        """
+        args = b'\0'.join(
+            arg.encode(self.encoding or 'utf-8')
+            if isinstance(arg, six.text_type) else arg
+            for arg in args
+        )
+
+        output = []
+        errors = []
+
+        try:
+            self._process.stdin.write(b'runcommand\n' +
+                                      struct.pack(b'>I', len(args)) + args)
+            self._process.stdin.flush()
+
+            while True:
+                channel, data = self._read_channel()
+
+                if channel == b'o':
+                    output.append(data)
+                elif channel == b'e':
+                    errors.append(data)
+                elif channel == b'r':
+                    return (struct.unpack(b'>i', data)[0], b''.join(output),
+                            b''.join(errors))
+                elif channel.isupper():
+                    # Required channels that we don't support, such as
+                    # requests for input.
+                    raise ValueError('Unsupported channel %r' % channel)
+        except (IOError, OSError, ValueError, struct.error) as e:
+            self.close()
+
+            raise SCMError('Lost the Mercurial command server: %s' % e)
+
+    def close(self):
+        """Stops the command server."""
+        if self._process is not None:
+            process = self._process
+            self._process = None
+
+            try:
+                process.stdin.close()
+                process.stdout.close()
+                process.wait()
+            except (IOError, OSError):
+                pass
+
+        if self._devnull is not None:
+            self._devnull.close()
+            self._devnull = None
+
+    def _read_channel(self):
+        """Reads a message from the command server.
+
+        This returns a tuple of the channel and the message's data. For
+        input channels, the data is the requested length.
+        """
+        channel, length = struct.unpack(b'>cI', self._read_bytes(5))
+
+        if channel in (b'I', b'L'):
+            return channel, length
+
+        return channel, self._read_bytes(length)
+
+    def _read_bytes(self, size):
+        """Reads exactly ``size`` bytes from the command server.
+
+        If no output arrives within the read timeout, the server is killed
+        and IOError is raised.
+        """
+        fd = self._process.stdout.fileno()
+        chunks = []
+        remaining = size
+
+        while remaining > 0:
+            readable = select.select([fd], [], [], self.read_timeout)[0]
+
+            if not readable:
+                try:
+                    self._process.kill()
+                except OSError:
+                    pass
+
+                raise IOError('Timed out waiting for the command server '
+                              'after %s seconds' % self.read_timeout)
+
+            chunk = os.read(fd, min(remaining, self.READ_CHUNK_SIZE))
+
+            if not chunk:
+                raise IOError('The command server exited unexpectedly')
+
+            chunks.append(chunk)
+            remaining -= len(chunk)
+
+        return b''.join(chunks)
+
+
+class HgCommandServerPool(object):
+    """A pool of Mercurial command servers.
+
+    Each command server runs one command at a time, so a server is taken
+    out of the pool while in use, and a new one is started if there are no
+    idle servers for the repository. Up to ``max_idle_servers`` idle
+    servers are kept for each repository. Servers that fail are closed
+    rather than returned to the pool, and replaced the next time one is
+    needed.
+    """
+    MAX_IDLE_SERVERS = 4
+
+    def __init__(self, max_idle_servers=MAX_IDLE_SERVERS):
+        self.max_idle_servers = max_idle_servers
+        self._idle_servers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self, path, local_site_name=None):
+        """Provides a command server for a repository.
+
+        This yields an :py:class:`HgCommandServer`, reusing an idle server
+        if one is available.
+        """
+        key = (path, local_site_name)
+        server = None
+
+        with self._lock:
+            servers = self._idle_servers[key]
+
+            while servers and server is None:
+                server = servers.pop()
+
+                if not server.alive:
+                    server = None
+
+        if server is None:
+            server = HgCommandServer(path, local_site_name)
+
+        try:
+            yield server
+        except Exception:
+            server.close()
+            raise
+
+        if server.alive:
+            with self._lock:
+                servers = self._idle_servers[key]
+
+                if len(servers) < self.max_idle_servers:
+                    servers.append(server)
+                    server = None
+
+        if server is not None:
+            server.close()
+
+    def clear(self):
+        """Stops all idle command servers."""
+        with self._lock:
+            servers = [
+                server
+                for servers in six.itervalues(self._idle_servers)
+                for server in servers
+            ]
+            self._idle_servers.clear()
+
+        for server in servers:
+            server.close()
+
+
+hg_command_server_pool = HgCommandServerPool()
+atexit.register(hg_command_server_pool.clear)
+
 
 class HgClient(SCMClient):
     def __init__(self, path, local_site):
@@ -244,6 +616,15 @@ class HgClient(SCMClient):
         else:
             self.local_site_name = None
 
+    @property
+    def use_command_server(self):
+        """Whether commands can be run through a command server.
+
+        Command servers are only used for repositories on the local
+        filesystem.
+        """
+        return os.path.isdir(self.path)
+
     def cat_file(self, path, rev="tip"):
         if rev == HEAD:
             rev = "tip"
@@ -251,6 +632,22 @@ class HgClient(SCMClient):
             rev = ""
 
         if path:
+            if self.use_command_server:
+                try:
+                    with hg_command_server_pool.connect(
+                            self.path, self.local_site_name) as server:
+                        failure, contents, errmsg = \
+                            server.run_command(['cat', '--rev', rev, path])
+                except SCMError as e:
+                    logging.warning('Unable to use the Mercurial command '
+                                    'server for %s, falling back to hg: %s',
+                                    self.path, e)
+                else:
+                    if not failure:
+                        return contents
+
+                    raise FileNotFoundError(path, rev)
+
             p = self._run_hg(['cat', '--rev', rev, path])
             contents = p.stdout.read()
             failure = p.wait()
@@ -0,0 +1,41 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.scmtools.commit_index import update_commit_indexes
+
+
+class Command(NoArgsCommand):
+    help = _('Adds new commits to the local indexes of repository commit '
+             'history')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    dest='loop',
+                    help=_('Keep running, updating the indexes '
+                           'periodically')),
+        make_option('--interval',
+                    action='store',
+                    type='int',
+                    default=5 * 60,
+                    dest='interval',
+                    help=_('Number of seconds to wait between updates '
+                           'when using --loop')),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            count = update_commit_indexes()
+
+            self.stdout.write(_('Updated %d commit index(es).') % count)
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
@@ -0,0 +1,46 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.scmtools.mirrors import get_mirrors_dir, update_mirrors
+
+
+class Command(NoArgsCommand):
+    help = _('Creates or updates local mirrors of remote repositories')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    dest='loop',
+                    help=_('Keep running, updating the mirrors '
+                           'periodically')),
+        make_option('--interval',
+                    action='store',
+                    type='int',
+                    default=5 * 60,
+                    dest='interval',
+                    help=_('Number of seconds to wait between updates '
+                           'when using --loop')),
+    )
+
+    def handle_noargs(self, **options):
+        if get_mirrors_dir() is None:
+            self.stderr.write(_('Local mirrors are disabled. Set a mirrors '
+                                'directory in the Diff Viewer settings to '
+                                'enable them.'))
+            return
+
+        while True:
+            count = update_mirrors()
+
+            self.stdout.write(_('Updated %d mirror(s).') % count)
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
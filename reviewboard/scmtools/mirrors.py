@@ -0,0 +1,319 @@
+"""Local mirrors of remote repositories.
+
+Some repositories can only be reached remotely, file by file, such as Git
+repositories accessed through a raw file URL, or Mercurial repositories
+accessed through hgweb. Every file fetch is an HTTP request, and existence
+checks have to download the entire file.
+
+Administrators can choose to keep a local mirror of these repositories,
+stored under the directory set in the ``scm_mirrors_dir`` site
+configuration setting. Mirrors are created and updated by
+:py:func:`update_mirrors`, which is normally invoked periodically by the
+``update-repository-mirrors`` management command.
+:py:meth:`Repository.get_file
+<reviewboard.scmtools.models.Repository.get_file>` and
+:py:meth:`Repository.get_file_exists
+<reviewboard.scmtools.models.Repository.get_file_exists>` check the mirror
+first, and only go to the repository for files the mirror doesn't have
+yet. Only revisions that always refer to the same content (commit and file
+SHAs) are read from the mirror. Others, such as HEAD or branch names, may
+have moved on since the mirror was last updated.
+
+The total size of the mirrors can be limited through the
+``scm_mirrors_max_size`` setting (in megabytes). Mirrors that would exceed
+it are removed, and their size is recorded so that they aren't fetched
+again until there's room for them.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import re
+import shutil
+
+from django.utils import six, timezone
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.scmtools.errors import FileNotFoundError, SCMError
+
+
+#: The mirror was updated successfully.
+MIRROR_STATE_OK = 'ok'
+
+#: The mirror couldn't be updated.
+MIRROR_STATE_ERROR = 'error'
+
+#: The mirror was removed, as it would have exceeded the quota.
+MIRROR_STATE_OVER_QUOTA = 'over-quota'
+
+#: Revisions that can be read from a local mirror.
+#:
+#: These are full or abbreviated SHAs, which always refer to the same
+#: content. Mercurial revision numbers aren't included, as they can differ
+#: between clones.
+MIRROR_REVISION_RE = re.compile(r'^[0-9a-f]{7,40}$')
+
+
+def get_mirrors_dir():
+    """Returns the directory containing local mirrors.
+
+    This returns None if local mirrors are disabled.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    return siteconfig.get('scm_mirrors_dir') or None
+
+
+def get_mirror_path(repository):
+    """Returns the path to a repository's local mirror.
+
+    This returns None if local mirrors are disabled. The mirror may not
+    have been created yet.
+    """
+    mirrors_dir = get_mirrors_dir()
+
+    if mirrors_dir and repository.pk:
+        return os.path.join(mirrors_dir, six.text_type(repository.pk))
+    else:
+        return None
+
+
+def is_mirror_enabled(repository):
+    """Returns whether a repository should have a local mirror.
+
+    The repository must have local mirrors turned on, must not be backed by
+    a hosting service, and must use an SCMTool that supports local mirrors.
+    """
+    return (get_mirrors_dir() is not None and
+            repository.pk is not None and
+            not repository.hosting_account_id and
+            not repository.archived and
+            repository.extra_data.get('use_local_mirror', False) and
+            repository.tool.scmtool_class.supports_local_mirrors)
+
+
+def get_mirror_status(repository):
+    """Returns the status of a repository's local mirror.
+
+    This is a dictionary containing the ``state`` of the mirror (one of
+    the ``MIRROR_STATE_*`` values), the ``updated`` timestamp, the
+    ``size`` in bytes, and any ``error`` message. If the mirror has never
+    been updated, this returns None.
+    """
+    mirror_path = get_mirror_path(repository)
+
+    if not mirror_path:
+        return None
+
+    try:
+        with open(mirror_path + '.json', 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def get_mirror_file(repository, scmtool, path, revision):
+    """Returns a file from a repository's local mirror.
+
+    This returns None if there's no mirror, the mirror doesn't have the
+    file, or the revision isn't one that can be read from the mirror, in
+    which case the file should be fetched from the repository.
+    """
+    mirror_path = _get_usable_mirror_path(repository, revision)
+
+    if mirror_path:
+        try:
+            return scmtool.get_local_mirror_file(mirror_path, path, revision)
+        except FileNotFoundError:
+            pass
+        except SCMError as e:
+            logging.warning('Unable to read %s from the local mirror of '
+                            'repository %s: %s',
+                            path, repository.pk, e)
+
+    return None
+
+
+def mirror_file_exists(repository, scmtool, path, revision):
+    """Returns whether a file exists in a repository's local mirror.
+
+    A file that's not in the mirror may have been added to the repository
+    since the mirror was last updated, so a result of False should be
+    checked against the repository.
+    """
+    mirror_path = _get_usable_mirror_path(repository, revision)
+
+    if mirror_path:
+        try:
+            return scmtool.local_mirror_file_exists(mirror_path, path,
+                                                    revision)
+        except SCMError as e:
+            logging.warning('Unable to check for %s in the local mirror of '
+                            'repository %s: %s',
+                            path, repository.pk, e)
+
+    return False
+
+
+def update_mirror(repository):
+    """Creates or updates a repository's local mirror.
+
+    The status of the mirror is recorded, and can be retrieved through
+    :py:func:`get_mirror_status`. This returns the size of the mirror in
+    bytes.
+
+    An SCMError is raised if the mirror couldn't be updated.
+    """
+    mirror_path = get_mirror_path(repository)
+    mirrors_dir = os.path.dirname(mirror_path)
+
+    if not os.path.exists(mirrors_dir):
+        os.makedirs(mirrors_dir, 0o700)
+
+    try:
+        repository.get_scmtool().update_local_mirror(mirror_path)
+    except Exception as e:
+        _set_mirror_status(repository,
+                           state=MIRROR_STATE_ERROR,
+                           size=_get_mirror_size(mirror_path),
+                           error=six.text_type(e))
+
+        if not isinstance(e, SCMError):
+            e = SCMError(six.text_type(e))
+
+        raise e
+
+    size = _get_mirror_size(mirror_path)
+    _set_mirror_status(repository, state=MIRROR_STATE_OK, size=size)
+
+    return size
+
+
+def remove_mirror(repository, state=None, size=0):
+    """Removes a repository's local mirror.
+
+    If ``state`` is provided, it's recorded as the mirror's status, along
+    with the ``size`` the mirror had (or was last known to have). Otherwise,
+    the status is removed as well.
+    """
+    mirror_path = get_mirror_path(repository)
+
+    if not mirror_path:
+        return
+
+    if os.path.exists(mirror_path):
+        shutil.rmtree(mirror_path, ignore_errors=True)
+
+    if state:
+        _set_mirror_status(repository, state=state, size=size)
+    elif os.path.exists(mirror_path + '.json'):
+        os.unlink(mirror_path + '.json')
+
+
+def update_mirrors():
+    """Creates or updates the local mirrors of all repositories.
+
+    Mirrors are updated in order of repository ID. Once the mirrors exceed
+    the ``scm_mirrors_max_size`` setting, any further mirrors are removed.
+    Mirrors whose last known size won't fit in the remaining space are
+    skipped, rather than being fetched in full only to be removed again.
+    Mirrors of repositories that no longer have local mirrors turned on are
+    removed as well.
+
+    This returns the number of mirrors updated.
+    """
+    from reviewboard.scmtools.models import Repository
+
+    if get_mirrors_dir() is None:
+        return 0
+
+    siteconfig = SiteConfiguration.objects.get_current()
+    max_size = siteconfig.get('scm_mirrors_max_size') * 1024 * 1024
+    total_size = 0
+    count = 0
+
+    for repository in (Repository.objects.select_related('tool')
+                       .order_by('pk')):
+        if not is_mirror_enabled(repository):
+            if os.path.exists(get_mirror_path(repository)):
+                remove_mirror(repository)
+
+            continue
+
+        status = get_mirror_status(repository)
+
+        if status:
+            last_size = status['size']
+        else:
+            last_size = 0
+
+        if max_size and (total_size >= max_size or
+                         total_size + last_size > max_size):
+            # There's no room left for it, so don't bother fetching it.
+            remove_mirror(repository, state=MIRROR_STATE_OVER_QUOTA,
+                          size=last_size)
+            continue
+
+        try:
+            size = update_mirror(repository)
+        except SCMError as e:
+            logging.error('Unable to update the local mirror of repository '
+                          '%s: %s',
+                          repository.pk, e)
+            continue
+
+        if max_size and total_size + size > max_size:
+            logging.warning('Removing the local mirror of repository %s, '
+                            'which would exceed the mirror quota',
+                            repository.pk)
+            remove_mirror(repository, state=MIRROR_STATE_OVER_QUOTA,
+                          size=size)
+        else:
+            total_size += size
+            count += 1
+
+    return count
+
+
+def _get_usable_mirror_path(repository, revision):
+    """Returns the path to a mirror, if it can be used for a revision.
+
+    The mirror must be enabled and created, and the revision must always
+    refer to the same content.
+    """
+    if (MIRROR_REVISION_RE.match(six.text_type(revision)) and
+        is_mirror_enabled(repository)):
+        mirror_path = get_mirror_path(repository)
+
+        if os.path.isdir(mirror_path):
+            return mirror_path
+
+    return None
+
+
+def _get_mirror_size(mirror_path):
+    """Returns the size of the files in a mirror, in bytes."""
+    size = 0
+
+    for dirpath, dirnames, filenames in os.walk(mirror_path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                # The file may have gone away.
+                pass
+
+    return size
+
+
+def _set_mirror_status(repository, state, size, error=None):
+    """Records the status of a repository's local mirror."""
+    with open(get_mirror_path(repository) + '.json', 'w') as f:
+        json.dump({
+            'state': state,
+            'updated': timezone.now().isoformat(),
+            'size': size,
+            'error': error,
+        }, f)
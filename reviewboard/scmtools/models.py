@@ -1,13 +1,15 @@
 from __future__ import unicode_literals
 
 import logging
+import re
+import threading
 import uuid
 from time import time
 
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured, ValidationError
-from django.db import models
+from django.db import connection, models
 from django.db import IntegrityError
 from django.utils import six, timezone
 from django.utils.encoding import python_2_unicode_compatible
@@ -19,15 +21,17 @@ from djblets.cache.backend import cache_memoize, make_cache_key
 from djblets.db.fields import JSONField
 from djblets.log import log_timed
 
+from reviewboard.accounts.access import get_access_snapshot
 from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.hostingsvcs.service import get_hosting_service
 from reviewboard.scmtools.crypto_utils import (decrypt_password,
                                                encrypt_password)
 from reviewboard.scmtools.managers import RepositoryManager, ToolManager
+from reviewboard.scmtools.mirrors import get_mirror_file, mirror_file_exists
 from reviewboard.scmtools.signals import (checked_file_exists,
                                           checking_file_exists,
                                           fetched_file, fetching_file)
-from reviewboard.scmtools.core import FileNotFoundError
+from reviewboard.scmtools.core import Commit, FileNotFoundError
 from reviewboard.site.models import LocalSite
 
 
@@ -47,6 +51,8 @@ class Tool(models.Model):
         lambda x: x.scmtool_class.supports_ticket_auth)
     supports_pending_changesets = property(
         lambda x: x.scmtool_class.supports_pending_changesets)
+    supports_local_mirrors = property(
+        lambda x: x.scmtool_class.supports_local_mirrors)
     field_help_text = property(
         lambda x: x.scmtool_class.field_help_text)
 
@@ -179,6 +185,13 @@ class Repository(models.Model):
     COMMITS_CACHE_PERIOD_SHORT = 60 * 5  # 5 minutes
     COMMITS_CACHE_PERIOD_LONG = 60 * 60 * 24  # 1 day
 
+    #: Revisions whose changes can be cached. These are full commit SHAs
+    #: and revision numbers, which always refer to the same change.
+    CACHEABLE_CHANGE_REVISION_RE = re.compile(r'^([0-9a-f]{40}|\d+)$')
+
+    #: The maximum number of changes fetched by prefetch_changes.
+    MAX_PREFETCH_CHANGES = 20
+
     def _set_password(self, value):
         """Sets the password for the repository.
 
@@ -381,6 +394,90 @@ class Repository(models.Model):
 
         return exists
 
+    def get_files_exist(self, files, base_commit_id=None, request=None):
+        """Returns whether or not several files exist in the repository.
+
+        ``files`` is a list of (path, revision) tuples. This returns a list
+        of booleans, in the same order.
+
+        If the repository is backed by a hosting service, the files that
+        aren't already known to exist are checked all at once, which some
+        hosting services can do in far fewer requests than checking each
+        file. SCMTools that support batch file fetches instead fetch the
+        files all at once, and their contents are cached for
+        :py:meth:`get_file`. Otherwise, each file is checked through
+        :py:meth:`get_file_exists`.
+
+        As with :py:meth:`get_file_exists`, files that exist are cached.
+        """
+        hosting_service = self.hosting_service
+
+        if hosting_service:
+            scmtool = None
+        else:
+            scmtool = self.get_scmtool()
+
+            if not scmtool.supports_batch_file_fetches:
+                return [
+                    self.get_file_exists(path, revision,
+                                         base_commit_id=base_commit_id,
+                                         request=request)
+                    for path, revision in files
+                ]
+
+        results = []
+        uncached = []
+
+        for i, (path, revision) in enumerate(files):
+            key = self._make_file_exists_cache_key(path, revision,
+                                                   base_commit_id)
+            file_cache_key = make_cache_key(
+                self._make_file_cache_key(path, revision, base_commit_id))
+
+            if (cache.get(make_cache_key(key)) == '1' or
+                file_cache_key in cache):
+                results.append(True)
+            else:
+                results.append(None)
+                uncached.append(i)
+
+        if uncached:
+            uncached_files = [files[i] for i in uncached]
+
+            for path, revision in uncached_files:
+                checking_file_exists.send(sender=self,
+                                          path=path,
+                                          revision=revision,
+                                          base_commit_id=base_commit_id,
+                                          request=request)
+
+            if hosting_service:
+                uncached_results = hosting_service.get_files_exist(
+                    self, uncached_files, base_commit_id=base_commit_id)
+            else:
+                uncached_results = self._fetch_files(
+                    scmtool, uncached_files, base_commit_id)
+
+            for i, exists in zip(uncached, uncached_results):
+                path, revision = files[i]
+
+                checked_file_exists.send(sender=self,
+                                         path=path,
+                                         revision=revision,
+                                         base_commit_id=base_commit_id,
+                                         request=request,
+                                         exists=exists)
+
+                if exists:
+                    cache_memoize(
+                        self._make_file_exists_cache_key(path, revision,
+                                                         base_commit_id),
+                        lambda: '1')
+
+                results[i] = exists
+
+        return results
+
     def get_branches(self):
         """Returns a list of branches."""
         hosting_service = self.hosting_service
@@ -397,11 +494,14 @@ class Repository(models.Model):
     def get_commit_cache_key(self, commit):
         return 'repository-commit:%s:%s' % (self.pk, commit)
 
-    def get_commits(self, branch=None, start=None):
+    def get_commits(self, branch=None, start=None, use_cache=True):
         """Returns a list of commits.
 
         This is paginated via the 'start' parameter. Any exceptions are
         expected to be handled by the caller.
+
+        If ``use_cache`` is False, the page of commits is always fetched
+        from the repository, rather than from a previously cached page.
         """
         hosting_service = self.hosting_service
 
@@ -430,7 +530,8 @@ class Repository(models.Model):
         cache_key = make_cache_key('repository-commits:%s:%s:%s'
                                    % (self.pk, branch, start))
         commits = cache_memoize(cache_key, commits_callable,
-                                cache_period)
+                                cache_period,
+                                force_overwrite=not use_cache)
 
         for commit in commits:
             cache.set(self.get_commit_cache_key(commit.id),
@@ -442,13 +543,69 @@ class Repository(models.Model):
         """Get an individual change.
 
         This returns a tuple of (commit message, diff).
+
+        A full commit SHA or a revision number always refers to the same
+        change, so the resulting change is cached for those.
         """
         hosting_service = self.hosting_service
 
         if hosting_service:
-            return hosting_service.get_change(self, revision)
+            change_callable = \
+                lambda: hosting_service.get_change(self, revision)
         else:
-            return self.get_scmtool().get_change(revision)
+            change_callable = \
+                lambda: self.get_scmtool().get_change(revision)
+
+        if self.CACHEABLE_CHANGE_REVISION_RE.match(six.text_type(revision)):
+            return cache_memoize('repository-change:%s:%s'
+                                 % (self.pk, revision),
+                                 change_callable,
+                                 large_data=True)
+        else:
+            return change_callable()
+
+    def prefetch_changes(self, revisions):
+        """Fetches and caches changes in the background.
+
+        This can be used to fetch changes before they're needed, such as
+        when a hook reports that new commits were pushed. Only revisions
+        that :py:meth:`get_change` would cache are fetched. Any errors are
+        logged.
+
+        This returns the thread fetching the changes, or None if there was
+        nothing to fetch.
+        """
+        revisions = [
+            revision
+            for revision in revisions[:self.MAX_PREFETCH_CHANGES]
+            if self.CACHEABLE_CHANGE_REVISION_RE.match(
+                six.text_type(revision))
+        ]
+
+        if not revisions:
+            return None
+
+        # Make sure the hosting service and its account are loaded here,
+        # rather than in the new thread.
+        self.hosting_service
+
+        def _prefetch():
+            try:
+                for revision in revisions:
+                    try:
+                        self.get_change(revision)
+                    except Exception as e:
+                        logging.warning('Unable to prefetch change %s from '
+                                        'repository %s: %s',
+                                        revision, self.pk, e)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=_prefetch)
+        thread.daemon = True
+        thread.start()
+
+        return thread
 
     def is_accessible_by(self, user):
         """Returns whether or not the user has access to the repository.
@@ -463,8 +620,7 @@ class Repository(models.Model):
         return (self.public or
                 user.is_superuser or
                 (user.is_authenticated() and
-                 (self.review_groups.filter(users__pk=user.pk).count() > 0 or
-                  self.users.filter(pk=user.pk).count() > 0)))
+                 self.pk in get_access_snapshot(user).repository_ids))
 
     def is_mutable_by(self, user):
         """Returns whether or not the user can modify or delete the repository.
@@ -532,16 +688,21 @@ class Repository(models.Model):
                 revision,
                 base_commit_id=base_commit_id)
         else:
-            try:
-                data = self.get_scmtool().get_file(path, revision)
-            except FileNotFoundError:
-                if base_commit_id:
-                    # Some funky workflows with mq (mercurial) can cause issues
-                    # with parent diffs. If we didn't find it with the parsed
-                    # revision, and there's a base commit ID, try that.
-                    data = self.get_scmtool().get_file(path, base_commit_id)
-                else:
-                    raise
+            scmtool = self.get_scmtool()
+            data = get_mirror_file(self, scmtool, path, revision)
+
+            if data is None:
+                try:
+                    data = scmtool.get_file(path, revision)
+                except FileNotFoundError:
+                    if base_commit_id:
+                        # Some funky workflows with mq (mercurial) can cause
+                        # issues with parent diffs. If we didn't find it with
+                        # the parsed revision, and there's a base commit ID,
+                        # try that.
+                        data = scmtool.get_file(path, base_commit_id)
+                    else:
+                        raise
 
         log_timer.done()
 
@@ -554,6 +715,40 @@ class Repository(models.Model):
 
         return data
 
+    def _fetch_files(self, scmtool, files, base_commit_id):
+        """Fetches several files at once using the SCMTool.
+
+        The contents of each file found are cached, as if fetched through
+        :py:meth:`get_file`. This returns a list of whether each file
+        exists.
+        """
+        log_timer = log_timed("Fetching %d files from %s"
+                              % (len(files), self))
+        contents = scmtool.get_files(files)
+        log_timer.done()
+
+        results = []
+
+        for (path, revision), data in zip(files, contents):
+            if data is None and base_commit_id:
+                # As with get_file, try the base commit ID for files that
+                # weren't found at the parsed revision.
+                try:
+                    data = scmtool.get_file(path, base_commit_id)
+                except FileNotFoundError:
+                    pass
+
+            if data is not None:
+                cache_memoize(
+                    self._make_file_cache_key(path, revision,
+                                              base_commit_id),
+                    lambda: [data],
+                    large_data=True)
+
+            results.append(data is not None)
+
+        return results
+
     def _get_file_exists_uncached(self, path, revision, base_commit_id,
                                   request):
         """Internal function for checking that a file exists.
@@ -588,7 +783,9 @@ class Repository(models.Model):
                     revision,
                     base_commit_id=base_commit_id)
             else:
-                exists = self.get_scmtool().file_exists(path, revision)
+                scmtool = self.get_scmtool()
+                exists = (mirror_file_exists(self, scmtool, path, revision) or
+                          scmtool.file_exists(path, revision))
 
             checked_file_exists.send(sender=self,
                                      path=path,
@@ -637,3 +834,39 @@ class Repository(models.Model):
         unique_together = (('name', 'local_site'),
                            ('archived_timestamp', 'path', 'local_site'),
                            ('hooks_uuid', 'local_site'))
+
+
+@python_2_unicode_compatible
+class IndexedCommit(models.Model):
+    """A commit in a repository's local index of commit history.
+
+    The index holds the history of a branch (or of the default branch,
+    when ``branch`` is empty), as returned by
+    :py:meth:`Repository.get_commits`. Commits are ordered by
+    ``position``, with newer commits having higher positions. See
+    :py:mod:`reviewboard.scmtools.commit_index`.
+    """
+    repository = models.ForeignKey(Repository,
+                                   related_name='indexed_commits')
+    branch = models.CharField(max_length=255, blank=True)
+    position = models.IntegerField()
+    commit_id = models.CharField(max_length=64)
+    parent_id = models.CharField(max_length=64, blank=True)
+    author_name = models.CharField(max_length=255, blank=True)
+    date = models.CharField(max_length=64, blank=True)
+    message = models.TextField(blank=True)
+
+    def to_commit(self):
+        """Returns a Commit for this entry."""
+        return Commit(author_name=self.author_name,
+                      id=self.commit_id,
+                      date=self.date,
+                      message=self.message,
+                      parent=self.parent_id)
+
+    def __str__(self):
+        return self.commit_id
+
+    class Meta:
+        index_together = (('repository', 'branch', 'position'),
+                          ('repository', 'branch', 'commit_id'))
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
 
+import atexit
+import importlib
 import logging
 import os
 import random
@@ -9,7 +11,9 @@ import signal
 import socket
 import subprocess
 import tempfile
+import threading
 import time
+from collections import defaultdict
 from contextlib import contextmanager
 
 from django.utils import six
@@ -85,7 +89,178 @@ class STunnelProxy(object):
                 pass
 
 
+class PerforceConnectionPool(object):
+    """A pool of persistent connections to Perforce servers.
+
+    Connecting to a Perforce server can involve starting an stunnel proxy
+    and logging in for a ticket, which takes far longer than most commands.
+    Rather than doing this for every command, connections are kept open
+    after use, and reused for later commands on the same server with the
+    same credentials. Connections that sit idle for too long are closed.
+
+    All connections to a server through stunnel share a single stunnel
+    proxy, which is shut down once the last of those connections is closed.
+    """
+    MAX_IDLE_CONNECTIONS = 4
+    MAX_IDLE_TIME = 5 * 60
+
+    def __init__(self, max_idle_connections=MAX_IDLE_CONNECTIONS,
+                 max_idle_time=MAX_IDLE_TIME):
+        self.max_idle_connections = max_idle_connections
+        self.max_idle_time = max_idle_time
+        self._idle_connections = defaultdict(list)
+        self._num_connections = defaultdict(int)
+        self._proxies = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self, client):
+        """Provides a connection for a client.
+
+        This yields a connected P4 instance, reusing an idle connection if
+        one is available. If the caller raises an exception, the connection
+        is closed rather than reused, in case it's no longer usable.
+        """
+        self.close_idle_connections(self.max_idle_time)
+
+        p4 = self._get_connection(client)
+
+        try:
+            yield p4
+        except Exception:
+            self._close_connection(client, p4)
+            raise
+
+        self._release_connection(client, p4)
+
+    def clear(self):
+        """Closes all idle connections in the pool."""
+        self.close_idle_connections()
+
+    def close_idle_connections(self, max_idle_time=0):
+        """Closes connections that have been idle for a period of time.
+
+        Any connections that have been idle for more than ``max_idle_time``
+        seconds are closed.
+        """
+        cutoff = time.time() - max_idle_time
+        expired = []
+
+        with self._lock:
+            for key, connections in six.iteritems(self._idle_connections):
+                while connections and connections[0][1] <= cutoff:
+                    expired.append((key, connections.pop(0)[0]))
+
+        for key, p4 in expired:
+            self._disconnect(key[0], p4)
+
+    def _get_connection(self, client):
+        """Returns an idle connection for a client, or opens a new one."""
+        key = client.connection_key
+
+        with self._lock:
+            connections = self._idle_connections.get(key)
+
+            while connections:
+                p4 = connections.pop()[0]
+
+                if p4.connected():
+                    return p4
+
+                self._disconnect(client.p4port, p4, locked=True)
+
+            self._num_connections[client.p4port] += 1
+
+            try:
+                if client.use_stunnel:
+                    port = '127.0.0.1:%d' % self._get_proxy(client).port
+                else:
+                    port = client.p4port
+            except Exception:
+                self._num_connections[client.p4port] -= 1
+                raise
+
+        try:
+            return client._open_connection(port)
+        except Exception:
+            with self._lock:
+                self._connection_closed(client.p4port)
+
+            raise
+
+    def _release_connection(self, client, p4):
+        """Returns a connection to the pool, or closes it if the pool is full.
+        """
+        with self._lock:
+            connections = self._idle_connections[client.connection_key]
+
+            if len(connections) < self.max_idle_connections:
+                connections.append((p4, time.time()))
+                return
+
+        self._disconnect(client.p4port, p4)
+
+    def _close_connection(self, client, p4):
+        """Closes a connection that's no longer usable."""
+        self._disconnect(client.p4port, p4)
+
+    def _disconnect(self, p4port, p4, locked=False):
+        """Disconnects a connection, shutting down its proxy if unused."""
+        try:
+            if p4.connected():
+                p4.disconnect()
+        except Exception as e:
+            logging.debug('Error disconnecting from Perforce server %s: %s',
+                          p4port, e)
+
+        if locked:
+            self._connection_closed(p4port)
+        else:
+            with self._lock:
+                self._connection_closed(p4port)
+
+    def _get_proxy(self, client):
+        """Returns the stunnel proxy for a server, starting it if needed.
+
+        This must be called with the lock held.
+        """
+        proxy = self._proxies.get(client.p4port)
+
+        if proxy is None:
+            proxy = STunnelProxy(STUNNEL_CLIENT, client.p4port)
+            proxy.start_client()
+            self._proxies[client.p4port] = proxy
+
+        return proxy
+
+    def _connection_closed(self, p4port):
+        """Records a closed connection, shutting down an unused proxy.
+
+        This must be called with the lock held.
+        """
+        self._num_connections[p4port] -= 1
+
+        if self._num_connections[p4port] <= 0:
+            del self._num_connections[p4port]
+            proxy = self._proxies.pop(p4port, None)
+
+            if proxy:
+                try:
+                    proxy.shutdown()
+                except:
+                    pass
+
+
+#: The shared pool of connections used by all Perforce clients.
+perforce_connection_pool = PerforceConnectionPool()
+atexit.register(perforce_connection_pool.clear)
+
+
 class PerforceClient(object):
+    #: Parts of errors that indicate a login ticket has expired.
+    LOGIN_ERRORS = ('Perforce password', 'Your session has expired',
+                    'Password must be set')
+
     def __init__(self, p4port, username, password, encoding, use_stunnel=False,
                  use_ticket_auth=False):
         self.p4port = p4port
@@ -94,67 +269,54 @@ class PerforceClient(object):
         self.encoding = encoding
         self.use_stunnel = use_stunnel
         self.use_ticket_auth = use_ticket_auth
-        self.proxy = None
 
-        import P4
-        self.p4 = P4.P4()
+        # Fail early if p4python isn't installed. Connections are opened
+        # (and the module used) only when needed.
+        importlib.import_module('P4')
 
         if use_stunnel and not is_exe_in_path('stunnel'):
             raise AttributeError('stunnel proxy was requested, but stunnel '
                                  'binary is not in the exec path.')
 
-    @contextmanager
-    def _connect(self):
-        """
-        Connect to the perforce server.
+    @property
+    def connection_key(self):
+        """The key for sharing connections between clients.
 
-        This connects p4python to the remote server, optionally using a stunnel
-        proxy.
+        Connections can only be shared by clients connecting to the same
+        server with the same settings.
         """
-        self.p4.user = self.username.encode('utf-8')
-        self.p4.password = self.password.encode('utf-8')
+        return (self.p4port, self.username, self.password, self.encoding,
+                self.use_stunnel, self.use_ticket_auth)
 
-        if self.encoding:
-            self.p4.charset = self.encoding.encode('utf-8')
-
-        self.p4.exception_level = 1
-
-        if self.use_stunnel:
-            # Spin up an stunnel client and then redirect through that
-            self.proxy = STunnelProxy(STUNNEL_CLIENT, self.p4port)
-            self.proxy.start_client()
-            p4_port = '127.0.0.1:%d' % self.proxy.port
-        else:
-            p4_port = self.p4port
+    def _open_connection(self, p4_port):
+        """
+        Open a new connection to the perforce server.
 
-        self.p4.port = p4_port.encode('utf-8')
+        This connects p4python to the given port, which may be a stunnel
+        proxy, and logs in if using ticket-based authentication.
+        """
+        import P4
 
-        self.p4.connect()
+        p4 = P4.P4()
+        p4.user = self.username.encode('utf-8')
+        p4.password = self.password.encode('utf-8')
 
-        if self.use_ticket_auth:
-            self.p4.run_login()
+        if self.encoding:
+            p4.charset = self.encoding.encode('utf-8')
 
-        yield
+        p4.exception_level = 1
+        p4.port = p4_port.encode('utf-8')
 
-        self._disconnect()
+        p4.connect()
 
-    def _disconnect(self):
-        """
-        Disconnect from the perforce server, and also shut down the stunnel
-        proxy (if it exists).
-        """
         try:
-            if self.p4.connected():
-                self.p4.disconnect()
-        except AttributeError:
-            pass
+            if self.use_ticket_auth:
+                p4.run_login()
+        except Exception:
+            p4.disconnect()
+            raise
 
-        if self.proxy:
-            try:
-                self.proxy.shutdown()
-            except:
-                pass
-            self.proxy = None
+        return p4
 
     @staticmethod
     def _convert_p4exception_to_scmexception(e):
@@ -179,44 +341,90 @@ class PerforceClient(object):
             raise SCMError(error)
 
     def _run_worker(self, worker):
+        """
+        Run a function with a connection to the perforce server.
+
+        The function is passed a connected P4 instance from the shared
+        connection pool. If the login ticket for a reused connection has
+        expired, this logs in again and retries once.
+        """
         from P4 import P4Exception
+
         try:
-            with self._connect():
-                return worker()
+            with perforce_connection_pool.connect(self) as p4:
+                try:
+                    return worker(p4)
+                except P4Exception as e:
+                    error = six.text_type(e)
+
+                    if (not self.use_ticket_auth or
+                        not any(s in error for s in self.LOGIN_ERRORS)):
+                        raise
+
+                p4.run_login()
+
+                return worker(p4)
         except P4Exception as e:
             self._convert_p4exception_to_scmexception(e)
 
-    def _get_changeset(self, changesetid):
+    def _get_changeset(self, p4, changesetid):
         changesetid = six.text_type(changesetid)
 
         try:
-            change = self.p4.run_change('-o', '-O', changesetid)
+            change = p4.run_change('-o', '-O', changesetid)
             changesetid = change[0]['Change']
         except Exception as e:
             logging.warning('Failed to get updated changeset information for '
                             'CLN %s (%s): %s',
                             changesetid, self.p4port, e, exc_info=True)
 
-        return self.p4.run_describe('-s', changesetid)
+        return p4.run_describe('-s', changesetid)
 
     def get_changeset(self, changesetid):
         """
         Get the contents of a changeset description.
         """
-        return self._run_worker(lambda: self._get_changeset(changesetid))
+        return self._run_worker(
+            lambda p4: self._get_changeset(p4, changesetid))
+
+    def _get_changesets(self, p4, changesetids):
+        from P4 import P4Exception
+
+        results = {}
+
+        for changesetid in changesetids:
+            try:
+                results[changesetid] = self._get_changeset(p4, changesetid)
+            except P4Exception as e:
+                logging.warning('Failed to get changeset information for '
+                                'CLN %s (%s): %s',
+                                changesetid, self.p4port, e)
+                results[changesetid] = None
+
+        return results
+
+    def get_changesets(self, changesetids):
+        """
+        Get the contents of several changeset descriptions, using a single
+        connection to the server.
+        """
+        return self._run_worker(
+            lambda p4: self._get_changesets(p4, changesetids))
 
     def get_info(self):
-        return self._run_worker(self.p4.run_info)
+        return self._run_worker(lambda p4: p4.run_info())
 
-    def _get_file(self, path, revision):
+    def _get_depot_path(self, path, revision):
+        if revision == HEAD:
+            return path
+        else:
+            return '%s#%s' % (path, revision)
+
+    def _get_file(self, p4, path, revision):
         if revision == PRE_CREATION:
             return ''
-        elif revision == HEAD:
-            depot_path = path
-        else:
-            depot_path = '%s#%s' % (path, revision)
 
-        res = self.p4.run_print('-q', depot_path)
+        res = p4.run_print('-q', self._get_depot_path(path, revision))
         if res:
             return res[-1]
 
@@ -224,22 +432,66 @@ class PerforceClient(object):
         """
         Get the contents of a file, at a specific revision.
         """
-        return self._run_worker(lambda: self._get_file(path, revision))
+        return self._run_worker(lambda p4: self._get_file(p4, path, revision))
+
+    def _get_files(self, p4, files):
+        depot_paths = [
+            self._get_depot_path(path, revision)
+            for path, revision in files
+            if revision != PRE_CREATION
+        ]
+
+        # 'p4 print' outputs the metadata of each file followed by its
+        # contents, in the order requested. Files that don't exist are
+        # left out, so match the output to the requested files in order.
+        printed = []
+
+        if depot_paths:
+            for item in p4.run_print('-q', *depot_paths):
+                if isinstance(item, dict):
+                    printed.append((item.get('depotFile'), item.get('rev'),
+                                    []))
+                elif printed:
+                    printed[-1][2].append(item)
+
+        results = []
+        i = 0
+
+        for path, revision in files:
+            if revision == PRE_CREATION:
+                results.append('')
+            elif (i < len(printed) and
+                  printed[i][0] == path and
+                  (revision == HEAD or
+                   printed[i][1] == six.text_type(revision))):
+                results.append(b''.join(printed[i][2]))
+                i += 1
+            else:
+                results.append(None)
+
+        return results
+
+    def get_files(self, files):
+        """
+        Get the contents of several files with a single 'p4 print'.
 
-    def _get_files_at_revision(self, revision_str):
-        return self.p4.run_files(revision_str)
+        This takes a list of (path, revision) tuples, and returns a list of
+        the contents of each file, in the same order. Files that don't exist
+        have contents of None.
+        """
+        return self._run_worker(lambda p4: self._get_files(p4, files))
 
     def get_files_at_revision(self, revision_str):
         """
         Get a list of files at a specific revision. This is a simple interface
         to 'p4 files'
         """
-        return self._run_worker(
-            lambda: self._get_files_at_revision(revision_str))
+        return self._run_worker(lambda p4: p4.run_files(revision_str))
 
 
 class PerforceTool(SCMTool):
     name = "Perforce"
+    supports_batch_file_fetches = True
     supports_ticket_auth = True
     supports_pending_changesets = True
     field_help_text = {
@@ -318,12 +570,34 @@ class PerforceTool(SCMTool):
         else:
             return None
 
+    def get_changesets(self, changesetids, allow_empty=False):
+        results = {}
+
+        for changesetid, changeset in six.iteritems(
+                self.client.get_changesets(changesetids)):
+            if changeset:
+                results[changesetid] = self.parse_change_desc(
+                    changeset[0], changesetid, allow_empty)
+            else:
+                results[changesetid] = None
+
+        return results
+
     def get_diffs_use_absolute_paths(self):
         return True
 
     def get_file(self, path, revision=HEAD):
         return self.client.get_file(path, revision)
 
+    def get_files(self, files):
+        """Returns the contents of several files at once.
+
+        This takes a list of (path, revision) tuples, and returns a list of
+        the contents of each file, fetched with a single 'p4 print'. Files
+        that don't exist have contents of None.
+        """
+        return self.client.get_files(files)
+
     def parse_diff_revision(self, file_str, revision_str, *args, **kwargs):
         # Perforce has this lovely idiosyncracy that diffs show revision #1
         # both for pre-creation and when there's an actual revision.
@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 import logging
 import os
 import re
+import threading
 import weakref
 
 from django.conf import settings
@@ -26,6 +27,10 @@ from reviewboard.ssh import utils as sshutils
 Client = None
 has_svn_backend = False
 
+# Clients built for each repository, kept per-thread so that their
+# authenticated sessions can be reused across requests.
+_clients = threading.local()
+
 
 # Register these URI schemes so we can handle them properly.
 sshutils.ssh_uri_schemes.append('svn+ssh')
@@ -46,6 +51,7 @@ class SVNCertificateFailures:
 
 class SVNTool(SCMTool):
     name = "Subversion"
+    supports_batch_file_fetches = True
     supports_post_commit = True
     dependencies = {
         'modules': [],  # This will get filled in later in
@@ -54,6 +60,34 @@ class SVNTool(SCMTool):
 
     COMMITS_PAGE_LIMIT = 31
 
+    # 'svn diff' produces patches which have the revision string localized
+    # to their system locale. This is a little ridiculous, but we have to
+    # deal with it because not everyone uses post-review.
+    revision_re = re.compile("""
+        ^(\(([^\)]+)\)\s)?      # creating diffs between two branches of a
+                                # remote repository will insert extra
+                                # "relocation information" into the diff.
+
+        (?:\d+-\d+-\d+\ +       # svnlook-style diffs contain a timestamp
+           \d+:\d+:\d+\ +       # on each line before the revision number.
+           [A-Z]+\ +)?          # This here is probably a really crappy
+                                # to express that, but oh well.
+
+        \ *\((?:
+            [Rr]ev(?:ision)?|   # English - svnlook uses 'rev 0' while svn
+                                #           diff uses 'revision 0'
+            revisión:|          # Spanish
+            révision|           # French
+            revisione|          # Italian
+            リビジョン|         # Japanese
+            리비전|             # Korean
+            revisjon|           # Norwegian
+            wersja|             # Polish
+            revisão|            # Brazilian Portuguese
+            版本                # Simplified Chinese
+        )\ (\d+)\)$
+        """, re.VERBOSE)
+
     def __init__(self, repository):
         self.repopath = repository.path
         if self.repopath[-1] == '/':
@@ -67,9 +101,9 @@ class SVNTool(SCMTool):
             local_site_name = None
 
         self.config_dir, self.client = \
-            self.build_client(self.repopath,
-                              repository.username, repository.password,
-                              local_site_name)
+            self._get_client(self.repopath,
+                             repository.username, repository.password,
+                             local_site_name)
 
         # If we assign a function to the pysvn Client that accesses anything
         # bound to SVNClient, it'll end up keeping a reference and a copy of
@@ -84,37 +118,18 @@ class SVNTool(SCMTool):
             lambda trust_dict:
             SVNTool._ssl_server_trust_prompt(trust_dict, repository_ref()))
 
-        # 'svn diff' produces patches which have the revision string localized
-        # to their system locale. This is a little ridiculous, but we have to
-        # deal with it because not everyone uses post-review.
-        self.revision_re = re.compile("""
-            ^(\(([^\)]+)\)\s)?      # creating diffs between two branches of a
-                                    # remote repository will insert extra
-                                    # "relocation information" into the diff.
-
-            (?:\d+-\d+-\d+\ +       # svnlook-style diffs contain a timestamp
-               \d+:\d+:\d+\ +       # on each line before the revision number.
-               [A-Z]+\ +)?          # This here is probably a really crappy
-                                    # to express that, but oh well.
-
-            \ *\((?:
-                [Rr]ev(?:ision)?|   # English - svnlook uses 'rev 0' while svn
-                                    #           diff uses 'revision 0'
-                revisión:|          # Spanish
-                révision|           # French
-                revisione|          # Italian
-                リビジョン|         # Japanese
-                리비전|             # Korean
-                revisjon|           # Norwegian
-                wersja|             # Polish
-                revisão|            # Brazilian Portuguese
-                版本                # Simplified Chinese
-            )\ (\d+)\)$
-            """, re.VERBOSE)
-
     def get_file(self, path, revision=HEAD):
         return self.client.get_file(path, revision)
 
+    def get_files(self, files):
+        """Returns the contents of several files.
+
+        ``files`` is a list of (path, revision) tuples. The contents are
+        returned in the same order, with None for any files that don't
+        exist.
+        """
+        return self.client.get_files(files)
+
     def get_keywords(self, path, revision=HEAD):
         return self.client.get_keywords(path, revision)
 
@@ -414,6 +429,31 @@ class SVNTool(SCMTool):
 
         return config_dir, client
 
+    @classmethod
+    def _get_client(cls, repopath, username=None, password=None,
+                    local_site_name=None):
+        """Returns a cached client for the repository.
+
+        Building a client sets up a new set of authentication providers and
+        a new session with the server, so clients are built once per
+        repository and thread, and reused by every SVNTool for that
+        repository. The cache is keyed on the credentials, so changing them
+        results in a new client.
+        """
+        if not hasattr(_clients, 'cache'):
+            _clients.cache = {}
+
+        key = (Client, repopath, username, password, local_site_name)
+
+        try:
+            return _clients.cache[key]
+        except KeyError:
+            result = cls.build_client(repopath, username, password,
+                                      local_site_name)
+            _clients.cache[key] = result
+
+            return result
+
     @classmethod
     def _create_subversion_dir(cls, config_dir):
         try:
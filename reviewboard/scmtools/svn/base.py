@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 import re
 
 from reviewboard.scmtools.core import HEAD
+from reviewboard.scmtools.errors import FileNotFoundError
 
 
 class Client(object):
@@ -47,6 +48,24 @@ class Client(object):
         """Returns the contents of a given file at the given revision."""
         raise NotImplementedError
 
+    def get_files(self, files):
+        """Returns the contents of several files.
+
+        ``files`` is a list of (path, revision) tuples. The contents are
+        returned in the same order, with None for any files that don't
+        exist. Backends can override this to fetch the files more
+        efficiently.
+        """
+        results = []
+
+        for path, revision in files:
+            try:
+                results.append(self.get_file(path, revision))
+            except FileNotFoundError:
+                results.append(None)
+
+        return results
+
     def get_keywords(self, path, revision=HEAD):
         """Returns a list of SVN keywords for a given path."""
         raise NotImplementedError
@@ -21,6 +21,7 @@ from django.utils import six
 from django.utils.datastructures import SortedDict
 from django.utils.six.moves.urllib.parse import (urlsplit, urlunsplit, quote)
 from django.utils.translation import ugettext as _
+from djblets.cache.backend import cache_memoize
 
 from reviewboard.scmtools.core import HEAD, PRE_CREATION
 from reviewboard.scmtools.errors import FileNotFoundError, SCMError
@@ -88,10 +89,10 @@ class Client(base.Client):
         # Find out if this file has any keyword expansion set.
         # If it does, collapse these keywords. This is because SVN
         # will return the file expanded to us, which would break patching.
-        keywords = self.client.propget("svn:keywords", normpath, normrev,
-                                       recurse=True)
-        if normpath in keywords:
-            data = self.collapse_keywords(data, keywords[normpath])
+        keywords = self._get_file_keywords(normpath, normrev)
+
+        if keywords:
+            data = self.collapse_keywords(data, keywords)
 
         return data
 
@@ -100,9 +101,21 @@ class Client(base.Client):
         return self._do_on_path(self._get_file_data, path, revision)
 
     def _get_file_keywords(self, normpath, normrev):
-        keywords = self.client.propget("svn:keywords", normpath, normrev,
-                                       recurse=True)
-        return keywords.get(normpath)
+        def _fetch_keywords():
+            keywords = self.client.propget('svn:keywords', normpath, normrev,
+                                           recurse=False)
+
+            return keywords.get(normpath) or ''
+
+        # The properties of a path at a given revision never change, so
+        # they're cached, saving a round trip to the server on every fetch
+        # of the file. HEAD is a moving target, so it's always looked up.
+        if normrev.kind == opt_revision_kind.number:
+            return cache_memoize('svn-keywords:%s@%s' % (normpath,
+                                                         normrev.number),
+                                 _fetch_keywords) or None
+        else:
+            return _fetch_keywords() or None
 
     def get_keywords(self, path, revision=HEAD):
         """Returns a list of SVN keywords for a given path."""
@@ -27,6 +27,23 @@ from reviewboard.scmtools.svn import base, SVNTool
 B = six.binary_type
 DIFF_UNIFIED = [B('-u')]
 SVN_KEYWORDS = B('svn:keywords')
+SVN_EOL_STYLE = B('svn:eol-style')
+
+# Line endings to use for files with an svn:eol-style property. Files are
+# stored with Unix line endings, and translated to these when fetched.
+EOL_STYLES = {
+    B('CRLF'): B('\r\n'),
+    B('CR'): B('\r'),
+}
+
+# Subversion error codes meaning that a path doesn't exist at a revision.
+# Any other errors are treated as problems with the session.
+NOT_FOUND_ERROR_CODES = (
+    160006,  # SVN_ERR_FS_NO_SUCH_REVISION
+    160013,  # SVN_ERR_FS_NOT_FOUND
+    160017,  # SVN_ERR_FS_NOT_FILE
+    175007,  # SVN_ERR_RA_DAV_PATH_NOT_FOUND
+)
 
 
 class Client(base.Client):
@@ -38,6 +55,7 @@ class Client(base.Client):
         self.config_dir = B(config_dir)
 
         self._ssl_trust_prompt_cb = None
+        self._ra = None
 
         auth_providers = [
             ra.get_simple_provider(),
@@ -66,12 +84,30 @@ class Client(base.Client):
     def set_ssl_server_trust_prompt(self, cb):
         self._ssl_trust_prompt_cb = cb
 
+    @property
+    def ra(self):
+        """The remote access session for the repository.
+
+        This is opened on first use and kept for the life of the client, so
+        that fetches don't need to reconnect and authenticate each time. If
+        the session fails, it's discarded and reopened on next use.
+        """
+        if self._ra is None:
+            self._ra = ra.RemoteAccess(self.repopath, auth=self.auth)
+
+        return self._ra
+
     def get_file(self, path, revision=HEAD):
         """Returns the contents of a given file at the given revision."""
         if not path:
             raise FileNotFoundError(path, revision)
         revnum = self._normalize_revision(revision)
         path = B(self.normalize_path(path))
+
+        if path.startswith(self.repopath + B('/')):
+            return self._get_file_from_session(
+                path[len(self.repopath) + 1:], revision, revnum)
+
         data = six.StringIO()
         try:
             self.client.cat(path, data, revnum)
@@ -83,6 +119,124 @@ class Client(base.Client):
             contents = self.collapse_keywords(contents, keywords)
         return contents
 
+    def get_files(self, files):
+        """Returns the contents of several files.
+
+        ``files`` is a list of (path, revision) tuples. The contents are
+        returned in the same order, with None for any files that don't
+        exist.
+
+        Files in the repository are all fetched over the one remote access
+        session. Files at HEAD are fetched at the same revision, which is
+        looked up once, so that they're consistent with each other.
+        """
+        head_revnum = None
+        results = []
+
+        for path, revision in files:
+            try:
+                if not path:
+                    raise FileNotFoundError(path, revision)
+
+                revnum = self._normalize_revision(revision)
+                normpath = B(self.normalize_path(path))
+
+                if not normpath.startswith(self.repopath + B('/')):
+                    results.append(self.get_file(path, revision))
+                    continue
+
+                if revnum == B('HEAD'):
+                    if head_revnum is None:
+                        head_revnum = self._get_head_revnum()
+
+                    revnum = head_revnum
+
+                results.append(self._get_file_from_session(
+                    normpath[len(self.repopath) + 1:], revision, revnum))
+            except FileNotFoundError:
+                results.append(None)
+
+        return results
+
+    def _get_head_revnum(self):
+        """Returns the latest revision number in the repository.
+
+        If it can't be looked up, this returns -1, which fetches files at
+        the latest revision at the time of each fetch.
+        """
+        try:
+            return self.ra.get_latest_revnum()
+        except SubversionException as e:
+            self._ra = None
+
+            logging.warning('Unable to look up the latest revision of %s: '
+                            '%s',
+                            self.repopath, e)
+
+            return -1
+
+    def _get_file_from_session(self, relpath, revision, revnum):
+        """Returns the contents of a file using the remote access session.
+
+        The file's contents and properties are fetched together, in a
+        single request to the server. The contents come back exactly as
+        stored in the repository, so keywords are already collapsed, but
+        line endings need to be translated for the svn:eol-style property.
+        """
+        if revnum == B('HEAD'):
+            revnum = -1
+
+        for attempt in range(2):
+            try:
+                data, props = self._fetch_file_from_session(relpath, revnum)
+                break
+            except SubversionException as e:
+                if self._get_error_code(e) in NOT_FOUND_ERROR_CODES:
+                    raise FileNotFoundError(relpath, revision,
+                                            detail=six.text_type(e))
+
+                # The session may have been dropped by the server, or left
+                # in a bad state. Start a new one and try again.
+                self._ra = None
+
+                if attempt > 0:
+                    raise SCMError(six.text_type(e))
+
+                logging.warning('Error fetching %s at revision %s using '
+                                'the Subversion session for %s. '
+                                'Reconnecting: %s',
+                                relpath, revision, self.repopath, e)
+
+        contents = data.getvalue()
+        eol = EOL_STYLES.get(props.get(SVN_EOL_STYLE))
+
+        if eol:
+            contents = contents.replace(B('\n'), eol)
+
+        keywords = props.get(SVN_KEYWORDS)
+
+        if keywords:
+            contents = self.collapse_keywords(contents, keywords)
+
+        return contents
+
+    def _fetch_file_from_session(self, relpath, revnum):
+        """Fetches a file and its properties using the session.
+
+        This returns a tuple of the file data and the properties.
+        """
+        data = six.StringIO()
+        props = self.ra.get_file(relpath, data, revnum)[1]
+
+        return data, props
+
+    def _get_error_code(self, e):
+        """Returns the Subversion error code from a SubversionException."""
+        if len(e.args) > 1:
+            return e.args[1]
+
+        return None
+
     def get_keywords(self, path, revision=HEAD):
         """Returns a list of SVN keywords for a given path."""
         revnum = self._normalize_revision(revision, negatives_allowed=False)
@@ -2,6 +2,8 @@
 from __future__ import unicode_literals
 
 import os
+import shutil
+import signal
 from errno import ECONNREFUSED
 from hashlib import md5
 from socket import error as SocketError
@@ -13,7 +15,9 @@ from django.contrib.auth.models import AnonymousUser, User
 from django.core.cache import cache
 from django.utils import six
 from django.utils.six.moves import zip_longest
+from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.filesystem import is_exe_in_path
+from kgb import SpyAgency
 import nose
 
 from reviewboard.diffviewer.diffutils import patch
@@ -24,15 +28,29 @@ from reviewboard.hostingsvcs.service import (HostingService,
                                              register_hosting_service,
                                              unregister_hosting_service)
 from reviewboard.reviews.models import Group
+from reviewboard.scmtools.commit_index import (get_indexed_commits,
+                                               update_commit_index,
+                                               update_commit_indexes)
 from reviewboard.scmtools.core import (Branch, ChangeSet, Commit, Revision,
                                        HEAD, PRE_CREATION)
 from reviewboard.scmtools.errors import (SCMError, FileNotFoundError,
                                          RepositoryNotFoundError,
                                          AuthenticationError)
 from reviewboard.scmtools.forms import RepositoryForm
-from reviewboard.scmtools.git import ShortSHA1Error
-from reviewboard.scmtools.models import Repository, Tool
-from reviewboard.scmtools.perforce import STunnelProxy, STUNNEL_SERVER
+from reviewboard.scmtools.git import (GitBlobCache, GitCatFileProcess,
+                                      ShortSHA1Error,
+                                      get_cat_file_process, git_blob_cache)
+from reviewboard.scmtools.hg import (HgCommandServer, HgWebClient,
+                                     hg_command_server_pool)
+from reviewboard.scmtools.mirrors import (MIRROR_STATE_OK,
+                                          MIRROR_STATE_OVER_QUOTA,
+                                          get_mirror_file,
+                                          get_mirror_path,
+                                          get_mirror_status,
+                                          update_mirror, update_mirrors)
+from reviewboard.scmtools.models import IndexedCommit, Repository, Tool
+from reviewboard.scmtools.perforce import (PerforceConnectionPool,
+                                           STunnelProxy, STUNNEL_SERVER)
 from reviewboard.scmtools.signals import (checked_file_exists,
                                           checking_file_exists,
                                           fetched_file, fetching_file)
@@ -343,6 +361,92 @@ class RepositoryTests(TestCase):
         self.assertEqual(num_calls['get_file'], 1)
         self.assertEqual(num_calls['get_file_exists'], 0)
 
+    def test_get_change_caching(self):
+        """Testing Repository.get_change caches changes for full SHAs"""
+        def get_change(self, revision):
+            num_calls['get_change'] += 1
+            return Commit(id=revision, message='Commit message',
+                          diff=b'diff data')
+
+        num_calls = {
+            'get_change': 0,
+        }
+
+        self.scmtool_cls.get_change = get_change
+
+        try:
+            revision = 'e965047c7c79e65a03b4a0e36e6e51d1ab6b1bc5'
+            change1 = self.repository.get_change(revision)
+            change2 = self.repository.get_change(revision)
+
+            self.assertEqual(change1.diff, b'diff data')
+            self.assertEqual(change2.diff, b'diff data')
+            self.assertEqual(num_calls['get_change'], 1)
+
+            # Branch names may refer to a different change later.
+            self.repository.get_change('master')
+            self.repository.get_change('master')
+            self.assertEqual(num_calls['get_change'], 3)
+        finally:
+            del self.scmtool_cls.get_change
+
+    def test_get_files_exist(self):
+        """Testing Repository.get_files_exist"""
+        def file_exists(self, path, revision):
+            num_calls['get_file_exists'] += 1
+            return path == 'readme'
+
+        num_calls = {
+            'get_file_exists': 0,
+        }
+
+        self.scmtool_cls.file_exists = file_exists
+
+        files = [('readme', 'e965047'), ('missing', 'e965047')]
+
+        self.assertEqual(self.repository.get_files_exist(files),
+                         [True, False])
+        self.assertEqual(self.repository.get_files_exist(files),
+                         [True, False])
+        self.assertEqual(num_calls['get_file_exists'], 3)
+
+    def test_get_files_exist_with_batch_file_fetches(self):
+        """Testing Repository.get_files_exist with an SCMTool supporting
+        batch file fetches
+        """
+        def get_files(self, files):
+            fetched_files.append(files)
+
+            return [
+                (path == 'readme' and b'Hello\n') or None
+                for path, revision in files
+            ]
+
+        def get_file(self, path, revision):
+            raise FileNotFoundError(path, revision)
+
+        fetched_files = []
+
+        self.scmtool_cls.supports_batch_file_fetches = True
+        self.scmtool_cls.get_files = get_files
+        self.scmtool_cls.get_file = get_file
+
+        try:
+            files = [('readme', 'e965047'), ('missing', 'e965047')]
+
+            self.assertEqual(self.repository.get_files_exist(files),
+                             [True, False])
+            self.assertEqual(self.repository.get_files_exist(files),
+                             [True, False])
+            self.assertEqual(fetched_files, [files, [files[1]]])
+
+            # The contents should have been cached for display.
+            self.assertEqual(self.repository.get_file('readme', 'e965047'),
+                             b'Hello\n')
+        finally:
+            del self.scmtool_cls.supports_batch_file_fetches
+            del self.scmtool_cls.get_files
+
     def test_get_file_exists_signals(self):
         """Testing Repository.get_file_exists emits signals"""
         def on_checking(sender, path, revision, request, **kwargs):
@@ -542,6 +646,24 @@ class CVSTests(SCMTestCase):
             '\n'
             'test content\n')
 
+    def test_get_files(self):
+        """Testing CVSTool.get_files"""
+        value = self.tool.get_files([
+            ('test/testfile', Revision('1.1')),
+            ('test/testfile2', Revision('1.1')),
+            (self.tool.repopath + '/test/testfile,v', Revision('1.1')),
+            ('test/testfile', Revision('1.2')),
+        ])
+
+        self.assertEqual(
+            value,
+            [
+                b'test content\n',
+                None,
+                b'test content\n',
+                b'$Id$\n$Author$\n\ntest content\n',
+            ])
+
     def test_revision_parsing(self):
         """Testing CVSTool revision number parsing"""
         self.assertEqual(self.tool.parse_diff_revision('', 'PRE-CREATION')[1],
@@ -889,6 +1011,35 @@ class CommonSVNTestsBase(SCMTestCase):
         self.assertRaises(FileNotFoundError,
                           lambda: self.tool.get_file('hello', PRE_CREATION))
 
+    def test_get_files(self):
+        """Testing SVN (<backend>) get_files"""
+        rev = Revision('2')
+        file = 'trunk/doc/misc-docs/Makefile'
+
+        self.assertTrue(self.tool.supports_batch_file_fetches)
+        self.assertEqual(
+            self.tool.get_files([
+                (file, rev),
+                ('trunk/doc/misc-docs/Makefile2', rev),
+                ('/' + file, rev),
+                (file, HEAD),
+                ('', rev),
+                (file, PRE_CREATION),
+            ]),
+            [
+                self.tool.get_file(file, rev),
+                None,
+                self.tool.get_file(file, rev),
+                self.tool.get_file(file, HEAD),
+                None,
+                None,
+            ])
+
+    def test_get_client_cached(self):
+        """Testing SVN (<backend>) reuses clients for a repository"""
+        tool = self.repository.get_scmtool()
+        self.assertIs(tool.client, self.tool.client)
+
     def test_revision_parsing(self):
         """Testing SVN (<backend>) revision number parsing"""
         self.assertEqual(
@@ -1245,6 +1396,56 @@ class SubvertpyTests(CommonSVNTestsBase):
             self.assertEqual(self.tool.client.collapse_keywords(data, keyword),
                              result)
 
+    def test_get_file_with_session_error(self):
+        """Testing SVN (<backend>) get_file reconnects after a session
+        error
+        """
+        from subvertpy import SubversionException
+
+        client = self.tool.client
+        errors = [SubversionException('Connection reset', 210002)]
+        fetch_file = client._fetch_file_from_session
+
+        def _fetch_file_from_session(*args):
+            if errors:
+                raise errors.pop()
+
+            return fetch_file(*args)
+
+        client._fetch_file_from_session = _fetch_file_from_session
+        old_ra = client.ra
+
+        self.assertIn(b'NAME = misc-docs',
+                      self.tool.get_file('trunk/doc/misc-docs/Makefile',
+                                         Revision('2')))
+        self.assertFalse(errors)
+        self.assertIsNot(client.ra, old_ra)
+
+    def test_get_file_with_repeated_session_error(self):
+        """Testing SVN (<backend>) get_file with repeated session errors"""
+        from subvertpy import SubversionException
+
+        def _fetch_file_from_session(*args):
+            raise SubversionException('Connection reset', 210002)
+
+        self.tool.client._fetch_file_from_session = _fetch_file_from_session
+
+        self.assertRaises(SCMError,
+                          lambda: self.tool.get_file(
+                              'trunk/doc/misc-docs/Makefile', Revision('2')))
+
+    def test_get_file_with_missing_file(self):
+        """Testing SVN (<backend>) get_file with a missing file keeps the
+        session
+        """
+        client = self.tool.client
+        old_ra = client.ra
+
+        self.assertRaises(FileNotFoundError,
+                          lambda: self.tool.get_file('trunk/missing-file',
+                                                     Revision('2')))
+        self.assertIs(client.ra, old_ra)
+
 
 class PerforceTests(SCMTestCase):
     """Unit tests for perforce.
@@ -1586,6 +1787,115 @@ class PerforceStunnelTests(SCMTestCase):
                          '227bdd87b052fcad9369e65c7bf23fd0')
 
 
+class _FakeP4(object):
+    def __init__(self, port):
+        self.port = port
+        self._connected = True
+
+    def connected(self):
+        return self._connected
+
+    def disconnect(self):
+        self._connected = False
+
+
+class _FakeSTunnelProxy(object):
+    port = 30000
+    num_shutdowns = 0
+
+    def shutdown(self):
+        self.num_shutdowns += 1
+
+
+class _FakePerforceClient(object):
+    def __init__(self, p4port='localhost:1666', use_stunnel=False):
+        self.p4port = p4port
+        self.use_stunnel = use_stunnel
+        self.connection_key = (p4port, 'user')
+        self.connections = []
+
+    def _open_connection(self, port):
+        p4 = _FakeP4(port)
+        self.connections.append(p4)
+
+        return p4
+
+
+class PerforceConnectionPoolTests(TestCase):
+    """Unit tests for PerforceConnectionPool."""
+    def setUp(self):
+        super(PerforceConnectionPoolTests, self).setUp()
+
+        self.pool = PerforceConnectionPool()
+        self.client = _FakePerforceClient()
+
+    def test_connection_reuse(self):
+        """Testing PerforceConnectionPool reuses connections"""
+        with self.pool.connect(self.client) as p4:
+            pass
+
+        with self.pool.connect(self.client) as p4_2:
+            self.assertIs(p4_2, p4)
+
+        self.assertEqual(len(self.client.connections), 1)
+        self.assertTrue(p4.connected())
+
+    def test_connection_with_error(self):
+        """Testing PerforceConnectionPool closes connections on errors"""
+        try:
+            with self.pool.connect(self.client) as p4:
+                raise SCMError('Oh no')
+        except SCMError:
+            pass
+
+        self.assertFalse(p4.connected())
+
+        with self.pool.connect(self.client) as p4_2:
+            self.assertIsNot(p4_2, p4)
+
+    def test_dropped_connection(self):
+        """Testing PerforceConnectionPool with a dropped idle connection"""
+        with self.pool.connect(self.client) as p4:
+            pass
+
+        p4._connected = False
+
+        with self.pool.connect(self.client) as p4_2:
+            self.assertIsNot(p4_2, p4)
+
+        self.assertEqual(len(self.client.connections), 2)
+
+    def test_close_idle_connections(self):
+        """Testing PerforceConnectionPool.close_idle_connections"""
+        with self.pool.connect(self.client) as p4:
+            pass
+
+        self.pool.close_idle_connections(60)
+        self.assertTrue(p4.connected())
+
+        self.pool.close_idle_connections()
+        self.assertFalse(p4.connected())
+
+    def test_shared_stunnel_proxy(self):
+        """Testing PerforceConnectionPool shares a stunnel proxy between
+        connections
+        """
+        client = _FakePerforceClient(use_stunnel=True)
+        proxy = _FakeSTunnelProxy()
+        self.pool._proxies[client.p4port] = proxy
+
+        with self.pool.connect(client) as p4:
+            with self.pool.connect(client) as p4_2:
+                self.assertIsNot(p4_2, p4)
+
+        self.assertEqual([conn.port for conn in client.connections],
+                         ['127.0.0.1:30000', '127.0.0.1:30000'])
+
+        self.pool.clear()
+        self.assertEqual(proxy.num_shutdowns, 1)
+        self.assertNotIn(client.p4port, self.pool._proxies)
+
+
 class MercurialTests(SCMTestCase):
     """Unit tests for mercurial."""
     fixtures = ['test_scmtools']
@@ -1607,6 +1917,34 @@ class MercurialTests(SCMTestCase):
     def _first_file_in_diff(self, diff):
         return self.tool.get_parser(diff).parse()[0]
 
+    def test_make_auth_env(self):
+        """Testing HgTool passes hgweb credentials in a private config
+        file
+        """
+        repository = Repository(name='Test HG',
+                                path='http://hg.example.com/repo',
+                                username='user',
+                                password='pass\nword',
+                                tool=Tool.objects.get(name='Mercurial'))
+        tool = repository.get_scmtool()
+
+        with tool._make_auth_env() as env:
+            hgrc_path = env['HGRCPATH'].split(os.pathsep)[-1]
+            self.assertEqual(os.stat(hgrc_path).st_mode & 0o777, 0o600)
+
+            with open(hgrc_path, 'r') as f:
+                self.assertEqual(
+                    f.read(),
+                    '[auth]\n'
+                    'reviewboard.prefix = http://hg.example.com/repo\n'
+                    'reviewboard.username = user\n'
+                    'reviewboard.password = password\n')
+
+        self.assertFalse(os.path.exists(hgrc_path))
+
+        with self.tool._make_auth_env() as env:
+            self.assertEqual(env, {})
+
     def test_patch_creates_new_file(self):
         """Testing HgTool with a patch that creates a new file"""
         self.assertEqual(
@@ -1775,6 +2113,43 @@ class MercurialTests(SCMTestCase):
         self.assertRaises(FileNotFoundError,
                           lambda: self.tool.get_file('hello', PRE_CREATION))
 
+    def test_get_file_reuses_command_server(self):
+        """Testing HgTool.get_file reuses the Mercurial command server"""
+        hg_command_server_pool.clear()
+        rev = Revision('661e5dd3c493')
+
+        self.assertEqual(self.tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+
+        with hg_command_server_pool.connect(self.repository.path) as server:
+            self.assertEqual(server.run_command(['cat', '--rev',
+                                                 '661e5dd3c493',
+                                                 'doc/readme'])[:2],
+                             (0, b'Hello\n\ngoodbye\n'))
+
+        with hg_command_server_pool.connect(self.repository.path) as server2:
+            self.assertIs(server2, server)
+
+    def test_command_server_with_read_timeout(self):
+        """Testing HgCommandServer stops a server that stops responding"""
+        server = HgCommandServer(self.repository.path, read_timeout=0.1)
+
+        try:
+            self.assertEqual(server.run_command(['cat', '--rev',
+                                                 '661e5dd3c493',
+                                                 'doc/readme'])[:2],
+                             (0, b'Hello\n\ngoodbye\n'))
+            process = server._process
+
+            os.kill(process.pid, signal.SIGSTOP)
+
+            self.assertRaises(SCMError,
+                              lambda: server.run_command(['root']))
+            self.assertFalse(server.alive)
+            self.assertIsNotNone(process.poll())
+        finally:
+            server.close()
+
     def test_interface(self):
         """Testing basic HgTool API"""
         self.assertTrue(self.tool.get_diffs_use_absolute_paths())
@@ -1799,6 +2174,60 @@ class MercurialTests(SCMTestCase):
         self.assertTrue(not tool.file_exists('TODO.rstNotFound', rev))
 
 
+class _FakeHgWebClient(HgWebClient):
+    """An HgWebClient that serves files using only the "raw" URL style."""
+    def __init__(self, *args, **kwargs):
+        super(_FakeHgWebClient, self).__init__(*args, **kwargs)
+        self.urls = []
+
+    def get_file_http(self, url, path, revision):
+        self.urls.append(url)
+
+        if '/raw/' not in url:
+            raise SCMError('Not found')
+        elif path == 'missing':
+            raise FileNotFoundError(path, revision)
+
+        return b'contents'
+
+
+class HgWebClientTests(TestCase):
+    """Unit tests for HgWebClient."""
+    def setUp(self):
+        super(HgWebClientTests, self).setUp()
+
+        cache.clear()
+
+    def test_cat_file_remembers_url_style(self):
+        """Testing HgWebClient.cat_file remembers the working URL style"""
+        client = _FakeHgWebClient('http://hg.example.com/repo/', None, None)
+        self.assertEqual(client.cat_file('README', '123'), b'contents')
+        self.assertEqual(client.urls, [
+            'http://hg.example.com/repo/raw-file/123/README',
+            'http://hg.example.com/repo/raw/123/README',
+        ])
+
+        client = _FakeHgWebClient('http://hg.example.com/repo/', None, None)
+        self.assertEqual(client.cat_file('README', '456'), b'contents')
+        self.assertEqual(client.urls, [
+            'http://hg.example.com/repo/raw/456/README',
+        ])
+
+    def test_cat_file_with_missing_file(self):
+        """Testing HgWebClient.cat_file with a missing file only tries the
+        working URL style
+        """
+        client = _FakeHgWebClient('http://hg.example.com/repo', None, None)
+        client.cat_file('README', '123')
+        client.urls = []
+
+        self.assertRaises(FileNotFoundError,
+                          lambda: client.cat_file('missing', '123'))
+        self.assertEqual(client.urls, [
+            'http://hg.example.com/repo/raw/123/missing',
+        ])
+
+
 class GitTests(SCMTestCase):
     """Unit tests for Git."""
     fixtures = ['test_scmtools']
@@ -2447,6 +2876,90 @@ class GitTests(SCMTestCase):
         self.assertRaises(FileNotFoundError,
                           lambda: self.tool.get_file("readme", "0000000"))
 
+    def test_get_file_reuses_cat_file_process(self):
+        """Testing GitTool.get_file reuses the git cat-file process"""
+        git_blob_cache.clear()
+        cat_file = get_cat_file_process(self.tool.client.git_dir)
+        cat_file.close()
+
+        self.assertEqual(self.tool.get_file('readme', 'e965047'), b'Hello\n')
+        process = cat_file._process
+        self.assertIsNotNone(process)
+
+        self.assertEqual(self.tool.get_file('readme'), b'Hello there\n')
+        self.assertIs(cat_file._process, process)
+
+        # A process that has died should be replaced.
+        process.kill()
+        process.wait()
+
+        self.assertEqual(self.tool.get_file('readme', 'd6613f5'),
+                         b'Hello there\n')
+        self.assertIsNot(cat_file._process, process)
+
+    def test_cat_file_process_with_read_timeout(self):
+        """Testing GitCatFileProcess restarts a process that stops
+        responding
+        """
+        cat_file = GitCatFileProcess(self.tool.client.git_dir,
+                                     read_timeout=0.1)
+
+        try:
+            self.assertEqual(cat_file.query('e965047')[3], b'Hello\n')
+            process = cat_file._process
+
+            os.kill(process.pid, signal.SIGSTOP)
+
+            self.assertRaises(SCMError, lambda: cat_file.query('d6613f5'))
+            self.assertIsNone(cat_file._process)
+            self.assertIsNotNone(process.poll())
+
+            self.assertEqual(cat_file.query('d6613f5')[3], b'Hello there\n')
+            self.assertIsNot(cat_file._process, process)
+        finally:
+            cat_file.close()
+
+    def test_cat_file_process_with_chunked_reads(self):
+        """Testing GitCatFileProcess reading objects over several chunks"""
+        cat_file = GitCatFileProcess(self.tool.client.git_dir)
+        cat_file.READ_CHUNK_SIZE = 3
+
+        try:
+            self.assertEqual(cat_file.query('e965047')[3], b'Hello\n')
+            self.assertEqual(cat_file.query('d6613f5')[3], b'Hello there\n')
+            self.assertEqual(cat_file._buffer, b'')
+        finally:
+            cat_file.close()
+
+    def test_get_file_with_cached_blob(self):
+        """Testing GitTool.get_file with a cached blob"""
+        git_blob_cache.clear()
+        self.assertEqual(self.tool.get_file('readme', 'e965047'), b'Hello\n')
+        self.assertEqual(
+            git_blob_cache.get(self.tool.client.git_dir, 'e965047'),
+            b'Hello\n')
+
+        # Files at HEAD can change, so they're not cached.
+        self.tool.get_file('readme')
+        self.assertIsNone(
+            git_blob_cache.get(self.tool.client.git_dir, 'HEAD:readme'))
+
+    def test_blob_cache_evicts_least_recently_used(self):
+        """Testing GitBlobCache evicts the least recently used blobs"""
+        cache = GitBlobCache(max_size=10, max_blob_size=5)
+        cache.add('repo', 'a', b'aaaa')
+        cache.add('repo', 'b', b'bbbb')
+        cache.add('repo', 'c', b'cccccc')
+        self.assertIsNone(cache.get('repo', 'c'))
+
+        self.assertEqual(cache.get('repo', 'a'), b'aaaa')
+        cache.add('repo', 'd', b'dddd')
+
+        self.assertEqual(cache.get('repo', 'a'), b'aaaa')
+        self.assertIsNone(cache.get('repo', 'b'))
+        self.assertEqual(cache.get('repo', 'd'), b'dddd')
+        self.assertEqual(cache.size, 8)
+
     def test_parse_diff_revision_with_remote_and_short_SHA1_error(self):
         """Testing GitTool.parse_diff_revision with remote files and short
         SHA1 error
@@ -2462,6 +2975,139 @@ class GitTests(SCMTestCase):
             lambda: self.remote_tool.get_file('README', 'd7e96b3'))
 
 
+class RepositoryMirrorTests(SpyAgency, TestCase):
+    """Unit tests for local repository mirrors."""
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(RepositoryMirrorTests, self).setUp()
+
+        if not is_exe_in_path('git'):
+            raise nose.SkipTest('git binary not found')
+
+        cache.clear()
+
+        self.mirrors_dir = mkdtemp(prefix='rb-tests-')
+        self.siteconfig = SiteConfiguration.objects.get_current()
+        self.siteconfig.set('scm_mirrors_dir', self.mirrors_dir)
+        self.siteconfig.save()
+
+        # The raw file URL can't be reached, so files can only come from
+        # the mirror.
+        self.repository = Repository.objects.create(
+            name='Git test repo',
+            path=os.path.join(os.path.dirname(__file__), 'testdata',
+                              'git_repo'),
+            raw_file_url='http://localhost:1/<revision>',
+            tool=Tool.objects.get(name='Git'))
+        self.repository.extra_data['use_local_mirror'] = True
+        self.repository.save()
+
+    def tearDown(self):
+        super(RepositoryMirrorTests, self).tearDown()
+
+        self.siteconfig.set('scm_mirrors_dir', '')
+        self.siteconfig.set('scm_mirrors_max_size', 0)
+        self.siteconfig.save()
+
+        shutil.rmtree(self.mirrors_dir)
+
+    def test_update_mirrors(self):
+        """Testing update_mirrors creates and updates mirrors"""
+        self.assertEqual(update_mirrors(), 1)
+
+        mirror_path = get_mirror_path(self.repository)
+        self.assertTrue(os.path.isdir(mirror_path))
+
+        status = get_mirror_status(self.repository)
+        self.assertEqual(status['state'], MIRROR_STATE_OK)
+        self.assertTrue(status['size'] > 0)
+
+        # Updating an existing mirror should fetch into it.
+        self.assertEqual(update_mirrors(), 1)
+        self.assertEqual(get_mirror_status(self.repository)['state'],
+                         MIRROR_STATE_OK)
+
+    def test_update_mirrors_with_disabled_mirror(self):
+        """Testing update_mirrors removes mirrors that were turned off"""
+        update_mirrors()
+
+        self.repository.extra_data['use_local_mirror'] = False
+        self.repository.save()
+
+        self.assertEqual(update_mirrors(), 0)
+        self.assertFalse(os.path.exists(get_mirror_path(self.repository)))
+        self.assertIsNone(get_mirror_status(self.repository))
+
+    def test_update_mirrors_over_quota(self):
+        """Testing update_mirrors removes mirrors over the quota"""
+        repository2 = Repository.objects.create(
+            name='Git test repo 2',
+            path=self.repository.path + '/',
+            raw_file_url=self.repository.raw_file_url,
+            tool=self.repository.tool)
+        repository2.extra_data['use_local_mirror'] = True
+        repository2.save()
+
+        update_mirror(self.repository)
+        size = get_mirror_status(self.repository)['size']
+
+        # Leave room for just one of the mirrors.
+        self.siteconfig.set('scm_mirrors_max_size',
+                            1.5 * size / (1024 * 1024))
+        self.siteconfig.save()
+
+        self.assertEqual(update_mirrors(), 1)
+        self.assertTrue(os.path.isdir(get_mirror_path(self.repository)))
+        self.assertFalse(os.path.exists(get_mirror_path(repository2)))
+        status = get_mirror_status(repository2)
+        self.assertEqual(status['state'], MIRROR_STATE_OVER_QUOTA)
+        self.assertTrue(status['size'] > 0)
+
+        # The over-quota mirror shouldn't be fetched again, as it still
+        # wouldn't fit.
+        spy = self.spy_on(update_mirror)
+
+        self.assertEqual(update_mirrors(), 1)
+        self.assertEqual(len(spy.calls), 1)
+        self.assertEqual(spy.last_call.args, (self.repository,))
+        self.assertFalse(os.path.exists(get_mirror_path(repository2)))
+        self.assertEqual(get_mirror_status(repository2)['size'],
+                         status['size'])
+
+    def test_get_file(self):
+        """Testing Repository.get_file with a local mirror"""
+        update_mirrors()
+
+        self.assertEqual(self.repository.get_file('readme', 'e965047'),
+                         b'Hello\n')
+        self.assertTrue(
+            self.repository.get_file_exists('readme', 'd6613f5'))
+
+    def test_get_mirror_file_with_moving_revision(self):
+        """Testing get_mirror_file doesn't use the mirror for revisions
+        that can move
+        """
+        update_mirrors()
+        tool = self.repository.get_scmtool()
+
+        self.assertEqual(
+            get_mirror_file(self.repository, tool, 'readme', 'e965047'),
+            b'Hello\n')
+        self.assertIsNone(
+            get_mirror_file(self.repository, tool, 'readme', HEAD))
+        self.assertIsNone(
+            get_mirror_file(self.repository, tool, 'readme', 'master'))
+
+    def test_get_file_without_mirror(self):
+        """Testing Repository.get_file falls back to the repository before
+        the mirror is created
+        """
+        self.assertRaises(
+            SCMError,
+            lambda: self.repository.get_file('readme', 'e965047'))
+
+
 class PolicyTests(TestCase):
     fixtures = ['test_scmtools']
 
@@ -3038,3 +3684,116 @@ class RepositoryFormTests(TestCase):
 
         form = RepositoryForm(instance=repository)
         self.assertTrue(form._get_field_data('bug_tracker_use_hosting'))
+
+
+class CommitIndexTests(TestCase):
+    """Unit tests for local commit history indexes."""
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(CommitIndexTests, self).setUp()
+
+        cache.clear()
+
+        self.repository = self.create_repository(tool_name='Test')
+        self.scmtool_cls = self.repository.get_scmtool().__class__
+        self.old_get_commits = self.scmtool_cls.get_commits
+        self.fetched_pages = []
+
+        def get_commits(tool, branch=None, start=None):
+            self.fetched_pages.append(start)
+
+            ids = [commit.id for commit in self.history]
+            i = start and ids.index(start) or 0
+
+            return self.history[i:i + 30]
+
+        self.scmtool_cls.get_commits = get_commits
+        self._set_history(75)
+
+    def tearDown(self):
+        super(CommitIndexTests, self).tearDown()
+
+        self.scmtool_cls.get_commits = self.old_get_commits
+        cache.clear()
+
+    def test_get_indexed_commits(self):
+        """Testing get_indexed_commits builds and pages through the index"""
+        commits = get_indexed_commits(self.repository)
+        self.assertEqual([commit.id for commit in commits],
+                         [six.text_type(i) for i in range(75, 45, -1)])
+        self.assertEqual(self.fetched_pages, [None])
+        self.assertEqual(IndexedCommit.objects.count(), 30)
+
+        commits = get_indexed_commits(self.repository, start='60')
+        self.assertEqual([commit.id for commit in commits],
+                         [six.text_type(i) for i in range(60, 30, -1)])
+        self.assertEqual(self.fetched_pages, [None, '45'])
+        self.assertEqual(IndexedCommit.objects.count(), 60)
+
+        # Pages within the index don't need to fetch anything.
+        commits = get_indexed_commits(self.repository, start='50')
+        self.assertEqual(len(commits), 30)
+        self.assertEqual(commits[0].message, 'Commit 50')
+        self.assertEqual(commits[0].parent, '49')
+        self.assertEqual(len(self.fetched_pages), 2)
+
+        get_indexed_commits(self.repository)
+        self.assertEqual(len(self.fetched_pages), 2)
+
+    def test_get_indexed_commits_with_unknown_start(self):
+        """Testing get_indexed_commits with a commit not in the index"""
+        commits = get_indexed_commits(self.repository, start='20')
+        self.assertEqual(len(commits), 20)
+        self.assertEqual(commits[0].id, '20')
+        self.assertFalse(IndexedCommit.objects.exists())
+
+    def test_update_commit_index(self):
+        """Testing update_commit_index adds new commits"""
+        self.assertEqual(update_commit_index(self.repository), 30)
+
+        self._set_history(110)
+        self.assertEqual(update_commit_index(self.repository), 35)
+        self.assertEqual(self.fetched_pages, [None, None, '80'])
+
+        commits = get_indexed_commits(self.repository)
+        self.assertEqual(commits[0].id, '110')
+        self.assertEqual(len(self.fetched_pages), 3)
+
+        commits = get_indexed_commits(self.repository, start='75')
+        self.assertEqual([commit.id for commit in commits],
+                         [six.text_type(i) for i in range(75, 45, -1)])
+        self.assertEqual(len(self.fetched_pages), 3)
+
+    def test_update_commit_index_with_rewritten_history(self):
+        """Testing update_commit_index rebuilds the index when the newest
+        commit is gone
+        """
+        update_commit_index(self.repository)
+
+        self._set_history(40, prefix='new')
+        self.assertEqual(update_commit_index(self.repository), 40)
+
+        commits = get_indexed_commits(self.repository)
+        self.assertEqual(commits[0].id, 'new40')
+        self.assertFalse(IndexedCommit.objects.filter(
+            commit_id='75').exists())
+
+    def test_update_commit_indexes(self):
+        """Testing update_commit_indexes updates existing indexes"""
+        self.assertEqual(update_commit_indexes(), 0)
+
+        get_indexed_commits(self.repository)
+        self._set_history(80)
+
+        self.assertEqual(update_commit_indexes(), 1)
+        self.assertEqual(get_indexed_commits(self.repository)[0].id, '80')
+
+    def _set_history(self, count, prefix=''):
+        self.history = [
+            Commit('user%d' % i, '%s%d' % (prefix, i),
+                   '2013-01-01T%02d:00:00.0000000' % (i % 24),
+                   'Commit %d' % i,
+                   i > 1 and '%s%d' % (prefix, i - 1) or '')
+            for i in range(count, 0, -1)
+        ]
@@ -265,6 +265,19 @@ HOSTINGSVCS_HOOK_REGEX = (r'(?:Reviewed at %(server_url)sr/|Review request #)'
                           r'(?P<id>\d+)')
 HOSTINGSVCS_HOOK_REGEX_FLAGS = re.IGNORECASE
 
+# Whether hosting service webhooks should fetch and cache the changes for
+# pushed commits in the background, so that review requests can be created
+# from them more quickly. This can be overriden in settings_local.py.
+HOSTINGSVCS_HOOK_PREFETCH_CHANGES = False
+
+# The maximum number of seconds that a request for updates to a review
+# request can be held open, waiting for something new to be published. Each
+# waiting request occupies a worker for that long, so this should only be
+# enabled on deployments using asynchronous (evented) workers. When 0,
+# clients check for updates periodically instead. This can be overriden in
+# settings_local.py.
+REVIEW_REQUEST_UPDATES_MAX_WAIT = 0
+
 
 # The SVN backends to attempt to load, in order. This is useful if more than
 # one type of backend is installed on a server, and you need to force usage
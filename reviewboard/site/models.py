@@ -30,6 +30,8 @@ from django.db import models
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
+from reviewboard.accounts.access import get_access_snapshot
+
 
 @python_2_unicode_compatible
 class LocalSite(models.Model):
@@ -65,7 +67,8 @@ class LocalSite(models.Model):
         """
         return (self.public or
                 (user.is_authenticated() and
-                 (user.is_staff or self.users.filter(pk=user.pk).exists())))
+                 (user.is_staff or
+                  self.pk in get_access_snapshot(user).local_site_ids)))
 
     def is_mutable_by(self, user, perm='site.change_localsite'):
         """Returns whether or not a user can modify settings in a LocalSite.
@@ -77,7 +80,8 @@ class LocalSite(models.Model):
         modified, but a different permission can be passed to check for
         another object.
         """
-        return user.has_perm(perm) or self.admins.filter(pk=user.pk).exists()
+        return (user.has_perm(perm) or
+                self.pk in get_access_snapshot(user).admin_local_site_ids)
 
     def __str__(self):
         return self.name
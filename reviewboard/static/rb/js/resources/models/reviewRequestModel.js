@@ -333,23 +333,74 @@ RB.ReviewRequest = RB.BaseResource.extend({
      * This is called periodically after an initial call to
      * beginCheckForUpdates. It will see if there's a new update yet on the
      * server, and if there is, trigger the 'updated' event.
+     *
+     * Checks are made every CHECK_UPDATES_MSECS, passing the update token
+     * from the last response so that the server can cheaply report that
+     * nothing has changed.
+     *
+     * If the server allows waiting for updates (update_wait is non-zero),
+     * the request is instead held open by the server until there's a new
+     * update (or until it times out), and the next check is made right
+     * away.
+     *
+     * This doesn't go through RB.apiCall, as API calls are queued, and
+     * a waiting request would hold up every other call on the page.
      */
     _checkForUpdates: function() {
-        RB.apiCall({
+        var data = {
+                api_format: 'json'
+            },
+            waited = false;
+
+        if (this._updateToken) {
+            data['update-token'] = this._updateToken;
+
+            if (this._updateWait) {
+                data.wait = this._updateWait;
+                waited = true;
+            }
+        }
+
+        $.ajax({
             type: 'GET',
-            prefix: this.get('sitePrefix'),
-            noActivityIndicator: true,
             url: this.get('links').last_update.href,
+            data: data,
+            dataType: 'json',
             success: _.bind(function(rsp) {
-                var lastUpdate = rsp.last_update;
-                if ((this._checkUpdatesType === undefined ||
-                     this._checkUpdatesType === lastUpdate.type) &&
-                    this._lastUpdateTimestamp !== lastUpdate.timestamp) {
-                    this.trigger('updated', lastUpdate);
-                }
+                var lastUpdate = rsp && rsp.last_update,
+                    userSession = RB.UserSession.instance;
+
+                /*
+                 * A missing response means there was nothing new (HTTP 304).
+                 *
+                 * When waiting, updates made by the current user are
+                 * skipped, since the server may report them before the page
+                 * has had a chance to call markUpdated(). Without waiting,
+                 * the timestamp recorded by markUpdated() is enough to skip
+                 * them, and updates made by the current user elsewhere
+                 * (such as in another tab) are still reported.
+                 */
+                if (lastUpdate) {
+                    if ((this._checkUpdatesType === undefined ||
+                         this._checkUpdatesType === lastUpdate.type) &&
+                        this._lastUpdateTimestamp !== lastUpdate.timestamp &&
+                        !(waited && lastUpdate.user && userSession &&
+                          lastUpdate.user.username ===
+                          userSession.get('username'))) {
+                        this.trigger('updated', lastUpdate);
+                    }
 
-                this._lastUpdateTimestamp = lastUpdate.timestamp;
+                    this._lastUpdateTimestamp = lastUpdate.timestamp;
+                    this._updateToken = lastUpdate.update_token;
+                    this._updateWait = lastUpdate.update_wait || 0;
+                }
 
+                setTimeout(_.bind(this._checkForUpdates, this),
+                           (this._updateToken && this._updateWait
+                            ? RB.ReviewRequest.CHECK_UPDATES_WAIT_DELAY_MSECS
+                            : RB.ReviewRequest.CHECK_UPDATES_MSECS));
+            }, this),
+            error: _.bind(function() {
                 setTimeout(_.bind(this._checkForUpdates, this),
                            RB.ReviewRequest.CHECK_UPDATES_MSECS);
             }, this)
@@ -410,6 +461,9 @@ RB.ReviewRequest = RB.BaseResource.extend({
 }, {
     CHECK_UPDATES_MSECS: 5 * 60 * 1000, // Every 5 minutes
 
+    /* The delay between waiting requests, to avoid a tight loop. */
+    CHECK_UPDATES_WAIT_DELAY_MSECS: 1000,
+
     CLOSE_DISCARDED: 1,
     CLOSE_SUBMITTED: 2,
     PENDING: 3
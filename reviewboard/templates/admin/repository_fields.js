@@ -4,7 +4,8 @@ var HOSTING_SERVICES = {{form.hosting_service_info|json_dumps:2}};
 
 var TOOLS_INFO = {
     "none": {
-        fields: [ "raw_file_url", "username", "password", "use_ticket_auth" ],
+        fields: [ "raw_file_url", "username", "password", "use_ticket_auth",
+                  "use_local_mirror" ],
     },
 
 {% for tool in form.tool.field.queryset %}
@@ -15,6 +16,9 @@ var TOOLS_INFO = {
 {%  endif %}
 {%  if tool.supports_ticket_auth %}
            "use_ticket_auth",
+{% endif %}
+{%  if tool.supports_local_mirrors %}
+           "use_local_mirror",
 {% endif %}
            "username", "password"
         {% endspaceless %} ],
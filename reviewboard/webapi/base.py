@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 
 from django.contrib import auth
-from django.db.models import Q
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import NoReverseMatch
+from django.db.models import Manager, Q
 from django.utils import six
 from django.utils.encoding import force_unicode
 from django.utils.six.moves.urllib.parse import quote as urllib_quote
@@ -9,7 +11,8 @@ from djblets.util.decorators import augment_method_from
 from djblets.webapi.decorators import (SPECIAL_PARAMS,
                                        webapi_login_required,
                                        webapi_request_fields)
-from djblets.webapi.errors import NOT_LOGGED_IN, PERMISSION_DENIED
+from djblets.webapi.errors import (DOES_NOT_EXIST, INVALID_FORM_DATA,
+                                   NOT_LOGGED_IN, PERMISSION_DENIED)
 from djblets.webapi.resources import WebAPIResource as DjbletsWebAPIResource
 
 from reviewboard.site.models import LocalSite
@@ -17,11 +20,17 @@ from reviewboard.site.urlresolvers import local_site_reverse
 from reviewboard.webapi.decorators import (webapi_check_local_site,
                                            webapi_check_login_required)
 from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.policies import CompiledAPIPolicy
+from reviewboard.webapi.responses import (WebAPIResponseCursorPaginated,
+                                          decode_cursor)
 
 
 CUSTOM_MIMETYPE_BASE = 'application/vnd.reviewboard.org'
 EXTRA_DATA_LEN = len('extra_data.')
 
+# The first placeholder ID used when building URL templates.
+URL_TEMPLATE_PLACEHOLDER_BASE = 9182736450
+
 
 class WebAPIResource(DjbletsWebAPIResource):
     """A specialization of the Djblets WebAPIResource for Review Board."""
@@ -30,6 +39,19 @@ class WebAPIResource(DjbletsWebAPIResource):
 
     api_token_access_allowed = True
 
+    # Relations to fetch along with each page of objects returned by
+    # get_list(). These should cover anything needed to serialize the
+    # objects and their links that isn't already a field on the resource,
+    # such as the parent objects used to build URLs.
+    list_select_related = ()
+    list_prefetch_related = ()
+
+    # The fields used to sort the results of get_list() when paginating
+    # with ?start-cursor=. Together, these must uniquely identify each
+    # object, so this should end with the primary key. Cursor pagination
+    # isn't available for resources that leave this empty.
+    cursor_pagination_fields = ()
+
     @property
     def policy_id(self):
         """Returns the ID used for access policies.
@@ -47,16 +69,14 @@ class WebAPIResource(DjbletsWebAPIResource):
             if not self.api_token_access_allowed:
                 return PERMISSION_DENIED
 
-            policy = webapi_token.policy
-            resources_policy = policy.get('resources')
+            compiled_policy = \
+                WebAPIToken.objects.get_compiled_policy(webapi_token)
+            resource_id = kwargs.get(self.uri_object_key)
 
-            if resources_policy:
-                resource_id = kwargs.get(self.uri_object_key)
-
-                if not self.is_resource_method_allowed(resources_policy,
-                                                       method, resource_id):
-                    # The token's policies disallow access to this resource.
-                    return PERMISSION_DENIED
+            if not compiled_policy.is_method_allowed(self.policy_id, method,
+                                                     resource_id):
+                # The token's policies disallow access to this resource.
+                return PERMISSION_DENIED
 
         return view(request, *args, **kwargs)
 
@@ -88,6 +108,22 @@ class WebAPIResource(DjbletsWebAPIResource):
                                'returned with the number of results, instead '
                                'of the results themselves.',
             },
+            'start-cursor': {
+                'type': six.text_type,
+                'description': 'If specified, results are paginated using '
+                               'cursors instead of ``start``. This should be '
+                               'empty for the first page, and is otherwise '
+                               'provided by the ``next`` link of the '
+                               'previous page. This is only supported by '
+                               'some resources.',
+            },
+            'skip-total-results': {
+                'type': bool,
+                'description': 'If specified along with ``start-cursor``, '
+                               'the ``total_results`` field is left out of '
+                               'the payload. This saves counting every '
+                               'result on large lists.',
+            },
         }, **DjbletsWebAPIResource.get_list.optional_fields),
         required=DjbletsWebAPIResource.get_list.required_fields,
         allow_unknown=True
@@ -101,12 +137,19 @@ class WebAPIResource(DjbletsWebAPIResource):
         If ``?counts-only=1`` is passed on the URL, then this will return
         only a ``count`` field with the number of entries, instead of the
         serialized objects.
+
+        If ``?start-cursor=`` is passed on the URL, and the resource
+        supports it, results will be paginated using cursors. See
+        :py:meth:`_get_cursor_list_impl`.
         """
         if self.model and request.GET.get('counts-only', False):
             return 200, {
                 'count': self.get_queryset(request, is_list=True,
                                            *args, **kwargs).count()
             }
+        elif (self.model and self.cursor_pagination_fields and
+              'start-cursor' in request.GET):
+            return self._get_cursor_list_impl(request, *args, **kwargs)
         else:
             return self._get_list_impl(request, *args, **kwargs)
 
@@ -125,6 +168,57 @@ class WebAPIResource(DjbletsWebAPIResource):
         """
         return super(WebAPIResource, self).get_list(request, *args, **kwargs)
 
+    def _get_cursor_list_impl(self, request, *args, **kwargs):
+        """Returns the list of results, paginated using cursors.
+
+        Results are sorted by :py:attr:`cursor_pagination_fields`, and each
+        page starts right after the object pointed to by the
+        ``?start-cursor=`` value, rather than at an offset. This keeps deep
+        pages on large lists as fast as the first page. The count of all
+        results can be skipped by passing ``?skip-total-results=1``.
+        """
+        data = {
+            'links': self.get_links(self.list_child_resources,
+                                    request=request, *args, **kwargs),
+        }
+
+        if not self.has_list_access_permissions(request, *args, **kwargs):
+            return self.get_no_access_error(request, *args, **kwargs)
+
+        start_cursor = request.GET.get('start-cursor')
+
+        if start_cursor:
+            try:
+                start_values = decode_cursor(start_cursor, self.model,
+                                             self.cursor_pagination_fields)
+            except ValueError:
+                return INVALID_FORM_DATA, {
+                    'fields': {
+                        'start-cursor': ['This is not a valid cursor.'],
+                    },
+                }
+        else:
+            start_values = None
+
+        try:
+            queryset = self._get_queryset(request, is_list=True,
+                                          *args, **kwargs)
+        except ObjectDoesNotExist:
+            return DOES_NOT_EXIST
+
+        return WebAPIResponseCursorPaginated(
+            request,
+            queryset=queryset,
+            cursor_fields=self.cursor_pagination_fields,
+            start_values=start_values,
+            include_total_results=not kwargs.get('skip-total-results'),
+            results_key=self.list_result_key,
+            serialize_object_func=lambda obj:
+                self.get_serializer_for_object(obj).serialize_object(
+                    obj, request=request, *args, **kwargs),
+            extra_data=data,
+            **self.build_response_args(request))
+
     def get_href(self, obj, request, *args, **kwargs):
         """Returns the URL for this object.
 
@@ -142,6 +236,36 @@ class WebAPIResource(DjbletsWebAPIResource):
         return request.build_absolute_uri(
             self.get_item_url(request=request, **href_kwargs))
 
+    def get_parent_object(self, obj):
+        """Returns the parent of an object.
+
+        This is a specialization of the Djblets
+        WebAPIResource.get_parent_object(), which makes use of parents
+        fetched through list_prefetch_related.
+        """
+        parent_obj = getattr(obj, self.model_parent_key)
+
+        if isinstance(parent_obj, Manager):
+            parent_obj = self.get_related_object(parent_obj)
+
+        return parent_obj
+
+    def get_related_object(self, manager):
+        """Returns the single object from a related manager.
+
+        This works like ``manager.get()``, but will use any objects already
+        fetched through prefetch_related() instead of performing a new
+        query.
+        """
+        objs = manager.all()[:2]
+
+        if len(objs) == 1:
+            return objs[0]
+        elif objs:
+            raise manager.model.MultipleObjectsReturned
+        else:
+            raise manager.model.DoesNotExist
+
     def get_list_url(self, **kwargs):
         """Returns the URL to the list version of this resource.
 
@@ -203,64 +327,20 @@ class WebAPIResource(DjbletsWebAPIResource):
         allows, the method will be allowed.
 
         If no policies apply to this, then the default is to allow.
-        """
-        # First check the resource policy. For this, we'll want to look in
-        # both the resource ID and the '*' wildcard.
-        resource_policy = resources_policy.get(self.policy_id)
-
-        if resource_policy:
-            permission = self._check_resource_policy(
-                resource_policy, method, [resource_id, '*'])
-
-            if permission is not None:
-                return permission
-
-        # Nothing was found there. Now check in the global policy. Note that
-        # there isn't a sub-key of 'resources.*', so we'll check based on
-        # resources_policy.
-        if '*' in resources_policy:
-            permission = self._check_resource_policy(
-                resources_policy, method, ['*'])
 
-            if permission is not None:
-                return permission
-
-        return True
-
-    def _check_resource_policy(self, policy, method, keys):
-        """Checks the policy for a specific resource and method.
-
-        This will grab the resource policy for the given policy ID,
-        and see if a given method can be performed on that resource,
-        without factoring in any global policy rules.
+        This compiles the policy on each call. Requests made with a
+        WebAPIToken use the token's cached compiled policy instead.
+        """
+        return CompiledAPIPolicy(resources_policy).is_method_allowed(
+            self.policy_id, method, resource_id)
 
-        If the method is allowed and restrict_ids is True, this will then
-        check if the resource should be blocked based on the ID.
+    def get_policy_id_field(self, *args, **kwargs):
+        """Returns the model field matching resource IDs in token policies.
 
-        In case of a conflict, blocked policies always trump allowed
-        policies.
+        This is used to exclude objects blocked by a token's policy from
+        lists. By default, this is the model_object_key.
         """
-        for key in keys:
-            sub_policy = policy.get(key)
-
-            if sub_policy:
-                # We first want to check the specific values, to see if they've
-                # been singled out. If not found, we'll check the wildcards.
-                #
-                # Blocked values always take precedence over allowed values.
-                allowed = sub_policy.get('allow', [])
-                blocked = sub_policy.get('block', [])
-
-                if method in blocked:
-                    return False
-                elif method in allowed:
-                    return True
-                elif '*' in blocked:
-                    return False
-                elif '*' in allowed:
-                    return True
-
-        return None
+        return self.model_object_key
 
     def _get_api_token_for_request(self, request):
         webapi_token = getattr(request, '_webapi_token', None)
@@ -294,38 +374,121 @@ class WebAPIResource(DjbletsWebAPIResource):
             request, is_list=is_list, *args, **kwargs)
 
         if is_list:
+            if self.list_select_related:
+                # select_related() replaces any fields from prior calls, so
+                # include those the parent class selected for the resource's
+                # own fields.
+                queryset = queryset.select_related(*(
+                    list(getattr(self, '_select_related_fields', [])) +
+                    list(self.list_select_related)))
+
+            if self.list_prefetch_related:
+                queryset = queryset.prefetch_related(
+                    *self.list_prefetch_related)
+
             # We'll need to filter the list of results down to exclude any
             # that are blocked for GET access by the token policy.
             webapi_token = self._get_api_token_for_request(request)
 
             if webapi_token:
-                resources_policy = webapi_token.policy.get('resources', {})
-                resource_policy = resources_policy.get(self.policy_id)
-
-                if resource_policy:
-                    resource_ids = [
-                        resource_id
-                        for resource_id in six.iterkeys(resource_policy)
-                        if (resource_id != '*' and
-                            not self._check_resource_policy(
-                                resources_policy, self.policy_id, 'GET',
-                                resource_id, True))
-                    ]
-
-                    if resource_ids:
-                        queryset = queryset.exclude(**{
-                            self.model_object_key + '__in': resource_ids,
-                        })
+                exclude_q = (
+                    WebAPIToken.objects.get_compiled_policy(webapi_token)
+                    .get_list_exclude_q(
+                        self.policy_id,
+                        self.get_policy_id_field(*args, **kwargs)))
+
+                if exclude_q is not None:
+                    queryset = queryset.exclude(exclude_q)
 
         return queryset
 
     def _get_resource_url(self, name, local_site_name=None, request=None,
                           **kwargs):
-        return local_site_reverse(
-            self._build_named_url(name),
-            local_site_name=local_site_name,
-            request=request,
-            kwargs=kwargs)
+        """Returns the URL to the resource.
+
+        Serializing a list of objects reverses the same URLs for every
+        object, differing only by ID. To avoid the cost of reversing them
+        each time, the URL is reversed once per request with placeholders
+        for any integer IDs, and the resulting template is filled in for
+        each object.
+        """
+        if request is None:
+            return local_site_reverse(
+                self._build_named_url(name),
+                local_site_name=local_site_name,
+                kwargs=kwargs)
+
+        template_key = [name, local_site_name]
+        template_kwargs = {}
+        placeholders = {}
+
+        for i, (key, value) in enumerate(sorted(six.iteritems(kwargs))):
+            if (isinstance(value, six.integer_types) and
+                not isinstance(value, bool)):
+                template_key.append((key, None))
+                placeholders[key] = URL_TEMPLATE_PLACEHOLDER_BASE + i
+                template_kwargs[key] = placeholders[key]
+            else:
+                template_key.append((key, value))
+                template_kwargs[key] = value
+
+        template_key = tuple(template_key)
+
+        try:
+            url_templates = request._webapi_url_templates
+        except AttributeError:
+            url_templates = {}
+            request._webapi_url_templates = url_templates
+
+        try:
+            url_template = url_templates[template_key]
+        except KeyError:
+            url_template = self._build_url_template(
+                name, local_site_name, request, template_kwargs,
+                placeholders)
+            url_templates[template_key] = url_template
+
+        if url_template is None:
+            return local_site_reverse(
+                self._build_named_url(name),
+                local_site_name=local_site_name,
+                request=request,
+                kwargs=kwargs)
+
+        return url_template % dict(
+            (key, kwargs[key])
+            for key in six.iterkeys(placeholders)
+        )
+
+    def _build_url_template(self, name, local_site_name, request, kwargs,
+                            placeholders):
+        """Builds a template for the URL to the resource.
+
+        The URL is reversed using the placeholder IDs in ``kwargs``, which
+        are then replaced by format specifiers. If the URL can't be
+        reversed with the placeholders, or a placeholder is ambiguous, this
+        returns None, and the URL must be reversed normally.
+        """
+        try:
+            url = local_site_reverse(
+                self._build_named_url(name),
+                local_site_name=local_site_name,
+                request=request,
+                kwargs=kwargs)
+        except NoReverseMatch:
+            return None
+
+        url = url.replace('%', '%%')
+
+        for key, placeholder in six.iteritems(placeholders):
+            placeholder = six.text_type(placeholder)
+
+            if url.count(placeholder) != 1:
+                return None
+
+            url = url.replace(placeholder, '%%(%s)d' % key)
+
+        return url
 
     def _get_local_site(self, local_site_name):
         if local_site_name:
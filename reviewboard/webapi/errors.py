@@ -156,3 +156,8 @@ TOKEN_GENERATION_FAILED = WebAPIError(
     228,
     'There was an error generating the API token. Please try again.',
     http_status=500)  # 500 Internal Server Error.
+
+BATCH_OPERATION_FAILED = WebAPIError(
+    229,
+    'An operation in the batch failed. No changes were made.',
+    http_status=400)  # 400 Bad Request
@@ -12,11 +12,20 @@ from django.utils.six.moves import range
 from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.webapi.errors import WebAPITokenGenerationError
+from reviewboard.webapi.policies import CompiledAPIPolicy
 
 
 class WebAPITokenManager(Manager):
     """Manages WebAPIToken models."""
 
+    #: The maximum number of compiled policies to keep in the cache.
+    POLICY_CACHE_SIZE = 1000
+
+    def __init__(self):
+        super(WebAPITokenManager, self).__init__()
+
+        self._policy_cache = {}
+
     def generate_token(self, user, max_attempts=20, local_site=None,
                        note=None, policy=None):
         """Generates a WebAPIToken for a user.
@@ -55,3 +64,45 @@ class WebAPITokenManager(Manager):
 
         raise WebAPITokenGenerationError(
             _('Could not create a unique API token. Please try again.'))
+
+    def get_compiled_policy(self, token):
+        """Returns the compiled policy for a WebAPIToken.
+
+        Compiled policies are cached in-process, keyed by the token's ID
+        and a hash of its policy. A policy changed by another process will
+        therefore never match a stale entry, and this process drops a
+        token's entries as soon as the token is saved or deleted.
+        """
+        compiled_policy = getattr(token, '_compiled_policy', None)
+
+        if compiled_policy is not None:
+            return compiled_policy
+
+        policy = token.policy or {}
+        key = (token.pk,
+               hashlib.sha1(json.dumps(policy, sort_keys=True)).hexdigest())
+
+        try:
+            compiled_policy = self._policy_cache[key]
+        except KeyError:
+            compiled_policy = CompiledAPIPolicy(policy.get('resources') or {})
+
+            if len(self._policy_cache) >= self.POLICY_CACHE_SIZE:
+                self._policy_cache.clear()
+
+            self._policy_cache[key] = compiled_policy
+
+        token._compiled_policy = compiled_policy
+
+        return compiled_policy
+
+    def invalidate_compiled_policy(self, token):
+        """Invalidates the cached compiled policies for a WebAPIToken.
+
+        This is called automatically when a token is saved or deleted.
+        """
+        token._compiled_policy = None
+
+        for key in list(six.iterkeys(self._policy_cache)):
+            if key[0] == token.pk:
+                self._policy_cache.pop(key, None)
@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.utils import six, timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
@@ -158,3 +159,12 @@ class WebAPIToken(models.Model):
     class Meta:
         verbose_name = _('Web API token')
         verbose_name_plural = _('Web API tokens')
+
+
+def _invalidate_compiled_policy(instance, **kwargs):
+    """Invalidates the cached compiled policy for a WebAPIToken."""
+    WebAPIToken.objects.invalidate_compiled_policy(instance)
+
+
+post_save.connect(_invalidate_compiled_policy, sender=WebAPIToken)
+post_delete.connect(_invalidate_compiled_policy, sender=WebAPIToken)
@@ -0,0 +1,143 @@
+"""Evaluation of API token policies.
+
+A token's policy is a JSON document of allow and block rules, organized by
+resource policy ID and resource ID (see
+:py:meth:`~reviewboard.webapi.models.WebAPIToken.validate_policy`). Rather
+than walking that document for every check, it's compiled once into a
+:py:class:`CompiledAPIPolicy`, which answers checks through dictionary
+lookups and remembers the answers.
+"""
+
+from __future__ import unicode_literals
+
+from django.db.models import Q
+from django.utils import six
+
+
+class CompiledAPIPolicy(object):
+    """An API policy compiled for fast lookups.
+
+    This takes the ``resources`` section of a policy. Each set of rules is
+    stored as a tuple of the blocked and allowed methods, and results of
+    checks are cached, so repeated checks for the same resource and method
+    are just a dictionary lookup.
+    """
+    def __init__(self, resources_policy):
+        self.global_rules = self._compile_rules(resources_policy.get('*'))
+        self.resource_rules = {}
+
+        for policy_id, resource_policy in six.iteritems(resources_policy):
+            if policy_id != '*' and resource_policy:
+                self.resource_rules[policy_id] = dict(
+                    (resource_id, self._compile_rules(rules))
+                    for resource_id, rules in six.iteritems(resource_policy)
+                    if rules
+                )
+
+        self._allowed_cache = {}
+        self._exclude_q_cache = {}
+
+    def is_method_allowed(self, policy_id, method, resource_id=None):
+        """Returns whether a method can be performed on a resource.
+
+        A method can be performed if a specific per-resource policy allows
+        it, and the global policy also allows it.
+
+        The per-resource policy takes precedence over the global policy.
+        If, for instance, the global policy blocks and the resource policies
+        allows, the method will be allowed.
+
+        If no policies apply to this, then the default is to allow.
+        """
+        resource_rules = self.resource_rules.get(policy_id, {})
+
+        if resource_id not in resource_rules:
+            # Every ID without its own rules gets the same result, so cache
+            # them under one key.
+            resource_id = None
+
+        key = (policy_id, method, resource_id)
+
+        try:
+            return self._allowed_cache[key]
+        except KeyError:
+            pass
+
+        # The resource ID takes precedence over the resource's wildcard,
+        # which takes precedence over the global policy.
+        allowed = None
+
+        for rules in (resource_rules.get(resource_id),
+                      resource_rules.get('*'),
+                      self.global_rules):
+            if rules is not None:
+                allowed = self._check_rules(rules, method)
+
+                if allowed is not None:
+                    break
+
+        if allowed is None:
+            allowed = True
+
+        self._allowed_cache[key] = allowed
+
+        return allowed
+
+    def get_list_exclude_q(self, policy_id, field_name):
+        """Returns a Q object matching the objects blocked from lists.
+
+        This matches, by ``field_name``, the IDs of any resources that the
+        policy specifically blocks GET requests for. If no resources are
+        blocked, this returns None.
+        """
+        key = (policy_id, field_name)
+
+        try:
+            return self._exclude_q_cache[key]
+        except KeyError:
+            pass
+
+        blocked_ids = [
+            resource_id
+            for resource_id in six.iterkeys(
+                self.resource_rules.get(policy_id, {}))
+            if (resource_id != '*' and
+                not self.is_method_allowed(policy_id, 'GET', resource_id))
+        ]
+
+        if blocked_ids:
+            q = Q(**{'%s__in' % field_name: blocked_ids})
+        else:
+            q = None
+
+        self._exclude_q_cache[key] = q
+
+        return q
+
+    def _compile_rules(self, rules):
+        """Returns the blocked and allowed methods from a set of rules."""
+        if not rules:
+            return None
+
+        return (frozenset(rules.get('block', [])),
+                frozenset(rules.get('allow', [])))
+
+    def _check_rules(self, rules, method):
+        """Checks whether a set of rules allow a method.
+
+        Specific methods take precedence over the wildcard, and in case of
+        a conflict, blocked methods always trump allowed methods. If the
+        rules don't cover the method, this returns None.
+        """
+        blocked, allowed = rules
+
+        if method in blocked:
+            return False
+        elif method in allowed:
+            return True
+        elif '*' in blocked:
+            return False
+        elif '*' in allowed:
+            return True
+        else:
+            return None
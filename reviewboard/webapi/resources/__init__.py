@@ -67,7 +67,7 @@ class Resources(object):
         register_resource_for_model(ChangeDescription, self.change)
         register_resource_for_model(
             Comment,
-            lambda obj: (obj.review.get().is_reply() and
+            lambda obj: (obj.get_review().is_reply() and
                          self.review_reply_diff_comment or
                          self.review_diff_comment))
         register_resource_for_model(DefaultReviewer, self.default_reviewer)
@@ -99,12 +99,12 @@ class Resources(object):
                          self.file_attachment))
         register_resource_for_model(
             ScreenshotComment,
-            lambda obj: (obj.review.get().is_reply() and
+            lambda obj: (obj.get_review().is_reply() and
                          self.review_reply_screenshot_comment or
                          self.review_screenshot_comment))
         register_resource_for_model(
             FileAttachmentComment,
-            lambda obj: (obj.review.get().is_reply() and
+            lambda obj: (obj.get_review().is_reply() and
                          self.review_reply_file_attachment_comment or
                          self.review_file_attachment_comment))
         register_resource_for_model(User, self.user)
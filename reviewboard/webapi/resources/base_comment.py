@@ -68,6 +68,12 @@ class BaseCommentResource(MarkdownFieldsMixin, WebAPIResource):
         },
     }
     last_modified_field = 'timestamp'
+    cursor_pagination_fields = ('timestamp', 'pk')
+
+    list_prefetch_related = (
+        'review__user',
+        'review__review_request__local_site',
+    )
 
     # Common field definitions for create/update requests
     _COMMON_REQUIRED_CREATE_FIELDS = {
@@ -250,7 +256,7 @@ class BaseCommentResource(MarkdownFieldsMixin, WebAPIResource):
         comment.issue_status = issue_status
         comment.save(update_fields=['issue_status'])
 
-        last_activity_time, updated_object = review_request.get_last_activity()
+        last_activity_time = review_request.get_last_activity_time()
         comment.timestamp = localize(comment.timestamp)
 
         return 200, {
@@ -271,6 +277,6 @@ class BaseCommentResource(MarkdownFieldsMixin, WebAPIResource):
 
         issue_status = BaseComment.issue_string_to_status(issue_status)
 
-        return (comment.review.get().public and
+        return (comment.get_review().public and
                 (comment.issue_opened or issue_opened) and
                 issue_status != comment.issue_status)
@@ -45,6 +45,11 @@ class BaseDiffCommentResource(BaseCommentResource):
 
     allowed_methods = ('GET',)
 
+    list_prefetch_related = BaseCommentResource.list_prefetch_related + (
+        'filediff__diffset__history__review_request__local_site',
+        'interfilediff__diffset__history__review_request__local_site',
+    )
+
     def get_queryset(self, request, review_id=None, is_list=False,
                      *args, **kwargs):
         """Returns a queryset for Comment models.
@@ -91,13 +96,13 @@ class BaseDiffCommentResource(BaseCommentResource):
         return q
 
     def serialize_public_field(self, obj, **kwargs):
-        return obj.review.get().public
+        return obj.get_review().public
 
     def serialize_timesince_field(self, obj, **kwargs):
         return timesince(obj.timestamp)
 
     def serialize_user_field(self, obj, **kwargs):
-        return obj.review.get().user
+        return obj.get_review().user
 
     @webapi_request_fields(
         optional={
@@ -53,6 +53,10 @@ class BaseFileAttachmentCommentResource(BaseCommentResource):
     uri_object_key = 'comment_id'
     allowed_methods = ('GET',)
 
+    list_prefetch_related = BaseCommentResource.list_prefetch_related + (
+        'file_attachment__review_request__local_site',
+    )
+
     def get_queryset(self, request, *args, **kwargs):
         review_request = \
             resources.review_request.get_object(request, *args, **kwargs)
@@ -66,7 +70,7 @@ class BaseFileAttachmentCommentResource(BaseCommentResource):
         return obj.get_link_text()
 
     def serialize_public_field(self, obj, **kwargs):
-        return obj.review.get().public
+        return obj.get_review().public
 
     def serialize_review_url_field(self, obj, **kwargs):
         return obj.get_review_url()
@@ -78,7 +82,7 @@ class BaseFileAttachmentCommentResource(BaseCommentResource):
         return timesince(obj.timestamp)
 
     def serialize_user_field(self, obj, **kwargs):
-        return obj.review.get().user
+        return obj.get_review().user
 
     @webapi_check_local_site
     @augment_method_from(WebAPIResource)
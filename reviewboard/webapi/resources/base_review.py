@@ -89,6 +89,7 @@ class BaseReviewResource(MarkdownFieldsMixin, WebAPIResource):
         },
     }
     last_modified_field = 'timestamp'
+    cursor_pagination_fields = ('timestamp', 'pk')
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
 
@@ -55,6 +55,10 @@ class BaseScreenshotCommentResource(BaseCommentResource):
 
     allowed_methods = ('GET',)
 
+    list_prefetch_related = BaseCommentResource.list_prefetch_related + (
+        'screenshot__review_request__local_site',
+    )
+
     def get_queryset(self, request, *args, **kwargs):
         review_request = \
             resources.review_request.get_object(request, *args, **kwargs)
@@ -64,13 +68,13 @@ class BaseScreenshotCommentResource(BaseCommentResource):
             review__isnull=False)
 
     def serialize_public_field(self, obj, **kwargs):
-        return obj.review.get().public
+        return obj.get_review().public
 
     def serialize_timesince_field(self, obj, **kwargs):
         return timesince(obj.timestamp)
 
     def serialize_user_field(self, obj, **kwargs):
-        return obj.review.get().user
+        return obj.get_review().user
 
     def serialize_thumbnail_url_field(self, obj, **kwargs):
         return obj.get_image_url()
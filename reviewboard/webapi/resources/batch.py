@@ -0,0 +1,308 @@
+from __future__ import unicode_literals
+
+import json
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.urlresolvers import Resolver404, get_script_prefix, resolve
+from django.db import transaction
+from django.utils import six
+from django.utils.six.moves.urllib.parse import urlencode, urlparse
+from djblets.webapi.decorators import (webapi_request_fields,
+                                       webapi_response_errors)
+from djblets.webapi.errors import INVALID_FORM_DATA, NOT_LOGGED_IN
+
+from reviewboard.site.middleware import LocalSiteMiddleware
+from reviewboard.webapi.base import WebAPIResource
+from reviewboard.webapi.decorators import (webapi_check_local_site,
+                                           webapi_check_login_required)
+from reviewboard.webapi.errors import BATCH_OPERATION_FAILED
+
+
+class _BatchOperationFailed(Exception):
+    """Raised to roll back a batch when one of its operations fails."""
+
+
+class BatchResource(WebAPIResource):
+    """Performs a batch of API requests in a single HTTP request.
+
+    Clients that need to make many API requests in a row (such as posting
+    a review with many comments) can send them all at once as a list of
+    operations, saving a round trip to the server for each one.
+
+    Each operation is a JSON object with a ``method`` (``GET``, ``POST``,
+    ``PUT`` or ``DELETE``), a ``path`` to an API resource (which may be the
+    full URL from a link), and an optional ``data`` object with the fields
+    to send. For example::
+
+        [
+            {"method": "POST",
+             "path": "/api/review-requests/1/reviews/"},
+            {"method": "POST",
+             "path": "/api/review-requests/1/reviews/2/diff-comments/",
+             "data": {"filediff_id": 3, "first_line": 10,
+                      "num_lines": 1, "text": "Typo."}},
+            {"method": "PUT",
+             "path": "/api/review-requests/1/reviews/2/",
+             "data": {"public": true}}
+        ]
+
+    Operations are performed in order, as the user making the batch
+    request, and within a single database transaction. The result of each
+    operation is returned as its HTTP status and JSON payload. If an
+    operation fails, the operations before it are rolled back, and the
+    results up to and including the failed one are returned in an error.
+
+    Publishing or closing something sends e-mails, WebHooks and signals
+    that can't be rolled back, so an operation that sets ``public`` or
+    ``status`` can only be the last operation in a batch.
+
+    Operations can only refer to objects created earlier in the batch if
+    the client already knows their paths, so a batch is best suited to
+    requests that don't depend on each other's results.
+    """
+    added_in = '2.0.13'
+
+    name = 'batch'
+    singleton = True
+    allowed_methods = ('POST',)
+
+    #: The maximum number of operations allowed in a batch.
+    MAX_OPERATIONS = 500
+
+    #: The HTTP methods that can be used for operations.
+    OPERATION_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+    #: Fields that publish or close objects when set in an operation.
+    #:
+    #: Operations setting these have side effects outside of the database,
+    #: so they're only allowed as the last operation in a batch.
+    PUBLISHING_FIELDS = ('public', 'status')
+
+    #: Request headers that shouldn't be passed on to operations.
+    EXCLUDED_HEADERS = (
+        'CONTENT_LENGTH',
+        'CONTENT_TYPE',
+        'HTTP_IF_MODIFIED_SINCE',
+        'HTTP_IF_NONE_MATCH',
+    )
+
+    fields = {
+        'results': {
+            'type': list,
+            'description': 'The result of each operation, in order. Each '
+                           'result contains the ``status`` code and the '
+                           '``rsp`` payload (which is null for empty '
+                           'responses).',
+        },
+    }
+
+    @webapi_check_login_required
+    @webapi_check_local_site
+    @webapi_response_errors(BATCH_OPERATION_FAILED, INVALID_FORM_DATA,
+                            NOT_LOGGED_IN)
+    @webapi_request_fields(
+        required={
+            'operations': {
+                'type': six.text_type,
+                'description': 'A JSON-encoded list of the operations to '
+                               'perform.',
+            },
+        },
+    )
+    def create(self, request, operations, *args, **kwargs):
+        """Performs a batch of API requests.
+
+        All operations are performed in a single transaction. If an
+        operation fails with an HTTP 4xx or 5xx status code, any changes
+        made by the earlier operations are rolled back, and a
+        Batch Operation Failed error is returned, containing the
+        ``results`` so far and the ``failed_operation`` index.
+        """
+        try:
+            operations = self._parse_operations(operations)
+        except ValueError as e:
+            return INVALID_FORM_DATA, {
+                'fields': {
+                    'operations': [six.text_type(e)],
+                },
+            }
+
+        results = []
+
+        try:
+            with transaction.atomic():
+                for operation in operations:
+                    result = self._run_operation(request, *operation)
+                    results.append(result)
+
+                    if result['status'] >= 400:
+                        raise _BatchOperationFailed
+        except _BatchOperationFailed:
+            return BATCH_OPERATION_FAILED, {
+                'failed_operation': len(results) - 1,
+                'results': results,
+            }
+
+        return 200, {
+            self.item_result_key: {
+                'results': results,
+            },
+        }
+
+    def _parse_operations(self, operations):
+        """Parses and validates the list of operations.
+
+        This returns a list of tuples of (method, path, data) for each
+        operation. A ValueError is raised if any of the operations are
+        invalid.
+        """
+        try:
+            operations = json.loads(operations)
+        except ValueError:
+            raise ValueError('The operations must be valid JSON.')
+
+        if not isinstance(operations, list) or not operations:
+            raise ValueError('The operations must be a non-empty list.')
+
+        if len(operations) > self.MAX_OPERATIONS:
+            raise ValueError('No more than %d operations can be performed '
+                             'in a batch.' % self.MAX_OPERATIONS)
+
+        result = []
+
+        for i, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                raise ValueError('Operation %d must be an object.' % i)
+
+            method = operation.get('method')
+            path = operation.get('path')
+            data = operation.get('data', {})
+
+            if method not in self.OPERATION_METHODS:
+                raise ValueError('Operation %d has an invalid method.' % i)
+
+            if not isinstance(path, six.string_types):
+                raise ValueError('Operation %d is missing a path.' % i)
+
+            if not isinstance(data, dict):
+                raise ValueError('The data for operation %d must be an '
+                                 'object.' % i)
+
+            if (i < len(operations) - 1 and
+                method in ('POST', 'PUT') and
+                any(data.get(field) not in (None, False, 0, '0', 'false')
+                    for field in self.PUBLISHING_FIELDS)):
+                raise ValueError('Operation %d publishes or closes an '
+                                 'object, and must be the last operation '
+                                 'in the batch.' % i)
+
+            result.append((method, path, data))
+
+        return result
+
+    def _run_operation(self, request, method, path, data):
+        """Performs a single operation.
+
+        The operation is dispatched to the resource at the given path, using
+        a request with the same user, session and API token as the batch
+        request. This returns the operation's result.
+        """
+        url = urlparse(path)
+        script_prefix = get_script_prefix()
+        path_info = url.path
+
+        if path_info.startswith(script_prefix):
+            path_info = '/' + path_info[len(script_prefix):]
+
+        try:
+            match = resolve(path_info)
+        except Resolver404:
+            match = None
+
+        if (match is None or
+            not match.url_name or
+            not match.url_name.endswith('-resource') or
+            match.url_name == self._build_named_url(self.name)):
+            return {
+                'status': 404,
+                'rsp': None,
+            }
+
+        sub_request = self._build_request(request, method, path_info,
+                                          url.query, data)
+        LocalSiteMiddleware().process_view(sub_request, match.func,
+                                           match.args, match.kwargs)
+        response = match.func(sub_request, *match.args, **match.kwargs)
+
+        if response.content:
+            rsp = json.loads(response.content.decode('utf-8'))
+        else:
+            rsp = None
+
+        return {
+            'status': response.status_code,
+            'rsp': rsp,
+        }
+
+    def _build_request(self, request, method, path_info, query_string,
+                       data):
+        """Builds the request for an operation.
+
+        The data is sent as form data (or in the query string, for GET
+        requests), just as it would be in a normal API request, and the
+        response is always requested as JSON.
+        """
+        body = urlencode(
+            [
+                (key, self._normalize_value(value))
+                for key, value in six.iteritems(data)
+            ],
+            doseq=True).encode('utf-8')
+
+        if method == 'GET' and body:
+            query_string = '&'.join(filter(None, [query_string,
+                                                  body.decode('utf-8')]))
+            body = b''
+
+        environ = dict(
+            (key, value)
+            for key, value in six.iteritems(request.META)
+            if key not in self.EXCLUDED_HEADERS
+        )
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path_info,
+            'QUERY_STRING': query_string,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': len(body),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': BytesIO(body),
+        })
+
+        sub_request = WSGIRequest(environ)
+        sub_request.user = request.user
+        sub_request.session = request.session
+        sub_request._webapi_token = getattr(request, '_webapi_token', None)
+
+        return sub_request
+
+    def _normalize_value(self, value):
+        """Normalizes a value from the operation data for form data.
+
+        Booleans are converted to ``true`` or ``false``, and objects are
+        JSON-encoded. Lists are sent as multiple values.
+        """
+        if isinstance(value, list):
+            return [self._normalize_value(item) for item in value]
+        elif isinstance(value, bool):
+            value = value and 'true' or 'false'
+        elif isinstance(value, dict):
+            value = json.dumps(value)
+        elif value is None:
+            value = ''
+
+        return six.text_type(value).encode('utf-8')
+
+
+batch_resource = BatchResource()
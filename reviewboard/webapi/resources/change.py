@@ -87,6 +87,7 @@ class ChangeResource(MarkdownFieldsMixin, WebAPIResource):
     }
     uri_object_key = 'change_id'
     model_parent_key = 'review_request'
+    list_prefetch_related = ('review_request__local_site',)
     last_modified_field = 'timestamp'
     allowed_methods = ('GET',)
     mimetype_list_resource_name = 'review-request-changes'
@@ -94,6 +94,7 @@ class DiffResource(WebAPIResource):
     uri_object_key = 'diff_revision'
     model_object_key = 'revision'
     model_parent_key = 'history'
+    list_prefetch_related = ('history__review_request__local_site',)
     last_modified_field = 'timestamp'
 
     allowed_mimetypes = WebAPIResource.allowed_mimetypes + [
@@ -111,7 +112,7 @@ class DiffResource(WebAPIResource):
             history__review_request=review_request)
 
     def get_parent_object(self, diffset):
-        return diffset.history.review_request.get()
+        return self.get_related_object(diffset.history.review_request)
 
     def has_access_permissions(self, request, diffset, *args, **kwargs):
         review_request = diffset.history.review_request.get()
@@ -14,6 +14,7 @@ class FileAttachmentResource(BaseFileAttachmentResource):
     added_in = '1.6'
 
     model_parent_key = 'review_request'
+    list_prefetch_related = ('review_request__local_site',)
 
     item_child_resources = [
         resources.file_attachment_comment,
@@ -90,6 +90,7 @@ class FileDiffResource(WebAPIResource):
 
     uri_object_key = 'filediff_id'
     model_parent_key = 'diffset'
+    list_prefetch_related = ('diffset__history__review_request__local_site',)
 
     DIFF_DATA_MIMETYPE_BASE = CUSTOM_MIMETYPE_BASE + '.diff.data'
     DIFF_DATA_MIMETYPE_JSON = DIFF_DATA_MIMETYPE_BASE + '+json'
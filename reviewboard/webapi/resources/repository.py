@@ -87,6 +87,7 @@ class RepositoryResource(WebAPIResource):
         resources.repository_commits,
         resources.repository_info,
     ]
+    list_select_related = ('tool',)
     autogenerate_etags = True
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
@@ -7,6 +7,7 @@ from djblets.webapi.decorators import (webapi_response_errors,
 from djblets.webapi.errors import DOES_NOT_EXIST
 
 from reviewboard.reviews.models import ReviewRequest
+from reviewboard.scmtools.commit_index import get_indexed_commits
 from reviewboard.scmtools.errors import SCMError
 from reviewboard.webapi.base import WebAPIResource
 from reviewboard.webapi.decorators import (webapi_check_login_required,
@@ -26,6 +27,10 @@ class RepositoryCommitsResource(WebAPIResource):
     Successive pages of commit history can be fetched by using the 'parent'
     field of the last entry as the 'start' parameter for another request.
 
+    Pages are served from a local index of the repository's commit history,
+    which is kept up to date in the background, so paging through history
+    generally won't need to contact the repository.
+
     Returns an array of objects with the following fields:
 
         'author_name' is a string with the author's real name or user name,
@@ -87,7 +92,8 @@ class RepositoryCommitsResource(WebAPIResource):
             return DOES_NOT_EXIST
 
         try:
-            items = repository.get_commits(branch=branch, start=start)
+            items = get_indexed_commits(repository, branch=branch,
+                                        start=start)
         except SCMError as e:
             return REPO_INFO_ERROR.with_message(six.text_type(e))
         except NotImplementedError:
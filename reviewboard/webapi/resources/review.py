@@ -24,6 +24,7 @@ class ReviewResource(BaseReviewResource):
     """
     uri_object_key = 'review_id'
     model_parent_key = 'review_request'
+    list_select_related = ('review_request__local_site',)
 
     item_child_resources = [
         resources.review_diff_comment,
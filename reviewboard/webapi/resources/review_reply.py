@@ -101,6 +101,7 @@ class ReviewReplyResource(BaseReviewResource):
 
     uri_object_key = 'reply_id'
     model_parent_key = 'base_reply_to'
+    list_select_related = ('base_reply_to__review_request__local_site',)
 
     mimetype_list_resource_name = 'review-replies'
     mimetype_item_resource_name = 'review-reply'
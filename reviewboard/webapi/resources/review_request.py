@@ -273,6 +273,8 @@ class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
     uri_object_key = 'review_request_id'
     model_object_key = 'display_id'
     last_modified_field = 'last_updated'
+    list_select_related = ('local_site',)
+    cursor_pagination_fields = ('-last_updated', '-pk')
     item_child_resources = [
         resources.change,
         resources.diff,
@@ -1158,6 +1160,17 @@ class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
             request, id_field=id_field, local_site_name=local_site_name,
             *args, **kwargs)
 
+    def get_policy_id_field(self, local_site_name=None, *args, **kwargs):
+        """Returns the model field matching resource IDs in token policies.
+
+        Review requests are identified by their local_id on Local Sites, and
+        by their pk elsewhere.
+        """
+        if local_site_name:
+            return 'local_id'
+        else:
+            return 'pk'
+
     def get_href(self, obj, request, *args, **kwargs):
         """Returns the URL for this object.
 
@@ -1175,7 +1188,9 @@ class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
         href_kwargs.update(self.get_href_parent_ids(obj))
 
         return request.build_absolute_uri(
-            self.get_item_url(local_site_name=local_site_name, **href_kwargs))
+            self.get_item_url(request=request,
+                              local_site_name=local_site_name,
+                              **href_kwargs))
 
     def _parse_date(self, timestamp_str):
         try:
@@ -1,13 +1,16 @@
 from __future__ import unicode_literals
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponseNotModified
 from django.utils import six
 from django.utils.translation import ugettext as _
 from djblets.util.http import get_modified_since, http_date
+from djblets.webapi.decorators import webapi_request_fields
 from djblets.webapi.errors import DOES_NOT_EXIST
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.reviews.models import Review, ReviewRequest
+from reviewboard.reviews.updates import get_update_token, wait_for_update
 from reviewboard.webapi.base import WebAPIResource
 from reviewboard.webapi.decorators import (webapi_check_local_site,
                                            webapi_check_login_required)
@@ -18,7 +21,12 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
     """Provides information on the last update made to a review request.
 
     Clients can periodically poll this to see if any new updates have been
-    made.
+    made. Passing the ``update_token`` from the last response makes these
+    checks cheap when nothing has changed.
+
+    If the server allows it (see ``update_wait``), clients can also pass a
+    number of seconds to ``wait``. The request will then be held open until
+    something new is published, or until the time is up.
     """
     name = 'last_update'
     policy_id = 'review_request_last_update'
@@ -37,6 +45,21 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
             'description': 'The timestamp of this most recent update '
                            '(YYYY-MM-DD HH:MM:SS format).',
         },
+        'update_wait': {
+            'type': int,
+            'description': 'The maximum number of seconds the server will '
+                           'wait for an update, when passing ``wait``. If '
+                           '0, waiting is disabled, and clients should check '
+                           'for updates periodically instead.',
+            'added_in': '2.0.13',
+        },
+        'update_token': {
+            'type': six.text_type,
+            'description': 'An opaque token identifying this update. This '
+                           'can be passed back as ``update-token`` to wait '
+                           'for the next update.',
+            'added_in': '2.0.13',
+        },
         'type': {
             'type': ('review-request', 'diff', 'reply', 'review'),
             'description': "The type of the last update. ``review-request`` "
@@ -54,6 +77,28 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
 
     @webapi_check_login_required
     @webapi_check_local_site
+    @webapi_request_fields(
+        optional={
+            'update-token': {
+                'type': six.text_type,
+                'description': 'The ``update_token`` from a previous '
+                               'response. If nothing new has been published '
+                               'since, this will return HTTP 304 Not '
+                               'Modified, after waiting up to ``wait`` '
+                               'seconds for an update.',
+                'added_in': '2.0.13',
+            },
+            'wait': {
+                'type': int,
+                'description': 'The number of seconds to wait for a new '
+                               'update when passing ``update-token``. This '
+                               'is capped at ``update_wait`` seconds, and '
+                               'ignored if waiting is disabled on the '
+                               'server. The default is to not wait.',
+                'added_in': '2.0.13',
+            },
+        },
+    )
     def get(self, request, *args, **kwargs):
         """Returns the last update made to the review request.
 
@@ -65,7 +110,15 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
         This does not take into account changes to a draft review request, as
         that's generally not update information that the owner of the draft is
         interested in. Only public updates are represented.
+
+        Checking for updates with ``update-token`` doesn't compute anything
+        about the review request unless something new has been published,
+        so it's cheap to call repeatedly.
         """
+        update_token = kwargs.pop('update-token', None)
+        max_wait = settings.REVIEW_REQUEST_UPDATES_MAX_WAIT
+        wait = min(max(kwargs.pop('wait', None) or 0, 0), max_wait)
+
         try:
             review_request = \
                 resources.review_request.get_object(request, *args, **kwargs)
@@ -76,6 +129,17 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
                                                                review_request):
             return self._no_access_error(request.user)
 
+        # The token must be fetched before the activity, so that anything
+        # published in between will be seen as a new update next time.
+        current_token = get_update_token(review_request.pk)
+
+        if update_token and wait > 0 and update_token == current_token:
+            current_token = wait_for_update(review_request.pk, update_token,
+                                            wait)
+
+        if update_token == current_token:
+            return HttpResponseNotModified()
+
         timestamp, updated_object = review_request.get_last_activity()
 
         if get_modified_since(request, timestamp):
@@ -119,6 +183,8 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
                 'user': user,
                 'summary': summary,
                 'type': update_type,
+                'update_token': current_token,
+                'update_wait': max_wait,
             }
         }, {
             'Last-Modified': http_date(timestamp)
@@ -9,6 +9,7 @@ from reviewboard.webapi.resources.base_screenshot import BaseScreenshotResource
 class ScreenshotResource(BaseScreenshotResource):
     """A resource representing a screenshot on a review request."""
     model_parent_key = 'review_request'
+    list_prefetch_related = ('review_request__local_site',)
 
     item_child_resources = [
         resources.screenshot_comment,
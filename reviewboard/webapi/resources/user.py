@@ -43,6 +43,8 @@ class UserResource(WebAPIResource, DjbletsUserResource):
 
     hidden_fields = ('email', 'first_name', 'last_name', 'fullname')
 
+    cursor_pagination_fields = ('pk',)
+
     def get_etag(self, request, obj, *args, **kwargs):
         if obj.is_profile_visible(request.user):
             return self.generate_etag(obj, six.iterkeys(self.fields), request)
@@ -0,0 +1,185 @@
+from __future__ import unicode_literals
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import six
+from django.utils.six.moves.urllib.parse import quote as urllib_quote
+from djblets.util.http import get_url_params_except
+from djblets.webapi.responses import WebAPIResponsePaginated
+
+
+def _get_cursor_fields(model, cursor_fields):
+    """Returns the model fields and sort directions for cursor fields.
+
+    Each entry in ``cursor_fields`` is a field name, as passed to
+    ``order_by()``. A ``-`` prefix indicates a descending sort.
+
+    This returns a list of tuples of (field name, field, descending).
+    """
+    result = []
+
+    for field_name in cursor_fields:
+        descending = field_name.startswith('-')
+        field_name = field_name.lstrip('-')
+
+        if field_name == 'pk':
+            field = model._meta.pk
+        else:
+            field = model._meta.get_field(field_name)
+
+        result.append((field_name, field, descending))
+
+    return result
+
+
+def encode_cursor(obj, cursor_fields):
+    """Returns an opaque cursor pointing to an object.
+
+    The cursor contains the values of the object's cursor fields, encoded
+    in a form that's safe to use in a URL.
+    """
+    values = [
+        field.value_to_string(obj)
+        for field_name, field, descending
+        in _get_cursor_fields(type(obj), cursor_fields)
+    ]
+
+    return base64.urlsafe_b64encode(
+        json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, model, cursor_fields):
+    """Returns the field values stored in a cursor.
+
+    This is the reverse of :py:func:`encode_cursor`. A ValueError is raised
+    if the cursor wasn't generated for the given fields.
+    """
+    fields = _get_cursor_fields(model, cursor_fields)
+
+    try:
+        cursor = cursor.encode('ascii')
+        values = json.loads(base64.urlsafe_b64decode(
+            cursor + b'=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError('The cursor could not be decoded')
+
+    if (not isinstance(values, list) or
+        len(values) != len(fields) or
+        not all(isinstance(value, six.string_types) for value in values)):
+        raise ValueError('The cursor does not match the fields')
+
+    try:
+        return [
+            field.to_python(value)
+            for (field_name, field, descending), value in zip(fields, values)
+        ]
+    except ValidationError:
+        raise ValueError('The cursor contains invalid values')
+
+
+class WebAPIResponseCursorPaginated(WebAPIResponsePaginated):
+    """Provides paginated responses for lists using cursors.
+
+    Rather than skipping over a number of results using ``?start=``, each
+    page begins right after the last object of the previous page, as
+    pointed to by an opaque ``?start-cursor=`` token. This is done by
+    filtering on a stable sort order (``cursor_fields``), which the database
+    can satisfy through an index, so later pages are as fast to fetch as the
+    first.
+
+    Only links to the next page are provided. The total number of results
+    can optionally be left out, saving a ``COUNT`` query on large tables.
+    """
+    def __init__(self, request, queryset, cursor_fields, start_values=None,
+                 start_cursor_param='start-cursor',
+                 include_total_results=True, *args, **kwargs):
+        self.cursor_fields = cursor_fields
+        self.start_values = start_values
+        self.start_cursor_param = start_cursor_param
+        self.include_total_results = include_total_results
+        self.next_cursor = None
+
+        super(WebAPIResponseCursorPaginated, self).__init__(
+            request, queryset, *args, **kwargs)
+
+    def has_prev(self):
+        return False
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def get_results(self):
+        queryset = self.queryset.order_by(*self.cursor_fields)
+
+        if self.start_values is not None:
+            queryset = queryset.filter(self._build_start_q())
+
+        # Fetch one extra result to find out whether there's another page.
+        results = list(queryset[:self.max_results + 1])
+
+        if len(results) > self.max_results:
+            results = results[:self.max_results]
+            self.next_cursor = encode_cursor(results[-1], self.cursor_fields)
+
+        return results
+
+    def get_total_results(self):
+        if self.include_total_results:
+            return self.queryset.count()
+        else:
+            return None
+
+    def get_links(self):
+        links = {}
+
+        if self.has_next():
+            full_path = self.request.build_absolute_uri(self.request.path)
+            query_parameters = get_url_params_except(
+                self.request.GET, self.start_cursor_param,
+                self.max_results_param)
+
+            if query_parameters:
+                query_parameters = '&' + query_parameters
+
+            links[self.next_key] = {
+                'method': 'GET',
+                'href': '%s?%s=%s&%s=%s%s' % (
+                    full_path, self.start_cursor_param,
+                    urllib_quote(self.next_cursor),
+                    self.max_results_param, self.max_results,
+                    query_parameters),
+            }
+
+        return links
+
+    def _build_start_q(self):
+        """Returns a Q object matching the results after the cursor.
+
+        For cursor fields (a, b, c), this matches ``a > A``, or ``a = A``
+        and ``b > B``, or ``a = A`` and ``b = B`` and ``c > C``, with the
+        comparisons flipped for descending fields.
+        """
+        fields = _get_cursor_fields(self.queryset.model, self.cursor_fields)
+        q = None
+
+        for i, (field_name, field, descending) in enumerate(fields):
+            if descending:
+                lookup = '%s__lt' % field_name
+            else:
+                lookup = '%s__gt' % field_name
+
+            field_q = Q(**{lookup: self.start_values[i]})
+
+            for j, (prev_field_name, prev_field, prev_descending) in \
+                    enumerate(fields[:i]):
+                field_q &= Q(**{prev_field_name: self.start_values[j]})
+
+            if q is None:
+                q = field_q
+            else:
+                q |= field_q
+
+        return q
@@ -9,6 +9,9 @@ api_token_list_mimetype = _build_mimetype('api-tokens')
 api_token_item_mimetype = _build_mimetype('api-token')
 
 
+batch_mimetype = _build_mimetype('batch')
+
+
 change_list_mimetype = _build_mimetype('review-request-changes')
 change_item_mimetype = _build_mimetype('review-request-change')
 
@@ -122,6 +125,9 @@ review_request_item_mimetype = _build_mimetype('review-request')
 review_request_draft_item_mimetype = _build_mimetype('review-request-draft')
 
 
+review_request_last_update_item_mimetype = _build_mimetype('last-update')
+
+
 root_item_mimetype = _build_mimetype('root')
 
 
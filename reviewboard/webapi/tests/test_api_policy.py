@@ -1,11 +1,16 @@
 from __future__ import unicode_literals
 
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import six
 
 from reviewboard.testing import TestCase
 from reviewboard.webapi.base import WebAPIResource
 from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.policies import CompiledAPIPolicy
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import review_request_list_mimetype
+from reviewboard.webapi.tests.urls import get_review_request_list_url
 
 
 class PolicyTestResource(WebAPIResource):
@@ -634,3 +639,120 @@ class APIPolicyValidationTests(TestCase):
                     }
                 }
             })
+
+
+class CompiledAPIPolicyTests(TestCase):
+    """Tests compiled API policies."""
+    fixtures = ['test_users']
+
+    def test_get_list_exclude_q(self):
+        """Testing CompiledAPIPolicy.get_list_exclude_q"""
+        compiled_policy = CompiledAPIPolicy({
+            'test': {
+                '*': {
+                    'allow': ['*'],
+                },
+                '1': {
+                    'block': ['GET'],
+                },
+                '2': {
+                    'block': ['PUT'],
+                },
+                '3': {
+                    'block': ['*'],
+                },
+            },
+        })
+
+        q = compiled_policy.get_list_exclude_q('test', 'display_id')
+        self.assertEqual(len(q.children), 1)
+        self.assertEqual(q.children[0][0], 'display_id__in')
+        self.assertEqual(sorted(q.children[0][1]), ['1', '3'])
+
+        self.assertIs(
+            compiled_policy.get_list_exclude_q('test', 'display_id'), q)
+        self.assertIsNone(
+            compiled_policy.get_list_exclude_q('other', 'display_id'))
+
+    def test_get_compiled_policy_cached(self):
+        """Testing WebAPITokenManager.get_compiled_policy caches policies"""
+        user = User.objects.get(username='doc')
+        token = self.create_webapi_token(user, policy={
+            'resources': {
+                '*': {
+                    'block': ['*'],
+                },
+            },
+        })
+
+        compiled_policy = WebAPIToken.objects.get_compiled_policy(
+            WebAPIToken.objects.get(pk=token.pk))
+        self.assertFalse(compiled_policy.is_method_allowed('test', 'GET'))
+        self.assertIs(
+            WebAPIToken.objects.get_compiled_policy(
+                WebAPIToken.objects.get(pk=token.pk)),
+            compiled_policy)
+
+    def test_get_compiled_policy_after_update(self):
+        """Testing WebAPITokenManager.get_compiled_policy after updating a
+        token's policy
+        """
+        user = User.objects.get(username='doc')
+        token = self.create_webapi_token(user, policy={
+            'resources': {
+                '*': {
+                    'block': ['*'],
+                },
+            },
+        })
+        compiled_policy = WebAPIToken.objects.get_compiled_policy(token)
+
+        token.policy = {
+            'resources': {
+                '*': {
+                    'allow': ['*'],
+                },
+            },
+        }
+        token.save()
+
+        new_compiled_policy = WebAPIToken.objects.get_compiled_policy(
+            WebAPIToken.objects.get(pk=token.pk))
+        self.assertIsNot(new_compiled_policy, compiled_policy)
+        self.assertTrue(new_compiled_policy.is_method_allowed('test', 'GET'))
+
+
+class APIPolicyListTests(BaseWebAPITestCase):
+    """Tests API policy enforcement on lists."""
+    fixtures = ['test_users']
+
+    def test_get_list_excludes_blocked(self):
+        """Testing API policy enforcement excludes blocked objects from
+        lists
+        """
+        review_request1 = self.create_review_request(publish=True)
+        review_request2 = self.create_review_request(publish=True)
+
+        token = self.create_webapi_token(self.user, policy={
+            'resources': {
+                'review_request': {
+                    '*': {
+                        'allow': ['*'],
+                    },
+                    six.text_type(review_request1.display_id): {
+                        'block': ['GET'],
+                    },
+                },
+            },
+        })
+
+        session = self.client.session
+        session['webapi_token_id'] = token.pk
+        session.save()
+
+        rsp = self.api_get(get_review_request_list_url(),
+                           expected_mimetype=review_request_list_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertEqual(
+            [item_rsp['id'] for item_rsp in rsp['review_requests']],
+            [review_request2.display_id])
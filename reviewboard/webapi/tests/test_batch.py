@@ -0,0 +1,229 @@
+from __future__ import unicode_literals
+
+import json
+
+from djblets.webapi.errors import INVALID_FORM_DATA
+
+from reviewboard.reviews.models import Comment, Review
+from reviewboard.webapi.errors import BATCH_OPERATION_FAILED
+from reviewboard.webapi.resources import resources
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import batch_mimetype
+from reviewboard.webapi.tests.urls import (get_batch_url,
+                                           get_review_diff_comment_list_url,
+                                           get_review_item_url,
+                                           get_review_request_item_url,
+                                           get_user_item_url)
+
+
+class ResourceTests(BaseWebAPITestCase):
+    """Testing the BatchResource APIs."""
+    fixtures = ['test_users', 'test_scmtools', 'test_site']
+    sample_api_url = 'batch/'
+    resource = resources.batch
+
+    def setUp(self):
+        super(ResourceTests, self).setUp()
+
+        self.review_request = self.create_review_request(
+            create_repository=True,
+            publish=True)
+        diffset = self.create_diffset(self.review_request)
+        self.filediff = self.create_filediff(diffset)
+        self.review = self.create_review(self.review_request, user=self.user)
+
+    def test_post(self):
+        """Testing the POST batch/ API"""
+        comments_url = get_review_diff_comment_list_url(self.review)
+        operations = [
+            {
+                'method': 'POST',
+                'path': comments_url,
+                'data': {
+                    'filediff_id': self.filediff.pk,
+                    'first_line': i + 1,
+                    'num_lines': 1,
+                    'text': 'Comment %d' % i,
+                    'issue_opened': True,
+                },
+            }
+            for i in range(3)
+        ]
+        operations.append({
+            'method': 'PUT',
+            'path': get_review_item_url(self.review_request, self.review.pk),
+            'data': {
+                'public': True,
+            },
+        })
+
+        rsp = self.api_post(get_batch_url(),
+                            {'operations': json.dumps(operations)},
+                            expected_status=200,
+                            expected_mimetype=batch_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        results = rsp['batch']['results']
+        self.assertEqual([result['status'] for result in results],
+                         [201, 201, 201, 200])
+        self.assertEqual(results[0]['rsp']['diff_comment']['text'],
+                         'Comment 0')
+        self.assertTrue(results[0]['rsp']['diff_comment']['issue_opened'])
+
+        review = Review.objects.get(pk=self.review.pk)
+        self.assertTrue(review.public)
+        self.assertEqual(review.comments.count(), 3)
+
+    def test_post_with_get(self):
+        """Testing the POST batch/ API with a GET operation"""
+        rsp = self.api_post(
+            get_batch_url(),
+            {
+                'operations': json.dumps([{
+                    'method': 'GET',
+                    'path': get_review_request_item_url(
+                        self.review_request.display_id),
+                    'data': {
+                        'api_format': 'json',
+                    },
+                }]),
+            },
+            expected_status=200,
+            expected_mimetype=batch_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        result = rsp['batch']['results'][0]
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['rsp']['review_request']['id'],
+                         self.review_request.display_id)
+
+    def test_post_with_failed_operation(self):
+        """Testing the POST batch/ API with a failed operation rolls back
+        earlier operations
+        """
+        comments_url = get_review_diff_comment_list_url(self.review)
+        operations = [
+            {
+                'method': 'POST',
+                'path': comments_url,
+                'data': {
+                    'filediff_id': self.filediff.pk,
+                    'first_line': 1,
+                    'num_lines': 1,
+                    'text': 'Comment',
+                },
+            },
+            {
+                'method': 'POST',
+                'path': comments_url,
+                'data': {
+                    'filediff_id': self.filediff.pk + 1000,
+                    'first_line': 1,
+                    'num_lines': 1,
+                    'text': 'Comment',
+                },
+            },
+        ]
+
+        rsp = self.api_post(get_batch_url(),
+                            {'operations': json.dumps(operations)},
+                            expected_status=400)
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], BATCH_OPERATION_FAILED.code)
+        self.assertEqual(rsp['failed_operation'], 1)
+        self.assertEqual([result['status'] for result in rsp['results']],
+                         [201, 400])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_post_with_publish_before_last_operation(self):
+        """Testing the POST batch/ API with an operation publishing before
+        the last operation
+        """
+        operations = [
+            {
+                'method': 'PUT',
+                'path': get_review_item_url(self.review_request,
+                                            self.review.pk),
+                'data': {
+                    'public': True,
+                },
+            },
+            {
+                'method': 'GET',
+                'path': get_review_request_item_url(
+                    self.review_request.display_id),
+            },
+        ]
+
+        rsp = self.api_post(get_batch_url(),
+                            {'operations': json.dumps(operations)},
+                            expected_status=400)
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+        self.assertIn('operations', rsp['fields'])
+        self.assertFalse(Review.objects.get(pk=self.review.pk).public)
+
+    def test_post_with_local_site(self):
+        """Testing the POST batch/ API with a local site"""
+        self._login_user(local_site=True)
+
+        rsp = self.api_post(
+            get_batch_url(self.local_site_name),
+            {
+                'operations': json.dumps([{
+                    'method': 'GET',
+                    'path': get_user_item_url('doc', self.local_site_name),
+                }]),
+            },
+            expected_status=200,
+            expected_mimetype=batch_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        result = rsp['batch']['results'][0]
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['rsp']['user']['url'],
+                         '/s/%s/users/doc/' % self.local_site_name)
+
+    def test_post_with_unknown_path(self):
+        """Testing the POST batch/ API with a path outside the API"""
+        rsp = self.api_post(
+            get_batch_url(),
+            {
+                'operations': json.dumps([{
+                    'method': 'GET',
+                    'path': '/dashboard/',
+                }]),
+            },
+            expected_status=400)
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], BATCH_OPERATION_FAILED.code)
+        self.assertEqual(rsp['results'][0]['status'], 404)
+
+    def test_post_with_nested_batch(self):
+        """Testing the POST batch/ API with a nested batch operation"""
+        rsp = self.api_post(
+            get_batch_url(),
+            {
+                'operations': json.dumps([{
+                    'method': 'POST',
+                    'path': get_batch_url(),
+                    'data': {
+                        'operations': '[]',
+                    },
+                }]),
+            },
+            expected_status=400)
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], BATCH_OPERATION_FAILED.code)
+        self.assertEqual(rsp['results'][0]['status'], 404)
+
+    def test_post_with_invalid_operations(self):
+        """Testing the POST batch/ API with invalid operations"""
+        for operations in ('{', '[]', '[{"method": "PATCH", "path": "/"}]',
+                           '[{"method": "GET"}]'):
+            rsp = self.api_post(get_batch_url(),
+                                {'operations': operations},
+                                expected_status=400)
+            self.assertEqual(rsp['stat'], 'fail')
+            self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+            self.assertIn('operations', rsp['fields'])
@@ -0,0 +1,169 @@
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.six.moves.urllib.parse import parse_qs, urlparse
+from djblets.webapi.errors import INVALID_FORM_DATA
+
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import (
+    review_diff_comment_list_mimetype,
+    review_list_mimetype,
+    review_request_list_mimetype,
+    user_list_mimetype)
+from reviewboard.webapi.tests.urls import (get_review_diff_comment_list_url,
+                                           get_review_list_url,
+                                           get_review_request_list_url,
+                                           get_user_list_url)
+
+
+class CursorPaginationTests(BaseWebAPITestCase):
+    """Testing paginating lists with ?start-cursor="""
+    fixtures = ['test_users', 'test_scmtools']
+
+    def test_review_requests(self):
+        """Testing GET review-requests/?start-cursor= pages by last_updated
+        """
+        review_requests = [
+            self.create_review_request(publish=True)
+            for i in range(5)
+        ]
+
+        # Give some of the review requests the same timestamp, to make sure
+        # that ties are broken by ID.
+        ReviewRequest.objects.filter(
+            pk__in=[review_requests[1].pk, review_requests[2].pk,
+                    review_requests[3].pk]).update(
+            last_updated=timezone.now())
+
+        results = self._get_all_pages(get_review_request_list_url(),
+                                      review_request_list_mimetype,
+                                      'review_requests')
+
+        self.assertEqual(
+            [review_request['id'] for review_request in results],
+            list(ReviewRequest.objects.order_by('-last_updated', '-pk')
+                 .values_list('pk', flat=True)))
+
+    def test_reviews(self):
+        """Testing GET review-requests/<id>/reviews/?start-cursor="""
+        review_request = self.create_review_request(publish=True)
+        reviews = [
+            self.create_review(review_request, publish=True)
+            for i in range(5)
+        ]
+
+        results = self._get_all_pages(get_review_list_url(review_request),
+                                      review_list_mimetype, 'reviews')
+
+        self.assertEqual([review['id'] for review in results],
+                         [review.pk for review in reviews])
+
+    def test_diff_comments(self):
+        """Testing GET review-requests/<id>/reviews/<id>/diff-comments/
+        ?start-cursor=
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request, publish=True)
+        comments = [
+            self.create_diff_comment(review, filediff)
+            for i in range(5)
+        ]
+
+        results = self._get_all_pages(
+            get_review_diff_comment_list_url(review),
+            review_diff_comment_list_mimetype, 'diff_comments')
+
+        self.assertEqual([comment['id'] for comment in results],
+                         [comment.pk for comment in comments])
+
+    def test_users(self):
+        """Testing GET users/?start-cursor="""
+        results = self._get_all_pages(get_user_list_url(),
+                                      user_list_mimetype, 'users')
+
+        self.assertEqual(
+            [user['id'] for user in results],
+            list(User.objects.filter(is_active=True).order_by('pk')
+                 .values_list('pk', flat=True)))
+
+    def test_total_results(self):
+        """Testing GET review-requests/?start-cursor= with total results"""
+        for i in range(3):
+            self.create_review_request(publish=True)
+
+        rsp = self.api_get(get_review_request_list_url(),
+                           {'start-cursor': ''},
+                           expected_mimetype=review_request_list_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertEqual(rsp['total_results'], 3)
+        self.assertEqual(len(rsp['review_requests']), 3)
+        self.assertNotIn('next', rsp['links'])
+        self.assertNotIn('prev', rsp['links'])
+
+    def test_skip_total_results(self):
+        """Testing GET review-requests/?start-cursor=&skip-total-results=1"""
+        for i in range(3):
+            self.create_review_request(publish=True)
+
+        rsp = self.api_get(get_review_request_list_url(),
+                           {
+                               'start-cursor': '',
+                               'skip-total-results': 1,
+                               'max-results': 2,
+                           },
+                           expected_mimetype=review_request_list_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertNotIn('total_results', rsp)
+        self.assertEqual(len(rsp['review_requests']), 2)
+        self.assertIn('skip-total-results=1', rsp['links']['next']['href'])
+
+    def test_invalid_cursor(self):
+        """Testing GET review-requests/?start-cursor= with an invalid cursor
+        """
+        for cursor in ('bad-cursor', 'WyIxIl0'):
+            rsp = self.api_get(get_review_request_list_url(),
+                               {'start-cursor': cursor},
+                               expected_status=400)
+            self.assertEqual(rsp['stat'], 'fail')
+            self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+            self.assertIn('start-cursor', rsp['fields'])
+
+    def _get_all_pages(self, url, mimetype, result_key):
+        """Returns the results from every page of a list.
+
+        Each page contains two results, and is fetched by following the
+        ``next`` link of the previous page.
+        """
+        results = []
+        query = {
+            'start-cursor': '',
+            'max-results': 2,
+        }
+
+        while True:
+            rsp = self.api_get(url, query, expected_mimetype=mimetype)
+            self.assertEqual(rsp['stat'], 'ok')
+            self.assertNotIn('prev', rsp['links'])
+            self.assertLessEqual(len(rsp[result_key]), 2)
+
+            results += rsp[result_key]
+
+            if 'next' not in rsp['links']:
+                break
+
+            href = urlparse(rsp['links']['next']['href'])
+            self.assertEqual(href.path, url)
+
+            query = dict(
+                (key, values[0])
+                for key, values in parse_qs(href.query).items()
+            )
+
+        self.assertTrue(results)
+
+        return results
@@ -0,0 +1,190 @@
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviewboard.webapi.resources import resources
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import review_request_list_mimetype
+from reviewboard.webapi.tests.urls import (get_diff_list_url,
+                                           get_file_attachment_list_url,
+                                           get_repository_list_url,
+                                           get_review_diff_comment_list_url,
+                                           get_review_group_list_url,
+                                           get_review_list_url,
+                                           get_review_request_item_url,
+                                           get_review_request_list_url)
+
+
+class ListSerializationTests(BaseWebAPITestCase):
+    """Testing the number of queries used to serialize lists of objects.
+
+    Each test fetches a list, adds more objects, and fetches it again. The
+    number of queries must not depend on the number of objects in the list.
+    """
+    fixtures = ['test_users', 'test_scmtools', 'test_site']
+
+    def setUp(self):
+        super(ListSerializationTests, self).setUp()
+
+        self._login_user(local_site=True)
+        self.local_site = self.get_local_site(name=self.local_site_name)
+        self.repository = self.create_repository(
+            tool_name='Test',
+            local_site=self.local_site)
+        self.local_id = 0
+
+    def test_review_requests(self):
+        """Testing the number of queries for GET review-requests/"""
+        group = self.create_review_group(local_site=self.local_site)
+
+        def create_objects(count):
+            for i in range(count):
+                review_request = self._create_review_request()
+                review_request.target_groups.add(group)
+                review_request.target_people.add(review_request.submitter)
+                review_request.publish(review_request.submitter)
+
+        self._check_num_queries(
+            get_review_request_list_url(self.local_site_name),
+            create_objects)
+
+    def test_reviews(self):
+        """Testing the number of queries for GET review-requests/<id>/reviews/
+        """
+        review_request = self._create_review_request(publish=True)
+
+        def create_objects(count):
+            for i in range(count):
+                self.create_review(review_request, username='doc',
+                                   publish=True)
+
+        self._check_num_queries(
+            get_review_list_url(review_request, self.local_site_name),
+            create_objects)
+
+    def test_diff_comments(self):
+        """Testing the number of queries for
+        GET review-requests/<id>/reviews/<id>/diff-comments/
+        """
+        review_request = self._create_review_request(publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request, username='doc',
+                                    publish=True)
+
+        def create_objects(count):
+            for i in range(count):
+                self.create_diff_comment(review, filediff)
+
+        self._check_num_queries(
+            get_review_diff_comment_list_url(review, self.local_site_name),
+            create_objects)
+
+    def test_diffs(self):
+        """Testing the number of queries for GET review-requests/<id>/diffs/
+        """
+        review_request = self._create_review_request(publish=True)
+        revisions = []
+
+        def create_objects(count):
+            for i in range(count):
+                revisions.append(len(revisions) + 1)
+                self.create_diffset(review_request, revision=revisions[-1])
+
+        self._check_num_queries(
+            get_diff_list_url(review_request, self.local_site_name),
+            create_objects)
+
+    def test_file_attachments(self):
+        """Testing the number of queries for
+        GET review-requests/<id>/file-attachments/
+        """
+        review_request = self._create_review_request(publish=True)
+
+        def create_objects(count):
+            for i in range(count):
+                self.create_file_attachment(review_request)
+
+        self._check_num_queries(
+            get_file_attachment_list_url(review_request,
+                                         self.local_site_name),
+            create_objects)
+
+    def test_repositories(self):
+        """Testing the number of queries for GET repositories/"""
+        def create_objects(count):
+            for i in range(count):
+                self.local_id += 1
+                self.create_repository(tool_name='Test',
+                                       name='Repo %d' % self.local_id,
+                                       path='/repo%d' % self.local_id,
+                                       local_site=self.local_site)
+
+        self._check_num_queries(
+            get_repository_list_url(self.local_site_name),
+            create_objects)
+
+    def test_review_groups(self):
+        """Testing the number of queries for GET groups/"""
+        def create_objects(count):
+            for i in range(count):
+                self.local_id += 1
+                self.create_review_group(name='group%d' % self.local_id,
+                                         local_site=self.local_site)
+
+        self._check_num_queries(
+            get_review_group_list_url(self.local_site_name),
+            create_objects)
+
+    def test_item_urls(self):
+        """Testing item URLs in lists match those reversed individually"""
+        review_requests = [
+            self._create_review_request(publish=True)
+            for i in range(3)
+        ]
+
+        rsp = self.api_get(get_review_request_list_url(self.local_site_name),
+                           expected_mimetype=review_request_list_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        hrefs = sorted(
+            item['links']['self']['href']
+            for item in rsp[resources.review_request.list_result_key]
+        )
+
+        self.assertEqual(
+            hrefs,
+            sorted(
+                self.base_url +
+                get_review_request_item_url(review_request.display_id,
+                                            self.local_site_name)
+                for review_request in review_requests
+            ))
+
+    def _create_review_request(self, **kwargs):
+        self.local_id += 1
+
+        return self.create_review_request(local_site=self.local_site,
+                                          local_id=self.local_id,
+                                          repository=self.repository,
+                                          **kwargs)
+
+    def _get_num_queries(self, url):
+        # The first request after creating objects may need to populate
+        # caches for the user, so only the second is counted.
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            rsp = self.client.get(url)
+
+        self.assertEqual(rsp.status_code, 200)
+
+        return len(queries)
+
+    def _check_num_queries(self, url, create_objects):
+        create_objects(2)
+        num_queries = self._get_num_queries(url)
+
+        create_objects(3)
+        self.assertEqual(self._get_num_queries(url), num_queries)
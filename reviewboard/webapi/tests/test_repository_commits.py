@@ -46,6 +46,24 @@ class ResourceTests(BaseWebAPITestCase):
         self.assertEqual(rsp['commits'][0]['message'], 'Commit 5')
         self.assertEqual(rsp['commits'][3]['author_name'], 'user2')
 
+    def test_get_from_index(self):
+        """Testing the GET repositories/<id>/commits/ API indexes commits"""
+        repository = self.create_repository(tool_name='Test')
+
+        rsp = self.api_get(get_repository_commits_url(repository),
+                           expected_mimetype=repository_commits_item_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertEqual(len(rsp['commits']), 10)
+        self.assertEqual(rsp['commits'][0]['id'], '10')
+        self.assertEqual(repository.indexed_commits.count(), 10)
+
+        rsp = self.api_get(get_repository_commits_url(repository),
+                           query={'start': rsp['commits'][4]['parent']},
+                           expected_mimetype=repository_commits_item_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertEqual(len(rsp['commits']), 5)
+        self.assertEqual(rsp['commits'][0]['message'], 'Commit 5')
+
     @add_fixtures(['test_site'])
     def test_get_with_site(self):
         """Testing the GET repositories/<id>/commits/ API with a local site"""
@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+
+from django.test.utils import override_settings
+
+from reviewboard.reviews.updates import get_update_token
+from reviewboard.webapi.resources import review_request_last_update
+from reviewboard.webapi.resources import resources
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import \
+    review_request_last_update_item_mimetype
+from reviewboard.webapi.tests.urls import get_review_request_last_update_url
+
+
+class ResourceTests(BaseWebAPITestCase):
+    """Testing the ReviewRequestLastUpdateResource APIs."""
+    fixtures = ['test_users']
+    sample_api_url = 'review-requests/<id>/last-update/'
+    resource = resources.review_request_last_update
+
+    def test_get(self):
+        """Testing the GET review-requests/<id>/last-update/ API"""
+        review_request = self.create_review_request(publish=True)
+
+        rsp = self.api_get(
+            get_review_request_last_update_url(review_request),
+            expected_mimetype=review_request_last_update_item_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        last_update = rsp['last_update']
+        self.assertEqual(last_update['type'], 'review-request')
+        self.assertEqual(last_update['update_token'],
+                         get_update_token(review_request.pk))
+        self.assertEqual(last_update['update_wait'], 0)
+
+    def test_get_with_update_token_not_modified(self):
+        """Testing the GET review-requests/<id>/last-update/?update-token=
+        API without new updates
+        """
+        review_request = self.create_review_request(publish=True)
+
+        rsp = self.client.get(
+            get_review_request_last_update_url(review_request),
+            {
+                'update-token': get_update_token(review_request.pk),
+            })
+        self.assertEqual(rsp.status_code, 304)
+
+    def test_get_with_update_token_and_new_review(self):
+        """Testing the GET review-requests/<id>/last-update/?update-token=
+        API with a new review
+        """
+        review_request = self.create_review_request(publish=True)
+        update_token = get_update_token(review_request.pk)
+
+        review = self.create_review(review_request, username='grumpy')
+        review.publish()
+
+        rsp = self.api_get(
+            get_review_request_last_update_url(review_request),
+            {
+                'update-token': update_token,
+                'wait': 30,
+            },
+            expected_mimetype=review_request_last_update_item_mimetype)
+        self.assertEqual(rsp['stat'], 'ok')
+
+        self.assertEqual(rsp['last_update']['update_token'],
+                         get_update_token(review_request.pk))
+        self.assertNotEqual(rsp['last_update']['update_token'], update_token)
+
+    def test_get_with_wait_disabled(self):
+        """Testing the GET review-requests/<id>/last-update/?wait= API
+        doesn't wait when waiting is disabled
+        """
+        self._test_get_with_wait(30, None)
+
+    @override_settings(REVIEW_REQUEST_UPDATES_MAX_WAIT=10)
+    def test_get_with_wait_enabled(self):
+        """Testing the GET review-requests/<id>/last-update/?wait= API
+        waits for up to REVIEW_REQUEST_UPDATES_MAX_WAIT seconds
+        """
+        self._test_get_with_wait(30, 10)
+
+    def _test_get_with_wait(self, wait, expected_wait):
+        def _wait_for_update(review_request_id, token, timeout):
+            waits.append(timeout)
+            return token
+
+        waits = []
+        review_request = self.create_review_request(publish=True)
+        old_wait_for_update = review_request_last_update.wait_for_update
+        review_request_last_update.wait_for_update = _wait_for_update
+
+        try:
+            rsp = self.client.get(
+                get_review_request_last_update_url(review_request),
+                {
+                    'update-token': get_update_token(review_request.pk),
+                    'wait': wait,
+                })
+        finally:
+            review_request_last_update.wait_for_update = old_wait_for_update
+
+        self.assertEqual(rsp.status_code, 304)
+
+        if expected_wait is None:
+            self.assertEqual(waits, [])
+        else:
+            self.assertEqual(waits, [expected_wait])
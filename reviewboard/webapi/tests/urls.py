@@ -34,6 +34,13 @@ def get_api_token_item_url(token, local_site_name=None):
         api_token_id=token.pk)
 
 
+#
+# BatchResource
+#
+def get_batch_url(local_site_name=None):
+    return resources.batch.get_item_url(local_site_name=local_site_name)
+
+
 #
 # ChangeResource
 #
@@ -560,6 +567,15 @@ def get_review_request_draft_url(review_request, local_site_name=None):
         review_request_id=review_request.display_id)
 
 
+#
+# ReviewRequestLastUpdateResource
+#
+def get_review_request_last_update_url(review_request, local_site_name=None):
+    return resources.review_request_last_update.get_item_url(
+        local_site_name=local_site_name,
+        review_request_id=review_request.display_id)
+
+
 #
 # ReviewScreenshotCommentResource
 #